@@ -1,6 +1,6 @@
 """
 Package des routes API
 """
-from api import calls, audio, insights, summary
+from api import calls, audio, insights, events, summary, analytics, jobs, metrics, admin
 
-__all__ = ["calls", "audio", "insights", "summary"]
+__all__ = ["calls", "audio", "insights", "events", "summary", "analytics", "jobs", "metrics", "admin"]
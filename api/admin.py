@@ -0,0 +1,84 @@
+"""
+Routes API d'administration (jeton X-Admin-Token, désactivées si ADMIN_TOKEN n'est pas défini)
+"""
+import logging
+import asyncio
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from typing import Optional
+
+from core.profiler import Collector, get_profiler, is_admin_token
+from config.live_config import ConfigError, get_config_watcher
+from config.settings import ADMIN_TOKEN, PROFILER_MAX_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Administration désactivée (ADMIN_TOKEN non défini)")
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="Jeton d'administration invalide")
+
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+_FORMAT = Query("collapsed", pattern="^(collapsed|speedscope)$")
+
+
+def _render(collector: Collector, format: str) -> Response:
+    profiler = get_profiler()
+    if format == "speedscope":
+        return JSONResponse(collector.speedscope(profiler.labels(), profiler.interval_ms))
+    return PlainTextResponse(collector.collapsed(profiler.labels()))
+
+
+@router.post("/profile")
+async def profile(
+    seconds: float = Query(10.0, gt=0, le=PROFILER_MAX_SECONDS),
+    session_id: Optional[str] = Query(None),
+    route: Optional[str] = Query(None, description="Préfixe de chemin, ex: /audio"),
+    threads: bool = Query(False, description="Inclure les autres threads (pool LLM, Deepgram)"),
+    format: str = _FORMAT
+) -> Response:
+    """
+    Échantillonne le process pendant `seconds` secondes et renvoie le profil
+
+    Sans filtre : toute la boucle asyncio (attente d'E/S comprise). Avec session_id ou route :
+    uniquement le temps passé pour les requêtes correspondantes (et les tâches qu'elles lancent).
+    Format : piles repliées (flamegraph.pl, speedscope) ou JSON speedscope.
+    """
+    profiler = get_profiler()
+    collector = profiler.start(Collector(session_id=session_id, route=route, threads=threads))
+    logger.info(f"[PROFILER] 🔬 Profil {collector.describe()} pendant {seconds:g}s")
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.stop(collector)
+    profiler.keep_result(collector)
+    return _render(collector, format)
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str, format: str = _FORMAT) -> Response:
+    """Profil d'une requête /audio envoyée avec X-Profile: 1 (identifiant : en-tête X-Profile-Id)"""
+    collector = get_profiler().get_result(profile_id)
+    if collector is None:
+        raise HTTPException(status_code=404, detail="Profil inconnu ou expiré")
+    return _render(collector, format)
+
+
+@router.post("/config/reload")
+async def reload_config() -> dict:
+    """
+    Recharge audio_config.yaml et company_context.yaml sans attendre la surveillance
+
+    422 si un fichier est invalide (la configuration courante reste en place).
+    """
+    watcher = get_config_watcher()
+    try:
+        changed = await asyncio.to_thread(watcher.reload)
+    except ConfigError as e:
+        logger.error(f"[CONFIG] ❌ Rechargement refusé: {e}")
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"changed": changed, **watcher.snapshot()}
@@ -0,0 +1,43 @@
+"""
+Routes API des statistiques toutes sessions confondues
+"""
+import logging
+from fastapi import APIRouter, Query
+from typing import Any, Dict
+
+from core.analytics import get_session_analytics, merge_states, summarize
+from core.cluster import get_cluster_router
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["analytics"])
+
+
+@router.get("/analytics")
+async def get_analytics(
+    scope: str = Query("cluster", pattern="^(node|cluster)$"),
+    raw: bool = Query(False)
+) -> Dict[str, Any]:
+    """
+    Statistiques d'équipe : concepts, progression des piliers, types d'insights par phase,
+    taux de doublons bloqués, distributions par appel, activité de la dernière heure / 24h
+
+    Lecture d'agrégats tenus à jour en continu : coût constant, quel que soit le volume d'appels.
+
+    Args:
+        scope: "cluster" (somme des nœuds, par défaut) ou "node" (ce nœud seulement, tous ses workers)
+        raw: état brut additionnable (utilisé entre nœuds)
+    """
+    state = await get_session_analytics().export_node()
+    router_ = get_cluster_router()
+    nodes = {router_.node_id if router_ else "local": "ok"}
+
+    if scope == "cluster" and router_ is not None:
+        for node, peer_state in (await router_.fetch_from_peers("/analytics?scope=node&raw=true")).items():
+            nodes[node] = "ok" if peer_state is not None else "unreachable"
+            if peer_state is not None:
+                state = merge_states(state, peer_state)
+
+    if raw:
+        return state
+    return {"scope": scope if router_ else "node", "nodes": nodes, **summarize(state)}
@@ -2,13 +2,19 @@
 Routes API pour le traitement audio et génération d'insights
 """
 import logging
+import time
 import numpy as np
 from datetime import datetime
+from typing import Any, Dict
 from fastapi import APIRouter, Request, HTTPException
 
 from services import TranscriptionService, CoachingService
 from services.relevance_filter import RelevanceFilter
-from api.calls import get_active_calls
+from services.audio_pool import analyze_chunk
+from services.metrics import get_metrics, span
+from services.capture import get_capture
+from core.session_store import get_session_store, SessionNotFoundError
+from core.session_pipeline import get_session_pipelines, DuplicateChunkError
 from config.settings import (
     TIME_THRESHOLD_DUPLICATE,
     COOLDOWN_BASE,
@@ -17,43 +23,115 @@ from config.settings import (
     MIN_RELEVANCE_SCORE,
     ALLOW_COOLDOWN_BYPASS
 )
+from config.log_pipeline import get_category_logger, CATEGORY_INSIGHTS
+from config.live_config import get_config
 
 logger = logging.getLogger(__name__)
+insights_logger = get_category_logger(__name__, CATEGORY_INSIGHTS)
 
 router = APIRouter(tags=["audio"])
 
-# Services
-transcription_service = TranscriptionService()
+# Services (TranscriptionService construit au premier usage : le démarrage n'en dépend pas)
+_transcription_service = None
 coaching_service = CoachingService()
 relevance_filter = RelevanceFilter()
 
 
+def get_transcription_service() -> TranscriptionService:
+    """Lazy loading du service de transcription"""
+    global _transcription_service
+    if _transcription_service is None:
+        _transcription_service = TranscriptionService()
+    return _transcription_service
+
+
+# Raison de non-génération (champ "reason" de la réponse) → issue pour /metrics
+_OUTCOMES = {
+    "duplicate_chunk": "duplicate_chunk",
+    "cooldown_active": "cooldown",
+    "low_relevance": "low_relevance",
+    "duplicate": "duplicate",
+}
+
+
+def _outcome(result: Dict[str, Any]) -> str:
+    if result.get("advice"):
+        return "accepted"
+    if result.get("reason") in _OUTCOMES:
+        return _OUTCOMES[result["reason"]]
+    return "no_insight" if result.get("transcription") else "silence"
+
+
 @router.post("/audio/{session_id}")
 async def process_audio(session_id: str, request: Request):
     """
     Traite l'audio client et commercial, génère des insights
     Version optimisée avec contexte structuré enrichi
+
+    La transcription (sans état) se fait en parallèle, hors pipeline ; la mise à jour de
+    la session et la génération d'insight passent par le pipeline ordonné de la session.
+
+    Numéro de séquence optionnel du chunk (à partir de 0) : en-tête X-Chunk-Seq
+    ou champ de formulaire `seq`.
+
+    Durée totale par issue (accepted, cooldown, low_relevance, duplicate...) dans /metrics.
+    Avec CAPTURE_DIR, chunk, transcriptions, réponses LLM et issue sont capturés (rejeu).
     """
+    start = time.perf_counter()
+    outcome = "error"
+    result = None
+    try:
+        result = await _process_audio(session_id, request)
+        outcome = _outcome(result)
+        return result
+    finally:
+        seconds = time.perf_counter() - start
+        get_metrics().record_request(outcome, seconds)
+        if get_capture().enabled:
+            get_capture().result(outcome, result, seconds)
+
+
+async def _process_audio(session_id: str, request: Request) -> Dict[str, Any]:
+    store = get_session_store()
     
-    active_calls = get_active_calls()
-    
-    if session_id not in active_calls:
+    if not await store.exists(session_id):
         raise HTTPException(status_code=404, detail="Session non trouvée")
     
-    manager = active_calls[session_id]
+    transcription_service = get_transcription_service()
     
     # Récupérer les fichiers audio
-    form = await request.form()
+    with span("form"):
+        form = await request.form()
     client_audio_file = form.get('client_audio')
     commercial_audio_file = form.get('commercial_audio')
     
     if not client_audio_file or not commercial_audio_file:
         raise HTTPException(status_code=400, detail="Les deux fichiers audio sont requis")
+
+    raw_seq = request.headers.get("X-Chunk-Seq", form.get("seq"))
+    try:
+        seq = int(raw_seq) if raw_seq is not None else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Numéro de séquence invalide")
+    if seq is not None and seq < 0:
+        raise HTTPException(status_code=400, detail="Numéro de séquence invalide")
+
+    pipeline = get_session_pipelines().get(session_id)
+    await pipeline.prepare(seq)
+    if pipeline.is_duplicate(seq):
+        return {"advice": None, "transcription": "", "reason": "duplicate_chunk", "seq": seq}
     
     # Lire les données audio
-    client_data = await client_audio_file.read()
-    commercial_data = await commercial_audio_file.read()
+    with span("form"):
+        client_data = await client_audio_file.read()
+        commercial_data = await commercial_audio_file.read()
     
+    if len(client_data) % 2 or len(commercial_data) % 2:
+        raise HTTPException(status_code=400, detail="Audio PCM 16 bits attendu (nombre d'octets impair)")
+
+    if get_capture().enabled:
+        get_capture().chunk(session_id, seq, client_data, commercial_data)
+
     client_audio = np.frombuffer(client_data, dtype=np.int16)
     commercial_audio = np.frombuffer(commercial_data, dtype=np.int16)
 
@@ -61,8 +139,13 @@ async def process_audio(session_id: str, request: Request):
     # 🆕 DÉTECTION DE L'ORDRE CHRONOLOGIQUE
     # ═══════════════════════════════════════════════════════════════════════════
     # Détecte qui a parlé en premier en analysant le début de la parole dans chaque audio
-    client_start_time = transcription_service.detect_speech_start_time(client_audio, "CLIENT")
-    commercial_start_time = transcription_service.detect_speech_start_time(commercial_audio, "COMMERCIAL")
+    # (+ détection de silence), dans le pool audio s'il est activé
+    # Un seul instantané de configuration pour tout le chunk (rechargement à chaud en cours de route)
+    config = get_config()
+    with span("vad"):
+        (client_start_time, client_silent), (commercial_start_time, commercial_silent) = await analyze_chunk(
+            client_audio, commercial_audio, config
+        )
 
     # Déterminer qui a parlé en premier
     client_spoke_first = client_start_time < commercial_start_time
@@ -73,24 +156,52 @@ async def process_audio(session_id: str, request: Request):
     # TRANSCRIPTION PARALLÈLE
     client_text, commercial_text = await transcription_service.transcribe_parallel(
         client_audio,
-        commercial_audio
+        commercial_audio,
+        silent=(client_silent, commercial_silent),
+        config=config
     )
 
+    # Étape avec état : dans l'ordre des chunks, une à la fois, sous le verrou de la session
+    queued_at = time.perf_counter()
+
+    def update_and_coach(manager):
+        get_metrics().observe_stage("pipeline_wait", time.perf_counter() - queued_at)
+        return _update_session_and_coach(manager, session_id, client_text, commercial_text, client_spoke_first)
+
+    try:
+        return await pipeline.submit(seq, update_and_coach)
+    except DuplicateChunkError:
+        return {"advice": None, "transcription": "", "reason": "duplicate_chunk", "seq": seq}
+    except SessionNotFoundError:
+        # Session terminée (/end) ou évincée pendant la transcription du chunk
+        get_session_pipelines().discard(session_id)
+        raise HTTPException(status_code=404, detail="Session non trouvée")
+
+
+async def _update_session_and_coach(
+    manager,
+    session_id: str,
+    client_text: str,
+    commercial_text: str,
+    client_spoke_first: bool
+):
+    """Ajoute les transcriptions à la session puis génère (ou non) un insight"""
     # ═══════════════════════════════════════════════════════════════════════════
     # ✅ AJOUT AU CONTEXTE DANS L'ORDRE CHRONOLOGIQUE
     # ═══════════════════════════════════════════════════════════════════════════
-    if client_spoke_first:
-        # CLIENT a parlé en premier → ajouter dans l'ordre : CLIENT puis COMMERCIAL
-        if client_text:
-            await manager.add_message("assistant", client_text)
-        if commercial_text:
-            await manager.add_message("user", commercial_text)
-    else:
-        # COMMERCIAL a parlé en premier → ajouter dans l'ordre : COMMERCIAL puis CLIENT
-        if commercial_text:
-            await manager.add_message("user", commercial_text)
-        if client_text:
-            await manager.add_message("assistant", client_text)
+    with span("session_update"):
+        if client_spoke_first:
+            # CLIENT a parlé en premier → ajouter dans l'ordre : CLIENT puis COMMERCIAL
+            if client_text:
+                await manager.add_message("assistant", client_text)
+            if commercial_text:
+                await manager.add_message("user", commercial_text)
+        else:
+            # COMMERCIAL a parlé en premier → ajouter dans l'ordre : COMMERCIAL puis CLIENT
+            if commercial_text:
+                await manager.add_message("user", commercial_text)
+            if client_text:
+                await manager.add_message("assistant", client_text)
 
     # Log historique
     if client_text or commercial_text:
@@ -105,13 +216,14 @@ async def process_audio(session_id: str, request: Request):
     # ═══════════════════════════════════════════════════════════════════════════
 
     # 1. Vérifier le score de pertinence AVANT de générer l'insight
-    should_generate, relevance_score, analysis = relevance_filter.should_generate_insight(
-        manager.messages,
-        manager.pillar_progress,
-        manager.last_insight_time,
-        manager.conversation_phase,
-        min_score=MIN_RELEVANCE_SCORE
-    )
+    with span("relevance"):
+        should_generate, relevance_score, analysis = relevance_filter.should_generate_insight(
+            manager.messages,
+            manager.pillar_progress,
+            manager.last_insight_time,
+            manager.conversation_phase,
+            min_score=MIN_RELEVANCE_SCORE
+        )
 
     # 2. Cooldown adaptatif
     current_time = datetime.now().timestamp()
@@ -130,13 +242,13 @@ async def process_audio(session_id: str, request: Request):
     can_bypass = ALLOW_COOLDOWN_BYPASS and relevance_score >= 85
 
     if cooldown_active and not can_bypass:
-        logger.info(f"\n{'='*80}")
-        logger.info(f"[COOLDOWN] ⏸️  INSIGHT BLOQUÉ - COOLDOWN ACTIF")
-        logger.info(f"{'='*80}")
-        logger.info(f"[COOLDOWN] ⏱️  Temps écoulé: {elapsed_since_last:.1f}s / {required_cooldown}s requis")
-        logger.info(f"[COOLDOWN] 📊 Score de pertinence: {relevance_score}/100")
-        logger.info(f"[COOLDOWN] 🚫 Raison: Cooldown adaptatif en cours")
-        logger.info(f"{'='*80}\n")
+        insights_logger.info(f"\n{'='*80}")
+        insights_logger.info(f"[COOLDOWN] ⏸️  INSIGHT BLOQUÉ - COOLDOWN ACTIF")
+        insights_logger.info(f"{'='*80}")
+        insights_logger.info(f"[COOLDOWN] ⏱️  Temps écoulé: {elapsed_since_last:.1f}s / {required_cooldown}s requis")
+        insights_logger.info(f"[COOLDOWN] 📊 Score de pertinence: {relevance_score}/100")
+        insights_logger.info(f"[COOLDOWN] 🚫 Raison: Cooldown adaptatif en cours")
+        insights_logger.info(f"{'='*80}\n")
 
         return {
             "advice": None,
@@ -151,13 +263,13 @@ async def process_audio(session_id: str, request: Request):
 
     # Si score trop faible, ne pas générer
     if not should_generate:
-        logger.info(f"\n{'='*80}")
-        logger.info(f"[PERTINENCE] 🚫 INSIGHT NON GÉNÉRÉ - SCORE TROP FAIBLE")
-        logger.info(f"{'='*80}")
-        logger.info(f"[PERTINENCE] 📊 Score: {relevance_score}/100 (min requis: {MIN_RELEVANCE_SCORE})")
-        logger.info(f"[PERTINENCE] 📝 Analyse: {', '.join(analysis['reasons'])}")
-        logger.info(f"[PERTINENCE] 💡 Triggers: {', '.join(analysis['triggers']) if analysis['triggers'] else 'Aucun'}")
-        logger.info(f"{'='*80}\n")
+        insights_logger.info(f"\n{'='*80}")
+        insights_logger.info(f"[PERTINENCE] 🚫 INSIGHT NON GÉNÉRÉ - SCORE TROP FAIBLE")
+        insights_logger.info(f"{'='*80}")
+        insights_logger.info(f"[PERTINENCE] 📊 Score: {relevance_score}/100 (min requis: {MIN_RELEVANCE_SCORE})")
+        insights_logger.info(f"[PERTINENCE] 📝 Analyse: {', '.join(analysis['reasons'])}")
+        insights_logger.info(f"[PERTINENCE] 💡 Triggers: {', '.join(analysis['triggers']) if analysis['triggers'] else 'Aucun'}")
+        insights_logger.info(f"{'='*80}\n")
 
         return {
             "advice": None,
@@ -171,24 +283,26 @@ async def process_audio(session_id: str, request: Request):
         }
 
     # 3. Si on arrive ici : pertinence OK + cooldown OK → Générer l'insight
-    logger.info(f"\n{'='*80}")
-    logger.info(f"[PERTINENCE] ✅ GÉNÉRATION D'INSIGHT AUTORISÉE")
-    logger.info(f"{'='*80}")
-    logger.info(f"[PERTINENCE] 📊 Score: {relevance_score}/100")
-    logger.info(f"[PERTINENCE] ⏱️  Cooldown: {elapsed_since_last:.1f}s (requis: {required_cooldown}s)")
-    logger.info(f"[PERTINENCE] 🎯 Triggers: {', '.join(analysis['triggers'])}")
-    logger.info(f"{'='*80}\n")
+    insights_logger.info(f"\n{'='*80}")
+    insights_logger.info(f"[PERTINENCE] ✅ GÉNÉRATION D'INSIGHT AUTORISÉE")
+    insights_logger.info(f"{'='*80}")
+    insights_logger.info(f"[PERTINENCE] 📊 Score: {relevance_score}/100")
+    insights_logger.info(f"[PERTINENCE] ⏱️  Cooldown: {elapsed_since_last:.1f}s (requis: {required_cooldown}s)")
+    insights_logger.info(f"[PERTINENCE] 🎯 Triggers: {', '.join(analysis['triggers'])}")
+    insights_logger.info(f"{'='*80}\n")
 
     # CONSTRUCTION DU CONTEXTE
-    context_window = manager.get_context_window()
-    context = "\n".join([
-        f"{'COMMERCIAL' if msg['role'] == 'user' else 'CLIENT'}: {msg['content']}" 
-        for msg in context_window
-    ])
+    with span("prompt_build"):
+        context_window = manager.get_context_window()
+        context = "\n".join([
+            f"{'COMMERCIAL' if msg['role'] == 'user' else 'CLIENT'}: {msg['content']}" 
+            for msg in context_window
+        ])
+        prompt = coaching_service.build_coaching_prompt(context, manager)
     
     # GÉNÉRATION DU COACHING
-    prompt = coaching_service.build_coaching_prompt(context, manager)
-    raw_advice = await coaching_service.generate_insight(prompt)
+    with span("llm_coaching"):
+        raw_advice = await coaching_service.generate_insight(prompt, session_id=session_id)
     
     if not raw_advice:
         return {
@@ -197,7 +311,8 @@ async def process_audio(session_id: str, request: Request):
         }
     
     # PARSING
-    advice_json = coaching_service.parse_insight_response(raw_advice)
+    with span("parse"):
+        advice_json = coaching_service.parse_insight_response(raw_advice)
     
     if not advice_json:
         return {
@@ -209,60 +324,64 @@ async def process_audio(session_id: str, request: Request):
     full_insight = f"{advice_json['title']} - {advice_json['details']['description']}"
 
     # VÉRIFICATION ANTI-DOUBLON
-    logger.info(f"\n{'='*80}")
-    logger.info(f"[ANTI-DOUBLON] 🔍 VÉRIFICATION DOUBLON EN COURS")
-    logger.info(f"{'='*80}")
-    logger.info(f"[INSIGHT] 📝 NOUVEL INSIGHT GÉNÉRÉ:")
-    logger.info(f"[INSIGHT]    Type: {advice_json['type'].upper()}")
-    logger.info(f"[INSIGHT]    Titre: {advice_json['title']}")
-    logger.info(f"[INSIGHT]    Action: {advice_json['details']['description']}")
-    logger.info(f"[INSIGHT]    Insight complet: {full_insight}")
-    logger.info(f"{'='*80}")
+    insights_logger.info(f"\n{'='*80}")
+    insights_logger.info(f"[ANTI-DOUBLON] 🔍 VÉRIFICATION DOUBLON EN COURS")
+    insights_logger.info(f"{'='*80}")
+    insights_logger.info(f"[INSIGHT] 📝 NOUVEL INSIGHT GÉNÉRÉ:")
+    insights_logger.info(f"[INSIGHT]    Type: {advice_json['type'].upper()}")
+    insights_logger.info(f"[INSIGHT]    Titre: {advice_json['title']}")
+    insights_logger.info(f"[INSIGHT]    Action: {advice_json['details']['description']}")
+    insights_logger.info(f"[INSIGHT]    Insight complet: {full_insight}")
+    insights_logger.info(f"{'='*80}")
 
     # Vérification de doublon avec détection titre + sémantique
-    is_duplicate = await manager.is_duplicate_insight(
-        full_insight,
-        new_title=advice_json['title'],  # ✅ Passer le titre pour vérification anti-répétition
-        time_threshold_seconds=TIME_THRESHOLD_DUPLICATE
-    )
+    with span("duplicate_check"):
+        is_duplicate = await manager.is_duplicate_insight(
+            full_insight,
+            new_title=advice_json['title'],  # ✅ Passer le titre pour vérification anti-répétition
+            time_threshold_seconds=TIME_THRESHOLD_DUPLICATE
+        )
 
     if is_duplicate:
-        logger.info(f"\n{'='*80}")
-        logger.info(f"[ANTI-DOUBLON] ❌ INSIGHT REJETÉ - DOUBLON DÉTECTÉ")
-        logger.info(f"{'='*80}")
-        logger.info(f"[INSIGHT] 🚫 INSIGHT BLOQUÉ:")
-        logger.info(f"[INSIGHT]    Type: {advice_json['type'].upper()}")
-        logger.info(f"[INSIGHT]    Titre: {advice_json['title']}")
-        logger.info(f"[INSIGHT]    Action: {advice_json['details']['description']}")
-        logger.info(f"[INSIGHT]    Insight complet: {full_insight}")
-        logger.info(f"")
-        logger.info(f"[INSIGHT] 📊 HISTORIQUE DES INSIGHTS (pour comparaison):")
+        insights_logger.info(f"\n{'='*80}")
+        insights_logger.info(f"[ANTI-DOUBLON] ❌ INSIGHT REJETÉ - DOUBLON DÉTECTÉ")
+        insights_logger.info(f"{'='*80}")
+        insights_logger.info(f"[INSIGHT] 🚫 INSIGHT BLOQUÉ:")
+        insights_logger.info(f"[INSIGHT]    Type: {advice_json['type'].upper()}")
+        insights_logger.info(f"[INSIGHT]    Titre: {advice_json['title']}")
+        insights_logger.info(f"[INSIGHT]    Action: {advice_json['details']['description']}")
+        insights_logger.info(f"[INSIGHT]    Insight complet: {full_insight}")
+        insights_logger.info(f"")
+        insights_logger.info(f"[INSIGHT] 📊 HISTORIQUE DES INSIGHTS (pour comparaison):")
         for i, old_insight in enumerate(manager.last_insights[-5:], 1):
-            logger.info(f"[INSIGHT]    {i}. {old_insight[:80]}...")
-        logger.info(f"{'='*80}\n")
+            insights_logger.info(f"[INSIGHT]    {i}. {old_insight[:80]}...")
+        insights_logger.info(f"{'='*80}\n")
+
+        blocked_insight = {
+            "type": advice_json['type'],
+            "title": advice_json['title'],
+            "description": advice_json['details']['description'],
+            "full_text": full_insight
+        }
+        manager.publish_event("insight_blocked", {"reason": "duplicate", **blocked_insight})
 
         return {
             "advice": None,
             "transcription": f"CLIENT: {client_text}\nCOMMERCIAL: {commercial_text}",
             "reason": "duplicate",
-            "blocked_insight": {
-                "type": advice_json['type'],
-                "title": advice_json['title'],
-                "description": advice_json['details']['description'],
-                "full_text": full_insight
-            }
+            "blocked_insight": blocked_insight
         }
 
     # Ajouter l'insight au cache
-    logger.info(f"\n{'='*80}")
-    logger.info(f"[ANTI-DOUBLON] ✅ INSIGHT VALIDÉ ET ACCEPTÉ")
-    logger.info(f"{'='*80}")
-    logger.info(f"[INSIGHT] ✨ AJOUT AU CACHE:")
-    logger.info(f"[INSIGHT]    Type: {advice_json['type'].upper()}")
-    logger.info(f"[INSIGHT]    Titre: {advice_json['title']}")
-    logger.info(f"[INSIGHT]    Action: {advice_json['details']['description']}")
-    logger.info(f"{'='*80}\n")
-    manager.add_insight(full_insight, title=advice_json['title'])  # ✅ Passer le titre pour tracking
+    insights_logger.info(f"\n{'='*80}")
+    insights_logger.info(f"[ANTI-DOUBLON] ✅ INSIGHT VALIDÉ ET ACCEPTÉ")
+    insights_logger.info(f"{'='*80}")
+    insights_logger.info(f"[INSIGHT] ✨ AJOUT AU CACHE:")
+    insights_logger.info(f"[INSIGHT]    Type: {advice_json['type'].upper()}")
+    insights_logger.info(f"[INSIGHT]    Titre: {advice_json['title']}")
+    insights_logger.info(f"[INSIGHT]    Action: {advice_json['details']['description']}")
+    insights_logger.info(f"{'='*80}\n")
+    manager.add_insight(full_insight, title=advice_json['title'], insight_type=advice_json.get('type'))
     
     return {
         "advice": advice_json,
@@ -2,39 +2,43 @@
 Routes API pour la gestion des sessions d'appels
 """
 import logging
-import uuid
 from fastapi import APIRouter, HTTPException
 from typing import Dict, Any
 
 from models import CallConfig
 from core import CallManager
+from core.session_store import get_session_store
+from core.session_pipeline import get_session_pipelines
+from core.cluster import new_call_id
+from core.event_bus import get_event_bus
+from core.analytics import get_session_analytics
+from config.log_pipeline import get_category_logger, CATEGORY_TRANSCRIPTION
 
 logger = logging.getLogger(__name__)
+transcription_logger = get_category_logger(__name__, CATEGORY_TRANSCRIPTION)
 
 router = APIRouter(prefix="/calls", tags=["calls"])
 
-# Stockage des sessions actives
-active_calls: Dict[str, CallManager] = {}
-
 
 @router.post("/start")
 async def start_call(config: CallConfig = None) -> Dict[str, Any]:
     """Démarre une nouvelle session d'appel"""
-    call_id = str(uuid.uuid4())
+    call_id = new_call_id()
     manager = CallManager(config)
     manager.call_id = call_id
-    active_calls[call_id] = manager
+    await get_session_store().create(manager)
+    get_session_analytics().record_call_started()
     
     logger.info(f"\n{'='*80}")
     logger.info(f"🟢 DÉBUT SESSION: {call_id}")
     logger.info(f"{'='*80}\n")
 
     # Log spécifique pour le fichier de transcription
-    logger.info(f"[TRANSCRIPTION] {'='*60}")
-    logger.info(f"[TRANSCRIPTION] 🎙️ NOUVELLE SESSION DÉMARRÉE")
-    logger.info(f"[TRANSCRIPTION] ID: {call_id}")
-    logger.info(f"[TRANSCRIPTION] Date: {manager.created_at.strftime('%Y-%m-%d %H:%M:%S')}")
-    logger.info(f"[TRANSCRIPTION] {'='*60}")
+    transcription_logger.info(f"[TRANSCRIPTION] {'='*60}")
+    transcription_logger.info(f"[TRANSCRIPTION] 🎙️ NOUVELLE SESSION DÉMARRÉE")
+    transcription_logger.info(f"[TRANSCRIPTION] ID: {call_id}")
+    transcription_logger.info(f"[TRANSCRIPTION] Date: {manager.created_at.strftime('%Y-%m-%d %H:%M:%S')}")
+    transcription_logger.info(f"[TRANSCRIPTION] {'='*60}")
     
     result = {
         "call_id": call_id,
@@ -54,32 +58,33 @@ async def start_call(config: CallConfig = None) -> Dict[str, Any]:
 async def end_call(session_id: str):
     """Termine une session d'appel"""
     
-    if session_id not in active_calls:
-        raise HTTPException(status_code=404, detail="Session non trouvée")
+    manager = await get_session_store().pop(session_id)
+    get_session_pipelines().discard(session_id)
+    get_event_bus().close_session(session_id, "ended")
     
-    manager = active_calls[session_id]
+    if manager is None:
+        raise HTTPException(status_code=404, detail="Session non trouvée")
     
+    get_session_analytics().record_call_ended(manager, "ended")
     manager.log_conversation_history()
     
     context_count = len(manager.messages)
     total_count = len(manager.full_transcript)
     insight_count = len(manager.last_insights)
-    
-    del active_calls[session_id]
 
     logger.info(f"\n{'='*80}")
     logger.info(f"🔴 FIN SESSION: {session_id}")
     logger.info(f"{'='*80}\n")
 
     # Log spécifique pour le fichier de transcription
-    logger.info(f"[TRANSCRIPTION] {'='*60}")
-    logger.info(f"[TRANSCRIPTION] 🏁 SESSION TERMINÉE")
-    logger.info(f"[TRANSCRIPTION] ID: {session_id}")
-    logger.info(f"[TRANSCRIPTION] Messages contexte: {context_count}")
-    logger.info(f"[TRANSCRIPTION] Messages total: {total_count}")
-    logger.info(f"[TRANSCRIPTION] Insights générés: {insight_count}")
-    logger.info(f"[TRANSCRIPTION] Phase finale: {manager.conversation_phase}")
-    logger.info(f"[TRANSCRIPTION] {'='*60}")
+    transcription_logger.info(f"[TRANSCRIPTION] {'='*60}")
+    transcription_logger.info(f"[TRANSCRIPTION] 🏁 SESSION TERMINÉE")
+    transcription_logger.info(f"[TRANSCRIPTION] ID: {session_id}")
+    transcription_logger.info(f"[TRANSCRIPTION] Messages contexte: {context_count}")
+    transcription_logger.info(f"[TRANSCRIPTION] Messages total: {total_count}")
+    transcription_logger.info(f"[TRANSCRIPTION] Insights générés: {insight_count}")
+    transcription_logger.info(f"[TRANSCRIPTION] Phase finale: {manager.conversation_phase}")
+    transcription_logger.info(f"[TRANSCRIPTION] {'='*60}")
     
     return {
         "status": "ended",
@@ -95,10 +100,10 @@ async def end_call(session_id: str):
 async def get_call_state(session_id: str):
     """Récupère l'état d'une session"""
     
-    if session_id not in active_calls:
-        raise HTTPException(status_code=404, detail="Session non trouvée")
+    manager = await get_session_store().get(session_id)
     
-    manager = active_calls[session_id]
+    if manager is None:
+        raise HTTPException(status_code=404, detail="Session non trouvée")
     
     from config.settings import MAX_CONTEXT_MESSAGES
     
@@ -132,8 +137,3 @@ async def get_call_state(session_id: str):
         }
     
     return result
-
-
-def get_active_calls():
-    """Fonction utilitaire pour accéder aux appels actifs depuis d'autres routes"""
-    return active_calls
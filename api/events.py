@@ -0,0 +1,103 @@
+"""
+Route API du flux d'événements d'une session (Server-Sent Events)
+"""
+import logging
+import asyncio
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from typing import Any, Dict, Optional
+
+from core.session_store import get_session_store
+from core.event_bus import get_event_bus, SessionEvent, RESYNC, SESSION_ENDED
+from config.settings import SSE_KEEPALIVE_SECONDS, SSE_MAX_STREAM_SECONDS
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/calls", tags=["events"])
+
+# Délai de reconnexion suggéré au navigateur (ms)
+SSE_RETRY_MS = 1000
+
+
+def _state_data(manager) -> Dict[str, Any]:
+    """État courant compact (événement `state`, envoyé à la connexion et à chaque resync)"""
+    return {
+        "call_id": manager.call_id,
+        "conversation_phase": manager.conversation_phase,
+        "pain_points": manager.pain_points,
+        "pillars": {i: p["status"] for i, p in manager.pillar_progress.items()},
+        "topics_covered": manager.topics_covered,
+        "total_message_count": len(manager.full_transcript),
+        "insight_count": len(manager.insight_history)
+    }
+
+
+@router.get("/{session_id}/events")
+async def stream_session_events(
+    session_id: str,
+    request: Request,
+    last_event_id: Optional[str] = Header(None)
+):
+    """
+    Flux SSE des changements d'état de la session (remplace le polling de /state et /insights)
+
+    Événements :
+    - state : état compact courant (à la connexion, puis si des événements ont été perdus)
+    - message, phase, pain_points, pillar : deltas du contexte de la conversation
+    - insight / insight_blocked : insight accepté / rejeté comme doublon
+    - session_ended : fin du flux
+
+    Le flux se ferme après SSE_MAX_STREAM_SECONDS : le navigateur (EventSource) se reconnecte
+    avec Last-Event-ID et reprend là où il en était.
+    """
+    store = get_session_store()
+    if not await store.exists(session_id):
+        raise HTTPException(status_code=404, detail="Session non trouvée")
+
+    try:
+        resume_from = int(last_event_id) if last_event_id is not None else None
+    except ValueError:
+        resume_from = -1  # Illisible : resync
+
+    bus = get_event_bus()
+    subscription = bus.subscribe(session_id, resume_from)
+    await bus.follow(session_id)
+    if resume_from is None:
+        # Première connexion : l'état courant tient lieu d'historique
+        subscription.push(SessionEvent(bus.last_event_id(session_id), RESYNC, {"reason": "connect"}))
+
+    async def stream():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + SSE_MAX_STREAM_SECONDS
+        last_sent = resume_from or 0
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            while not subscription.finished:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                event = await subscription.get(min(SSE_KEEPALIVE_SECONDS, remaining))
+                if event is None:
+                    if not subscription.closed:
+                        yield ": keep-alive\n\n"  # Garde la connexion (proxy, relais du cluster) ouverte
+                    continue
+
+                if event.type == RESYNC:
+                    manager = await store.get(session_id)
+                    if manager is None:
+                        yield SessionEvent(event.id, SESSION_ENDED, {"reason": "not_found"}).payload
+                        break
+                    # État lu sans attente depuis l'événement : les événements en buffer antérieurs y sont inclus
+                    event = SessionEvent(bus.last_event_id(session_id), "state", _state_data(manager))
+                elif event.id <= last_sent:
+                    continue  # Déjà inclus dans le dernier état envoyé
+                yield event.payload
+                last_sent = event.id
+        finally:
+            bus.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
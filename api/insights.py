@@ -1,113 +1,112 @@
 """
 Routes API pour l'historique et les statistiques des insights
 """
+import bisect
+import heapq
 import logging
-from fastapi import APIRouter, HTTPException
+import zlib
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from typing import Dict, Any
 from datetime import datetime
 
-from api.calls import get_active_calls
+from core.session_store import get_session_store
+from config.settings import TIME_THRESHOLD_DUPLICATE
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/calls", tags=["insights"])
 
+# Au-delà, un insight est "ancien"
+INSIGHT_RECENT_SECONDS = 60
+MAX_PAGE_SIZE = 500
+
+
+def _format_elapsed(seconds: float) -> str:
+    minutes, rest = int(seconds / 60), int(seconds % 60)
+    return f"{minutes}min {rest}s ago" if minutes > 0 else f"{rest}s ago"
+
 
 @router.get("/{session_id}/insights")
-async def get_insights_history(session_id: str) -> Dict[str, Any]:
+async def get_insights_history(
+    session_id: str,
+    request: Request,
+    response: Response,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE)
+) -> Dict[str, Any]:
     """
-    Récupère l'historique COMPLET des insights générés pour cette session
+    Récupère l'historique COMPLET des insights générés pour cette session (paginé)
     
     Retourne:
-    - Liste complète de tous les insights avec timestamps
+    - Liste des insights (page offset/limit) avec timestamps
     - Concepts associés
     - Temps écoulé depuis chaque insight
     - Statistiques
+
+    Réponse cacheable : ETag + If-None-Match (304 tant que rien n'a changé). L'ETag change
+    avec un nouvel insight, un nouveau message, la phase, ou quand un insight devient ancien ;
+    les durées relatives ("time_ago") sont calculées à `generated_at`.
     """
-    active_calls = get_active_calls()
+    manager = await get_session_store().get(session_id)
     
-    if session_id not in active_calls:
+    if manager is None:
         raise HTTPException(status_code=404, detail="Session non trouvée")
     
-    manager = active_calls[session_id]
-    
     current_time = datetime.now().timestamp()
-    
-    # Construire l'historique détaillé
+    history = manager.insight_history
+
+    # Insights devenus anciens (historique trié par horodatage)
+    old_count = bisect.bisect_right(history, current_time - INSIGHT_RECENT_SECONDS, key=lambda r: r.timestamp)
+
+    version = (
+        session_id, len(history), old_count, len(manager.full_transcript),
+        manager.conversation_phase, len(manager.pain_points), offset, limit
+    )
+    etag = f'W/"{zlib.crc32(repr(version).encode("utf-8")):08x}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match.strip() == "*" or etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+    # Construire la page demandée
     insights_with_metadata = []
-    for i, insight in enumerate(manager.last_insights):
-        # Récupérer les concepts associés
-        concepts = manager.recent_concepts[i] if i < len(manager.recent_concepts) else "général"
-        
-        # Récupérer le timestamp
-        if i < len(manager.insight_timestamps):
-            timestamp = manager.insight_timestamps[i]
-            time_elapsed = current_time - timestamp
-            minutes_ago = int(time_elapsed / 60)
-            seconds_ago = int(time_elapsed % 60)
-            time_display = f"{minutes_ago}min {seconds_ago}s ago" if minutes_ago > 0 else f"{seconds_ago}s ago"
-        else:
-            time_elapsed = 0
-            time_display = "Unknown"
-        
-        # Extraire le type d'insight
-        insight_type = "unknown"
-        if "🔴" in insight or "alerte" in insight.lower():
-            insight_type = "alert"
-        elif "🔵" in insight or "opportunité" in insight.lower():
-            insight_type = "opportunity"
-        elif "🟢" in insight or "progression" in insight.lower():
-            insight_type = "progression"
-        
-        # Déterminer si l'insight est "ancien" (> 60s)
-        is_old = time_elapsed > 60
-        
+    for record in history[offset:offset + limit]:
+        time_elapsed = current_time - record.timestamp
+        is_old = time_elapsed > INSIGHT_RECENT_SECONDS
         insights_with_metadata.append({
-            "index": i + 1,
-            "insight": insight,
-            "concepts": concepts,
-            "type": insight_type,
-            "time_ago": time_display,
+            "index": record.index,
+            "insight": record.insight,
+            "title": record.title,
+            "concepts": ", ".join(record.concepts),
+            "type": record.type,
+            "timestamp": record.timestamp,
+            "time_ago": _format_elapsed(time_elapsed),
             "seconds_elapsed": int(time_elapsed),
             "is_old": is_old,
             "status": "⏰ ANCIEN" if is_old else "🔥 RÉCENT"
         })
-    
-    # Statistiques par type
-    type_counts = {"alert": 0, "opportunity": 0, "progression": 0, "unknown": 0}
-    for item in insights_with_metadata:
-        type_counts[item["type"]] += 1
-    
-    # Concepts les plus fréquents
-    all_concepts = []
-    for concepts_str in manager.recent_concepts:
-        all_concepts.extend(concepts_str.split(", "))
-    
-    concept_frequency = {}
-    for concept in all_concepts:
-        concept_frequency[concept] = concept_frequency.get(concept, 0) + 1
-    
-    # Top 10 concepts
-    top_concepts = sorted(concept_frequency.items(), key=lambda x: x[1], reverse=True)[:10]
-    
-    # Statistiques temporelles
-    recent_count = sum(1 for item in insights_with_metadata if not item["is_old"])
-    old_count = len(insights_with_metadata) - recent_count
+
+    # Statistiques tenues à jour par CallManager.add_insight
+    stats = manager.insight_stats
+    top_concepts = heapq.nlargest(10, stats["concepts"].items(), key=lambda item: item[1])
+    total = len(history)
+    next_offset = offset + limit if offset + limit < total else None
     
     return {
         "session_id": session_id,
-        "total_insights": len(manager.last_insights),
+        "total_insights": total,
+        "generated_at": current_time,
         "insights": insights_with_metadata,
+        "pagination": {"offset": offset, "limit": limit, "total": total, "next_offset": next_offset},
         "statistics": {
-            "by_type": type_counts,
+            "by_type": dict(stats["by_type"]),
             "by_age": {
-                "recent": recent_count,
+                "recent": total - old_count,
                 "old": old_count
             },
             "top_concepts": [{"concept": c[0], "count": c[1]} for c in top_concepts],
-            "average_insights_per_message": round(
-                len(manager.last_insights) / max(len(manager.full_transcript), 1), 2
-            )
+            "average_insights_per_message": round(total / max(len(manager.full_transcript), 1), 2)
         },
         "conversation_context": {
             "phase": manager.conversation_phase,
@@ -115,7 +114,7 @@ async def get_insights_history(session_id: str) -> Dict[str, Any]:
             "pain_points_identified": len(manager.pain_points)
         },
         "duplicate_detection": {
-            "time_threshold_seconds": 30,
-            "description": "Les insights similaires séparés de plus de 30s ne sont pas considérés comme doublons (TIME_THRESHOLD_DUPLICATE)"
+            "time_threshold_seconds": TIME_THRESHOLD_DUPLICATE,
+            "description": f"Les insights similaires séparés de plus de {TIME_THRESHOLD_DUPLICATE}s ne sont pas considérés comme doublons (TIME_THRESHOLD_DUPLICATE)"
         }
     }
@@ -0,0 +1,29 @@
+"""
+Routes API des jobs en tâche de fond
+"""
+import logging
+from fastapi import APIRouter, HTTPException, Response
+from typing import Any, Dict
+
+from core.jobs import get_job_queue
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["jobs"])
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, response: Response) -> Dict[str, Any]:
+    """
+    État d'un job (queued, running, done, failed) et son résultat une fois terminé
+
+    Tant que le job n'est pas terminé, l'en-tête Retry-After indique quand revenir.
+    """
+    job = await get_job_queue().lookup(job_id)
+
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job inconnu ou expiré")
+
+    if job["status"] not in ("done", "failed"):
+        response.headers["Retry-After"] = "1"
+    return job
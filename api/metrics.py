@@ -0,0 +1,22 @@
+"""
+Route API des métriques Prometheus
+"""
+import logging
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from services.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_prometheus_metrics() -> PlainTextResponse:
+    """
+    Latences par étape de /audio et par issue, appels aux API externes et tokens LLM
+    (format texte Prometheus, somme des workers du nœud si METRICS_MULTIPROCESS_DIR)
+    """
+    body = await get_metrics().render_node()
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4; charset=utf-8")
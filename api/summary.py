@@ -2,12 +2,16 @@
 Routes API pour les résumés d'appels
 """
 import logging
-from fastapi import APIRouter, HTTPException
+import asyncio
+import zlib
+from fastapi import APIRouter, HTTPException, Response
 from typing import Dict, Any
 
 from models import MessageRequest
 from services import SummaryService
-from api.calls import get_active_calls
+from core.session_store import get_session_store
+from core.summary_cache import get_summary_cache
+from core.jobs import get_job_queue, JobQueueFullError
 
 logger = logging.getLogger(__name__)
 
@@ -17,54 +21,57 @@ router = APIRouter(tags=["summary"])
 summary_service = SummaryService()
 
 
-@router.post("/resume/{session_id}")
-async def summarize_call_client_focused(session_id: str, request: MessageRequest) -> Dict[str, Any]:
+async def _client_summary(manager, session_id: str) -> Dict[str, Any]:
     """
-    Résume l'appel complet avec note et évaluation détaillée
-    FOCUS : Client (ses besoins, objections, attentes)
-    """
-    active_calls = get_active_calls()
-    
-    if session_id not in active_calls:
-        raise HTTPException(status_code=404, detail="Session non trouvée")
+    Résumé FOCUS CLIENT (réponse de /resume)
 
-    manager = active_calls[session_id]
-
-    full_transcript = manager.get_full_transcript()
+    Appel long : réduction finale de la mémoire glissante (début de l'appel déjà résumé)
+    et de la fin du transcript, au lieu du transcript complet.
+    Résultat mis en cache jusqu'au prochain message (requêtes simultanées coalescées).
+    """
+    memory = manager.get_summary_memory()
+    covered = manager.summary_covered_until if memory else 0
+    full_transcript = manager.get_full_transcript(covered)
     
-    if not full_transcript.strip():
+    if not full_transcript.strip() and not memory:
         return {"error": "Aucune conversation enregistrée pour ce résumé."}
 
     logger.info(f"\n{'='*80}")
     logger.info("📊 GÉNÉRATION DU RÉSUMÉ (FOCUS CLIENT)")
     logger.info(f"{'='*80}")
-    logger.info(f"Messages: {len(manager.full_transcript)}")
+    logger.info(f"Messages: {len(manager.full_transcript)} (dont {covered} déjà résumés)")
     logger.info(f"Phase: {manager.conversation_phase}")
     logger.info(f"{'='*80}\n")
 
-    summary_json = await summary_service.generate_client_focused_summary(full_transcript)
+    try:
+        summary_json, cached = await get_summary_cache().get_or_generate(
+            session_id,
+            "client",
+            f"v{manager.transcript_version}",
+            lambda: summary_service.generate_client_focused_summary(
+                full_transcript,
+                session_id=session_id,
+                earlier_summary=memory or None,
+                fallback=False
+            )
+        )
+    except Exception:
+        logger.exception("Erreur appel OpenAI pour summary")
+        return {"summary": summary_service.get_fallback_summary()}
     
     if not summary_json:
         return {"error": "Erreur lors de la génération du résumé"}
     
-    return {"summary": summary_json}
+    return {"summary": summary_json, "cached": cached}
 
 
-@router.post("/summary/{session_id}")
-async def summarize_call_commercial_focused(session_id: str, request: MessageRequest) -> Dict[str, Any]:
+async def _commercial_summary(manager, session_id: str, text: str = "") -> Dict[str, Any]:
     """
-    Résume l'appel avec focus sur l'évaluation du commercial
-    FOCUS : Commercial (performance, points forts/faibles)
+    Résumé FOCUS COMMERCIAL (réponse de /summary), sur `text` ou à défaut la fenêtre de contexte
+    Résultat mis en cache jusqu'au prochain message (requêtes simultanées coalescées).
     """
-    active_calls = get_active_calls()
-    
-    if session_id not in active_calls:
-        raise HTTPException(status_code=404, detail="Session non trouvée")
-
-    manager = active_calls[session_id]
-
-    # Récupérer le texte du dialogue
-    text = (request.user_message or "").strip()
+    # Texte fourni par le client : il fait partie de la clé du cache
+    cache_key = f"v{manager.transcript_version}" + (f":{zlib.crc32(text.encode()):08x}" if text else "")
 
     if not text:
         parts = []
@@ -86,9 +93,83 @@ async def summarize_call_commercial_focused(session_id: str, request: MessageReq
     logger.info(f"Longueur texte: {len(text)} caractères")
     logger.info(f"{'='*80}\n")
 
-    summary_json = await summary_service.generate_commercial_focused_summary(text)
+    try:
+        summary_json, cached = await get_summary_cache().get_or_generate(
+            session_id,
+            "commercial",
+            cache_key,
+            lambda: summary_service.generate_commercial_focused_summary(text, session_id=session_id, fallback=False)
+        )
+    except Exception:
+        logger.exception("Erreur appel OpenAI pour summary commercial")
+        return {"summary": summary_service.get_fallback_commercial_summary()}
     
     if not summary_json:
         return {"error": "Erreur lors de la génération du résumé"}
 
-    return {"summary": summary_json}
+    return {"summary": summary_json, "cached": cached}
+
+
+@router.post("/resume/{session_id}")
+async def summarize_call_client_focused(session_id: str, request: MessageRequest) -> Dict[str, Any]:
+    """
+    Résume l'appel complet avec note et évaluation détaillée
+    FOCUS : Client (ses besoins, objections, attentes)
+    """
+    manager = await get_session_store().get(session_id)
+    
+    if manager is None:
+        raise HTTPException(status_code=404, detail="Session non trouvée")
+
+    return await _client_summary(manager, session_id)
+
+
+@router.post("/summary/{session_id}")
+async def summarize_call_commercial_focused(session_id: str, request: MessageRequest) -> Dict[str, Any]:
+    """
+    Résume l'appel avec focus sur l'évaluation du commercial
+    FOCUS : Commercial (performance, points forts/faibles)
+    """
+    manager = await get_session_store().get(session_id)
+    
+    if manager is None:
+        raise HTTPException(status_code=404, detail="Session non trouvée")
+
+    # Récupérer le texte du dialogue
+    text = (request.user_message or "").strip()
+
+    return await _commercial_summary(manager, session_id, text)
+
+
+@router.post("/calls/{session_id}/summaries", status_code=202)
+async def create_summary_job(session_id: str, response: Response) -> Dict[str, Any]:
+    """
+    Lance en tâche de fond les deux résumés de fin d'appel (client et commercial, en parallèle)
+
+    Répond immédiatement avec l'identifiant du job ; résultat via GET /jobs/{job_id}.
+    Un job identique en cours (même version du transcript) est renvoyé tel quel.
+    """
+    manager = await get_session_store().get(session_id)
+
+    if manager is None:
+        raise HTTPException(status_code=404, detail="Session non trouvée")
+
+    version = manager.transcript_version
+
+    async def run() -> Dict[str, Any]:
+        current = await get_session_store().get(session_id)
+        if current is None:
+            raise RuntimeError("Session terminée avant le résumé")
+        client, commercial = await asyncio.gather(
+            _client_summary(current, session_id),
+            _commercial_summary(current, session_id)
+        )
+        return {"transcript_version": current.transcript_version, "client": client, "commercial": commercial}
+
+    try:
+        job = await get_job_queue().submit("summaries", session_id, run, dedup_key=(version,))
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=f"File des résumés pleine ({e}), réessayer", headers={"Retry-After": "5"})
+
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return {"job_id": job.id, "status": job.status, "status_url": f"/jobs/{job.id}"}
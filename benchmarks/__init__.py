@@ -0,0 +1,3 @@
+"""
+Benchmarks de performance (scripts exécutables avec python -m benchmarks.<nom>)
+"""
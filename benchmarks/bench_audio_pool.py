@@ -0,0 +1,137 @@
+"""
+Benchmark : sessions par nœud pour l'étape CPU de /audio, avec et sans pool de process
+
+Étape mesurée (sans réseau) : décodage PCM + début de parole + détection de silence des deux
+pistes d'un chunk. Chaque session envoie un chunk toutes les `--interval` secondes : le débit
+soutenu (chunks/s) donne le nombre de sessions qu'un process API peut suivre,
+    sessions/nœud ≈ débit × intervalle
+tant que la boucle d'événements reste réactive (retard max de la boucle rapporté).
+
+Modes :
+- legacy : ancienne détection du début de parole (boucle Python échantillon par échantillon)
+- inline : détection vectorisée dans la boucle d'événements (défaut, AUDIO_PROCESS_POOL_WORKERS=0)
+- pool   : détection vectorisée dans un pool de process, audio en mémoire partagée
+
+Usage:
+    python -m benchmarks.bench_audio_pool --chunks 400 --workers 4
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, List
+
+import numpy as np
+
+from services.audio_pool import AudioProcessPool, TrackAnalysis, analyze_track
+from services.transcription import TranscriptionService
+from config.settings import AUDIO_SAMPLE_RATE, SILENCE_THRESHOLD_BROWSER, SILENCE_THRESHOLD_MIC
+
+
+def legacy_speech_start(audio: np.ndarray, role: str) -> float:
+    """Ancienne implémentation de detect_speech_start_time (référence)"""
+    threshold = SILENCE_THRESHOLD_BROWSER if role == "CLIENT" else SILENCE_THRESHOLD_MIC
+    for i, sample in enumerate(audio):
+        if abs(sample) > threshold:
+            return i / AUDIO_SAMPLE_RATE
+    return float("inf")
+
+
+def make_chunk(rng: np.random.Generator, seconds: float, speech_at: float) -> bytes:
+    """Bruit de fond puis parole à partir de `speech_at` (fraction du chunk)"""
+    n = int(seconds * AUDIO_SAMPLE_RATE)
+    audio = (rng.standard_normal(n) * 80).astype(np.int16)
+    start = int(n * speech_at)
+    audio[start:] = (rng.standard_normal(n - start) * 4000).astype(np.int16)
+    return audio.tobytes()
+
+
+async def measure_lag(stop: asyncio.Event, samples: List[float]) -> None:
+    """Retard de la boucle d'événements (réactivité des autres requêtes)"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.005)
+        samples.append(time.perf_counter() - start - 0.005)
+
+
+async def run_mode(
+    analyze: Callable[[bytes, bytes], Awaitable[List[TrackAnalysis]]],
+    chunks: List[tuple],
+    concurrency: int
+) -> tuple:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(client_data: bytes, commercial_data: bytes) -> None:
+        async with semaphore:
+            await analyze(client_data, commercial_data)
+
+    lag: List[float] = []
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_lag(stop, lag))
+    start = time.perf_counter()
+    await asyncio.gather(*(one(c, m) for c, m in chunks))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await lag_task
+    return len(chunks) / elapsed, max(lag, default=0.0) * 1000
+
+
+async def run(args) -> None:
+    rng = np.random.default_rng(0)
+    chunks = [
+        (make_chunk(rng, args.chunk_seconds, 0.7), make_chunk(rng, args.chunk_seconds, 0.3))
+        for _ in range(16)
+    ]
+    chunks = [chunks[i % len(chunks)] for i in range(args.chunks)]
+
+    async def legacy(client_data: bytes, commercial_data: bytes):
+        client = np.frombuffer(client_data, dtype=np.int16)
+        commercial = np.frombuffer(commercial_data, dtype=np.int16)
+        return [
+            (legacy_speech_start(client, "CLIENT"), TranscriptionService.is_silence(client, "CLIENT")),
+            (legacy_speech_start(commercial, "COMMERCIAL"), TranscriptionService.is_silence(commercial, "COMMERCIAL")),
+        ]
+
+    async def inline(client_data: bytes, commercial_data: bytes):
+        client = np.frombuffer(client_data, dtype=np.int16)
+        commercial = np.frombuffer(commercial_data, dtype=np.int16)
+        return [analyze_track(client, "CLIENT"), analyze_track(commercial, "COMMERCIAL")]
+
+    pool = AudioProcessPool(args.workers)
+    await pool.warm_up()
+
+    async def pooled(client_data: bytes, commercial_data: bytes):
+        return await pool.analyze([
+            np.frombuffer(client_data, dtype=np.int16),
+            np.frombuffer(commercial_data, dtype=np.int16)
+        ])
+
+    print(
+        f"Chunks de {args.chunk_seconds}s à {AUDIO_SAMPLE_RATE} Hz, 1 chunk/session toutes les {args.interval}s, "
+        f"{os.cpu_count()} cœur(s)\n"
+    )
+    print(f"{'mode':>16} {'chunks/s':>10} {'sessions/nœud':>14} {'retard boucle max (ms)':>23}")
+    modes = [("legacy", legacy, min(args.chunks, 50)), ("inline", inline, args.chunks), (f"pool x{args.workers}", pooled, args.chunks)]
+    for name, analyze, count in modes:
+        throughput, lag_ms = await run_mode(analyze, chunks[:count], args.concurrency)
+        print(f"{name:>16} {throughput:>10.0f} {throughput * args.interval:>14.0f} {lag_ms:>23.1f}")
+
+    pool.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=400)
+    parser.add_argument("--chunk-seconds", type=float, default=2.0)
+    parser.add_argument("--interval", type=float, default=2.0, help="Intervalle entre deux chunks d'une session (s)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--concurrency", type=int, default=64, help="Chunks en cours simultanément")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark : filtrage des transcriptions et rechargement de la configuration
+
+- ancien filtrage : `pattern.lower() in text.lower()` pour chaque motif de UNWANTED_PATTERNS
+- instantané      : une seule regex compilée au rechargement (ConfigSnapshot.find_unwanted)
+- lecture         : coût de get_config() (une lecture d'attribut, sans verrou)
+- rechargement    : lecture + validation des deux fichiers YAML (thread de surveillance)
+
+Usage:
+    python -m benchmarks.bench_config_snapshot --texts 20000
+"""
+import argparse
+import random
+import time
+from typing import Callable, List, Optional
+
+from config.live_config import get_config, get_config_watcher
+from config.settings import UNWANTED_PATTERNS
+
+WORDS = (
+    "le prix me semble élevé pour une équipe de notre taille est-ce que vous proposez un essai "
+    "gratuit nous utilisons déjà un autre outil mais la migration nous inquiète un peu"
+).split()
+
+
+def legacy_find_unwanted(text: str) -> Optional[str]:
+    """Ancien filtrage (référence)"""
+    text_lower = text.lower()
+    for pattern in UNWANTED_PATTERNS:
+        if pattern.lower() in text_lower:
+            return pattern
+    return None
+
+
+def make_texts(count: int, unwanted_ratio: float) -> List[str]:
+    rng = random.Random(42)
+    texts = []
+    for _ in range(count):
+        words = rng.choices(WORDS, k=rng.randint(4, 30))
+        if UNWANTED_PATTERNS and rng.random() < unwanted_ratio:
+            words.insert(rng.randint(0, len(words)), rng.choice(UNWANTED_PATTERNS))
+        texts.append(" ".join(words))
+    return texts
+
+
+def timed(label: str, fn: Callable[[], object], count: int) -> float:
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed / count * 1e6:8.2f} µs/op")
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--texts", type=int, default=20000)
+    parser.add_argument("--unwanted-ratio", type=float, default=0.1)
+    parser.add_argument("--reloads", type=int, default=50)
+    args = parser.parse_args()
+
+    config = get_config()
+    texts = make_texts(args.texts, args.unwanted_ratio)
+    print(f"{len(config.unwanted_patterns)} motifs indésirables, {len(texts)} transcriptions\n")
+
+    legacy = [legacy_find_unwanted(t) is not None for t in texts]
+    compiled = [config.find_unwanted(t.lower()) is not None for t in texts]
+    mismatches = sum(a != b for a, b in zip(legacy, compiled))
+
+    before = timed("filtrage par motif", lambda: [legacy_find_unwanted(t) for t in texts], len(texts))
+    after = timed("filtrage regex compilée", lambda: [config.find_unwanted(t.lower()) for t in texts], len(texts))
+    timed("get_config()", lambda: [get_config() for _ in range(len(texts))], len(texts))
+
+    watcher = get_config_watcher()
+    start = time.perf_counter()
+    for _ in range(args.reloads):
+        watcher._build(watcher.current.version)
+    print(f"{'rechargement (2 fichiers)':<28} {(time.perf_counter() - start) / args.reloads * 1e3:8.2f} ms")
+
+    print(f"\nGain filtrage: x{before / after:.1f} ; décisions différentes: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
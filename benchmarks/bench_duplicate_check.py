@@ -0,0 +1,86 @@
+"""
+Benchmark : latence d'une vérification anti-doublon en fonction de la taille de l'historique
+
+Compare :
+- legacy : ré-encodage de chaque paire (nouvel insight, ancien insight)
+- cached : nouvel insight encodé une fois + embeddings d'historique en cache + produit matrice-vecteur
+- lexical : pré-filtre MinHash seul (signature du nouvel insight + comparaison à l'historique)
+
+Usage:
+    python -m benchmarks.bench_duplicate_check --repeat 30
+"""
+import argparse
+import logging
+import statistics
+import time
+from typing import List
+
+from services.duplicate_detector import DuplicateDetector, get_embedding_model
+from services.minhash import compute_sketch
+
+INSIGHTS = [
+    "Contexte compris - Creuser l'impact chiffré du problème",
+    "Signal d'achat - Proposer une démo la semaine prochaine",
+    "Objection prix - Recentrer sur le ROI mesuré",
+    "Pain identifié - Demander combien d'heures sont perdues",
+    "Décideur cité - Valider qui signe et le budget",
+    "Concurrent mentionné - Différencier sur le coaching temps réel",
+    "Équipe réticente - Rassurer sur l'onboarding",
+    "Timing flou - Demander l'échéance du projet",
+    "Intérêt fort - Proposer un pilote sur une équipe",
+    "Question technique - Confirmer l'intégration HubSpot",
+]
+NEW_INSIGHT = "Impact non chiffré - Demander le coût mensuel du problème"
+
+
+def legacy_check(detector: DuplicateDetector, history: List[str]) -> None:
+    """Reproduit l'ancien algorithme : une paire encodée par insight d'historique"""
+    for old_insight in history[-5:]:
+        detector._compute_semantic_similarity(NEW_INSIGHT, old_insight)
+
+
+def cached_check(detector: DuplicateDetector, history: List[str], embeddings, timestamps) -> None:
+    new_embedding = detector.encode([NEW_INSIGHT])[0]
+    detector.check_duplicate_semantic(
+        NEW_INSIGHT, history, timestamps,
+        embeddings_history=embeddings, new_embedding=new_embedding
+    )
+
+
+def lexical_check(detector: DuplicateDetector, sketches, timestamps) -> None:
+    detector.check_duplicate_lexical(compute_sketch(NEW_INSIGHT), sketches, timestamps)
+
+
+def measure(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    get_embedding_model().encode(["warm-up"], show_progress_bar=False)
+    detector = DuplicateDetector()
+
+    print(f"{'historique':>10} {'legacy (ms)':>12} {'cached (ms)':>12} {'gain':>7} {'lexical (ms)':>13}")
+    for size in (1, 2, 5, 10):
+        history = INSIGHTS[:size]
+        timestamps = [time.time() - 10 * (size - i) for i in range(size)]
+        embeddings = list(detector.encode(history))
+        sketches = [compute_sketch(insight) for insight in history]
+
+        legacy_ms = measure(lambda: legacy_check(detector, history), args.repeat)
+        cached_ms = measure(lambda: cached_check(detector, history, embeddings, timestamps), args.repeat)
+        lexical_ms = measure(lambda: lexical_check(detector, sketches, timestamps), args.repeat)
+        print(f"{size:>10} {legacy_ms:>12.2f} {cached_ms:>12.2f} {legacy_ms / cached_ms:>6.1f}x {lexical_ms:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Parité et performance des backends d'embeddings (torch fp32 vs ONNX int8)
+
+1. Parité : cosine entre les embeddings torch et ONNX sur un jeu de phrases de référence,
+   et accord des décisions anti-doublon (seuil sémantique du DuplicateDetector).
+   Code de sortie 1 si la parité est insuffisante.
+2. Performance : latence CPU d'un encodage (1 texte, batch de 16) et RSS du process,
+   chaque backend étant mesuré dans un sous-process isolé.
+
+Usage:
+    python -m benchmarks.bench_embedding_backends [--min-cosine 0.98]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+FIXTURES = [
+    "Bonjour, merci de prendre le temps pour cet appel.",
+    "Aujourd'hui on perd beaucoup de temps sur la qualification des leads.",
+    "Combien d'heures par semaine votre équipe passe sur ce problème ?",
+    "Je dirais dix heures par commercial, c'est frustrant.",
+    "Qui d'autre est impliqué dans la décision et quel est le budget ?",
+    "On pourrait organiser une démo avec votre directeur commercial.",
+    "Contexte compris - Creuser l'impact chiffré du problème",
+    "Signal d'achat - Proposer une démo la semaine prochaine",
+    "Objection prix - Recentrer sur le ROI mesuré",
+    "Pain identifié - Demander combien d'heures sont perdues",
+    "Décideur cité - Valider qui signe et le budget",
+    "Concurrent mentionné - Différencier sur le coaching temps réel",
+    "Équipe réticente - Rassurer sur l'onboarding",
+    "Timing flou - Demander l'échéance du projet",
+    "Intérêt fort - Proposer un pilote sur une équipe",
+    "Question technique - Confirmer l'intégration HubSpot",
+    "We already use Gong, why would we switch?",
+    "C'est trop cher pour nous cette année.",
+]
+
+
+def rss_mb() -> float:
+    """RSS courant du process (Linux)"""
+    for line in Path("/proc/self/status").read_text().splitlines():
+        if line.startswith("VmRSS:"):
+            return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def normalized(embeddings: np.ndarray) -> np.ndarray:
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
+def run_backend(backend: str, repeat: int) -> dict:
+    """Mesures d'un backend (exécuté dans un sous-process dédié)"""
+    from services.embedding_backends import load_embedding_backend
+
+    baseline = rss_mb()
+    start = time.perf_counter()
+    model = load_embedding_backend(backend)
+    embeddings = model.encode(FIXTURES, show_progress_bar=False)
+    load_s = time.perf_counter() - start
+
+    single, batch = [], []
+    for i in range(repeat):
+        t = time.perf_counter()
+        model.encode([FIXTURES[i % len(FIXTURES)]], show_progress_bar=False)
+        single.append((time.perf_counter() - t) * 1000)
+        t = time.perf_counter()
+        model.encode(FIXTURES[:16], show_progress_bar=False)
+        batch.append((time.perf_counter() - t) * 1000)
+
+    return {
+        "backend": backend,
+        "load_s": round(load_s, 2),
+        "rss_mb": round(rss_mb(), 1),
+        "rss_model_mb": round(rss_mb() - baseline, 1),
+        "encode_1_ms": round(statistics.median(single), 2),
+        "encode_16_ms": round(statistics.median(batch), 2),
+        "embeddings": np.asarray(embeddings, dtype=np.float32).tolist(),
+    }
+
+
+def measure_in_subprocess(backend: str, repeat: int) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_embedding_backends", "--child", backend, "--repeat", str(repeat)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--min-cosine", type=float, default=0.98, help="Cosine torch/ONNX minimale acceptée")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_backend(args.child, args.repeat)))
+        return
+
+    from services.duplicate_detector import DuplicateDetector
+    threshold = DuplicateDetector().semantic_threshold
+
+    results = {backend: measure_in_subprocess(backend, args.repeat) for backend in ("torch", "onnx")}
+    torch_emb = normalized(np.array(results["torch"].pop("embeddings")))
+    onnx_emb = normalized(np.array(results["onnx"].pop("embeddings")))
+
+    # 1. Parité vecteur à vecteur
+    cosines = (torch_emb * onnx_emb).sum(axis=1)
+
+    # 2. Parité des décisions anti-doublon (similarité convertie en [0, 1] comme le détecteur)
+    torch_sim = (torch_emb @ torch_emb.T + 1) / 2
+    onnx_sim = (onnx_emb @ onnx_emb.T + 1) / 2
+    upper = np.triu_indices(len(FIXTURES), k=1)
+    decisions_agree = np.mean((torch_sim[upper] >= threshold) == (onnx_sim[upper] >= threshold))
+
+    print(f"\n{'='*80}")
+    print("🧪 PARITÉ torch fp32 ↔ ONNX int8")
+    print(f"{'='*80}")
+    print(f"Cosine min / moyenne     : {cosines.min():.4f} / {cosines.mean():.4f} (min requis {args.min_cosine})")
+    print(f"Écart max des similarités: {np.abs(torch_sim - onnx_sim)[upper].max():.4f}")
+    print(f"Décisions doublon égales : {decisions_agree:.1%} ({len(upper[0])} paires, seuil {threshold})")
+
+    print(f"\n{'='*80}")
+    print("⚡ PERFORMANCE CPU")
+    print(f"{'='*80}")
+    print(f"{'backend':<8}{'chargement s':>14}{'RSS MB':>10}{'RSS modèle MB':>16}{'1 texte ms':>12}{'16 textes ms':>14}")
+    for r in results.values():
+        print(f"{r['backend']:<8}{r['load_s']:>14}{r['rss_mb']:>10}{r['rss_model_mb']:>16}"
+              f"{r['encode_1_ms']:>12}{r['encode_16_ms']:>14}")
+
+    if cosines.min() < args.min_cosine:
+        print(f"\n❌ Parité insuffisante : cosine min {cosines.min():.4f} < {args.min_cosine}")
+        sys.exit(1)
+    print("\n✅ Parité OK")
+
+
+if __name__ == "__main__":
+    main()
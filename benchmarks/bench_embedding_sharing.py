@@ -0,0 +1,184 @@
+"""
+Mémoire et latence du modèle d'embeddings selon le mode de partage entre workers
+
+Modes comparés pour N workers :
+- per_worker : chaque worker charge son propre modèle (uvicorn --workers N classique)
+- prefork    : modèle chargé dans le parent puis fork (tools/serve_prefork.py)
+- sidecar    : un seul process détient le modèle, les workers l'interrogent
+               sur une socket Unix (services/embedding_sidecar.py)
+
+Mémoire : somme des PSS (Proportional Set Size) de tous les process du mode — contrairement
+au RSS, les pages partagées ne sont comptées qu'une fois au total.
+Latence : encodage d'un texte mesuré dans chaque worker (p50 / p95 sur l'ensemble).
+
+Usage:
+    python -m benchmarks.bench_embedding_sharing --workers 4 --backend torch
+"""
+import argparse
+import gc
+import json
+import multiprocessing as mp
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+TEXTS = [
+    "Contexte compris - Creuser l'impact chiffré du problème",
+    "Signal d'achat - Proposer une démo la semaine prochaine",
+    "Objection prix - Recentrer sur le ROI mesuré",
+    "Pain identifié - Demander combien d'heures sont perdues",
+    "Décideur cité - Valider qui signe et le budget",
+]
+
+_preloaded_model = None
+
+
+def memory_kb(pid: int) -> Tuple[int, int]:
+    """(RSS, PSS) d'un process en kB (Linux, /proc/<pid>/smaps_rollup)"""
+    rss = pss = 0
+    for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines():
+        if line.startswith("Rss:"):
+            rss = int(line.split()[1])
+        elif line.startswith("Pss:"):
+            pss = int(line.split()[1])
+    return rss, pss
+
+
+def _worker(source: Tuple[str, str], repeat: int, results, release) -> None:
+    """Encode `repeat` fois un texte puis attend la mesure mémoire"""
+    kind, value = source
+    if kind == "preloaded":
+        model = _preloaded_model
+    elif kind == "sidecar":
+        from services.embedding_sidecar import SidecarEmbeddingModel
+        model = SidecarEmbeddingModel(value)
+    else:
+        from services.embedding_backends import load_embedding_backend
+        model = load_embedding_backend(value)
+
+    model.encode(["warm up"], show_progress_bar=False)
+    latencies = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        model.encode([TEXTS[i % len(TEXTS)]], show_progress_bar=False)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    results.put((os.getpid(), latencies))
+    release.wait()
+
+
+def _measure(ctx, source, workers: int, repeat: int, extra_pids: List[int]) -> Dict:
+    results, release = ctx.Queue(), ctx.Event()
+    procs = [ctx.Process(target=_worker, args=(source, repeat, results, release)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+
+    latencies, pids = [], []
+    for _ in range(workers):
+        pid, values = results.get(timeout=600)
+        pids.append(pid)
+        latencies.extend(values)
+
+    memory = [memory_kb(pid) for pid in pids + extra_pids]
+    release.set()
+    for p in procs:
+        p.join()
+
+    latencies.sort()
+    return {
+        "processes": len(memory),
+        "rss_total_mb": round(sum(m[0] for m in memory) / 1024, 1),
+        "pss_total_mb": round(sum(m[1] for m in memory) / 1024, 1),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2),
+    }
+
+
+def run_per_worker(backend: str, workers: int, repeat: int) -> Dict:
+    return _measure(mp.get_context("spawn"), ("backend", backend), workers, repeat, [])
+
+
+def _prefork_coordinator(backend: str, workers: int, repeat: int, out) -> None:
+    """Process parent du mode prefork : charge le modèle (sans inférence), gc.freeze, fork"""
+    global _preloaded_model
+    from services.embedding_backends import load_embedding_backend
+
+    _preloaded_model = load_embedding_backend(backend)
+    gc.collect()
+    gc.freeze()
+    out.put(_measure(mp.get_context("fork"), ("preloaded", ""), workers, repeat, [os.getpid()]))
+
+
+def run_prefork(backend: str, workers: int, repeat: int) -> Dict:
+    ctx = mp.get_context("spawn")
+    out = ctx.Queue()
+    coordinator = ctx.Process(target=_prefork_coordinator, args=(backend, workers, repeat, out))
+    coordinator.start()
+    result = out.get(timeout=900)
+    coordinator.join()
+    return result
+
+
+def run_sidecar(backend: str, workers: int, repeat: int) -> Dict:
+    socket_path = os.path.join(tempfile.mkdtemp(prefix="kitt-bench-"), "embeddings.sock")
+    sidecar = subprocess.Popen(
+        [sys.executable, "-m", "services.embedding_sidecar", "--socket", socket_path, "--backend", backend],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = time.monotonic() + 600
+        while True:
+            if sidecar.poll() is not None:
+                raise RuntimeError("Le sidecar s'est arrêté au démarrage")
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                    probe.connect(socket_path)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.2)
+
+        return _measure(mp.get_context("spawn"), ("sidecar", socket_path), workers, repeat, [sidecar.pid])
+    finally:
+        sidecar.terminate()
+        sidecar.wait()
+
+
+MODES = {"per_worker": run_per_worker, "prefork": run_prefork, "sidecar": run_sidecar}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Partage du modèle d'embeddings entre workers")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--backend", default="torch", choices=["torch", "onnx"])
+    parser.add_argument("--repeat", type=int, default=50, help="Encodages mesurés par worker")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--json", type=Path, help="Écrire le rapport JSON dans ce fichier")
+    args = parser.parse_args()
+
+    report = {}
+    for mode in args.modes.split(","):
+        report[mode] = MODES[mode](args.backend, args.workers, args.repeat)
+
+    print(f"\n{'='*80}")
+    print(f"📊 PARTAGE DU MODÈLE - {args.workers} workers, backend {args.backend}")
+    print(f"{'='*80}")
+    print(f"{'Mode':<14}{'process':>9}{'RSS total MB':>15}{'PSS total MB':>15}{'p50 ms':>10}{'p95 ms':>10}")
+    for mode, row in report.items():
+        print(f"{mode:<14}{row['processes']:>9}{row['rss_total_mb']:>15}{row['pss_total_mb']:>15}"
+              f"{row['p50_ms']:>10}{row['p95_ms']:>10}")
+    print(f"{'='*80}\n")
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
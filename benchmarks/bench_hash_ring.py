@@ -0,0 +1,72 @@
+"""
+Benchmark : équilibre et déplacement des clés de l'anneau de hachage cohérent
+
+Pour des call_id sans préfixe de nœud (sessions orphelines, routées par l'anneau) :
+- équilibre : écart max à la charge moyenne selon le nombre de nœuds virtuels
+- rehachage : part des clés qui changent de nœud quand un nœud rejoint / quitte le cluster,
+  comparée à un simple hash % N
+
+Usage:
+    python -m benchmarks.bench_hash_ring --nodes 4 --keys 100000
+"""
+import argparse
+import time
+import uuid
+from collections import Counter
+from typing import Callable, List
+
+from core.hash_ring import HashRing, _hash
+
+
+def imbalance(owners: List[str], nodes: int) -> float:
+    """Charge du nœud le plus chargé rapportée à la moyenne"""
+    counts = Counter(owners)
+    return max(counts.values()) / (len(owners) / nodes)
+
+
+def moved(before: List[str], after: List[str]) -> float:
+    return sum(a != b for a, b in zip(before, after)) / len(before)
+
+
+def modulo_owner(names: List[str]) -> Callable[[str], str]:
+    return lambda key: names[_hash(key) % len(names)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=4)
+    parser.add_argument("--keys", type=int, default=100_000)
+    args = parser.parse_args()
+
+    names = [f"node-{i}" for i in range(args.nodes)]
+    keys = [str(uuid.uuid4()) for _ in range(args.keys)]
+
+    print(f"{args.keys} clés, {args.nodes} nœuds\n")
+    print(f"{'vnodes':>7} {'déséquilibre':>13} {'join (+1)':>10} {'leave (-1)':>11} {'lookup (µs)':>12}")
+    for vnodes in (1, 16, 160, 512):
+        ring = HashRing(names, vnodes)
+        start = time.perf_counter()
+        before = [ring.get_node(k) for k in keys]
+        lookup_us = (time.perf_counter() - start) / len(keys) * 1e6
+
+        ring.add_node(f"node-{args.nodes}")
+        joined = [ring.get_node(k) for k in keys]
+        ring.remove_node(f"node-{args.nodes}")
+        ring.remove_node(names[-1])
+        left = [ring.get_node(k) for k in keys]
+
+        print(
+            f"{vnodes:>7} {imbalance(before, args.nodes):>12.2f}x {moved(before, joined):>9.1%} "
+            f"{moved(before, left):>10.1%} {lookup_us:>12.2f}"
+        )
+
+    owner = modulo_owner(names)
+    before = [owner(k) for k in keys]
+    joined = [modulo_owner(names + [f"node-{args.nodes}"])(k) for k in keys]
+    left = [modulo_owner(names[:-1])(k) for k in keys]
+    print(f"{'hash % N':>7} {imbalance(before, args.nodes):>12.2f}x {moved(before, joined):>9.1%} {moved(before, left):>10.1%}")
+    print(f"\nIdéal : join {1 / (args.nodes + 1):.1%}, leave {1 / args.nodes:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Benchmark : temps d'import de l'application (cold start / cycles --reload)
+
+Lance `python -X importtime -c "import main"` dans des sous-process neufs et rapporte
+le temps total ainsi que les modules les plus coûteux (temps cumulé).
+
+Usage:
+    python -m benchmarks.bench_import_time [--runs 5] [--top 15]
+"""
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)")
+
+
+def import_profile(module: str) -> tuple[float, dict]:
+    """Retourne (temps mur en s, {module: temps cumulé en µs})"""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True
+    )
+    wall = time.perf_counter() - start
+
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            cumulative[match.group(4)] = int(match.group(2))
+    return wall, cumulative
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    walls, totals, profile = [], [], {}
+    for _ in range(args.runs):
+        wall, profile = import_profile(args.module)
+        walls.append(wall)
+        totals.append(profile.get(args.module, 0) / 1e6)
+
+    print(f"\n{'='*80}")
+    print(f"⏱️  IMPORT DE '{args.module}' ({args.runs} runs)")
+    print(f"{'='*80}")
+    print(f"Import (médiane)          : {statistics.median(totals):.3f} s")
+    print(f"Process complet (médiane) : {statistics.median(walls):.3f} s")
+    print(f"Modules lourds chargés    : "
+          f"{', '.join(m for m in ('torch', 'sentence_transformers', 'onnxruntime', 'openai') if m in profile) or 'aucun'}")
+    print(f"\nTop {args.top} (temps cumulé, dernier run) :")
+    for name, micros in sorted(profile.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {micros / 1000:>9.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
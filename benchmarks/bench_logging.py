@@ -0,0 +1,167 @@
+"""
+Benchmark : coût des logs d'une requête /audio dans le thread de la requête
+
+Rejoue les logs d'une requête /audio typique (bannières, chronologie, pertinence,
+anti-doublon, insight : ~60 lignes INFO) et mesure le temps passé dans le thread appelant :
+- sync : configuration historique (5 handlers écrivant directement sur disque, filtres
+  transcription / insights par recherche de mots-clés dans le message)
+- queue : pipeline actuel (QueueHandler → thread d'écriture, fichiers JSON, catégories)
+- nosrc : queue + LOG_SKIP_CALLER_INFO (pas de remontée de pile : funcName / lineno vides)
+
+Pour queue, "vidage" est le temps restant au thread d'écriture après la dernière requête.
+--interval espace les requêtes (charge réaliste) ; à 0, le thread d'écriture prend du
+retard et dispute le GIL au thread appelant (pire cas, p99 dégradé).
+La console est redirigée vers /dev/null ; les fichiers vont dans un dossier temporaire.
+
+Usage:
+    python -m benchmarks.bench_logging --requests 2000 --interval 5
+"""
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import time
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Callable, List
+
+from config.settings import LOG_FORMAT, LOG_MAX_BYTES, LOG_BACKUP_COUNT
+from config.log_pipeline import (
+    build_handlers, start_log_pipeline, get_category_logger, CATEGORY_INSIGHTS, CATEGORY_TRANSCRIPTION
+)
+
+
+def legacy_handlers(log_dir: Path, devnull) -> List[logging.Handler]:
+    """Handlers de l'ancien main.setup_logging"""
+    formatter = logging.Formatter(LOG_FORMAT)
+
+    class TranscriptionFilter(logging.Filter):
+        def filter(self, record):
+            return 'TRANSCRIPTION' in record.getMessage()
+
+    class InsightsFilter(logging.Filter):
+        def filter(self, record):
+            msg = record.getMessage()
+            return any(keyword in msg for keyword in ['INSIGHT', 'COACHING', 'ANTI-DOUBLON'])
+
+    console = logging.StreamHandler(devnull)
+    console.setLevel(logging.INFO)
+    handlers = [console]
+    for name, level, log_filter in (
+        ("kitt_main.log", logging.DEBUG, None),
+        ("kitt_errors.log", logging.ERROR, None),
+        ("kitt_transcription.log", logging.INFO, TranscriptionFilter()),
+        ("kitt_insights.log", logging.INFO, InsightsFilter()),
+    ):
+        handler = RotatingFileHandler(log_dir / name, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8')
+        handler.setLevel(level)
+        if log_filter is not None:
+            handler.addFilter(log_filter)
+        handlers.append(handler)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+
+def audio_request(i: int) -> None:
+    """Logs d'une requête /audio qui aboutit à un insight accepté"""
+    audio = logging.getLogger("api.audio")
+    insights = get_category_logger("api.audio", CATEGORY_INSIGHTS)
+    transcription = logging.getLogger("services.transcription")
+    manager = get_category_logger("core.call_manager", CATEGORY_INSIGHTS)
+    duplicates = logging.getLogger("services.duplicate_detector")
+    advice = {"type": "objection", "title": f"Rassurer sur le budget {i}", "description": "Proposer un paiement échelonné"}
+
+    audio.info(f"[CHRONOLOGIE] Client start: {i * 0.5:.3f}s, Commercial start: {i * 0.5 + 0.2:.3f}s")
+    audio.info(f"[CHRONOLOGIE] CLIENT a parlé en premier")
+    transcription.info(f"[TRANSCRIPTION DEEPGRAM] [{i}] client: Je trouve que c'est un peu cher pour notre budget")
+    transcription.info(f"[TRANSCRIPTION DEEPGRAM] [{i}] commercial: Je comprends, regardons ensemble les options")
+    for tag, lines in (("PERTINENCE", 4), ("ANTI-DOUBLON", 1)):
+        insights.info(f"\n{'='*80}")
+        for n in range(lines):
+            insights.info(f"[{tag}] 📊 Score: {60 + n}/100 (min requis: 40)")
+        insights.info(f"{'='*80}\n")
+    for key, value in advice.items():
+        insights.info(f"[INSIGHT]    {key}: {value}")
+    duplicates.info(f"[ANTI-DOUBLON LEXICAL] ✅ UNIQUE - similarité 0.12")
+    duplicates.info(f"[ANTI-DOUBLON SÉMANTIQUE] 🧬 ANALYSE PAR VECTORISATION")
+    for n in range(20):
+        duplicates.info(f"   Insight {n}: similarité {0.05 * n:.2f}")
+    manager.info("[ANTI-DOUBLON] ⏳ Modèle d'embeddings non prêt, vérification textuelle")
+    insights.info(f"\n{'='*80}")
+    insights.info(f"[ANTI-DOUBLON] ✅ INSIGHT VALIDÉ ET ACCEPTÉ")
+    for key, value in advice.items():
+        insights.info(f"[INSIGHT]    {key}: {value}")
+    insights.info(f"{'='*80}\n")
+    for n in range(15):
+        audio.info(f"[TIMING] étape {n}: {n * 1.5:.1f}ms")
+
+
+def run(label: str, requests: int, interval: float, setup: Callable[[], Callable[[], None]]) -> None:
+    root = logging.getLogger()
+    saved = root.handlers[:]
+    root.handlers.clear()
+    finish = setup()
+
+    durations = []
+    start = time.perf_counter()
+    for i in range(requests):
+        t = time.perf_counter()
+        audio_request(i)
+        durations.append((time.perf_counter() - t) * 1000)
+        if interval:
+            time.sleep(interval / 1000)
+    elapsed = time.perf_counter() - start
+
+    t = time.perf_counter()
+    finish()
+    drain = time.perf_counter() - t
+    root.handlers[:] = saved
+
+    durations.sort()
+    print(
+        f"{label:<6} {statistics.mean(durations):>9.3f} {durations[len(durations) // 2]:>9.3f} "
+        f"{durations[int(len(durations) * 0.99)]:>9.3f} {elapsed:>9.2f} {drain:>10.2f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--interval", type=float, default=5.0, help="Pause entre deux requêtes (ms)")
+    parser.add_argument("--format", choices=["json", "text"], default="json", help="Format des fichiers (queue)")
+    args = parser.parse_args()
+
+    devnull = open(os.devnull, "w")
+    logging.getLogger().setLevel(logging.INFO)
+
+    print(f"{args.requests} requêtes /audio simulées, {args.interval:g} ms entre deux requêtes\n")
+    print(f"{'':<6} {'moy (ms)':>9} {'p50 (ms)':>9} {'p99 (ms)':>9} {'total (s)':>9} {'vidage (s)':>10}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        def sync_setup():
+            handlers = legacy_handlers(Path(tmp) / "sync", devnull)
+            for handler in handlers:
+                logging.getLogger().addHandler(handler)
+            return lambda: [handler.close() for handler in handlers]
+
+        def queue_setup(skip_caller_info: bool):
+            def setup():
+                handlers = build_handlers(args.format, Path(tmp) / ("nosrc" if skip_caller_info else "queue"))
+                handlers[0].setStream(devnull)
+                listener = start_log_pipeline(handlers, "INFO", skip_caller_info=skip_caller_info)
+                return listener.stop
+            return setup
+
+        for name in ("sync", "queue", "nosrc"):
+            (Path(tmp) / name).mkdir()
+        srcfile = logging._srcfile
+        run("sync", args.requests, args.interval, sync_setup)
+        run("queue", args.requests, args.interval, queue_setup(False))
+        run("nosrc", args.requests, args.interval, queue_setup(True))
+        logging._srcfile = srcfile
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark : surcoût de l'instrumentation /metrics sur une requête /audio
+
+Rejoue, pour une requête /audio qui aboutit à un insight accepté, toutes les mesures
+enregistrées (spans des étapes, issue de la requête, appels OpenAI / Deepgram, tokens) et
+compare leur coût :
+- au temps CPU d'une requête complète (--request-cpu-ms : ~18 ms mesurés en process, API
+  simulées par tools.mock_apis sans latence, chunks de 2 s)
+- à la seule analyse VAD des deux pistes (plus petite étape CPU locale, borne très pessimiste)
+- à la durée d'une requête réelle (--request-ms, transcription + LLM compris)
+
+Mesure aussi le rendu de GET /metrics avec toutes les séries renseignées.
+
+Usage:
+    python -m benchmarks.bench_metrics --requests 20000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from services.audio_pool import analyze_track
+from services.metrics import Metrics
+from config.settings import AUDIO_SAMPLE_RATE
+
+# Étapes d'une requête acceptée (transcription et détection de phase : une par piste)
+STAGES = (
+    "form", "form", "vad", "transcription", "transcription", "pipeline_wait", "session_update",
+    "phase_detection", "context_analysis", "phase_detection", "context_analysis",
+    "relevance", "prompt_build", "llm_coaching", "parse", "duplicate_check",
+)
+
+
+def instrumented_request(metrics: Metrics) -> None:
+    for stage in STAGES:
+        with metrics.span(stage):
+            pass
+    for _ in range(2):
+        metrics.record_api_call("deepgram", "transcribe", "ok", 0.3)
+        metrics.record_api_call("openai", "phase", "ok", 0.4)
+        metrics.record_tokens("phase", 240, 3)
+    metrics.record_api_call("openai", "coaching", "ok", 0.9)
+    metrics.record_tokens("coaching", 900, 60)
+    metrics.record_request("accepted", 1.2)
+
+
+def per_call_us(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--chunk-seconds", type=float, default=2.0)
+    parser.add_argument("--request-cpu-ms", type=float, default=18.0, help="Temps CPU d'une requête /audio (ms)")
+    parser.add_argument("--request-ms", type=float, default=1200.0, help="Durée d'une requête /audio réelle (ms)")
+    args = parser.parse_args()
+
+    enabled, disabled = Metrics(enabled=True), Metrics(enabled=False)
+    instrumented_request(enabled)  # Séries créées
+
+    on_us = per_call_us(lambda: instrumented_request(enabled), args.requests)
+    off_us = per_call_us(lambda: instrumented_request(disabled), args.requests)
+
+    rng = np.random.default_rng(0)
+    samples = int(args.chunk_seconds * AUDIO_SAMPLE_RATE)
+    client = (rng.standard_normal(samples) * 3000).astype(np.int16)
+    commercial = (rng.standard_normal(samples) * 3000).astype(np.int16)
+    vad_us = per_call_us(lambda: (analyze_track(client, "CLIENT"), analyze_track(commercial, "COMMERCIAL")), 200)
+
+    render_us = per_call_us(enabled.render, 200)
+    overhead_us = on_us - off_us
+
+    print(f"Instrumentation d'une requête acceptée ({len(STAGES)} spans + appels + tokens)")
+    print(f"  activée      : {on_us:8.2f} µs")
+    print(f"  désactivée   : {off_us:8.2f} µs (METRICS_ENABLED=false)")
+    print(f"  surcoût      : {overhead_us:8.2f} µs")
+    print(f"\nSurcoût rapporté à :")
+    print(f"  CPU d'une requête complète ({args.request_cpu_ms:g} ms)  : {overhead_us / (args.request_cpu_ms * 1000):.2%}")
+    print(f"  VAD seule (chunk {args.chunk_seconds:g}s, {vad_us:.0f} µs)       : {overhead_us / vad_us:.2%}")
+    print(f"  durée d'une requête réelle ({args.request_ms:g} ms) : {overhead_us / (args.request_ms * 1000):.4%}")
+    print(f"\nRendu de /metrics ({len(enabled.render().splitlines())} lignes) : {render_us:.0f} µs")
+
+
+if __name__ == "__main__":
+    main()
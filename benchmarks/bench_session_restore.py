@@ -0,0 +1,154 @@
+"""
+Benchmark : sauvegarde et restauration de N sessions (redémarrage sans perte d'appels)
+
+Mesure pour des sessions réalistes (transcript de 200 messages, 10 insights avec embeddings
+et signatures MinHash) :
+- taille et temps de sérialisation : format binaire vs ancien format JSON + zlib
+- sauvegarde complète à l'arrêt (InMemorySessionStore.snapshot_all)
+- restauration paresseuse : premier accès à chaque session par un nouveau store
+  (lecture du fichier + décodage), latence p50/p95/p99 et durée totale
+
+Usage:
+    python -m benchmarks.bench_session_restore --sessions 1000
+"""
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import tempfile
+import time
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from core.call_manager import CallManager
+from core.session_snapshot import SnapshotDirectory, dumps_snapshot, loads_snapshot
+from core.session_store import InMemorySessionStore
+from services.minhash import compute_sketch
+from config.settings import MAX_CONTEXT_MESSAGES, MAX_INSIGHTS_CACHE
+
+PHRASES = [
+    "On utilise encore des tableurs partagés pour suivre les relances clients",
+    "Combien de temps votre équipe passe-t-elle sur la préparation des rendez-vous ?",
+    "Le problème c'est qu'on perd des opportunités faute de suivi",
+    "Qui d'autre serait impliqué dans la décision côté direction commerciale ?",
+    "Honnêtement le budget est serré cette année, il faudrait un ROI clair",
+    "Est-ce que vous seriez ouverts à un pilote sur une équipe de cinq commerciaux ?",
+]
+
+
+def build_session(index: int, rng: np.random.Generator, messages: int, insights: int) -> CallManager:
+    """Session remplie directement (sans appel IA)"""
+    manager = CallManager()
+    manager.call_id = f"bench-{index:06d}"
+    for i in range(messages):
+        message = {"role": "client" if i % 2 else "commercial", "content": f"{PHRASES[i % len(PHRASES)]} ({i})"}
+        manager.full_transcript.append(message)
+    manager.messages = manager.full_transcript[-MAX_CONTEXT_MESSAGES:]
+
+    for i in range(insights):
+        insight = f"Insight {i} - {PHRASES[(i + index) % len(PHRASES)]}"
+        vector = rng.standard_normal(384).astype(np.float32)
+        manager.last_insights.append(insight)
+        manager.last_titles.append(insight.split(" - ")[0])
+        manager.insight_timestamps.append(time.time() - 10 * (insights - i))
+        manager.insight_embeddings.append(vector / np.linalg.norm(vector))
+        manager.insight_sketches.append(compute_sketch(insight))
+
+    manager.conversation_phase = "discovery"
+    manager.pain_points = ["suivi des relances", "budget"]
+    manager.pillar_progress[1]["status"] = "completed"
+    manager.pillar_progress[2]["signals"] = ["perd des opportunités"]
+    return manager
+
+
+def legacy_dumps(manager: CallManager) -> bytes:
+    payload = json.dumps(manager.to_state(), separators=(",", ":"), ensure_ascii=False)
+    return zlib.compress(payload.encode("utf-8"), 6)
+
+
+def percentile(samples, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run(args) -> None:
+    rng = np.random.default_rng(0)
+    managers = [
+        build_session(i, rng, args.messages, min(args.insights, MAX_INSIGHTS_CACHE))
+        for i in range(args.sessions)
+    ]
+
+    # Formats : taille et coût de (dé)sérialisation
+    start = time.perf_counter()
+    binary = [dumps_snapshot(m) for m in managers]
+    binary_dump_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    legacy = [legacy_dumps(m) for m in managers]
+    legacy_dump_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    for blob in binary:
+        loads_snapshot(blob)
+    binary_load_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    for blob in legacy:
+        CallManager.from_state(json.loads(zlib.decompress(blob)))
+    legacy_load_ms = (time.perf_counter() - start) * 1000
+
+    n = args.sessions
+    print(f"{n} sessions, {args.messages} messages, {min(args.insights, MAX_INSIGHTS_CACHE)} insights chacune\n")
+    print(f"{'format':>10} {'octets/session':>15} {'dump (ms/session)':>18} {'load (ms/session)':>18}")
+    print(f"{'binaire':>10} {statistics.mean(map(len, binary)):>15.0f} {binary_dump_ms / n:>18.3f} {binary_load_ms / n:>18.3f}")
+    print(f"{'json+zlib':>10} {statistics.mean(map(len, legacy)):>15.0f} {legacy_dump_ms / n:>18.3f} {legacy_load_ms / n:>18.3f}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Arrêt : sauvegarde de toutes les sessions
+        old_store = InMemorySessionStore(SnapshotDirectory(Path(tmp)))
+        for manager in managers:
+            await old_store.create(manager)
+        start = time.perf_counter()
+        saved = await old_store.snapshot_all(timeout=5)
+        snapshot_ms = (time.perf_counter() - start) * 1000
+
+        # Nouveau process : restauration au premier accès
+        new_store = InMemorySessionStore(SnapshotDirectory(Path(tmp)))
+        latencies = []
+        start = time.perf_counter()
+        for manager in managers:
+            t0 = time.perf_counter()
+            restored = await new_store.get(manager.call_id)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            assert restored is not None and len(restored.full_transcript) == args.messages
+        restore_ms = (time.perf_counter() - start) * 1000
+
+        # Restauration concurrente (toutes les sessions réclamées en même temps)
+        await old_store.snapshot_all(timeout=5)
+        concurrent_store = InMemorySessionStore(SnapshotDirectory(Path(tmp)))
+        start = time.perf_counter()
+        await asyncio.gather(*(concurrent_store.get(m.call_id) for m in managers))
+        concurrent_ms = (time.perf_counter() - start) * 1000
+
+    print(f"\nSauvegarde à l'arrêt     : {saved} sessions en {snapshot_ms:.0f}ms")
+    print(
+        f"Restauration séquentielle: {restore_ms:.0f}ms au total, par session "
+        f"p50 {statistics.median(latencies):.2f}ms / p95 {percentile(latencies, 0.95):.2f}ms / "
+        f"p99 {percentile(latencies, 0.99):.2f}ms"
+    )
+    print(f"Restauration concurrente : {concurrent_ms:.0f}ms au total")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--insights", type=int, default=MAX_INSIGHTS_CACHE)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Configuration rechargeable à chaud (audio_config.yaml, company_context.yaml)
+
+Un thread vérifie les deux fichiers toutes les CONFIG_RELOAD_INTERVAL secondes (date de
+modification, taille). Au moindre changement, un nouvel instantané est construit et validé,
+puis remplace l'ancien en une seule affectation : les services lisent `get_config()` sans
+verrou, et un chunk en cours de traitement garde l'instantané qu'il a lu. Un fichier invalide
+(YAML illisible, clé manquante, valeur hors bornes) est refusé avec un log d'erreur :
+l'instantané courant reste en place, les appels en cours ne sont pas interrompus.
+
+Structures dérivées construites une fois par rechargement, pas par chunk :
+- motifs indésirables : une seule regex sur le texte en minuscules (au lieu d'une recherche
+  par motif et par transcription)
+- seuils de silence par rôle (CLIENT = navigateur, COMMERCIAL = micro)
+
+Rechargés : détection de silence, filtrage des transcriptions, contexte entreprise. La section
+`audio` (format des chunks) reste lue au démarrage (config.settings).
+
+Chaque process a son instantané : les process du pool audio reçoivent l'empreinte de celui
+du process API avec chaque chunk et relisent les fichiers si elle diffère de la leur.
+"""
+import logging
+import hashlib
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import yaml
+
+from config.settings import AUDIO_CONFIG_PATH, COMPANY_CONTEXT_PATH, CONFIG_RELOAD_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigError(ValueError):
+    """Fichier de configuration invalide (l'instantané courant est conservé)"""
+
+
+class SilenceThresholds:
+    """Seuils de détection de silence d'une source audio"""
+
+    __slots__ = ("rms_threshold", "min_amplitude", "min_audio_length")
+
+    def __init__(self, rms_threshold: float, min_amplitude: int, min_audio_length: int):
+        self.rms_threshold = rms_threshold
+        self.min_amplitude = min_amplitude
+        self.min_audio_length = min_audio_length
+
+
+def _number(section: Dict[str, Any], key: str, kind: type, path: str):
+    try:
+        value = kind(section[key])
+    except KeyError:
+        raise ConfigError(f"{path}.{key} manquant")
+    except (TypeError, ValueError):
+        raise ConfigError(f"{path}.{key} invalide: {section[key]!r}")
+    if value < 0:
+        raise ConfigError(f"{path}.{key} négatif: {value}")
+    return value
+
+
+def _section(data: Any, key: str, path: str) -> Dict[str, Any]:
+    section = data.get(key) if isinstance(data, dict) else None
+    if not isinstance(section, dict):
+        raise ConfigError(f"{path}{key} manquant")
+    return section
+
+
+class ConfigSnapshot:
+    """Instantané validé de la configuration (ne jamais modifier : remplacé à chaque rechargement)"""
+
+    def __init__(self, audio_cfg: Dict[str, Any], company_ctx: Dict[str, Any], fingerprint: str, version: int):
+        self.version = version
+        self.fingerprint = fingerprint
+        self.loaded_at = time.time()
+
+        silence = _section(audio_cfg, "silence_detection", "")
+        self.silence: Dict[str, SilenceThresholds] = {}
+        for role, source in (("CLIENT", "browser"), ("COMMERCIAL", "microphone")):
+            section = _section(silence, source, "silence_detection.")
+            path = f"silence_detection.{source}"
+            self.silence[role] = SilenceThresholds(
+                _number(section, "rms_threshold", float, path),
+                _number(section, "min_amplitude", int, path),
+                _number(section, "min_audio_length", int, path),
+            )
+
+        filtering = _section(audio_cfg, "transcription_filtering", "")
+        self.min_transcription_length: int = _number(filtering, "min_length", int, "transcription_filtering")
+        patterns = filtering.get("unwanted_patterns") or []
+        if not isinstance(patterns, list) or not all(isinstance(p, str) and p.strip() for p in patterns):
+            raise ConfigError("transcription_filtering.unwanted_patterns : liste de textes non vides attendue")
+        self.unwanted_patterns: Tuple[str, ...] = tuple(patterns)
+        # Comparaison en minuscules (comme `pattern.lower() in text.lower()`), motifs les plus longs d'abord
+        lowered = sorted({p.lower() for p in patterns}, key=len, reverse=True)
+        self.unwanted_matcher: Optional[re.Pattern] = re.compile("|".join(map(re.escape, lowered))) if lowered else None
+
+        for key, field in (("product", "name"), ("company", "name"), ("sales_methodology", "framework")):
+            if not isinstance(_section(company_ctx, key, "").get(field), str):
+                raise ConfigError(f"company_context: {key}.{field} manquant")
+        self.company_context = company_ctx
+        self.product_name: str = company_ctx["product"]["name"]
+        self.company_name: str = company_ctx["company"]["name"]
+        self.sales_framework: str = company_ctx["sales_methodology"]["framework"]
+
+    def silence_thresholds(self, role: str) -> SilenceThresholds:
+        """Seuils du rôle (CLIENT = navigateur, tout autre rôle = micro)"""
+        return self.silence["CLIENT" if role == "CLIENT" else "COMMERCIAL"]
+
+    def find_unwanted(self, text_lower: str) -> Optional[str]:
+        """Premier motif indésirable trouvé dans le texte (déjà en minuscules), None sinon"""
+        if self.unwanted_matcher is None:
+            return None
+        match = self.unwanted_matcher.search(text_lower)
+        return match.group(0) if match else None
+
+
+class ConfigWatcher:
+    """Instantané courant de la configuration et surveillance des fichiers"""
+
+    def __init__(
+        self,
+        paths: Tuple[Path, Path] = (AUDIO_CONFIG_PATH, COMPANY_CONTEXT_PATH),
+        interval: float = CONFIG_RELOAD_INTERVAL
+    ):
+        self.paths = paths
+        self.interval = interval
+        self._reload_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._signature = self._stat()
+        self.stats = {"reloads": 0, "rejected": 0, "last_error": None}
+        # Au démarrage, une configuration invalide est fatale (comme config.settings)
+        self.current: ConfigSnapshot = self._build(version=1)
+
+    def _stat(self) -> Tuple:
+        signature = []
+        for path in self.paths:
+            try:
+                stat = path.stat()
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _build(self, version: int) -> ConfigSnapshot:
+        blobs = []
+        for path in self.paths:
+            try:
+                blobs.append(path.read_bytes())
+            except OSError as e:
+                raise ConfigError(f"{path.name} illisible: {e}")
+        fingerprint = hashlib.sha1(b"\0".join(blobs)).hexdigest()[:12]
+
+        documents = []
+        for path, blob in zip(self.paths, blobs):
+            try:
+                documents.append(yaml.safe_load(blob))
+            except yaml.YAMLError as e:
+                raise ConfigError(f"{path.name}: YAML invalide ({e})")
+        return ConfigSnapshot(documents[0], documents[1], fingerprint, version)
+
+    def reload(self) -> bool:
+        """
+        Relit les fichiers et remplace l'instantané s'ils ont changé
+
+        Returns:
+            True si un nouvel instantané est en place
+
+        Raises:
+            ConfigError: fichier invalide (l'instantané courant est conservé)
+        """
+        with self._reload_lock:
+            self._signature = self._stat()
+            try:
+                snapshot = self._build(self.current.version + 1)
+            except ConfigError as e:
+                self.stats["rejected"] += 1
+                self.stats["last_error"] = str(e)
+                raise
+            if snapshot.fingerprint == self.current.fingerprint:
+                return False
+            previous, self.current = self.current, snapshot
+            self.stats["reloads"] += 1
+            self.stats["last_error"] = None
+        logger.info(
+            f"[CONFIG] 🔄 Configuration rechargée (v{snapshot.version}, {snapshot.fingerprint}, "
+            f"{len(snapshot.unwanted_patterns)} motifs indésirables, précédente {previous.fingerprint})"
+        )
+        return True
+
+    def ensure(self, fingerprint: str) -> None:
+        """Aligne cet instantané sur celui d'un autre process (pool audio)"""
+        if fingerprint != self.current.fingerprint:
+            try:
+                self.reload()
+            except ConfigError as e:
+                logger.error(f"[CONFIG] ❌ {e}")
+
+    def start(self) -> None:
+        """Démarre la surveillance des fichiers (sans effet si CONFIG_RELOAD_INTERVAL = 0)"""
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="kitt-config-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            if self._stat() == self._signature:
+                continue
+            try:
+                self.reload()
+            except ConfigError as e:
+                logger.error(f"[CONFIG] ❌ Rechargement refusé, configuration v{self.current.version} conservée: {e}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "version": self.current.version,
+            "fingerprint": self.current.fingerprint,
+            "loaded_at": self.current.loaded_at,
+            "watching": self._thread is not None,
+            **self.stats
+        }
+
+
+_config_watcher: Optional[ConfigWatcher] = None
+
+
+def get_config_watcher() -> ConfigWatcher:
+    """Retourne le gestionnaire de configuration du process"""
+    global _config_watcher
+    if _config_watcher is None:
+        _config_watcher = ConfigWatcher()
+    return _config_watcher
+
+
+def get_config() -> ConfigSnapshot:
+    """Instantané courant (lecture sans verrou ; le garder le temps d'un traitement)"""
+    return get_config_watcher().current
@@ -0,0 +1,219 @@
+"""
+Pipeline de logs non bloquant
+
+Les loggers n'écrivent plus eux-mêmes : un seul QueueHandler sur le logger racine met
+chaque record en file (message formaté une fois, dans le thread appelant), et un
+QueueListener écrit dans un thread dédié vers la console et les fichiers tournants.
+La boucle asyncio ne fait plus d'écriture disque.
+
+Fichiers en JSON Lines (LOG_FILE_FORMAT=json, par défaut) : un objet par record
+(ts, level, logger, category, message, champs `extra`, exception).
+
+Catégories (kitt_transcription.log, kitt_insights.log) : attribut `category` du record,
+posé par `get_category_logger` ou déduit du nom du logger (LOGGER_CATEGORIES),
+au lieu de chercher des mots-clés dans le message formaté.
+
+Process forkés (tools/serve_prefork.py importe main puis fork les workers) : un fork ne
+copie pas le thread d'écriture. Chaque process enfant repart avec une file neuve et son
+propre thread (os.register_at_fork) ; il doit appeler `stop_log_pipeline()` avant
+`os._exit`, qui saute atexit, pour vider sa file.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config.settings import (
+    LOG_LEVEL,
+    LOG_FORMAT,
+    LOG_FILE_FORMAT,
+    LOG_FILE_MAIN,
+    LOG_FILE_ERRORS,
+    LOG_FILE_TRANSCRIPTION,
+    LOG_FILE_INSIGHTS,
+    LOG_MAX_BYTES,
+    LOG_BACKUP_COUNT,
+    LOG_SKIP_CALLER_INFO
+)
+
+CATEGORY_TRANSCRIPTION = "transcription"
+CATEGORY_INSIGHTS = "insights"
+
+# Modules dont tous les logs relèvent d'une catégorie (nom du logger, ou préfixe "a.b")
+LOGGER_CATEGORIES = {
+    "services.transcription": CATEGORY_TRANSCRIPTION,
+    "services.coaching": CATEGORY_INSIGHTS,
+    "services.duplicate_detector": CATEGORY_INSIGHTS,
+    "services.relevance_filter": CATEGORY_INSIGHTS,
+}
+
+# Attributs standard d'un LogRecord : le reste vient de `extra` et part dans le JSON
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "category", "_json"}
+
+_categories_by_name: Dict[str, Optional[str]] = {}
+
+
+def category_of(record: logging.LogRecord) -> Optional[str]:
+    """Catégorie du record : champ `category`, sinon celle de son logger (mise en cache par nom)"""
+    category = getattr(record, "category", None)
+    if category is not None:
+        return category
+    name = record.name
+    if name not in _categories_by_name:
+        parts = name.split(".")
+        _categories_by_name[name] = next(
+            (LOGGER_CATEGORIES[prefix] for prefix in (".".join(parts[:i]) for i in range(len(parts), 0, -1))
+             if prefix in LOGGER_CATEGORIES),
+            None
+        )
+    return _categories_by_name[name]
+
+
+def get_category_logger(name: str, category: str) -> logging.LoggerAdapter:
+    """Logger du module `name` dont les records portent la catégorie `category`"""
+    return logging.LoggerAdapter(logging.getLogger(name), {"category": category})
+
+
+class CategoryFilter(logging.Filter):
+    """Ne laisse passer que les records d'une catégorie"""
+
+    def __init__(self, category: str):
+        super().__init__()
+        self.category = category
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return category_of(record) == self.category
+
+
+class JsonFormatter(logging.Formatter):
+    """Un objet JSON par ligne (calculé une fois par record, partagé par les fichiers)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = record.__dict__.get("_json")
+        if line is not None:
+            return line
+        data = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "pid": record.process,
+            "category": category_of(record),
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                data[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exception"] = record.exc_text
+        if record.stack_info:
+            data["stack"] = record.stack_info
+        record._json = json.dumps(data, ensure_ascii=False, default=str)
+        return record._json
+
+
+class _PreparedQueueHandler(QueueHandler):
+    """
+    Met en file le record avec le message déjà fusionné et l'exception en texte
+
+    Contrairement à QueueHandler.prepare, pas de copie (seul handler du logger racine, le
+    record n'est plus relu ensuite) et la trace n'est pas collée au message : le JSON la
+    garde dans un champ à part.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _file_handler(path, level: int, formatter: logging.Formatter, category: Optional[str] = None) -> logging.Handler:
+    handler = RotatingFileHandler(path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+    handler.setLevel(level)
+    handler.setFormatter(formatter)
+    if category is not None:
+        handler.addFilter(CategoryFilter(category))
+    return handler
+
+
+def build_handlers(file_format: str = LOG_FILE_FORMAT, log_dir: Optional[Path] = None) -> List[logging.Handler]:
+    """Console (texte) + fichier principal, erreurs, transcription, insights (dans `log_dir` si fourni)"""
+    main_file, errors_file, transcription_file, insights_file = (
+        log_dir / path.name if log_dir is not None else path
+        for path in (LOG_FILE_MAIN, LOG_FILE_ERRORS, LOG_FILE_TRANSCRIPTION, LOG_FILE_INSIGHTS)
+    )
+    text_formatter = logging.Formatter(LOG_FORMAT)
+    file_formatter = JsonFormatter() if file_format == "json" else text_formatter
+
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setLevel(getattr(logging, LOG_LEVEL))
+    console_handler.setFormatter(text_formatter)
+
+    return [
+        console_handler,
+        _file_handler(main_file, logging.DEBUG, file_formatter),
+        _file_handler(errors_file, logging.ERROR, file_formatter),
+        _file_handler(transcription_file, logging.INFO, file_formatter, CATEGORY_TRANSCRIPTION),
+        _file_handler(insights_file, logging.INFO, file_formatter, CATEGORY_INSIGHTS),
+    ]
+
+
+_listener: Optional[QueueListener] = None
+
+
+def _listen(queue_handler: QueueHandler, handlers: List[logging.Handler]) -> QueueListener:
+    """File neuve + thread d'écriture (au démarrage, puis dans chaque process forké)"""
+    global _listener
+    # Après un fork : la copie de la file du parent contient des records que le parent écrira
+    queue_handler.queue = queue.SimpleQueue()
+    _listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_log_pipeline() -> None:
+    """Vide la file et arrête le thread d'écriture du process (sans effet s'il est déjà arrêté)"""
+    if _listener is not None and _listener._thread is not None:  # QueueListener.stop n'est pas idempotent en 3.11
+        _listener.stop()
+
+
+def start_log_pipeline(
+    handlers: List[logging.Handler],
+    level: str = LOG_LEVEL,
+    skip_caller_info: bool = LOG_SKIP_CALLER_INFO
+) -> QueueListener:
+    """
+    Branche le logger racine sur une file consommée par un thread d'écriture
+
+    Le thread est arrêté (file vidée) à la sortie du process, et relancé dans les process forkés.
+    skip_caller_info (LOG_SKIP_CALLER_INFO, désactivé par défaut) : voir plus bas.
+    """
+    if skip_caller_info:
+        # Opt-in : `_srcfile = None` coupe la remontée de pile pour TOUS les loggers du
+        # process (bibliothèques comprises) : pathname / funcName / lineno ne sont plus
+        # renseignés. Nos formats ne les affichent pas, mais un format ou un handler tiers
+        # qui s'en sert les perd.
+        logging._srcfile = None
+    # Nom du process multiprocessing jamais affiché (le JSON garde le pid)
+    logging.logMultiprocessing = False
+
+    queue_handler = _PreparedQueueHandler(queue.SimpleQueue())
+    root_logger = logging.getLogger()
+    root_logger.setLevel(getattr(logging, level))
+    root_logger.addHandler(queue_handler)
+
+    listener = _listen(queue_handler, handlers)
+    os.register_at_fork(after_in_child=lambda: _listen(queue_handler, handlers))
+    atexit.register(stop_log_pipeline)
+    return listener
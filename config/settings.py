@@ -40,6 +40,9 @@ _company_ctx = load_company_context()
 # ============================================================================
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
+# URL alternative de l'API Deepgram (ex: serveur de substitution tools/mock_apis.py)
+# Côté OpenAI, le SDK lit directement OPENAI_BASE_URL
+DEEPGRAM_BASE_URL = os.getenv("DEEPGRAM_BASE_URL")
 
 # ============================================================================
 # MODÈLES IA
@@ -80,6 +83,15 @@ UNWANTED_PATTERNS = _audio_cfg['transcription_filtering']['unwanted_patterns']
 # ----- AUDIO DE BASE -----
 AUDIO_SAMPLE_RATE = int(_audio_cfg['audio']['sample_rate'])
 AUDIO_SUBTYPE = _audio_cfg['audio']['subtype']
+# Process dédiés à l'analyse des chunks (VAD), 0 = dans la boucle d'événements (services/audio_pool.py)
+AUDIO_PROCESS_POOL_WORKERS = int(os.getenv("AUDIO_PROCESS_POOL_WORKERS", "0"))
+
+# ----- RECHARGEMENT À CHAUD (voir config/live_config.py) -----
+# Silence, filtrage et contexte entreprise ci-dessus = valeurs au démarrage ; les services lisent
+# les valeurs courantes via config.live_config.get_config(), rechargées si un des YAML change
+AUDIO_CONFIG_PATH = _audio_config_path
+COMPANY_CONTEXT_PATH = _company_context_path
+CONFIG_RELOAD_INTERVAL = float(os.getenv("CONFIG_RELOAD_INTERVAL", "2"))  # Vérification des fichiers (s), 0 = pas de surveillance
 
 # ============================================================================
 # INSIGHTS & COACHING
@@ -87,9 +99,40 @@ AUDIO_SUBTYPE = _audio_cfg['audio']['subtype']
 MIN_INSIGHT_INTERVAL = int(os.getenv("MIN_INSIGHT_INTERVAL", "1"))
 MAX_CONTEXT_MESSAGES = 50  # ⚡ OPTIMISÉ : Augmenté de 24 à 50 pour un meilleur contexte RAG
 SUMMARY_THRESHOLD = 10  # Nombre de messages avant résumé
+# Résumé glissant (core/rolling_summary.py) : les messages sortis du contexte sont résumés par
+# segments de SUMMARY_THRESHOLD (map), fusionnés au-delà de SUMMARY_MAX_SEGMENTS segments (reduce)
+SUMMARY_MAX_SEGMENTS = int(os.getenv("SUMMARY_MAX_SEGMENTS", "4"))
+SUMMARY_RETRY_DELAY = float(os.getenv("SUMMARY_RETRY_DELAY", "30"))  # Après un échec / délestage (s)
+# Résumés de fin d'appel en tâche de fond (POST /calls/{id}/summaries → GET /jobs/{id}, voir core/jobs.py)
+SUMMARY_JOB_WORKERS = int(os.getenv("SUMMARY_JOB_WORKERS", "4"))  # Jobs exécutés simultanément
+SUMMARY_JOB_QUEUE_SIZE = int(os.getenv("SUMMARY_JOB_QUEUE_SIZE", "256"))  # Jobs en attente max (au-delà : 503)
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "3600"))  # Conservation d'un job terminé (s)
 TIME_THRESHOLD_DUPLICATE = 45  # ✅ ASSOUPLI: Réduit de 250s à 45s pour fenêtre temporelle raisonnable
 MAX_INSIGHTS_CACHE = 10  # ✅ HARMONISÉ avec frontend : Augmenté de 5 à 10 pour cohérence
 
+# ============================================================================
+# EMBEDDINGS (anti-doublon sémantique)
+# ============================================================================
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "paraphrase-multilingual-MiniLM-L12-v2")
+# Backend : "torch" (sentence-transformers fp32), "onnx" (ONNX Runtime int8, sans torch)
+# ou "sidecar" (modèle unique partagé par tous les workers, voir services/embedding_sidecar.py)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_ONNX_DIR = Path(os.getenv(
+    "EMBEDDING_ONNX_DIR",
+    str(_config_dir.parent / "model_cache" / "minilm-l12-onnx-int8")
+))
+EMBEDDING_ONNX_THREADS = int(os.getenv("EMBEDDING_ONNX_THREADS", "0"))  # 0 = auto
+EMBEDDING_SIDECAR_SOCKET = os.getenv("EMBEDDING_SIDECAR_SOCKET", "/tmp/kitt-embeddings.sock")
+EMBEDDING_SIDECAR_BACKEND = os.getenv("EMBEDDING_SIDECAR_BACKEND", "torch")  # Backend réel du sidecar
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))  # Fenêtre de micro-batching
+EMBEDDING_MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", "64"))  # Textes max par batch
+
+# Pré-filtre lexical (MinHash sur trigrammes de caractères) avant les embeddings
+# Jaccard ≥ HIGH avec un insight récent → doublon évident ; < LOW avec tous → insight unique
+# Entre les deux : zone ambiguë, tranchée par les embeddings
+DUPLICATE_LEXICAL_HIGH = float(os.getenv("DUPLICATE_LEXICAL_HIGH", "0.80"))
+DUPLICATE_LEXICAL_LOW = float(os.getenv("DUPLICATE_LEXICAL_LOW", "0.08"))
+
 # ============================================================================
 # SYSTÈME DE PERTINENCE INTELLIGENTE (v2) - ⚡ ASSOUPLI
 # ============================================================================
@@ -115,6 +158,87 @@ COACHING_TEMPERATURE = 0.1  # ✅ RÉDUIT: 0.1 au lieu de 0.3 pour respecter le
 SUMMARY_TEMPERATURE = 0.3
 DUPLICATE_CHECK_TEMPERATURE = 0.2
 
+# ============================================================================
+# ORDONNANCEUR LLM (limites de débit OpenAI de l'organisation)
+# ============================================================================
+LLM_RATE_LIMIT_RPM = int(os.getenv("LLM_RATE_LIMIT_RPM", "500"))  # Requêtes / minute
+LLM_RATE_LIMIT_TPM = int(os.getenv("LLM_RATE_LIMIT_TPM", "200000"))  # Tokens / minute
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))  # Appels simultanés max
+
+# Délestage : une requête est refusée si la capacité restante passe sous le seuil
+# (le coaching n'est jamais délesté)
+LLM_SHED_THRESHOLDS = {
+    "phase": 0.10,
+    "duplicate": 0.15,
+    "summary": 0.25,
+}
+
+# ============================================================================
+# STOCKAGE DES SESSIONS (partagé entre workers / nœuds)
+# ============================================================================
+# "memory" : dict du process (un seul worker) ; "redis" : état sérialisé dans Redis
+SESSION_STORE_BACKEND = os.getenv("SESSION_STORE", "memory")
+REDIS_URL = os.getenv("REDIS_URL", "redis://127.0.0.1:6379/0")
+SESSION_STORE_TTL = int(os.getenv("SESSION_STORE_TTL", "86400"))  # Expiration d'une session inactive (s)
+SESSION_LOCK_TTL = float(os.getenv("SESSION_LOCK_TTL", "60"))  # Expiration du verrou si son détenteur disparaît (prolongé tant qu'il est détenu) (s)
+SESSION_LOCK_TIMEOUT = float(os.getenv("SESSION_LOCK_TIMEOUT", "30"))  # Attente max du verrou (s)
+
+# Nettoyage des sessions abandonnées (store "memory" ; avec Redis : SESSION_STORE_TTL)
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "1800"))  # Session inactive supprimée après (s)
+SESSION_MEMORY_BUDGET_MB = float(os.getenv("SESSION_MEMORY_BUDGET_MB", "512"))  # Budget mémoire des sessions
+SESSION_MIN_IDLE_FOR_EVICTION = float(os.getenv("SESSION_MIN_IDLE_FOR_EVICTION", "60"))  # Jamais évincée avant (s)
+SESSION_REAPER_INTERVAL = float(os.getenv("SESSION_REAPER_INTERVAL", "30"))  # Période du nettoyage (s)
+# Dossier d'archivage des sessions évincées (vide = pas d'archivage)
+SESSION_ARCHIVE_DIR = Path(os.getenv("SESSION_ARCHIVE_DIR")) if os.getenv("SESSION_ARCHIVE_DIR") else None
+
+# Sauvegarde des sessions à l'arrêt (store "memory"), restaurées au premier accès par le process suivant
+# SESSION_SNAPSHOT_DIR vide = pas de sauvegarde
+SESSION_SNAPSHOT_DIR = os.getenv("SESSION_SNAPSHOT_DIR", str(_config_dir.parent / "snapshots"))
+SESSION_DRAIN_TIMEOUT = float(os.getenv("SESSION_DRAIN_TIMEOUT", "20"))  # Attente max des traitements en cours (s)
+
+# Pipeline ordonné par session (chunks numérotés via X-Chunk-Seq)
+CHUNK_REORDER_TIMEOUT = float(os.getenv("CHUNK_REORDER_TIMEOUT", "2.0"))  # Attente max d'un chunk manquant (s)
+SESSION_ACTOR_IDLE_TIMEOUT = float(os.getenv("SESSION_ACTOR_IDLE_TIMEOUT", "60"))  # Acteur inactif arrêté, pipeline retiré (s)
+
+# ============================================================================
+# ÉVÉNEMENTS TEMPS RÉEL (SSE /calls/{id}/events, voir core/event_bus.py)
+# ============================================================================
+SSE_SUBSCRIBER_BUFFER = int(os.getenv("SSE_SUBSCRIBER_BUFFER", "256"))  # Événements en attente max par abonné
+SSE_REPLAY_EVENTS = int(os.getenv("SSE_REPLAY_EVENTS", "128"))  # Historique par session (reprise via Last-Event-ID)
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))  # Commentaire keep-alive sans événement (s)
+# Durée max d'un flux : le navigateur se reconnecte seul (Last-Event-ID), l'arrêt du serveur n'attend pas plus
+SSE_MAX_STREAM_SECONDS = float(os.getenv("SSE_MAX_STREAM_SECONDS", "60"))
+
+# ============================================================================
+# ANALYTICS (agrégats toutes sessions, GET /analytics, voir core/analytics.py)
+# ============================================================================
+ANALYTICS_MAX_CONCEPTS = int(os.getenv("ANALYTICS_MAX_CONCEPTS", "64"))  # Concepts distincts suivis (au-delà : "other")
+# Agrégats sauvegardés à l'arrêt et rechargés au démarrage (vide = pas de sauvegarde)
+# Un fichier par process ({nom}.{pid}.json) : plusieurs workers se partagent ce préfixe
+ANALYTICS_STATE_FILE = os.getenv(
+    "ANALYTICS_STATE_FILE",
+    str(Path(SESSION_SNAPSHOT_DIR) / "analytics.json") if SESSION_SNAPSHOT_DIR else ""
+)
+ANALYTICS_FLUSH_INTERVAL = float(os.getenv("ANALYTICS_FLUSH_INTERVAL", "15"))  # Écriture périodique de l'état (s)
+
+# ============================================================================
+# CLUSTER (plusieurs nœuds, routage des sessions vers leur nœud, voir core/cluster.py)
+# ============================================================================
+NODE_ID = os.getenv("NODE_ID", "")  # Identifiant de ce nœud, intégré aux call_id
+# "node-a=http://10.0.0.1:8000,node-b=http://10.0.0.2:8000" (vide = nœud unique, pas de routage)
+CLUSTER_NODES = os.getenv("CLUSTER_NODES", "")
+HASH_RING_VNODES = int(os.getenv("HASH_RING_VNODES", "160"))  # Nœuds virtuels par nœud
+CLUSTER_FORWARD_TIMEOUT = float(os.getenv("CLUSTER_FORWARD_TIMEOUT", "60"))  # Relais vers un autre nœud (s)
+
+# ============================================================================
+# ADMINISTRATION (routes /admin, en-tête X-Admin-Token, voir api/admin.py)
+# ============================================================================
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")  # Vide = routes /admin et profilage par requête désactivés
+# Profileur par échantillonnage (voir core/profiler.py)
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "10"))  # Période d'échantillonnage
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))  # Durée max d'un profil à la demande
+PROFILER_KEEP = int(os.getenv("PROFILER_KEEP", "20"))  # Profils par requête (X-Profile) conservés
+
 # ============================================================================
 # CORS
 # ============================================================================
@@ -129,7 +253,12 @@ ALLOWED_ORIGINS = [
 # LOGGING
 # ============================================================================
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
-LOG_FORMAT = '%(asctime)s - %(levelname)s - %(name)s - %(message)s'
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(name)s - %(message)s'  # Console
+# Fichiers : "json" (une ligne JSON par record) ou "text" (LOG_FORMAT), voir config/log_pipeline.py
+LOG_FILE_FORMAT = os.getenv("LOG_FILE_FORMAT", "json")
+# Ne plus relever fichier / ligne / fonction de l'appelant (%(funcName)s, %(lineno)d vides) :
+# économise une remontée de pile par record, à réserver aux déploiements qui n'en ont pas besoin
+LOG_SKIP_CALLER_INFO = os.getenv("LOG_SKIP_CALLER_INFO", "false").lower() == "true"
 
 # Dossier des logs
 import pathlib
@@ -146,6 +275,21 @@ LOG_FILE_INSIGHTS = LOG_DIR / "kitt_insights.log"
 LOG_MAX_BYTES = 10 * 1024 * 1024  # 10 MB
 LOG_BACKUP_COUNT = 5  # Garder 5 fichiers de backup
 
+# ============================================================================
+# MÉTRIQUES (GET /metrics, format Prometheus, voir services/metrics.py)
+# ============================================================================
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# Dossier partagé par les workers d'un nœud (tools/serve_prefork.py en crée un) : chaque process
+# y écrit ses compteurs ({pid}.json) et GET /metrics renvoie leur somme. Vide = ce process seul
+METRICS_MULTIPROCESS_DIR = os.getenv("METRICS_MULTIPROCESS_DIR", "")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))  # Écriture périodique des compteurs (s)
+
+# ============================================================================
+# CAPTURE DES SESSIONS (rejeu hors ligne : tools/replay_capture.py, voir services/capture.py)
+# ============================================================================
+CAPTURE_DIR = os.getenv("CAPTURE_DIR", "")  # Vide = pas de capture
+CAPTURE_MAX_PENDING = int(os.getenv("CAPTURE_MAX_PENDING", "1000"))  # Records en attente d'écriture, au-delà : ignorés
+
 # ============================================================================
 # CONTEXTE ENTREPRISE & PRODUIT (depuis company_context.yaml)
 # ============================================================================
@@ -0,0 +1,376 @@
+"""
+Statistiques toutes sessions confondues, tenues à jour au fil de l'eau
+
+Alimenté par le CallManager (messages, insights acceptés ou bloqués) et par la fin des
+sessions (/end, éviction) : les chiffres survivent à la suppression des sessions.
+
+Tout est de taille fixe, quel que soit le nombre d'appels :
+- compteurs globaux, matrice phase × type d'insight, progression par pilier
+- concepts : au plus ANALYTICS_MAX_CONCEPTS distincts (au-delà : "other")
+- histogrammes à bornes fixes (durée, messages et insights par appel)
+- cumuls par tranche de temps : 60 tranches d'une minute, 48 tranches d'une heure
+
+Un enregistrement coûte O(1) ; GET /analytics lit ces agrégats sans parcourir les sessions.
+L'état est un dict de nombres (JSON), additionnable (`merge_states`) entre workers et entre
+nœuds pour une vue du cluster.
+
+Plusieurs workers par nœud (prefork, uvicorn --workers) : chaque process compte son trafic et
+écrit son propre fichier (WorkerStateFiles) toutes les ANALYTICS_FLUSH_INTERVAL secondes et à
+l'arrêt ; la vue du nœud additionne l'état du process et les fichiers des autres.
+"""
+import logging
+import asyncio
+import bisect
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from models import InsightType
+from config.settings import ANALYTICS_MAX_CONCEPTS, ANALYTICS_STATE_FILE, ANALYTICS_FLUSH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+PHASES = ("introduction", "discovery", "presentation", "negotiation", "closing")
+INSIGHT_TYPES = tuple(t.value for t in InsightType) + ("unknown",)
+OTHER = "other"
+
+# Compteurs cumulés par tranche de temps
+ROLLUP_COUNTERS = ("calls_started", "calls_ended", "messages", "insights", "blocked_duplicates")
+# (nom, largeur d'une tranche en secondes, nombre de tranches conservées)
+ROLLUPS = (("minutes", 60, 60), ("hours", 3600, 48))
+
+# Bornes des histogrammes : tranche i = [bornes[i-1], bornes[i])
+HISTOGRAM_BOUNDS = {
+    "duration_minutes": (1, 5, 15, 30, 60),
+    "messages_per_call": (10, 25, 50, 100, 200),
+    "insights_per_call": (1, 3, 5, 10, 20),
+}
+
+
+def _histogram_labels(bounds: Tuple[int, ...]) -> List[str]:
+    return [f"<{bounds[0]}"] + [f"{lo}-{hi}" for lo, hi in zip(bounds, bounds[1:])] + [f"{bounds[-1]}+"]
+
+
+def _empty_state() -> Dict[str, Any]:
+    return {
+        "since": time.time(),
+        "totals": {
+            "calls_started": 0, "calls_ended": 0, "messages_client": 0, "messages_commercial": 0,
+            "insights": 0, "blocked_duplicates": 0
+        },
+        "end_reasons": {},
+        "insights_by_phase": {phase: {t: 0 for t in INSIGHT_TYPES} for phase in PHASES + (OTHER,)},
+        "concepts": {},
+        "pillars": {},
+        "histograms": {name: [0] * (len(bounds) + 1) for name, bounds in HISTOGRAM_BOUNDS.items()},
+        **{name: {} for name, _, _ in ROLLUPS}
+    }
+
+
+def merge_states(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
+    """Somme de deux états (nœuds différents) : nombres additionnés, listes terme à terme"""
+    merged = dict(a)
+    for key, value in b.items():
+        if key not in merged:
+            merged[key] = value
+        elif key == "since":
+            merged[key] = min(merged[key], value)
+        elif isinstance(value, dict):
+            merged[key] = merge_states(merged[key], value)
+        elif isinstance(value, list):
+            merged[key] = [x + y for x, y in zip(merged[key], value)]
+        elif isinstance(value, (int, float)):
+            merged[key] = merged[key] + value
+    return merged
+
+
+def _rate(part: int, whole: int) -> Optional[float]:
+    return round(part / whole, 3) if whole else None
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class WorkerStateFiles:
+    """
+    Un fichier d'état par process, `{nom}.{pid}.json` à côté de ANALYTICS_STATE_FILE
+
+    Au démarrage, le process reprend les fichiers des process terminés (et de son propre pid :
+    redémarrage dans un conteneur) ainsi que l'ancien fichier unique : chaque fichier est
+    d'abord renommé, un seul process peut donc le reprendre, et ses comptes ne sont additionnés
+    qu'une fois. Les fichiers des autres workers en vie sont seulement lus (vue du nœud).
+    """
+
+    def __init__(self, path: Path, pid: Optional[int] = None):
+        self.base = path
+        self.pid = pid or os.getpid()
+        self.path = path.with_name(f"{path.stem}.{self.pid}{path.suffix}")
+
+    def _files(self) -> List[Tuple[Path, int]]:
+        files = []
+        for path in self.base.parent.glob(f"{self.base.stem}.*{self.base.suffix}"):
+            middle = path.name[len(self.base.stem) + 1:-len(self.base.suffix) or None]
+            if middle.isdigit():
+                files.append((path, int(middle)))
+        return files
+
+    @staticmethod
+    def _read(path: Path) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads(path.read_text())
+        except FileNotFoundError:
+            return None  # Repris ou réécrit entre-temps
+        except (OSError, ValueError) as e:
+            logger.error(f"[ANALYTICS] ❌ État illisible ({path}), ignoré: {e}")
+            return None
+
+    def claim(self) -> Tuple[Optional[Dict[str, Any]], List[Path]]:
+        """
+        Reprend les états laissés par les process précédents
+
+        Returns:
+            (somme des états repris ou None, fichiers renommés à supprimer une fois la somme écrite)
+        """
+        candidates = [path for path, pid in self._files() if pid == self.pid or not _pid_alive(pid)]
+        if self.base.exists():
+            candidates.append(self.base)
+
+        state, claimed = None, []
+        for path in candidates:
+            taken = path.with_name(f"{path.name}.claimed-{self.pid}")
+            try:
+                path.rename(taken)
+            except FileNotFoundError:
+                continue  # Repris par un autre worker
+            claimed.append(taken)
+            previous = self._read(taken)
+            if previous is not None:
+                state = merge_states(state, previous) if state else previous
+        if claimed:
+            logger.info(f"[ANALYTICS] ♻️ {len(claimed)} état(s) de process précédents repris")
+        return state, claimed
+
+    def peer_states(self) -> List[Dict[str, Any]]:
+        """États écrits par les autres process du nœud"""
+        states = []
+        for path, pid in self._files():
+            if pid != self.pid:
+                state = self._read(path)
+                if state is not None:
+                    states.append(state)
+        return states
+
+    def write(self, blob: str) -> None:
+        """Écriture atomique de l'état de ce process (déjà sérialisé)"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(blob)
+        tmp.replace(self.path)
+
+
+class SessionAnalytics:
+    """Agrégats incrémentaux des sessions du process"""
+
+    def __init__(
+        self,
+        max_concepts: int = ANALYTICS_MAX_CONCEPTS,
+        state: Optional[Dict[str, Any]] = None,
+        files: Optional[WorkerStateFiles] = None,
+        flush_interval: float = ANALYTICS_FLUSH_INTERVAL
+    ):
+        self.max_concepts = max_concepts
+        self.state = merge_states(_empty_state(), state) if state else _empty_state()
+        self.files = files
+        self.flush_interval = flush_interval
+        self._task: Optional[asyncio.Task] = None
+
+    # ------------------------------------------------------------------
+    # Enregistrement (O(1))
+    # ------------------------------------------------------------------
+
+    def _roll(self, counter: str, now: float) -> None:
+        """Incrémente `counter` dans la tranche courante de chaque cumul"""
+        for name, width, keep in ROLLUPS:
+            buckets = self.state[name]
+            start = str(int(now // width * width))
+            bucket = buckets.get(start)
+            if bucket is None:
+                bucket = buckets[start] = dict.fromkeys(ROLLUP_COUNTERS, 0)
+                while len(buckets) > keep:  # Une fois par tranche
+                    del buckets[min(buckets, key=int)]
+            bucket[counter] += 1
+
+    def record_call_started(self) -> None:
+        self.state["totals"]["calls_started"] += 1
+        self._roll("calls_started", time.time())
+
+    def record_event(self, event_type: str, data: Dict[str, Any], phase: str) -> None:
+        """Événement d'une session (même flux que le bus SSE, voir CallManager.publish_event)"""
+        now = time.time()
+        totals = self.state["totals"]
+        if event_type == "message":
+            totals["messages_client" if data["role"] == "assistant" else "messages_commercial"] += 1
+            self._roll("messages", now)
+        elif event_type == "insight":
+            totals["insights"] += 1
+            self._roll("insights", now)
+            by_phase = self.state["insights_by_phase"]
+            row = by_phase[phase] if phase in by_phase else by_phase[OTHER]
+            row[data["type"] if data["type"] in row else "unknown"] += 1
+            concepts = self.state["concepts"]
+            for concept in data["concepts"]:
+                if concept not in concepts and len(concepts) >= self.max_concepts:
+                    concept = OTHER
+                concepts[concept] = concepts.get(concept, 0) + 1
+        elif event_type == "insight_blocked":
+            totals["blocked_duplicates"] += 1
+            self._roll("blocked_duplicates", now)
+
+    def record_call_ended(self, manager, reason: str) -> None:
+        """Fin de session (/end ou éviction) : progression des piliers et histogrammes par appel"""
+        now = time.time()
+        self.state["totals"]["calls_ended"] += 1
+        self._roll("calls_ended", now)
+        reasons = self.state["end_reasons"]
+        reasons[reason] = reasons.get(reason, 0) + 1
+
+        pillars = self.state["pillars"]
+        for i, pillar in manager.pillar_progress.items():
+            stats = pillars.setdefault(str(i), {"name": pillar["name"], "reached": 0, "completed": 0})
+            stats["reached"] += pillar["status"] != "not_started"
+            stats["completed"] += pillar["status"] == "completed"
+
+        values = {
+            "duration_minutes": (now - manager.created_at.timestamp()) / 60,
+            "messages_per_call": len(manager.full_transcript),
+            "insights_per_call": len(manager.insight_history),
+        }
+        for name, value in values.items():
+            self.state["histograms"][name][bisect.bisect_right(HISTOGRAM_BOUNDS[name], value)] += 1
+
+    # ------------------------------------------------------------------
+    # Lecture
+    # ------------------------------------------------------------------
+
+    def export(self) -> Dict[str, Any]:
+        """Copie de l'état brut (JSON), additionnable avec `merge_states`"""
+        return json.loads(json.dumps(self.state))
+
+    async def export_node(self) -> Dict[str, Any]:
+        """État du nœud : ce process + derniers fichiers écrits par les autres workers"""
+        state = self.export()
+        if self.files is not None:
+            for peer_state in await asyncio.to_thread(self.files.peer_states):
+                state = merge_states(state, peer_state)
+        return state
+
+    # ------------------------------------------------------------------
+    # Persistance (fichier du process)
+    # ------------------------------------------------------------------
+
+    async def save(self) -> None:
+        """Écrit l'état du process (sérialisé dans la boucle : l'état n'est jamais lu pendant une mise à jour)"""
+        if self.files is not None:
+            await asyncio.to_thread(self.files.write, json.dumps(self.state))
+
+    def start(self) -> None:
+        """Écriture périodique, pour que les autres workers voient ce trafic"""
+        if self.files is not None and self.flush_interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._flush_loop(), name="analytics-flush")
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.save()
+            except OSError as e:
+                logger.error(f"[ANALYTICS] ❌ Écriture de l'état impossible: {e}")
+
+
+def summarize(state: Dict[str, Any], now: Optional[float] = None) -> Dict[str, Any]:
+    """Vue lisible d'un état (taux, histogrammes étiquetés, fenêtres glissantes)"""
+    now = now or time.time()
+    totals = state["totals"]
+    ended = totals["calls_ended"]
+    generated = totals["insights"] + totals["blocked_duplicates"]
+
+    windows = {}
+    for label, rollup, seconds in (("last_hour", "minutes", 3600), ("last_24h", "hours", 86400)):
+        window = dict.fromkeys(ROLLUP_COUNTERS, 0)
+        for start, bucket in state[rollup].items():
+            if int(start) > now - seconds:
+                for counter in ROLLUP_COUNTERS:
+                    window[counter] += bucket[counter]
+        windows[label] = window
+
+    hourly = [
+        {"start": datetime.fromtimestamp(int(start)).isoformat(), **bucket}
+        for start, bucket in sorted(state["hours"].items(), key=lambda item: int(item[0]))
+        if int(start) > now - 86400
+    ]
+
+    return {
+        "since": datetime.fromtimestamp(state["since"]).isoformat(),
+        "generated_at": datetime.fromtimestamp(now).isoformat(),
+        "calls": {
+            "started": totals["calls_started"],
+            "ended": ended,
+            "end_reasons": state["end_reasons"],
+        },
+        "messages": {"client": totals["messages_client"], "commercial": totals["messages_commercial"]},
+        "insights": {
+            "accepted": totals["insights"],
+            "blocked_duplicates": totals["blocked_duplicates"],
+            "duplicate_block_rate": _rate(totals["blocked_duplicates"], generated),
+            "by_type": {t: sum(row[t] for row in state["insights_by_phase"].values()) for t in INSIGHT_TYPES},
+            "by_phase": state["insights_by_phase"],
+        },
+        "concepts": dict(sorted(state["concepts"].items(), key=lambda item: item[1], reverse=True)),
+        "pillars": {
+            i: {
+                "name": p["name"],
+                "reached_rate": _rate(p["reached"], ended),
+                "completion_rate": _rate(p["completed"], ended),
+            }
+            for i, p in sorted(state["pillars"].items())
+        },
+        "per_call": {
+            name: dict(zip(_histogram_labels(HISTOGRAM_BOUNDS[name]), counts))
+            for name, counts in state["histograms"].items()
+        },
+        "windows": windows,
+        "hourly": hourly,
+    }
+
+
+_session_analytics: Optional[SessionAnalytics] = None
+
+
+def get_session_analytics() -> SessionAnalytics:
+    """Retourne les agrégats du process (états des process précédents repris au premier appel)"""
+    global _session_analytics
+    if _session_analytics is None:
+        files = WorkerStateFiles(Path(ANALYTICS_STATE_FILE)) if ANALYTICS_STATE_FILE else None
+        state, claimed = files.claim() if files is not None else (None, [])
+        _session_analytics = SessionAnalytics(state=state, files=files)
+        if claimed:
+            # Comptes repris écrits dans le fichier de ce process avant de supprimer les originaux
+            files.write(json.dumps(_session_analytics.state))
+            for path in claimed:
+                path.unlink(missing_ok=True)
+    return _session_analytics
@@ -2,15 +2,49 @@
 Gestionnaire de session d'appel avec contexte structuré
 """
 import logging
-from typing import List, Dict, Optional, Any
+import base64
+from typing import List, Dict, Optional, Any, Tuple
 from datetime import datetime
+import numpy as np
 
-from models import CallConfig, PROFILE_TEMPLATES
+from models import CallConfig, InsightRecord, InsightType, PROFILE_TEMPLATES
 from services.context_analyzer import ContextAnalyzer
-from services.duplicate_detector import DuplicateDetector
-from config.settings import MAX_CONTEXT_MESSAGES, MAX_INSIGHTS_CACHE
+from services.duplicate_detector import DuplicateDetector, is_embedding_model_ready, record_duplicate_tier
+from services.embedding_batcher import get_embedding_batcher
+from services.minhash import compute_sketch
+from core.event_bus import get_event_bus
+from core.analytics import get_session_analytics
+from core.rolling_summary import get_rolling_summarizer
+from services.metrics import span
+from config.settings import MAX_CONTEXT_MESSAGES, MAX_INSIGHTS_CACHE, SUMMARY_THRESHOLD
+from config.log_pipeline import get_category_logger, CATEGORY_INSIGHTS
 
 logger = logging.getLogger(__name__)
+insights_logger = get_category_logger(__name__, CATEGORY_INSIGHTS)
+
+
+def _array_to_b64(array: Optional[np.ndarray]) -> Optional[str]:
+    return base64.b64encode(np.ascontiguousarray(array).tobytes()).decode("ascii") if array is not None else None
+
+
+def _b64_to_array(data: Optional[str], dtype) -> Optional[np.ndarray]:
+    return np.frombuffer(base64.b64decode(data), dtype=dtype).copy() if data is not None else None
+
+
+def classify_insight_type(insight: str) -> str:
+    """Type d'un insight d'après son texte (quand le modèle n'a pas fourni de type)"""
+    lowered = insight.lower()
+    if "🔴" in insight or "alerte" in lowered:
+        return InsightType.ALERT.value
+    if "🔵" in insight or "opportunité" in lowered:
+        return InsightType.OPPORTUNITY.value
+    if "🟢" in insight or "progression" in lowered:
+        return InsightType.PROGRESSION.value
+    return "unknown"
+
+
+def _empty_insight_stats() -> Dict[str, Any]:
+    return {"by_type": {t.value: 0 for t in InsightType} | {"unknown": 0}, "concepts": {}}
 
 
 class CallManager:
@@ -23,16 +57,35 @@ class CallManager:
         # Messages et transcripts
         self.messages: List[Dict] = []
         self.full_transcript: List[Dict] = []
+        self.transcript_version = 0  # Incrémenté à chaque message (clé du cache des résumés)
+
+        # Chunks numérotés appliqués (core/session_pipeline.py) : partagés entre workers via le store
+        self.chunk_next_seq = 0
+        self.chunk_skipped: List[int] = []  # Numéros sautés, encore acceptés s'ils arrivent en retard
+
+        # Résumés de fin d'appel déjà générés : {type: {"key", "summary", "generated_at"}}
+        self.summary_cache: Dict[str, Dict[str, Any]] = {}
         
         # Insights
         self.last_insights: List[str] = []
         self.last_titles: List[str] = []  # ✅ NOUVEAU: Tracking des titres pour éviter répétitions
         self.insight_timestamps: List[float] = []
         self.recent_concepts: List[str] = []
+        self.insight_embeddings: List[Optional[np.ndarray]] = []  # Embeddings normalisés (cache anti-doublon)
+        self.insight_sketches: List[np.ndarray] = []  # Signatures MinHash (pré-filtre lexical)
         self.last_insight_time: float = 0
+        self._candidate_embedding: Optional[tuple] = None  # (texte, embedding) du dernier insight vérifié
+
+        # Historique complet (non tronqué) + compteurs tenus à jour à chaque ajout
+        self.insight_history: List[InsightRecord] = []
+        self.insight_stats: Dict[str, Any] = _empty_insight_stats()
         
         # Contexte structuré
+        # Mémoire des échanges sortis du contexte : résumé fusionné + résumés de segments récents,
+        # couvrant full_transcript[:summary_covered_until] (core/rolling_summary.py)
         self.conversation_summary = ""
+        self.summary_segments: List[str] = []
+        self.summary_covered_until = 0
         self.pain_points: List[str] = []
         self.conversation_phase = "introduction"
         self.topics_covered: List[str] = []
@@ -66,6 +119,63 @@ class CallManager:
 
         self.created_at = datetime.now()
     
+    # Champs copiés tels quels lors de la sérialisation (types JSON natifs)
+    _STATE_FIELDS = (
+        "call_id", "messages", "full_transcript", "transcript_version", "chunk_next_seq", "chunk_skipped",
+        "summary_cache",
+        "last_insights", "last_titles", "insight_timestamps", "recent_concepts", "last_insight_time", "insight_stats",
+        "conversation_summary", "summary_segments", "summary_covered_until",
+        "pain_points", "conversation_phase", "topics_covered", "needs_summary_update",
+        "performance_metrics"
+    )
+
+    def to_state(self, with_arrays: bool = True) -> Dict[str, Any]:
+        """
+        État complet de la session en types JSON (pour le SessionStore)
+
+        Les services (analyseur, détecteur) ne sont pas sérialisés : ils sont sans état.
+        Avec `with_arrays=False`, les embeddings et signatures (base64) sont omis :
+        le format binaire (core/session_snapshot.py) les écrit bruts.
+        """
+        state = {field: getattr(self, field) for field in self._STATE_FIELDS}
+        state["config"] = self.config.model_dump(mode="json") if self.config else None
+        state["pillar_progress"] = self.pillar_progress
+        state["created_at"] = self.created_at.isoformat()
+        state["insight_history"] = [record.model_dump() for record in self.insight_history]
+        if with_arrays:
+            state["insight_embeddings"] = [_array_to_b64(e) for e in self.insight_embeddings]
+            state["insight_sketches"] = [_array_to_b64(s) for s in self.insight_sketches]
+        return state
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "CallManager":
+        """Reconstruit une session depuis `to_state()` (profil client déjà appliqué)"""
+        manager = cls()
+        for field in cls._STATE_FIELDS:
+            if field in state:  # Sessions sérialisées par une version antérieure : valeur par défaut
+                setattr(manager, field, state[field])
+        manager.config = CallConfig.model_validate(state["config"]) if state["config"] else None
+        # Les clés entières deviennent des chaînes en JSON
+        manager.pillar_progress = {int(k): v for k, v in state["pillar_progress"].items()}
+        manager.created_at = datetime.fromisoformat(state["created_at"])
+        manager.insight_history = [InsightRecord.model_validate(r) for r in state.get("insight_history", [])]
+        manager.insight_embeddings = [_b64_to_array(e, np.float32) for e in state["insight_embeddings"]]
+        manager.insight_sketches = [_b64_to_array(s, np.uint64) for s in state["insight_sketches"]]
+        return manager
+
+    def estimate_memory_bytes(self) -> int:
+        """
+        Estimation rapide de la mémoire occupée par la session
+
+        `messages` partage ses dicts avec `full_transcript` : seul le transcript est compté.
+        """
+        transcript = sum(len(m["content"]) + 250 for m in self.full_transcript)
+        insights = sum(len(r.insight) + len(r.title) + 400 for r in self.insight_history)
+        insights += len(self.get_summary_memory())
+        vectors = sum(e.nbytes for e in self.insight_embeddings if e is not None)
+        vectors += sum(s.nbytes for s in self.insight_sketches)
+        return 16 * 1024 + transcript + insights + vectors
+
     def _apply_profile_defaults(self, config: CallConfig) -> CallConfig:
         """Applique automatiquement les valeurs par défaut d'un profil client"""
         primary = PROFILE_TEMPLATES.get(config.client_personality.primary_profile)
@@ -92,24 +202,72 @@ class CallManager:
 
         self.full_transcript.append(message)
         self.messages.append(message)
+        self.transcript_version += 1
+        self.publish_event("message", {"index": len(self.full_transcript), **message})
 
         # Mise à jour du contexte structuré (avec IA pour la phase)
         await self._update_structured_context()
 
         # Limiter l'historique
         if len(self.messages) > MAX_CONTEXT_MESSAGES:
-            self.needs_summary_update = True
             self.messages = self.messages[-MAX_CONTEXT_MESSAGES:]
             logger.info(f"[CONTEXT] Historique tronqué à {MAX_CONTEXT_MESSAGES} messages")
+
+            # Un segment complet est sorti du contexte : résumé en tâche de fond
+            self.needs_summary_update = self.pending_summary_range() is not None
+            if self.needs_summary_update:
+                get_rolling_summarizer().schedule(self.call_id)
+
+    def pending_summary_range(self) -> Optional[Tuple[int, int]]:
+        """Prochain segment de full_transcript à résumer (sorti du contexte), None s'il est incomplet"""
+        out_of_context = len(self.full_transcript) - len(self.messages)
+        if out_of_context - self.summary_covered_until < SUMMARY_THRESHOLD:
+            return None
+        return self.summary_covered_until, self.summary_covered_until + SUMMARY_THRESHOLD
+
+    def get_summary_memory(self) -> str:
+        """Résumé des échanges sortis du contexte (vide pour un appel court)"""
+        return "\n".join(part for part in [self.conversation_summary, *self.summary_segments] if part)
+
+    def get_call_memory(self) -> str:
+        """Mémoire de l'appel, formatée pour le contexte structuré"""
+        memory = self.get_summary_memory()
+        return f"🧠 Mémoire du début de l'appel (hors fenêtre de contexte) :\n{memory}" if memory else ""
     
+    def publish_event(self, event_type: str, data: Dict[str, Any]) -> None:
+        """Publie un événement delta de la session (flux SSE /calls/{id}/events, agrégats /analytics)"""
+        get_session_analytics().record_event(event_type, data, self.conversation_phase)
+        get_event_bus().publish(self.call_id, event_type, data)
+
     async def _update_structured_context(self):
         """Met à jour le contexte structuré avec détection de phase IA"""
-        # 🆕 Utiliser la détection de phase avec IA
-        self.conversation_phase = await self.context_analyzer.detect_conversation_phase_ai(self.messages)
-        self.pain_points = self.context_analyzer.extract_pain_points(self.messages)
+        previous_phase = self.conversation_phase
+        previous_pain_points = self.pain_points
+        previous_statuses = {i: p["status"] for i, p in self.pillar_progress.items()}
 
-        # 🆕 NOUVEAU : Mise à jour de la progression des piliers
-        self.update_pillar_progress(self.messages)
+        # 🆕 Utiliser la détection de phase avec IA
+        with span("phase_detection"):
+            self.conversation_phase = await self.context_analyzer.detect_conversation_phase_ai(
+                self.messages,
+                session_id=self.call_id
+            )
+        with span("context_analysis"):
+            self.pain_points = self.context_analyzer.extract_pain_points(self.messages)
+
+            # 🆕 NOUVEAU : Mise à jour de la progression des piliers
+            self.update_pillar_progress(self.messages)
+
+        # Événements : uniquement ce qui a changé
+        if self.conversation_phase != previous_phase:
+            self.publish_event("phase", {"phase": self.conversation_phase, "previous": previous_phase})
+        if self.pain_points != previous_pain_points:
+            self.publish_event("pain_points", {"pain_points": self.pain_points})
+        for i, pillar in self.pillar_progress.items():
+            if pillar["status"] != previous_statuses[i]:
+                self.publish_event("pillar", {
+                    "pillar": i, "name": pillar["name"],
+                    "status": pillar["status"], "previous": previous_statuses[i]
+                })
 
         if self.recent_concepts:
             all_topics = set()
@@ -210,7 +368,7 @@ class CallManager:
 
 📝 Sujets Déjà Traités : {topics_str}
 
-{self.conversation_summary}
+{self.get_call_memory()}
 ═══════════════════════════════════════════════════════════════════════════
 """
         return structured_context
@@ -234,16 +392,21 @@ class CallManager:
 
         return self.messages[-limit:]
     
-    def get_full_transcript(self) -> str:
-        """Retourne le transcript complet pour le résumé"""
+    def get_full_transcript(self, start: int = 0, end: Optional[int] = None) -> str:
+        """Retourne le transcript complet (ou la tranche [start:end]) pour le résumé"""
         parts = []
-        for msg in self.full_transcript:
+        for msg in self.full_transcript[start:end]:
             role = "COMMERCIAL" if msg['role'] == 'user' else "CLIENT"
             parts.append(f"{role}: {msg['content']}")
         return "\n".join(parts)
     
-    def add_insight(self, insight: str, title: str = None):
-        """Ajoute un insight au cache avec extraction de concepts et timestamp"""
+    def add_insight(self, insight: str, title: str = None, insight_type: Optional[str] = None):
+        """
+        Ajoute un insight au cache avec extraction de concepts et timestamp
+
+        Le type (fourni par le modèle, sinon déduit du texte), les concepts et l'horodatage
+        sont figés dans un InsightRecord ; les compteurs agrégés sont mis à jour ici.
+        """
         current_time = datetime.now().timestamp()
 
         self.last_insights.append(insight)
@@ -264,18 +427,54 @@ class CallManager:
         concepts = self.context_analyzer.extract_key_concepts(insight)
         self.recent_concepts.append(concepts)
 
+        insight_type = (insight_type or "").lower()
+        record = InsightRecord(
+            index=len(self.insight_history) + 1,
+            insight=insight,
+            title=self.last_titles[-1],
+            type=insight_type if insight_type in self.insight_stats["by_type"] else classify_insight_type(insight),
+            concepts=concepts.split(", "),
+            timestamp=current_time
+        )
+        self.insight_history.append(record)
+        self.insight_stats["by_type"][record.type] += 1
+        concept_counts = self.insight_stats["concepts"]
+        for concept in record.concepts:
+            concept_counts[concept] = concept_counts.get(concept, 0) + 1
+        self.publish_event("insight", record.model_dump())
+
+        # Embedding calculé une seule fois (réutilisé depuis la vérification anti-doublon si possible)
+        self.insight_embeddings.append(self._get_insight_embedding(insight))
+        self.insight_sketches.append(compute_sketch(insight))
+
         # Limiter l'historique
         if len(self.last_insights) > MAX_INSIGHTS_CACHE:
             self.last_insights = self.last_insights[-MAX_INSIGHTS_CACHE:]
             self.last_titles = self.last_titles[-MAX_INSIGHTS_CACHE:]
             self.recent_concepts = self.recent_concepts[-MAX_INSIGHTS_CACHE:]
             self.insight_timestamps = self.insight_timestamps[-MAX_INSIGHTS_CACHE:]
+            self.insight_embeddings = self.insight_embeddings[-MAX_INSIGHTS_CACHE:]
+            self.insight_sketches = self.insight_sketches[-MAX_INSIGHTS_CACHE:]
+
+    def _get_insight_embedding(self, insight: str) -> Optional[np.ndarray]:
+        """
+        Embedding normalisé d'un insight, repris de la vérification anti-doublon
+
+        None si indisponible : il sera alors calculé (en batch) lors de la prochaine vérification,
+        jamais de manière synchrone sur la boucle d'événements.
+        """
+        if self._candidate_embedding and self._candidate_embedding[0] == insight:
+            embedding = self._candidate_embedding[1]
+            self._candidate_embedding = None
+            return embedding
+        return None
 
     async def is_duplicate_insight(self, new_insight: str, new_title: str = None, time_threshold_seconds: int = None) -> bool:
         """
         Vérifie si l'insight est un doublon avec VÉRIFICATION TITRE + VECTORISATION SÉMANTIQUE
 
-        Utilise sentence-transformers pour une détection rapide et précise
+        Vérification par étages, du moins cher au plus cher :
+        titre → pré-filtre lexical (MinHash) → embeddings (cas ambigus uniquement)
         """
         # Extraire le titre si non fourni
         if not new_title:
@@ -292,15 +491,62 @@ class CallManager:
         )
 
         if is_title_dup:
-            logger.warning(f"[ANTI-DOUBLON] ❌ TITRE RÉPÉTITIF: {title_reason}")
+            insights_logger.warning(f"[ANTI-DOUBLON] ❌ TITRE RÉPÉTITIF: {title_reason}")
+            record_duplicate_tier("title")
             return True
 
-        # ✅ VÉRIFICATION 2: Similarité sémantique
+        if not self.last_insights:
+            record_duplicate_tier("no_history")
+            return False
+
+        # ✅ VÉRIFICATION 2: Pré-filtre lexical (doublons et insights uniques évidents)
+        is_lexical_dup, _ = self.duplicate_detector.check_duplicate_lexical(
+            compute_sketch(new_insight),
+            self.insight_sketches,
+            self.insight_timestamps,
+            time_threshold_seconds
+        )
+        if is_lexical_dup is not None:
+            record_duplicate_tier("lexical_duplicate" if is_lexical_dup else "lexical_unique")
+            return is_lexical_dup
+
+        # Modèle d'embeddings encore en préchargement : vérification textuelle simple
+        # (ne jamais bloquer un insight sur le chargement du modèle)
+        if not is_embedding_model_ready():
+            insights_logger.info("[ANTI-DOUBLON] ⏳ Modèle d'embeddings non prêt, vérification textuelle")
+            record_duplicate_tier("fallback")
+            return self.duplicate_detector._fallback_check(new_insight, self.last_insights)
+
+        # ✅ VÉRIFICATION 3: Similarité sémantique (zone ambiguë uniquement)
+        # Encodage hors boucle d'événements (worker batché partagé entre sessions) :
+        # le nouvel insight + les éventuels insights récents sans embedding en cache
+        recent_start = max(len(self.last_insights) - 5, 0)
+        missing = [
+            i for i in range(recent_start, len(self.last_insights))
+            if self.insight_embeddings[i] is None
+        ]
+        try:
+            embeddings = await get_embedding_batcher().encode(
+                [new_insight] + [self.last_insights[i] for i in missing]
+            )
+        except Exception as e:
+            insights_logger.error(f"[ANTI-DOUBLON] ❌ Embeddings indisponibles, vérification sémantique ignorée: {e}")
+            record_duplicate_tier("error")
+            return False
+
+        new_embedding = embeddings[0]
+        self._candidate_embedding = (new_insight, new_embedding)
+        for row, i in enumerate(missing, 1):
+            self.insight_embeddings[i] = embeddings[row]
+
+        record_duplicate_tier("semantic")
         is_dup, analysis = self.duplicate_detector.check_duplicate_semantic(
             new_insight,
             self.last_insights,
             self.insight_timestamps,
-            time_threshold_seconds
+            time_threshold_seconds,
+            embeddings_history=self.insight_embeddings,
+            new_embedding=new_embedding
         )
         return is_dup
 
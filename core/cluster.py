@@ -0,0 +1,181 @@
+"""
+Routage des sessions entre plusieurs nœuds backend (sessions en mémoire)
+
+Chaque nœud porte un identifiant (NODE_ID) intégré au call_id qu'il génère :
+    "{NODE_ID}.{uuid4}"   ex. "node-b.5f0c...-..."
+Une requête /audio, /calls, /resume ou /summary peut arriver sur n'importe quel nœud
+(load balancer sans affinité) : le middleware la transmet au nœud propriétaire de la session.
+
+Propriétaire d'une session :
+- le nœud indiqué dans le call_id, s'il fait partie du cluster (jamais de migration)
+- sinon (nœud retiré, call_id sans préfixe) : anneau de hachage cohérent sur le call_id,
+  ces sessions ne changent de nœud que pour ~1/N d'entre elles quand le cluster évolue ;
+  le nouveau propriétaire les retrouve via un dossier de snapshots ou un store Redis partagés
+
+CLUSTER_NODES vide : nœud unique, aucun routage.
+"""
+import logging
+import asyncio
+import re
+import uuid
+from typing import Any, Dict, Optional
+
+import httpx
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+
+from core.hash_ring import HashRing
+from config.settings import NODE_ID, CLUSTER_NODES, HASH_RING_VNODES, CLUSTER_FORWARD_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+CALL_ID_SEPARATOR = "."
+FORWARDED_HEADER = "x-kitt-forwarded-by"
+NODE_HEADER = "x-kitt-node"
+
+_NODE_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,32}$")
+_ROUTED_PATH = re.compile(r"^/(?:audio|calls|resume|summary|jobs)/([^/]+)")
+_HOP_BY_HOP = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade", "host"
+}
+
+
+def new_call_id(node_id: str = NODE_ID) -> str:
+    """call_id d'une nouvelle session, préfixé par le nœud qui la crée"""
+    call_id = str(uuid.uuid4())
+    return f"{node_id}{CALL_ID_SEPARATOR}{call_id}" if node_id else call_id
+
+
+def node_of(call_id: str) -> Optional[str]:
+    """Nœud créateur d'une session (None pour un call_id sans préfixe)"""
+    node, separator, _ = call_id.partition(CALL_ID_SEPARATOR)
+    return node if separator else None
+
+
+def parse_cluster_nodes(spec: str) -> Dict[str, str]:
+    """
+    "node-a=http://10.0.0.1:8000,node-b=http://10.0.0.2:8000" → {node_id: url}
+
+    Raises:
+        ValueError: entrée mal formée ou identifiant de nœud invalide
+    """
+    nodes = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        node, separator, url = entry.partition("=")
+        node, url = node.strip(), url.strip().rstrip("/")
+        if not separator or not url:
+            raise ValueError(f"CLUSTER_NODES: entrée invalide '{entry}' (attendu: id=url)")
+        if not _NODE_ID_PATTERN.match(node):
+            raise ValueError(f"CLUSTER_NODES: identifiant de nœud invalide '{node}'")
+        nodes[node] = url
+    return nodes
+
+
+class ClusterRouter:
+    """Détermine le nœud propriétaire d'une session et lui transmet les requêtes"""
+
+    def __init__(
+        self,
+        node_id: str,
+        nodes: Dict[str, str],
+        vnodes: int = HASH_RING_VNODES,
+        timeout: float = CLUSTER_FORWARD_TIMEOUT
+    ):
+        if node_id not in nodes:
+            raise ValueError(f"NODE_ID '{node_id}' absent de CLUSTER_NODES ({', '.join(nodes)})")
+        self.node_id = node_id
+        self.nodes = nodes
+        self.ring = HashRing(nodes, vnodes)
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self.stats = {"local": 0, "forwarded": 0, "forward_errors": 0}
+
+    def owner(self, session_id: str) -> str:
+        node = node_of(session_id)
+        if node in self.ring:
+            return node
+        return self.ring.get_node(session_id)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        return self._client
+
+    async def forward(self, request: Request, node: str) -> Response:
+        """Relaie la requête vers `node` (réponse transmise en streaming)"""
+        url = f"{self.nodes[node]}{request.url.path}"
+        if request.url.query:
+            url += f"?{request.url.query}"
+        headers = {k: v for k, v in request.headers.items() if k.lower() not in _HOP_BY_HOP}
+        headers[FORWARDED_HEADER] = self.node_id
+
+        client = self._get_client()
+        try:
+            upstream = await client.send(
+                client.build_request(request.method, url, headers=headers, content=await request.body()),
+                stream=True
+            )
+        except httpx.HTTPError as e:
+            self.stats["forward_errors"] += 1
+            logger.error(f"[CLUSTER] ❌ Nœud {node} injoignable pour {request.url.path}: {e}")
+            return JSONResponse(status_code=503, content={"detail": f"Nœud {node} injoignable, réessayer"})
+
+        self.stats["forwarded"] += 1
+        return StreamingResponse(
+            upstream.aiter_raw(),
+            status_code=upstream.status_code,
+            headers={k: v for k, v in upstream.headers.items() if k.lower() not in _HOP_BY_HOP},
+            background=BackgroundTask(upstream.aclose)
+        )
+
+    async def dispatch(self, request: Request, call_next) -> Response:
+        """Middleware HTTP : traite localement ou transmet au nœud propriétaire"""
+        match = _ROUTED_PATH.match(request.url.path)
+        # Requête déjà relayée : traitée ici quoi qu'il arrive (pas de boucle entre nœuds)
+        if match and match.group(1) != "start" and FORWARDED_HEADER not in request.headers:
+            node = self.owner(match.group(1))
+            if node != self.node_id:
+                return await self.forward(request, node)
+
+        self.stats["local"] += 1
+        response = await call_next(request)
+        response.headers[NODE_HEADER] = self.node_id
+        return response
+
+    async def fetch_from_peers(self, path: str) -> Dict[str, Optional[Any]]:
+        """GET `path` sur les autres nœuds, en parallèle : {nœud: JSON, ou None si injoignable}"""
+        client = self._get_client()
+        peers = [node for node in self.nodes if node != self.node_id]
+
+        async def fetch(node: str) -> Optional[Any]:
+            try:
+                response = await client.get(f"{self.nodes[node]}{path}", headers={FORWARDED_HEADER: self.node_id})
+                response.raise_for_status()
+                return response.json()
+            except (httpx.HTTPError, ValueError) as e:
+                logger.warning(f"[CLUSTER] ⚠️ {path} indisponible sur {node}: {e}")
+                return None
+
+        return dict(zip(peers, await asyncio.gather(*(fetch(node) for node in peers))))
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def snapshot(self) -> Dict:
+        return {"node_id": self.node_id, "nodes": self.ring.nodes, **self.stats}
+
+
+_cluster_router: Optional[ClusterRouter] = None
+
+
+def get_cluster_router() -> Optional[ClusterRouter]:
+    """Routeur du cluster (None si CLUSTER_NODES n'est pas configuré)"""
+    global _cluster_router
+    if _cluster_router is None and CLUSTER_NODES:
+        _cluster_router = ClusterRouter(NODE_ID, parse_cluster_nodes(CLUSTER_NODES))
+        logger.info(f"🕸️ Cluster: nœud {NODE_ID} parmi {', '.join(_cluster_router.ring.nodes)}")
+    return _cluster_router
@@ -0,0 +1,382 @@
+"""
+Bus d'événements des sessions (pub/sub en mémoire du process)
+
+Le CallManager publie un petit événement delta à chaque changement d'état ; la route SSE
+GET /calls/{id}/events les pousse au frontend, qui n'a plus à interroger /state et
+/insights en boucle.
+
+Événements : message, phase, pain_points, pillar, insight, insight_blocked, session_ended
+(et resync, voir plus bas). Chaque événement porte un numéro croissant par session (champ
+SSE `id`) : à la reconnexion, le navigateur renvoie Last-Event-ID et les événements manqués
+sont rejoués depuis un court historique par session (SSE_REPLAY_EVENTS).
+
+Abonnés lents : chaque abonné a un buffer borné (SSE_SUBSCRIBER_BUFFER). Buffer plein :
+son contenu est remplacé par un unique événement `resync`, le client recharge alors /state
+et /insights une fois. La publication ne ralentit jamais et la mémoire reste bornée.
+Même traitement pour un Last-Event-ID sorti de l'historique (ou d'un process précédent).
+
+Sans abonné, publier ne coûte rien : le canal d'une session n'existe qu'à partir du
+premier abonnement. Avec plusieurs nœuds, le routage du cluster envoie l'abonnement au
+nœud propriétaire de la session.
+
+Avec SESSION_STORE=redis, le worker qui traite un chunk n'est pas forcément celui qui tient
+le flux SSE : les événements passent alors par le pub/sub Redis (RedisEventRelay). Le numéro
+d'un événement vient d'un compteur Redis par session, identique pour tous les workers ; un
+worker ne suit le canal Redis d'une session que tant qu'il en a un abonné (historique de
+reprise compris : une reconnexion vers un autre worker vaut un resync). Publier coûte alors
+une mise en file dans la requête ; une tâche dédiée envoie dans l'ordre de publication, un
+aller-retour Redis par événement. Si aucun worker ne suit la session (PUBSUB NUMSUB, vérifié
+dans le script d'envoi), l'événement n'est ni numéroté ni diffusé : ni compteur créé, ni PUBLISH.
+"""
+import logging
+import asyncio
+import contextvars
+import json
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Set, Tuple
+
+from config.settings import (
+    SSE_SUBSCRIBER_BUFFER,
+    SSE_REPLAY_EVENTS,
+    SESSION_STORE_BACKEND,
+    REDIS_URL,
+    SESSION_STORE_TTL
+)
+
+logger = logging.getLogger(__name__)
+
+RESYNC = "resync"
+SESSION_ENDED = "session_ended"
+
+# Numérote l'événement (compteur par session) et le diffuse en une seule commande,
+# rien si aucun worker ne suit le canal de la session (retourne 0)
+PUBLISH_EVENT_SCRIPT = """
+if redis.call("PUBSUB", "NUMSUB", ARGV[1])[2] == 0 then
+    return 0
+end
+local id = redis.call("INCR", KEYS[1])
+redis.call("EXPIRE", KEYS[1], ARGV[3])
+redis.call("PUBLISH", ARGV[1], id .. " " .. ARGV[2])
+return id
+"""
+
+# Événements en attente d'envoi vers Redis (au-delà : ignorés et comptés)
+RELAY_MAX_PENDING = 10000
+
+
+class SessionEvent:
+    """Événement publié, sérialisé une seule fois au format SSE pour tous les abonnés"""
+    __slots__ = ("id", "type", "payload")
+
+    def __init__(self, event_id: int, event_type: str, data: Dict[str, Any]):
+        self.id = event_id
+        self.type = event_type
+        self.payload = f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class Subscription:
+    """Abonnement d'un client aux événements d'une session (buffer borné)"""
+
+    def __init__(self, session_id: str, maxsize: int):
+        self.session_id = session_id
+        self.maxsize = maxsize
+        self.closed = False
+        self.dropped = 0
+        self._buffer: Deque[SessionEvent] = deque()
+        self._wakeup = asyncio.Event()
+
+    def push(self, event: SessionEvent) -> bool:
+        """
+        Ajoute un événement au buffer
+
+        Returns:
+            False si l'abonné était en retard : buffer remplacé par un événement resync
+        """
+        if self.closed:
+            return True
+        lagging = len(self._buffer) >= self.maxsize
+        if lagging:
+            self.dropped += len(self._buffer)
+            self._buffer.clear()
+            # Même id que l'événement absorbé : le resync vaut état courant, la reprise continue après
+            self._buffer.append(SessionEvent(event.id, RESYNC, {"reason": "slow_consumer"}))
+        else:
+            self._buffer.append(event)
+        self._wakeup.set()
+        return not lagging
+
+    def close(self) -> None:
+        self.closed = True
+        self._wakeup.set()
+
+    @property
+    def finished(self) -> bool:
+        """Abonnement fermé et buffer vidé"""
+        return self.closed and not self._buffer
+
+    async def get(self, timeout: float) -> Optional[SessionEvent]:
+        """Prochain événement (None si aucun pendant `timeout` secondes ou abonnement fermé)"""
+        if not self._buffer and not self.closed:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                return None
+        return self._buffer.popleft() if self._buffer else None
+
+
+class _Channel:
+    __slots__ = ("next_id", "history", "subscribers")
+
+    def __init__(self, history_size: int):
+        self.next_id = 1
+        self.history: Deque[SessionEvent] = deque(maxlen=history_size)
+        self.subscribers: Set[Subscription] = set()
+
+
+class RedisEventRelay:
+    """Diffusion des événements entre workers par le pub/sub Redis (SESSION_STORE=redis)"""
+
+    def __init__(self, url: str = REDIS_URL, prefix: str = "kitt", ttl: int = SESSION_STORE_TTL):
+        try:
+            import redis.asyncio as aioredis
+        except ImportError as e:
+            raise ImportError("SESSION_STORE=redis nécessite le paquet redis (pip install redis)") from e
+
+        self._redis = aioredis.from_url(url)
+        self._publish_event = self._redis.register_script(PUBLISH_EVENT_SCRIPT)
+        self._pubsub = self._redis.pubsub()
+        self.prefix = prefix
+        self.ttl = ttl
+        self.bus: Optional["EventBus"] = None
+        self._outbox: Optional["asyncio.Queue[Tuple[str, str, str]]"] = None
+        self._sender: Optional[asyncio.Task] = None
+        self._listener: Optional[asyncio.Task] = None
+        self.stats = {"sent": 0, "unwatched": 0, "received": 0, "send_errors": 0, "send_dropped": 0}
+
+    def _channel(self, session_id: str) -> str:
+        return f"{self.prefix}:events:{session_id}"
+
+    def send(self, session_id: str, event_type: str, data: Dict[str, Any]) -> None:
+        """Met l'événement en file d'envoi (appelé depuis la boucle d'événements, sans attente)"""
+        if self._sender is None or self._sender.done():
+            self._outbox = asyncio.Queue(maxsize=RELAY_MAX_PENDING)
+            # Contexte vierge : tâche du process, pas de la requête qui la démarre (core.profiler)
+            self._sender = asyncio.get_running_loop().create_task(
+                self._send_loop(), name="event-relay-sender", context=contextvars.Context()
+            )
+        payload = json.dumps({"type": event_type, "data": data}, ensure_ascii=False)
+        try:
+            self._outbox.put_nowait((session_id, event_type, payload))
+        except asyncio.QueueFull:
+            self.stats["send_dropped"] += 1
+
+    async def _send_loop(self) -> None:
+        while True:
+            session_id, event_type, payload = await self._outbox.get()
+            try:
+                event_id = await self._publish_event(
+                    keys=[f"{self.prefix}:events-seq:{session_id}"],
+                    args=[self._channel(session_id), payload, self.ttl]
+                )
+                self.stats["sent" if event_id else "unwatched"] += 1
+            except Exception as e:
+                self.stats["send_errors"] += 1
+                logger.error(f"[EVENTS] ❌ Diffusion Redis de {event_type} impossible ({session_id}): {e}")
+
+    async def watch(self, session_id: str) -> None:
+        """Suit le canal Redis de la session (abonné local présent)"""
+        await self._pubsub.subscribe(self._channel(session_id))
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(
+                self._listen_loop(), name="event-relay-listener", context=contextvars.Context()
+            )
+
+    async def unwatch(self, session_id: str) -> None:
+        await self._pubsub.unsubscribe(self._channel(session_id))
+
+    async def _listen_loop(self) -> None:
+        prefix = f"{self.prefix}:events:"
+        while True:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[EVENTS] ❌ Réception Redis interrompue: {e}")
+                await asyncio.sleep(1.0)
+                continue
+            if message is None or message.get("type") != "message":
+                continue
+            channel, body = message["channel"], message["data"]
+            session_id = (channel.decode() if isinstance(channel, bytes) else channel)[len(prefix):]
+            raw_id, _, payload = (body.decode() if isinstance(body, bytes) else body).partition(" ")
+            event = json.loads(payload)
+            self.stats["received"] += 1
+            self.bus._receive(session_id, SessionEvent(int(raw_id), event["type"], event["data"]))
+
+    async def close(self) -> None:
+        for task in (self._sender, self._listener):
+            if task is not None:
+                task.cancel()
+        await self._pubsub.aclose()
+        await self._redis.aclose()
+
+
+class EventBus:
+    """Canaux d'événements par session"""
+
+    def __init__(
+        self,
+        buffer_size: int = SSE_SUBSCRIBER_BUFFER,
+        replay_size: int = SSE_REPLAY_EVENTS,
+        relay: Optional[RedisEventRelay] = None
+    ):
+        self.buffer_size = buffer_size
+        self.replay_size = replay_size
+        self.relay = relay
+        if relay is not None:
+            relay.bus = self
+        self._channels: Dict[str, _Channel] = {}
+        self._relay_tasks: Set[asyncio.Task] = set()
+        self.stats = {"published": 0, "delivered": 0, "resyncs": 0, "dropped": 0, "replayed": 0}
+
+    def publish(self, session_id: Optional[str], event_type: str, data: Dict[str, Any]) -> None:
+        """
+        Publie un événement (sans effet si personne ne suit la session ; avec le relais Redis,
+        il est tout de même mis en file, et le script d'envoi l'ignore si aucun worker ne suit)
+        """
+        if self.relay is not None:
+            # Numéroté par Redis, reçu (y compris par ce worker) via _receive
+            if session_id is not None:
+                self.relay.send(session_id, event_type, data)
+            return
+
+        channel = self._channels.get(session_id)
+        if channel is None:
+            return
+
+        event = SessionEvent(channel.next_id, event_type, data)
+        channel.next_id += 1
+        self._deliver(session_id, channel, event)
+
+    def _receive(self, session_id: str, event: SessionEvent) -> None:
+        """Événement diffusé par Redis (numéro attribué par le compteur de la session)"""
+        channel = self._channels.get(session_id)
+        if channel is None:
+            return
+        channel.next_id = max(channel.next_id, event.id + 1)
+        self._deliver(session_id, channel, event)
+        if event.type == SESSION_ENDED:
+            self._close_channel(session_id)
+
+    def _deliver(self, session_id: str, channel: _Channel, event: SessionEvent) -> None:
+        channel.history.append(event)
+        self.stats["published"] += 1
+        for subscription in channel.subscribers:
+            if subscription.push(event):
+                self.stats["delivered"] += 1
+            else:
+                self.stats["resyncs"] += 1
+                logger.warning(
+                    f"[EVENTS] 🐢 Abonné lent sur {session_id} : {subscription.maxsize} événements en attente, resync"
+                )
+
+    def subscribe(self, session_id: str, last_event_id: Optional[int] = None) -> Subscription:
+        """
+        Nouvel abonné ; avec `last_event_id` (reconnexion), les événements suivants sont rejoués
+        depuis l'historique, ou un resync est envoyé s'ils n'y sont plus
+        """
+        channel = self._channels.get(session_id)
+        if channel is None:
+            channel = self._channels[session_id] = _Channel(self.replay_size)
+        subscription = Subscription(session_id, self.buffer_size)
+
+        if last_event_id is not None and last_event_id < channel.next_id - 1:
+            oldest = channel.history[0].id if channel.history else channel.next_id
+            if 0 <= last_event_id and last_event_id >= oldest - 1:
+                missed = [event for event in channel.history if event.id > last_event_id]
+                for event in missed:  # Plus d'événements que le buffer : resync
+                    subscription.push(event)
+                self.stats["replayed"] += len(missed)
+            else:
+                subscription.push(SessionEvent(channel.next_id - 1, RESYNC, {"reason": "history_expired"}))
+                self.stats["resyncs"] += 1
+        elif last_event_id is not None and last_event_id >= channel.next_id:
+            # Identifiant d'un process précédent (redémarrage) : état à recharger
+            subscription.push(SessionEvent(channel.next_id - 1, RESYNC, {"reason": "unknown_event_id"}))
+            self.stats["resyncs"] += 1
+
+        channel.subscribers.add(subscription)
+        return subscription
+
+    async def follow(self, session_id: str) -> None:
+        """Avec le relais Redis : reçoit les événements publiés par les autres workers (sinon sans effet)"""
+        if self.relay is not None and session_id in self._channels:
+            await self.relay.watch(session_id)
+
+    def last_event_id(self, session_id: str) -> int:
+        """Numéro du dernier événement publié pour la session (0 si aucun)"""
+        channel = self._channels.get(session_id)
+        return channel.next_id - 1 if channel is not None else 0
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscription.close()
+        self.stats["dropped"] += subscription.dropped
+        channel = self._channels.get(subscription.session_id)
+        if channel is not None:
+            channel.subscribers.discard(subscription)
+            if self.relay is not None and not channel.subscribers:
+                # Plus d'abonné dans ce worker : le canal Redis n'est plus suivi, l'historique n'est plus complet
+                self._close_channel(subscription.session_id)
+
+    def close_session(self, session_id: str, reason: str) -> None:
+        """Fin de session : dernier événement session_ended, abonnements fermés, canal supprimé"""
+        if self.relay is not None:
+            # Les abonnés de tous les workers sont fermés à la réception (_receive)
+            self.publish(session_id, SESSION_ENDED, {"reason": reason})
+            return
+        if session_id not in self._channels:
+            return
+        self.publish(session_id, SESSION_ENDED, {"reason": reason})
+        self._close_channel(session_id)
+
+    def _close_channel(self, session_id: str) -> None:
+        channel = self._channels.pop(session_id, None)
+        if channel is None:
+            return
+        for subscription in channel.subscribers:
+            subscription.close()
+        if self.relay is not None:
+            task = asyncio.get_running_loop().create_task(self._unfollow(session_id))
+            self._relay_tasks.add(task)
+            task.add_done_callback(self._relay_tasks.discard)
+
+    async def _unfollow(self, session_id: str) -> None:
+        # Nouvel abonné entre-temps : son abonnement Redis doit rester
+        if session_id not in self._channels:
+            await self.relay.unwatch(session_id)
+
+    async def close(self) -> None:
+        """Arrêt du serveur : ferme les connexions du relais Redis"""
+        if self.relay is not None:
+            await self.relay.close()
+
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            "channels": len(self._channels),
+            "subscribers": sum(len(c.subscribers) for c in self._channels.values()),
+            **self.stats,
+            "relay": self.relay.stats if self.relay is not None else None
+        }
+
+
+_event_bus: Optional[EventBus] = None
+
+
+def get_event_bus() -> EventBus:
+    """Retourne le bus d'événements du process"""
+    global _event_bus
+    if _event_bus is None:
+        _event_bus = EventBus(relay=RedisEventRelay() if SESSION_STORE_BACKEND == "redis" else None)
+    return _event_bus
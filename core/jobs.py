@@ -0,0 +1,255 @@
+"""
+File de jobs en tâche de fond (résumés de fin d'appel)
+
+Un POST crée le job et répond aussitôt avec son identifiant ; GET /jobs/{id} donne son
+état (queued → running → done | failed) puis son résultat. Un pool borné de workers
+(SUMMARY_JOB_WORKERS) consomme une file bornée (SUMMARY_JOB_QUEUE_SIZE) : au-delà, la
+création est refusée plutôt que d'accumuler du retard. Les appels LLM des jobs passent par
+l'ordonnanceur en priorité SUMMARY, derrière le coaching temps réel.
+
+Un job identique déjà en attente ou en cours (même type, session, version du transcript)
+est renvoyé au lieu d'en créer un second. Les jobs terminés sont oubliés après
+JOB_RESULT_TTL secondes ; leurs résultats restent aussi dans la session (cache des résumés).
+
+L'identifiant porte le préfixe du nœud (comme les call_id) : avec plusieurs nœuds,
+GET /jobs/{id} est routé vers le nœud qui exécute le job.
+
+Plusieurs workers sur un nœud : le job s'exécute dans le worker qui l'a créé. Avec
+SESSION_STORE=redis, chaque changement d'état (et le résultat) est aussi écrit dans Redis
+(RedisJobRecords, expiration JOB_RESULT_TTL) : GET /jobs/{id} répond depuis n'importe quel
+worker. Avec le store memory, les sessions elles-mêmes n'existent que dans leur worker : les
+jobs suivent la même affinité.
+"""
+import logging
+import asyncio
+import contextvars
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from core.cluster import new_call_id
+from config.settings import (
+    SUMMARY_JOB_WORKERS,
+    SUMMARY_JOB_QUEUE_SIZE,
+    JOB_RESULT_TTL,
+    SESSION_STORE_BACKEND,
+    REDIS_URL
+)
+
+logger = logging.getLogger(__name__)
+
+JobFn = Callable[[], Awaitable[Any]]
+
+
+class JobQueueFullError(Exception):
+    """Trop de jobs en attente"""
+
+
+class Job:
+    """Job en tâche de fond et son résultat"""
+
+    def __init__(self, job_type: str, session_id: str, fn: JobFn, dedup_key: Tuple):
+        self.id = new_call_id()
+        self.type = job_type
+        self.session_id = session_id
+        self.fn = fn
+        self.dedup_key = dedup_key
+        self.status = "queued"
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.announced = asyncio.Event()  # État `queued` écrit (Redis) : les états suivants peuvent l'écraser
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "job_id": self.id,
+            "type": self.type,
+            "session_id": self.session_id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.status == "done":
+            data["result"] = self.result
+        elif self.status == "failed":
+            data["error"] = self.error
+        return data
+
+
+class RedisJobRecords:
+    """État des jobs dans Redis, lisible par tous les workers (SESSION_STORE=redis)"""
+
+    def __init__(self, url: str = REDIS_URL, prefix: str = "kitt"):
+        try:
+            import redis.asyncio as aioredis
+        except ImportError as e:
+            raise ImportError("SESSION_STORE=redis nécessite le paquet redis (pip install redis)") from e
+
+        self._redis = aioredis.from_url(url)
+        self.prefix = prefix
+
+    def _key(self, job_id: str) -> str:
+        return f"{self.prefix}:job:{job_id}"
+
+    async def put(self, data: Dict[str, Any], ttl: float) -> None:
+        blob = json.dumps(data, ensure_ascii=False, default=str)
+        await self._redis.set(self._key(data["job_id"]), blob, ex=max(int(ttl), 1))
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        blob = await self._redis.get(self._key(job_id))
+        return json.loads(blob) if blob is not None else None
+
+
+class JobQueue:
+    """File bornée + pool de workers asyncio"""
+
+    def __init__(
+        self,
+        workers: int = SUMMARY_JOB_WORKERS,
+        max_pending: int = SUMMARY_JOB_QUEUE_SIZE,
+        result_ttl: float = JOB_RESULT_TTL,
+        records: Optional[RedisJobRecords] = None
+    ):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.records = records
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()  # Ordre de création
+        self._active: Dict[Tuple, Job] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self.stats = {"submitted": 0, "deduplicated": 0, "rejected": 0, "done": 0, "failed": 0}
+
+    async def submit(self, job_type: str, session_id: str, fn: JobFn, dedup_key: Tuple = ()) -> Job:
+        """
+        Met en file `fn()` ; renvoie le job identique déjà en attente ou en cours s'il existe
+
+        Avec Redis, l'état `queued` est écrit avant le retour : le job est visible de tous les workers.
+
+        Raises:
+            JobQueueFullError: file pleine
+        """
+        self._ensure_started()
+        self._purge()
+
+        key = (job_type, session_id, *dedup_key)
+        existing = self._active.get(key)
+        if existing is not None:
+            self.stats["deduplicated"] += 1
+            return existing
+
+        if self._queue.full():
+            self.stats["rejected"] += 1
+            raise JobQueueFullError(f"{self._queue.qsize()} jobs en attente")
+
+        job = Job(job_type, session_id, fn, key)
+        self._jobs[job.id] = job
+        self._active[key] = job
+        self._queue.put_nowait(job)
+        self.stats["submitted"] += 1
+        try:
+            await self._publish(job)
+        finally:
+            job.announced.set()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._purge()
+        return self._jobs.get(job_id)
+
+    async def lookup(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """État d'un job (`Job.to_dict()`), exécuté par ce worker ou, avec Redis, par un autre"""
+        job = self.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        if self.records is not None:
+            return await self.records.get(job_id)
+        return None
+
+    async def _publish(self, job: Job) -> None:
+        if self.records is None:
+            return
+        try:
+            await self.records.put(job.to_dict(), self.result_ttl)
+        except Exception as e:
+            logger.warning(f"[JOBS] ⚠️ État du job {job.id} non écrit dans Redis: {e}")
+
+    def _ensure_started(self) -> None:
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        # Contexte vierge : workers du process, pas de la requête qui les démarre (core.profiler)
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"job-worker-{i}", context=contextvars.Context())
+            for i in range(self.workers)
+        ]
+        logger.info(f"[JOBS] ⚙️ {self.workers} workers démarrés")
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                await job.announced.wait()
+                await self._publish(job)
+                job.result = await job.fn()
+                job.status = "done"
+            except Exception as e:
+                job.error = str(e) or e.__class__.__name__
+                job.status = "failed"
+                logger.warning(f"[JOBS] ❌ Job {job.type} {job.id} en échec: {job.error}")
+            except asyncio.CancelledError:
+                job.error = "Arrêt du serveur"
+                job.status = "failed"
+                raise
+            finally:
+                job.finished_at = time.time()
+                job.fn = None  # Libère le contexte capturé
+                self._active.pop(job.dedup_key, None)
+                self.stats[job.status] += 1
+            await self._publish(job)
+
+    def _purge(self) -> None:
+        """Oublie les jobs terminés depuis plus de result_ttl (les plus anciens d'abord)"""
+        limit = time.time() - self.result_ttl
+        expired = []
+        for job_id, job in self._jobs.items():
+            if job.created_at >= limit:
+                break  # Jobs plus récents : rien à purger au-delà
+            if job.finished and job.finished_at < limit:
+                expired.append(job_id)
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def shutdown(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            "workers": self.workers,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "running": sum(job.status == "running" for job in self._active.values()),
+            "retained": len(self._jobs),
+            **self.stats
+        }
+
+
+_job_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    """Retourne la file de jobs du process"""
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = JobQueue(records=RedisJobRecords() if SESSION_STORE_BACKEND == "redis" else None)
+    return _job_queue
@@ -0,0 +1,353 @@
+"""
+Profileur par échantillonnage, activé à la demande (routes /admin)
+
+Un thread échantillonne toutes les PROFILER_INTERVAL_MS la pile du thread de la boucle
+asyncio (et, sur demande, celles des autres threads : appels LLM / Deepgram du pool) :
+on voit où part le temps CPU de la boucle sans redéployer avec de l'instrumentation.
+
+Filtrage par session ou par route : un middleware ASGI marque la tâche de chaque requête ;
+pendant un profilage, une fabrique de tâches propage la marque aux tâches qu'elle crée
+(contextvar lue à la création : le contexte d'une tâche n'est pas lisible depuis un autre
+thread). À chaque échantillon, la tâche asyncio en cours sur la boucle donne la requête à
+laquelle attribuer la pile. Sans filtre, la boucle inactive (attente d'E/S) apparaît aussi,
+ce qui donne son taux d'occupation.
+
+Profil d'une seule requête /audio : en-têtes `X-Profile: 1` et `X-Admin-Token` ; la réponse
+porte `X-Profile-Id`, profil lisible via GET /admin/profiles/{id} (PROFILER_KEEP derniers).
+Il couvre aussi, pendant la requête, l'acteur de la session (core.session_pipeline), tâche
+longue créée par une requête précédente.
+
+Coût nul à l'arrêt : aucun thread, fabrique de tâches d'origine ; le middleware ne marque
+les requêtes que pendant un profilage, et ne lit les en-têtes que sur /audio.
+
+Formats : piles repliées ("a;b;c 12", flamegraph.pl, speedscope) ou JSON speedscope.
+"""
+import logging
+import asyncio
+import contextvars
+import hmac
+import sys
+import threading
+import time
+import uuid
+import weakref
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from config.settings import ADMIN_TOKEN, PROFILER_INTERVAL_MS, PROFILER_KEEP
+
+logger = logging.getLogger(__name__)
+
+# (id de requête, chemin, session) de la requête en cours, posé par ProfilerMiddleware
+_request_tag: contextvars.ContextVar[Optional[Tuple[str, str, str]]] = contextvars.ContextVar(
+    "profiler_request_tag", default=None
+)
+
+_ROOT = str(Path(__file__).resolve().parent.parent) + "/"
+
+PROFILE_HEADER = b"x-profile"
+ADMIN_HEADER = b"x-admin-token"
+
+
+def is_admin_token(token: Optional[str]) -> bool:
+    """
+    Jeton d'administration valide (toujours faux si ADMIN_TOKEN n'est pas défini)
+
+    Comparaison en octets : hmac.compare_digest lève TypeError sur une chaîne non ASCII
+    (en-tête quelconque envoyé par un client), ce qui donnerait une 500 au lieu d'un refus.
+    """
+    if not ADMIN_TOKEN or token is None:
+        return False
+    return hmac.compare_digest(token.encode("utf-8", "surrogateescape"), ADMIN_TOKEN.encode("utf-8"))
+
+
+def _frame_label(code, cache: Dict[Any, str]) -> str:
+    label = cache.get(code)
+    if label is None:
+        filename = code.co_filename
+        if filename.startswith(_ROOT):
+            filename = filename[len(_ROOT):]
+        elif "site-packages/" in filename:
+            filename = filename.split("site-packages/", 1)[1]
+        label = cache[code] = f"{code.co_qualname} ({filename}:{code.co_firstlineno})"
+    return label
+
+
+class Collector:
+    """Échantillons d'un profil (toute la boucle, ou une session / route / requête)"""
+
+    def __init__(
+        self,
+        session_id: Optional[str] = None,
+        route: Optional[str] = None,
+        request_id: Optional[str] = None,
+        threads: bool = False
+    ):
+        self.id = request_id or uuid.uuid4().hex[:12]
+        self.session_id = session_id
+        self.route = route
+        self.request_id = request_id
+        self.threads = threads
+        self.filtered = bool(session_id or route or request_id)
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    def matches(self, tag: Optional[Tuple[str, str, str]]) -> bool:
+        if not self.filtered:
+            return True
+        if tag is None:
+            return False
+        request_id, path, session_id = tag
+        if self.request_id is not None and self.session_id is not None:
+            # Profil d'une requête : la requête, ou l'acteur de sa session pendant qu'elle attend
+            return request_id == self.request_id or session_id == self.session_id
+        return (
+            (self.request_id is None or request_id == self.request_id)
+            and (self.route is None or path.startswith(self.route))
+            and (self.session_id is None or session_id == self.session_id)
+        )
+
+    def collapsed(self, labels: Dict[Any, str]) -> str:
+        """Piles repliées : une ligne "racine;...;feuille nombre" par pile distincte"""
+        lines = [
+            ";".join(frame if isinstance(frame, str) else _frame_label(frame, labels) for frame in stack) + f" {count}"
+            for stack, count in self.counts.most_common()
+        ]
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self, labels: Dict[Any, str], interval_ms: float) -> Dict[str, Any]:
+        """Profil au format JSON speedscope (type "sampled", poids en millisecondes)"""
+        frames: List[Dict[str, Any]] = []
+        index: Dict[Any, int] = {}
+        samples, weights = [], []
+        for stack, count in self.counts.most_common():
+            row = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    if isinstance(frame, str):
+                        frames.append({"name": frame})
+                    else:
+                        frames.append({"name": _frame_label(frame, labels), "file": frame.co_filename, "line": frame.co_firstlineno})
+                row.append(index[frame])
+            samples.append(row)
+            weights.append(count * interval_ms)
+        duration = ((self.finished_at or time.time()) - self.started_at) * 1000
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": self.describe(),
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": round(duration, 3),
+                "samples": samples,
+                "weights": weights,
+            }],
+            "name": self.describe(),
+            "exporter": "kitt-backend",
+        }
+
+    def describe(self) -> str:
+        filters = [f"{key}={value}" for key, value in (
+            ("session", self.session_id), ("route", self.route), ("request", self.request_id)
+        ) if value]
+        return f"KITT {self.id} ({', '.join(filters) or 'toute la boucle'}, {self.samples} échantillons)"
+
+
+class SamplingProfiler:
+    """Thread d'échantillonnage partagé par les profils en cours"""
+
+    def __init__(self, interval_ms: float = PROFILER_INTERVAL_MS, keep: int = PROFILER_KEEP):
+        self.interval_ms = interval_ms
+        self.keep = keep
+        # Remplacé (jamais modifié) : lu sans verrou par le thread d'échantillonnage
+        self._collectors: Tuple[Collector, ...] = ()
+        self._finished: "OrderedDict[str, Collector]" = OrderedDict()
+        self._labels: Dict[Any, str] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        # Marque de requête de chaque tâche (lue par le thread d'échantillonnage)
+        self._task_tags: "weakref.WeakKeyDictionary[asyncio.Task, Tuple[str, str, str]]" = weakref.WeakKeyDictionary()
+        self._previous_factory = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.stats = {"profiles": 0, "samples": 0, "sampling_ms": 0.0}
+
+    @property
+    def active(self) -> bool:
+        return bool(self._collectors)
+
+    def start(self, collector: Collector) -> Collector:
+        """Ajoute un profil (depuis la boucle asyncio) ; démarre le thread au premier"""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._collectors = self._collectors + (collector,)
+        self.stats["profiles"] += 1
+        if self._thread is None:
+            self._previous_factory = self._loop.get_task_factory()
+            self._loop.set_task_factory(self._task_factory)
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="kitt-profiler", daemon=True)
+            self._thread.start()
+            logger.info(f"[PROFILER] 🔬 Échantillonnage démarré ({self.interval_ms:g} ms)")
+        return collector
+
+    def stop(self, collector: Collector) -> Collector:
+        """Retire un profil ; arrête le thread s'il n'en reste aucun"""
+        collector.finished_at = time.time()
+        self._collectors = tuple(c for c in self._collectors if c is not collector)
+        if not self._collectors and self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self._loop.set_task_factory(self._previous_factory)
+            self._previous_factory = None
+            logger.info("[PROFILER] 🔬 Échantillonnage arrêté")
+        return collector
+
+    def tag_task(self, task: Optional[asyncio.Task], tag: Tuple[str, str, str]) -> None:
+        if task is not None:
+            self._task_tags[task] = tag
+
+    def _task_factory(self, loop, coro, context=None):
+        """Crée la tâche et lui transmet la marque de requête du contexte qui la crée"""
+        if self._previous_factory is not None:
+            task = self._previous_factory(loop, coro, **({"context": context} if context is not None else {}))
+        else:
+            task = asyncio.Task(coro, loop=loop, context=context)
+        tag = context.get(_request_tag) if context is not None else _request_tag.get()
+        if tag is not None:
+            self._task_tags[task] = tag
+        return task
+
+    def keep_result(self, collector: Collector) -> None:
+        """Conserve un profil terminé pour GET /admin/profiles/{id}"""
+        self._finished[collector.id] = collector
+        while len(self._finished) > self.keep:
+            self._finished.popitem(last=False)
+
+    def get_result(self, profile_id: str) -> Optional[Collector]:
+        return self._finished.get(profile_id)
+
+    def labels(self) -> Dict[Any, str]:
+        return self._labels
+
+    def _run(self) -> None:
+        interval = self.interval_ms / 1000
+        loop, loop_thread = self._loop, self._loop_thread
+        while not self._stop.wait(interval):
+            started = time.perf_counter()
+            collectors = self._collectors
+            frames = sys._current_frames()
+
+            task = asyncio.current_task(loop)
+            tag = self._task_tags.get(task) if task is not None else None
+            loop_stack = None
+            thread_names = None
+
+            for collector in collectors:
+                if not collector.matches(tag):
+                    continue
+                if loop_stack is None:
+                    loop_stack = self._stack(frames.get(loop_thread))
+                collector.samples += 1
+                if collector.threads:
+                    if thread_names is None:
+                        thread_names = {t.ident: t.name for t in threading.enumerate()}
+                    collector.counts[(f"thread:{thread_names.get(loop_thread, 'loop')}",) + loop_stack] += 1
+                    if not collector.filtered:
+                        for ident, frame in frames.items():
+                            if ident not in (loop_thread, threading.get_ident()):
+                                collector.counts[(f"thread:{thread_names.get(ident, ident)}",) + self._stack(frame)] += 1
+                else:
+                    collector.counts[loop_stack] += 1
+
+            self.stats["samples"] += 1
+            self.stats["sampling_ms"] += (time.perf_counter() - started) * 1000
+
+    @staticmethod
+    def _stack(frame) -> Tuple:
+        codes = []
+        while frame is not None:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+        codes.reverse()
+        return tuple(codes)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "active": len(self._collectors),
+            "kept": len(self._finished),
+            "interval_ms": self.interval_ms,
+            **{k: round(v, 1) if isinstance(v, float) else v for k, v in self.stats.items()}
+        }
+
+
+def _session_of(path: str) -> str:
+    """Session d'une route /{ressource}/{session_id}/... ("" sinon)"""
+    parts = path.split("/", 3)
+    return parts[2] if len(parts) > 2 else ""
+
+
+class ProfilerMiddleware:
+    """
+    Middleware ASGI : marque les requêtes pendant un profilage, et profile une requête /audio
+    portant `X-Profile: 1` + un jeton d'administration valide
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        profiler = get_profiler()
+        path = scope["path"]
+        collector = None
+        if path.startswith("/audio/") and ADMIN_TOKEN:
+            headers = dict(scope["headers"])
+            if headers.get(PROFILE_HEADER) == b"1" and is_admin_token(headers.get(ADMIN_HEADER, b"").decode("latin-1")):
+                collector = Collector(request_id=uuid.uuid4().hex[:12], session_id=_session_of(path) or None)
+
+        if collector is None and not profiler.active:
+            return await self.app(scope, receive, send)
+
+        tag = (collector.id if collector else uuid.uuid4().hex[:12], path, _session_of(path))
+        token = _request_tag.set(tag)
+        if collector is None:
+            profiler.tag_task(asyncio.current_task(), tag)
+            try:
+                return await self.app(scope, receive, send)
+            finally:
+                _request_tag.reset(token)
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", collector.id.encode())]}
+            await send(message)
+
+        profiler.start(collector)
+        profiler.tag_task(asyncio.current_task(), tag)
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            _request_tag.reset(token)
+            profiler.keep_result(profiler.stop(collector))
+            logger.info(f"[PROFILER] 🔬 Profil {collector.id} ({path}) : {collector.samples} échantillons")
+
+
+_profiler: Optional[SamplingProfiler] = None
+
+
+def get_profiler() -> SamplingProfiler:
+    """Retourne le profileur du process"""
+    global _profiler
+    if _profiler is None:
+        _profiler = SamplingProfiler()
+    return _profiler
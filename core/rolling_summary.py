@@ -0,0 +1,106 @@
+"""
+Résumé glissant des appels longs (mémoire au-delà de la fenêtre de contexte)
+
+Quand MAX_CONTEXT_MESSAGES est dépassé, les messages les plus anciens sortent de
+`manager.messages`. Dès qu'un segment de SUMMARY_THRESHOLD messages est sorti, une tâche
+de fond (priorité SUMMARY de l'ordonnanceur LLM, jamais devant le coaching) :
+- map : résume ce segment seul (prompt court, taille fixe)
+- reduce : au-delà de SUMMARY_MAX_SEGMENTS résumés de segments, les fusionne avec le
+  résumé courant (`conversation_summary`)
+
+La mémoire (résumé fusionné + derniers résumés de segments) reste bornée quelle que soit
+la durée de l'appel : get_structured_context l'injecte dans le prompt de coaching, et /resume
+n'envoie plus que cette mémoire + la fin du transcript (réduction finale).
+
+Une seule tâche par session, l'appel LLM se fait hors du verrou de la session ; le résultat
+est appliqué sous verrou (valable aussi avec le store Redis). Échec ou délestage : le
+segment est repris au prochain message, au plus tôt après SUMMARY_RETRY_DELAY secondes.
+"""
+import logging
+import asyncio
+import time
+from typing import Dict, Optional
+
+from services.summary import SummaryService
+from config.settings import SUMMARY_MAX_SEGMENTS, SUMMARY_RETRY_DELAY
+
+logger = logging.getLogger(__name__)
+
+
+class RollingSummarizer:
+    """Tâches de résumé glissant des sessions du process"""
+
+    def __init__(
+        self,
+        summary_service: Optional[SummaryService] = None,
+        max_segments: int = SUMMARY_MAX_SEGMENTS,
+        retry_delay: float = SUMMARY_RETRY_DELAY
+    ):
+        self.summary_service = summary_service or SummaryService()
+        self.max_segments = max_segments
+        self.retry_delay = retry_delay
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._retry_at: Dict[str, float] = {}
+        self.stats = {"segments": 0, "reductions": 0, "failures": 0}
+
+    def schedule(self, session_id: Optional[str]) -> None:
+        """Lance le résumé des segments en attente (sans effet si une tâche tourne déjà)"""
+        if session_id is None or session_id in self._tasks:
+            return
+        if time.monotonic() < self._retry_at.get(session_id, 0.0):
+            return
+        self._retry_at.pop(session_id, None)
+        task = asyncio.create_task(self._run(session_id), name=f"rolling-summary-{session_id}")
+        self._tasks[session_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(session_id, None))
+
+    async def _run(self, session_id: str) -> None:
+        # Import local : core.session_store dépend de core.call_manager, qui dépend de ce module
+        from core.session_store import get_session_store, SessionNotFoundError
+
+        store = get_session_store()
+        try:
+            while True:
+                manager = await store.get(session_id)
+                span = manager.pending_summary_range() if manager is not None else None
+                if span is None:
+                    return
+                start, end = span
+                segments = manager.summary_segments + [
+                    await self.summary_service.summarize_segment(manager.get_full_transcript(start, end), session_id)
+                ]
+                summary = manager.conversation_summary
+                self.stats["segments"] += 1
+                if len(segments) > self.max_segments:
+                    summary = await self.summary_service.reduce_summaries(summary, segments, session_id)
+                    segments = []
+                    self.stats["reductions"] += 1
+
+                async with store.session(session_id) as manager:
+                    if manager.summary_covered_until != start:
+                        return  # Session restaurée ou remplacée entre-temps
+                    manager.conversation_summary = summary
+                    manager.summary_segments = segments
+                    manager.summary_covered_until = end
+                    manager.needs_summary_update = manager.pending_summary_range() is not None
+                logger.info(f"[RÉSUMÉ] 🧠 Messages {start}-{end - 1} intégrés à la mémoire de {session_id}")
+        except SessionNotFoundError:
+            return  # Session terminée pendant le résumé
+        except Exception as e:
+            self.stats["failures"] += 1
+            self._retry_at[session_id] = time.monotonic() + self.retry_delay
+            logger.warning(f"[RÉSUMÉ] ⚠️ Résumé glissant reporté pour {session_id}: {e}")
+
+    def snapshot(self) -> Dict[str, int]:
+        return {"running": len(self._tasks), **self.stats}
+
+
+_rolling_summarizer: Optional[RollingSummarizer] = None
+
+
+def get_rolling_summarizer() -> RollingSummarizer:
+    """Retourne le résumeur glissant du process"""
+    global _rolling_summarizer
+    if _rolling_summarizer is None:
+        _rolling_summarizer = RollingSummarizer()
+    return _rolling_summarizer
@@ -0,0 +1,333 @@
+"""
+Traitement ordonné des chunks audio d'une session
+
+Chaque session possède une file de travail consommée par UNE tâche (acteur) :
+les mises à jour de la session (messages, cooldown, insights) s'exécutent une par une,
+dans l'ordre des chunks.
+
+Les clients peuvent numéroter leurs chunks (en-tête X-Chunk-Seq ou champ de formulaire
+`seq`, à partir de 0) et les envoyer en parallèle : la transcription se fait en parallèle
+hors pipeline, puis un buffer de réordonnancement (jitter buffer) remet les chunks dans
+l'ordre avant l'acteur.
+- chunk en avance : attend les précédents au plus CHUNK_REORDER_TIMEOUT secondes,
+  puis les chunks manquants sont sautés
+- chunk sauté qui arrive finalement : traité à son arrivée (transcript conservé)
+- chunk déjà reçu (renvoi réseau) : rejeté
+- chunk sans numéro : traité dans l'ordre d'arrivée (ancien comportement)
+
+L'état de séquence fait foi dans la session (CallManager.chunk_next_seq / chunk_skipped),
+mis à jour sous le verrou du SessionStore à chaque chunk appliqué ; le buffer du process
+n'en est qu'une copie :
+- premier chunk numéroté vu par le process (session restaurée d'un snapshot, créée ou
+  alimentée par un autre worker) : le buffer repart de l'état de la session, pas de 0
+- store partagé (redis), chunks répartis entre workers : un chunk en avance relit l'état
+  de la session, puis l'attente d'un trou le relit GAP_POLLS fois, un trou comblé par un
+  autre worker ne coûte donc pas CHUNK_REORDER_TIMEOUT
+- doublon traité par un autre worker : rejeté sous le verrou (après transcription)
+
+Un pipeline inactif (acteur sans chunk depuis SESSION_ACTOR_IDLE_TIMEOUT, rien en attente) est
+retiré du registre : avec un store partagé, ni /end (reçu par un autre worker) ni le nettoyeur
+(désactivé) ne le retirent. L'état de séquence étant dans la session, un pipeline recréé
+repart de celle-ci. Une requête qui tenait le pipeline retiré le réinscrit en soumettant.
+"""
+import logging
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from core.call_manager import CallManager
+from core.session_store import InMemorySessionStore, get_session_store
+from config.settings import CHUNK_REORDER_TIMEOUT, SESSION_ACTOR_IDLE_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+Work = Callable[[CallManager], Awaitable[Any]]
+
+# Nombre max de numéros sautés mémorisés par session (détection des retardataires)
+MAX_SKIPPED_TRACKED = 256
+
+# Relectures de l'état de la session pendant l'attente d'un trou (store partagé uniquement)
+GAP_POLLS = 10
+
+
+class DuplicateChunkError(Exception):
+    """Chunk déjà reçu pour cette session (même numéro de séquence)"""
+
+
+def _trim_skipped(skipped: Set[int]) -> None:
+    while len(skipped) > MAX_SKIPPED_TRACKED:
+        skipped.discard(min(skipped))
+
+
+def _record_seq(manager: CallManager, seq: int) -> None:
+    """
+    Marque le chunk comme appliqué dans la session (sous son verrou)
+
+    Raises:
+        DuplicateChunkError: chunk déjà appliqué (par ce worker ou un autre)
+    """
+    if seq < manager.chunk_next_seq:
+        if seq not in manager.chunk_skipped:
+            raise DuplicateChunkError(f"Chunk {seq} déjà appliqué à la session {manager.call_id}")
+        manager.chunk_skipped.remove(seq)
+        return
+    skipped = set(manager.chunk_skipped)
+    skipped.update(range(manager.chunk_next_seq, seq))
+    _trim_skipped(skipped)
+    manager.chunk_skipped = sorted(skipped)
+    manager.chunk_next_seq = seq + 1
+
+
+class _Chunk:
+    __slots__ = ("seq", "work", "future")
+
+    def __init__(self, seq: Optional[int], work: Work, future: asyncio.Future):
+        self.seq = seq
+        self.work = work
+        self.future = future
+
+
+class SessionPipeline:
+    """Buffer de réordonnancement + acteur séquentiel d'une session"""
+
+    def __init__(
+        self,
+        session_id: str,
+        stats: Dict[str, int],
+        reorder_timeout: float = CHUNK_REORDER_TIMEOUT,
+        idle_timeout: float = SESSION_ACTOR_IDLE_TIMEOUT,
+        shared: bool = False,
+        registry: Optional["SessionPipelines"] = None
+    ):
+        self.session_id = session_id
+        self.registry = registry
+        self.retired = False
+        self.reorder_timeout = reorder_timeout
+        self.idle_timeout = idle_timeout
+        self.stats = stats
+        self.shared = shared  # Store partagé : d'autres workers appliquent aussi des chunks
+
+        self.next_seq = 0
+        self._synced = False
+        self._pending: Dict[int, _Chunk] = {}  # Chunks arrivés en avance
+        self._skipped: Set[int] = set()
+        self._ready: "asyncio.Queue[_Chunk]" = asyncio.Queue()
+        self._gap_waiter: Optional[asyncio.Task] = None
+        self._gap_seq: Optional[int] = None
+        self._actor: Optional[asyncio.Task] = None
+
+    async def prepare(self, seq: Optional[int]) -> None:
+        """
+        Avant un chunk numéroté : aligne le buffer sur l'état de la session au premier chunk
+        du process, et à chaque chunk en avance avec un store partagé
+        """
+        if seq is not None and (not self._synced or (self.shared and seq != self.next_seq)):
+            await self.sync()
+
+    async def sync(self) -> None:
+        """Relit l'état de séquence de la session (lecture sans verrou, au mieux)"""
+        try:
+            manager = await get_session_store().get(self.session_id)
+        except Exception as e:
+            logger.warning(f"[PIPELINE] ⚠️ État de séquence illisible ({self.session_id}): {e}")
+            return
+        self._synced = True
+        if manager is not None:
+            self._adopt(manager.chunk_next_seq, manager.chunk_skipped)
+
+    def _adopt(self, next_seq: int, skipped) -> None:
+        """Avance le buffer jusqu'à l'état de la session (chunks appliqués ailleurs)"""
+        if next_seq <= self.next_seq:
+            return
+        skipped = set(skipped)
+        for seq in [seq for seq in self._pending if seq < next_seq]:
+            chunk = self._pending.pop(seq)
+            if seq in skipped:
+                self.stats["late"] += 1
+                self._ready.put_nowait(chunk)
+            else:
+                self.stats["duplicates"] += 1
+                if not chunk.future.done():
+                    chunk.future.set_exception(DuplicateChunkError(f"Chunk {seq} déjà appliqué par un autre worker"))
+        self._skipped.update(skipped)
+        _trim_skipped(self._skipped)
+        self.next_seq = next_seq
+        self._release()
+
+    def is_duplicate(self, seq: Optional[int]) -> bool:
+        """Chunk déjà reçu (à vérifier avant la transcription pour ne pas la payer deux fois)"""
+        if seq is None:
+            return False
+        return seq in self._pending or (seq < self.next_seq and seq not in self._skipped)
+
+    def submit(self, seq: Optional[int], work: Work) -> asyncio.Future:
+        """
+        Planifie `work(manager)` à sa place dans l'ordre de la session
+
+        Returns:
+            Future résolu avec le résultat de `work`
+
+        Raises:
+            DuplicateChunkError: numéro de séquence déjà reçu
+        """
+        if self.retired and self.registry is not None:
+            # Retiré (inactif ou fin de session) pendant la transcription de ce chunk
+            owner = self.registry.reinstate(self)
+            if owner is not self:
+                return owner.submit(seq, work)
+        if self.is_duplicate(seq):
+            self.stats["duplicates"] += 1
+            raise DuplicateChunkError(f"Chunk {seq} déjà reçu pour la session {self.session_id}")
+
+        chunk = _Chunk(seq, work, asyncio.get_running_loop().create_future())
+
+        if seq is None:
+            self._ready.put_nowait(chunk)
+        elif seq < self.next_seq:
+            # Retardataire d'un trou déjà sauté : traité maintenant plutôt que perdu
+            self._skipped.discard(seq)
+            self.stats["late"] += 1
+            logger.warning(f"[PIPELINE] ⏰ Chunk {seq} arrivé après expiration du buffer ({self.session_id})")
+            self._ready.put_nowait(chunk)
+        else:
+            if seq != self.next_seq:
+                self.stats["reordered"] += 1
+            self._pending[seq] = chunk
+            self._release()
+
+        self._ensure_actor()
+        return chunk.future
+
+    def _release(self) -> None:
+        """Transmet à l'acteur les chunks consécutifs disponibles et arme l'attente du trou suivant"""
+        while self.next_seq in self._pending:
+            self._ready.put_nowait(self._pending.pop(self.next_seq))
+            self.next_seq += 1
+
+        if self._gap_waiter is not None and (not self._pending or self._gap_seq != self.next_seq):
+            if self._gap_waiter is not asyncio.current_task():
+                self._gap_waiter.cancel()
+            self._gap_waiter = None
+
+        if self._pending and self._gap_waiter is None:
+            self._gap_seq = self.next_seq
+            self._gap_waiter = asyncio.create_task(self._wait_gap())
+
+    async def _wait_gap(self) -> None:
+        """Attend le chunk manquant (en relisant la session si le store est partagé), puis le saute"""
+        waiter = asyncio.current_task()
+        polls = GAP_POLLS if self.shared else 1
+        for _ in range(polls):
+            await asyncio.sleep(self.reorder_timeout / polls)
+            if self.shared:
+                await self.sync()
+            if self._gap_waiter is not waiter:
+                return  # Trou comblé entre-temps
+        self._gap_waiter = None
+        self._skip_gap()
+
+    def _skip_gap(self) -> None:
+        """Délai de réordonnancement écoulé : les chunks manquants sont sautés"""
+        if not self._pending:
+            return
+
+        first_available = min(self._pending)
+        missing = range(self.next_seq, first_available)
+        self.stats["skipped"] += len(missing)
+        logger.warning(
+            f"[PIPELINE] ⏭️ Chunks {missing.start}-{missing.stop - 1} manquants après "
+            f"{self.reorder_timeout}s, sautés ({self.session_id})"
+        )
+
+        self._skipped.update(missing)
+        _trim_skipped(self._skipped)
+
+        self.next_seq = first_available
+        self._release()
+
+    def _ensure_actor(self) -> None:
+        if self._actor is None or self._actor.done():
+            self._actor = asyncio.create_task(self._run(), name=f"session-actor-{self.session_id}")
+
+    async def _run(self) -> None:
+        """Acteur : exécute les chunks un par un sous le verrou de la session"""
+        store = get_session_store()
+        while True:
+            try:
+                chunk = await asyncio.wait_for(self._ready.get(), timeout=self.idle_timeout)
+            except asyncio.TimeoutError:
+                if self._ready.empty() and not self._pending:
+                    if self.registry is not None:
+                        self.registry.retire(self)
+                    return  # Relancé au prochain chunk
+                continue
+
+            try:
+                async with store.session(self.session_id) as manager:
+                    if chunk.seq is not None:
+                        _record_seq(manager, chunk.seq)
+                    result = await chunk.work(manager)
+            except DuplicateChunkError as e:
+                self.stats["duplicates"] += 1
+                if not chunk.future.done():
+                    chunk.future.set_exception(e)
+                continue
+            except Exception as e:
+                if not chunk.future.done():
+                    chunk.future.set_exception(e)
+                continue
+
+            self.stats["processed"] += 1
+            # Requête annulée (client déconnecté) : le chunk est tout de même appliqué à la session
+            if not chunk.future.done():
+                chunk.future.set_result(result)
+
+
+class SessionPipelines:
+    """Registre des pipelines des sessions du process"""
+
+    def __init__(self):
+        self._pipelines: Dict[str, SessionPipeline] = {}
+        self.stats = {"processed": 0, "reordered": 0, "skipped": 0, "late": 0, "duplicates": 0}
+
+    def get(self, session_id: str) -> SessionPipeline:
+        pipeline = self._pipelines.get(session_id)
+        if pipeline is None:
+            shared = not isinstance(get_session_store(), InMemorySessionStore)
+            pipeline = SessionPipeline(session_id, self.stats, shared=shared, registry=self)
+            self._pipelines[session_id] = pipeline
+            # Acteur démarré dès la création : un pipeline jamais utilisé est aussi retiré
+            pipeline._ensure_actor()
+        return pipeline
+
+    def retire(self, pipeline: SessionPipeline) -> None:
+        """Retire un pipeline inactif (seulement s'il est encore celui de sa session)"""
+        pipeline.retired = True
+        if self._pipelines.get(pipeline.session_id) is pipeline:
+            del self._pipelines[pipeline.session_id]
+
+    def reinstate(self, pipeline: SessionPipeline) -> SessionPipeline:
+        """Pipeline retiré qui reçoit un chunk : réinscrit, sauf si un autre l'a remplacé"""
+        current = self._pipelines.setdefault(pipeline.session_id, pipeline)
+        if current is pipeline:
+            pipeline.retired = False
+        return current
+
+    def discard(self, session_id: str) -> None:
+        """Fin de session (les chunks déjà planifiés se terminent normalement)"""
+        pipeline = self._pipelines.pop(session_id, None)
+        if pipeline is not None:
+            pipeline.retired = True
+
+    def snapshot(self) -> Dict[str, int]:
+        return {"active": len(self._pipelines), **self.stats}
+
+
+_session_pipelines: Optional[SessionPipelines] = None
+
+
+def get_session_pipelines() -> SessionPipelines:
+    """Retourne le registre des pipelines de session du process"""
+    global _session_pipelines
+    if _session_pipelines is None:
+        _session_pipelines = SessionPipelines()
+    return _session_pipelines
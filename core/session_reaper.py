@@ -0,0 +1,196 @@
+"""
+Nettoyage des sessions abandonnées (store "memory")
+
+Un client qui ne termine pas son appel (/calls/{id}/end) laisse sa session en mémoire.
+Une tâche de fond parcourt périodiquement les sessions, de la moins récemment utilisée
+à la plus récente :
+- TTL : session inactive depuis SESSION_IDLE_TTL secondes → évincée
+- budget : tant que la mémoire estimée des sessions dépasse SESSION_MEMORY_BUDGET_MB,
+  les sessions inactives depuis au moins SESSION_MIN_IDLE_FOR_EVICTION secondes sont
+  évincées (LRU)
+Une session en cours de traitement (verrou tenu) n'est jamais évincée.
+
+Si SESSION_ARCHIVE_DIR est défini, la session évincée est écrite sur disque
+({call_id}.ksnap, format de core/session_snapshot.py) avant d'être oubliée.
+Les snapshots de redémarrage jamais réclamés depuis SESSION_IDLE_TTL sont supprimés.
+
+Avec SESSION_STORE=redis, l'expiration est gérée par Redis (SESSION_STORE_TTL,
+renouvelé à chaque écriture) et la mémoire par maxmemory : le nettoyage est inactif.
+"""
+import logging
+import asyncio
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from core.call_manager import CallManager
+from core.session_store import InMemorySessionStore, dumps_manager, get_session_store
+from core.session_snapshot import SnapshotDirectory
+from core.session_pipeline import get_session_pipelines
+from core.event_bus import get_event_bus
+from core.analytics import get_session_analytics
+from config.settings import (
+    SESSION_IDLE_TTL,
+    SESSION_MEMORY_BUDGET_MB,
+    SESSION_MIN_IDLE_FOR_EVICTION,
+    SESSION_REAPER_INTERVAL,
+    SESSION_ARCHIVE_DIR
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _process_rss_mb() -> Optional[float]:
+    """RSS courant du process (Linux), None si indisponible"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+class SessionReaper:
+    """Évince les sessions inactives (TTL) puis les moins récentes au-delà du budget mémoire"""
+
+    def __init__(
+        self,
+        idle_ttl: float = SESSION_IDLE_TTL,
+        memory_budget_mb: float = SESSION_MEMORY_BUDGET_MB,
+        min_idle: float = SESSION_MIN_IDLE_FOR_EVICTION,
+        interval: float = SESSION_REAPER_INTERVAL,
+        archive_dir: Optional[Path] = SESSION_ARCHIVE_DIR
+    ):
+        self.idle_ttl = idle_ttl
+        self.budget_bytes = int(memory_budget_mb * 1024 * 1024)
+        self.min_idle = min_idle
+        self.interval = interval
+        self.archive = SnapshotDirectory(archive_dir) if archive_dir is not None else None
+
+        # Estimation mise en cache tant que la session n'a pas changé de taille
+        self._sizes: Dict[str, Tuple[Tuple[int, int], int]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.session_bytes = 0
+        self.stats = {
+            "evicted_ttl": 0, "evicted_memory": 0, "archived": 0, "archive_errors": 0,
+            "snapshots_purged": 0, "sweeps": 0
+        }
+
+    def _estimate(self, session_id: str, manager: CallManager) -> int:
+        key = (len(manager.full_transcript), len(manager.insight_history))
+        cached = self._sizes.get(session_id)
+        if cached is None or cached[0] != key:
+            cached = (key, manager.estimate_memory_bytes())
+            self._sizes[session_id] = cached
+        return cached[1]
+
+    async def sweep(self, store: InMemorySessionStore) -> int:
+        """Un passage de nettoyage. Retourne le nombre de sessions évincées"""
+        sessions = list(store.iter_lru())
+        sizes = {sid: self._estimate(sid, manager) for sid, manager, _, _ in sessions}
+        total = sum(sizes.values())
+        evicted = 0
+
+        for session_id, _, idle, busy in sessions:
+            if busy:
+                continue
+            if idle >= self.idle_ttl:
+                reason, min_idle = "evicted_ttl", self.idle_ttl
+            elif total > self.budget_bytes:
+                reason, min_idle = "evicted_memory", self.min_idle
+            else:
+                continue
+
+            manager = store.evict_if_idle(session_id, min_idle)
+            if manager is None:
+                continue
+            if reason == "evicted_memory":
+                logger.info(
+                    f"[REAPER] 🧹 Budget mémoire dépassé ({total / 1048576:.0f} MB), "
+                    f"session {session_id} évincée (inactive depuis {idle:.0f}s)"
+                )
+            else:
+                logger.info(f"[REAPER] 🧹 Session {session_id} expirée (inactive depuis {idle:.0f}s)")
+
+            total -= sizes[session_id]
+            self._sizes.pop(session_id, None)
+            get_session_pipelines().discard(session_id)
+            get_event_bus().close_session(session_id, reason)
+            get_session_analytics().record_call_ended(manager, reason)
+            self.stats[reason] += 1
+            evicted += 1
+            if self.archive is not None:
+                await self._archive(manager)
+
+        # Sessions terminées entre-temps : estimation oubliée
+        for session_id in set(self._sizes) - set(sizes):
+            self._sizes.pop(session_id, None)
+
+        if store.snapshots is not None:
+            self.stats["snapshots_purged"] += await asyncio.to_thread(
+                store.snapshots.purge_older_than, self.idle_ttl
+            )
+
+        self.session_bytes = total
+        self.stats["sweeps"] += 1
+        return evicted
+
+    async def _archive(self, manager: CallManager) -> None:
+        try:
+            blob = dumps_manager(manager)
+            await asyncio.to_thread(self.archive.write, manager.call_id, blob)
+            self.stats["archived"] += 1
+        except Exception as e:
+            self.stats["archive_errors"] += 1
+            logger.error(f"[REAPER] ❌ Archivage de la session {manager.call_id} impossible: {e}")
+
+    async def _run(self, store: InMemorySessionStore) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep(store)
+            except Exception as e:
+                logger.error(f"[REAPER] ❌ Erreur lors du nettoyage des sessions: {e}")
+
+    def start(self) -> Optional[asyncio.Task]:
+        """Lance la tâche de fond (sans effet si le store n'est pas en mémoire)"""
+        store = get_session_store()
+        if not isinstance(store, InMemorySessionStore):
+            logger.info("🧹 Nettoyage des sessions délégué au store (expiration Redis)")
+            return None
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(store), name="session-reaper")
+            logger.info(
+                f"🧹 Nettoyage des sessions: TTL {self.idle_ttl:.0f}s, "
+                f"budget {self.budget_bytes / 1048576:.0f} MB, toutes les {self.interval:.0f}s"
+            )
+        return self._task
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        store = get_session_store()
+        return {
+            "enabled": self._task is not None and not self._task.done(),
+            "session_memory_mb": round(self.session_bytes / 1048576, 2),
+            "budget_mb": round(self.budget_bytes / 1048576, 1),
+            "process_rss_mb": _process_rss_mb(),
+            "archive": str(self.archive.directory) if self.archive is not None else None,
+            "snapshots_restored": store.restored if isinstance(store, InMemorySessionStore) else 0,
+            **self.stats
+        }
+
+
+_session_reaper: Optional[SessionReaper] = None
+
+
+def get_session_reaper() -> SessionReaper:
+    """Retourne le nettoyeur de sessions du process"""
+    global _session_reaper
+    if _session_reaper is None:
+        _session_reaper = SessionReaper()
+    return _session_reaper
@@ -0,0 +1,195 @@
+"""
+Format binaire compact des sessions (CallManager) et dossier de snapshots
+
+Format (little-endian) :
+    en-tête  : magic "KSNP" | version u16 | flags u16 | taille méta u32 | taille tableaux u32
+    corps    : zlib(méta JSON UTF-8) | embeddings float32 | signatures MinHash uint64
+
+- Les tableaux numpy sont écrits bruts, hors zlib (pas de base64, et des flottants
+  normalisés ne se compressent presque pas : les compresser coûte du temps pour rien)
+- `messages` (fenêtre de contexte) est le plus souvent la fin de `full_transcript` :
+  seul le nombre de messages partagés est écrit, et le partage est reconstruit au chargement
+
+Utilisé par le store Redis (valeur de chaque session), par l'archivage des sessions évincées
+et par la sauvegarde à l'arrêt du process (restaurée paresseusement au premier accès).
+"""
+import logging
+import json
+import os
+import re
+import struct
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+from core.call_manager import CallManager
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"KSNP"
+VERSION = 1
+SNAPSHOT_SUFFIX = ".ksnap"
+
+_HEADER = struct.Struct("<4sHHII")
+
+# Identifiants acceptés comme nom de fichier (pas de séparateur de chemin)
+_SAFE_ID = re.compile(r"^[A-Za-z0-9_.-]{1,128}$")
+
+
+class SnapshotFormatError(ValueError):
+    """Données qui ne sont pas un snapshot lisible (magic, version ou contenu invalide)"""
+
+
+def is_snapshot(blob: bytes) -> bool:
+    return blob[:len(MAGIC)] == MAGIC
+
+
+def dumps_snapshot(manager: CallManager, level: int = 6) -> bytes:
+    """Sérialise une session au format binaire"""
+    state = manager.to_state(with_arrays=False)
+
+    # Fenêtre de contexte partagée avec la fin du transcript : seul le nombre est écrit
+    messages, transcript = manager.messages, manager.full_transcript
+    if len(messages) <= len(transcript) and all(
+        a is b for a, b in zip(reversed(messages), reversed(transcript))
+    ):
+        state["messages"] = {"tail": len(messages)}
+
+    embeddings = manager.insight_embeddings
+    present = [e is not None for e in embeddings]
+    vectors = [e for e in embeddings if e is not None]
+    sketches = manager.insight_sketches
+
+    state["insight_embeddings"] = {"present": present, "dim": int(vectors[0].shape[0]) if vectors else 0}
+    state["insight_sketches"] = {"count": len(sketches), "width": int(sketches[0].shape[0]) if sketches else 0}
+
+    arrays = b"".join(np.ascontiguousarray(v, dtype=np.float32).tobytes() for v in vectors)
+    arrays += b"".join(np.ascontiguousarray(s, dtype=np.uint64).tobytes() for s in sketches)
+
+    meta = zlib.compress(json.dumps(state, separators=(",", ":"), ensure_ascii=False).encode("utf-8"), level)
+    return _HEADER.pack(MAGIC, VERSION, 0, len(meta), len(arrays)) + meta + arrays
+
+
+def loads_snapshot(blob: bytes) -> CallManager:
+    """
+    Reconstruit une session depuis `dumps_snapshot()`
+
+    Raises:
+        SnapshotFormatError: magic, version ou contenu invalide
+    """
+    if len(blob) < _HEADER.size:
+        raise SnapshotFormatError("Snapshot tronqué")
+    magic, version, _flags, meta_len, arrays_len = _HEADER.unpack_from(blob)
+    if magic != MAGIC:
+        raise SnapshotFormatError("Magic invalide")
+    if version != VERSION:
+        raise SnapshotFormatError(f"Version de snapshot non supportée: {version}")
+
+    if len(blob) != _HEADER.size + meta_len + arrays_len:
+        raise SnapshotFormatError("Taille incohérente avec l'en-tête")
+    try:
+        state = json.loads(zlib.decompress(blob[_HEADER.size:_HEADER.size + meta_len]))
+    except zlib.error as e:
+        raise SnapshotFormatError(f"Métadonnées illisibles: {e}") from e
+    arrays = memoryview(blob)[_HEADER.size + meta_len:]
+
+    embeddings_meta = state.pop("insight_embeddings")
+    sketches_meta = state.pop("insight_sketches")
+    messages = state["messages"]
+    if isinstance(messages, dict):
+        state["messages"] = []
+
+    manager = CallManager.from_state({**state, "insight_embeddings": [], "insight_sketches": []})
+
+    if isinstance(messages, dict):
+        tail = messages["tail"]
+        manager.messages = manager.full_transcript[-tail:] if tail else []
+
+    dim, present = embeddings_meta["dim"], embeddings_meta["present"]
+    n_vectors = sum(present)
+    vectors = np.frombuffer(arrays, dtype=np.float32, count=n_vectors * dim).reshape(n_vectors, dim)
+    rows = iter(vectors.copy())
+    manager.insight_embeddings = [next(rows) if p else None for p in present]
+
+    offset = vectors.nbytes
+    count, width = sketches_meta["count"], sketches_meta["width"]
+    sketches = np.frombuffer(arrays, dtype=np.uint64, count=count * width, offset=offset).reshape(count, width)
+    manager.insight_sketches = list(sketches.copy())
+    return manager
+
+
+class SnapshotDirectory:
+    """Un fichier {call_id}.ksnap par session sauvegardée (écriture atomique)"""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+
+    def path(self, session_id: str) -> Optional[Path]:
+        if not _SAFE_ID.match(session_id):
+            return None
+        return self.directory / f"{session_id}{SNAPSHOT_SUFFIX}"
+
+    def contains(self, session_id: str) -> bool:
+        path = self.path(session_id)
+        return path is not None and path.exists()
+
+    def write(self, session_id: str, blob: bytes) -> None:
+        path = self.path(session_id)
+        if path is None:
+            raise ValueError(f"Identifiant de session invalide pour un fichier: {session_id!r}")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(blob)
+        tmp.replace(path)
+
+    def write_all(self, blobs: Dict[str, bytes]) -> int:
+        for session_id, blob in blobs.items():
+            self.write(session_id, blob)
+        return len(blobs)
+
+    def take(self, session_id: str) -> Optional[CallManager]:
+        """
+        Charge puis supprime le snapshot d'une session (None si absent ou illisible)
+
+        Un snapshot illisible est renommé en .corrupt pour ne pas être relu à chaque requête.
+        """
+        path = self.path(session_id)
+        if path is None:
+            return None
+        try:
+            blob = path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+        try:
+            manager = loads_snapshot(blob)
+        except (SnapshotFormatError, ValueError, KeyError) as e:
+            logger.error(f"[SNAPSHOT] ❌ Snapshot illisible pour {session_id}: {e}")
+            path.replace(path.with_suffix(".corrupt"))
+            return None
+
+        path.unlink(missing_ok=True)
+        return manager
+
+    def session_ids(self) -> Iterable[str]:
+        if not self.directory.is_dir():
+            return []
+        return [p.name[:-len(SNAPSHOT_SUFFIX)] for p in self.directory.glob(f"*{SNAPSHOT_SUFFIX}")]
+
+    def purge_older_than(self, max_age: float) -> int:
+        """Supprime les snapshots jamais réclamés depuis `max_age` secondes"""
+        if not self.directory.is_dir():
+            return 0
+        deadline = time.time() - max_age
+        purged = 0
+        for path in self.directory.glob(f"*{SNAPSHOT_SUFFIX}"):
+            try:
+                if path.stat().st_mtime < deadline:
+                    path.unlink()
+                    purged += 1
+            except FileNotFoundError:
+                continue
+        return purged
@@ -0,0 +1,422 @@
+"""
+Stockage des sessions d'appel (partageable entre workers et nœuds)
+
+- memory : dict du process (défaut) — une session n'existe que dans le worker qui l'a créée.
+           À l'arrêt, les sessions sont sauvegardées dans SESSION_SNAPSHOT_DIR et le process
+           suivant les restaure au premier accès (redémarrage sans perte des appels en cours)
+- redis  : état du CallManager sérialisé (format binaire, core/session_snapshot.py) dans Redis,
+           verrou distribué par session, n'importe quel worker peut servir n'importe quelle session.
+           Une session abandonnée expire (SESSION_STORE_TTL) : l'index des sessions est un
+           ensemble trié par date d'expiration, purgé à chaque comptage
+
+Les routes n'accèdent aux sessions que via le store :
+    async with get_session_store().session(session_id) as manager:   # lecture/écriture, verrouillée
+    manager = await get_session_store().get(session_id)              # lecture seule, sans verrou
+"""
+import logging
+import asyncio
+import json
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Iterator, Optional, Tuple
+
+from core.call_manager import CallManager
+from core.session_snapshot import SnapshotDirectory, dumps_snapshot, is_snapshot, loads_snapshot
+from config.settings import (
+    SESSION_STORE_BACKEND,
+    REDIS_URL,
+    SESSION_STORE_TTL,
+    SESSION_LOCK_TTL,
+    SESSION_LOCK_TIMEOUT,
+    SESSION_SNAPSHOT_DIR
+)
+
+logger = logging.getLogger(__name__)
+
+# Libère le verrou seulement s'il appartient encore à ce détenteur (il a pu expirer)
+RELEASE_LOCK_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+# Prolonge le verrou (ARGV[2] ms) seulement s'il appartient encore à ce détenteur
+RENEW_LOCK_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("PEXPIRE", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Écrit la session (et son entrée d'index) seulement si le verrou appartient encore à ce détenteur
+# KEYS : verrou, session, index ; ARGV : jeton, état, TTL (s), date d'expiration, id de session
+WRITE_SESSION_SCRIPT = """
+if redis.call("GET", KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call("SET", KEYS[2], ARGV[2], "EX", ARGV[3])
+redis.call("ZADD", KEYS[3], ARGV[4], ARGV[5])
+return 1
+"""
+
+
+class SessionNotFoundError(KeyError):
+    """Session inexistante (jamais créée, terminée ou expirée)"""
+
+
+class SessionLockTimeout(TimeoutError):
+    """Verrou de session non obtenu dans le délai (session occupée par une autre requête)"""
+
+
+class SessionLockLost(RuntimeError):
+    """Verrou de session perdu avant l'écriture (expiré, repris ailleurs) : modifications abandonnées"""
+
+
+def dumps_manager(manager: CallManager) -> bytes:
+    """Sérialise une session (format binaire versionné)"""
+    return dumps_snapshot(manager)
+
+
+def loads_manager(blob: bytes) -> CallManager:
+    """Désérialise une session (format binaire, ou ancien format JSON + zlib)"""
+    if is_snapshot(blob):
+        return loads_snapshot(blob)
+    return CallManager.from_state(json.loads(zlib.decompress(blob)))
+
+
+class SessionStore:
+    """Interface commune des backends de stockage"""
+
+    async def create(self, manager: CallManager) -> None:
+        raise NotImplementedError
+
+    async def get(self, session_id: str) -> Optional[CallManager]:
+        """Lecture seule (les modifications ne sont pas persistées)"""
+        raise NotImplementedError
+
+    async def exists(self, session_id: str) -> bool:
+        raise NotImplementedError
+
+    async def pop(self, session_id: str) -> Optional[CallManager]:
+        """Supprime la session et la retourne (None si absente)"""
+        raise NotImplementedError
+
+    async def count(self) -> int:
+        raise NotImplementedError
+
+    def session(self, session_id: str):
+        """
+        Context manager async : verrouille la session, la fournit, puis persiste ses modifications
+
+        Raises:
+            SessionNotFoundError: session absente
+            SessionLockTimeout: verrou non obtenu dans SESSION_LOCK_TIMEOUT
+            SessionLockLost: verrou perdu pendant le traitement (redis), rien n'est écrit
+        """
+        raise NotImplementedError
+
+
+class InMemorySessionStore(SessionStore):
+    """Sessions dans la mémoire du process, verrou asyncio par session, ordre LRU des accès"""
+
+    def __init__(self, snapshots: Optional[SnapshotDirectory] = None):
+        self._sessions: Dict[str, CallManager] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._last_access: "OrderedDict[str, float]" = OrderedDict()  # Du moins au plus récent
+        self.snapshots = snapshots
+        self._restoring: Dict[str, asyncio.Task] = {}
+        self.restored = 0
+
+    async def _restore(self, session_id: str) -> Optional[CallManager]:
+        """Session sauvegardée par le process précédent : chargée au premier accès (une seule lecture)"""
+        if self.snapshots is None:
+            return None
+        task = self._restoring.get(session_id)
+        if task is None:
+            task = asyncio.ensure_future(self._load_snapshot(session_id))
+            self._restoring[session_id] = task
+            task.add_done_callback(lambda _: self._restoring.pop(session_id, None))
+        return await asyncio.shield(task)
+
+    async def _load_snapshot(self, session_id: str) -> Optional[CallManager]:
+        manager = await asyncio.to_thread(self.snapshots.take, session_id)
+        if manager is not None and session_id not in self._sessions:
+            await self.create(manager)
+            self.restored += 1
+            logger.info(f"[SESSIONS] ♻️ Session {session_id} restaurée depuis son snapshot")
+        return self._sessions.get(session_id)
+
+    async def _lookup(self, session_id: str) -> Optional[CallManager]:
+        manager = self._sessions.get(session_id)
+        if manager is None:
+            manager = await self._restore(session_id)
+        return manager
+
+    def _touch(self, session_id: str) -> None:
+        self._last_access[session_id] = time.monotonic()
+        self._last_access.move_to_end(session_id)
+
+    def iter_lru(self) -> Iterator[Tuple[str, CallManager, float, bool]]:
+        """
+        Sessions de la moins récemment utilisée à la plus récente
+
+        Yields:
+            (session_id, manager, secondes d'inactivité, requête en cours)
+        """
+        now = time.monotonic()
+        for session_id, last_access in list(self._last_access.items()):
+            manager = self._sessions.get(session_id)
+            lock = self._locks.get(session_id)
+            if manager is not None:
+                yield session_id, manager, now - last_access, lock is not None and lock.locked()
+
+    async def create(self, manager: CallManager) -> None:
+        self._locks[manager.call_id] = asyncio.Lock()
+        self._sessions[manager.call_id] = manager
+        self._touch(manager.call_id)
+
+    async def get(self, session_id: str) -> Optional[CallManager]:
+        manager = await self._lookup(session_id)
+        if manager is not None:
+            self._touch(session_id)
+        return manager
+
+    async def exists(self, session_id: str) -> bool:
+        if session_id in self._sessions:
+            return True
+        return self.snapshots is not None and await asyncio.to_thread(self.snapshots.contains, session_id)
+
+    async def pop(self, session_id: str) -> Optional[CallManager]:
+        await self._lookup(session_id)
+        lock = self._locks.get(session_id)
+        if lock is None:
+            return None
+        async with lock:
+            self._locks.pop(session_id, None)
+            self._last_access.pop(session_id, None)
+            return self._sessions.pop(session_id, None)
+
+    async def count(self) -> int:
+        return len(self._sessions)
+
+    def evict_if_idle(self, session_id: str, min_idle: float) -> Optional[CallManager]:
+        """
+        Retire la session si aucune requête ne l'utilise et qu'elle est inactive depuis `min_idle`
+
+        Synchrone (aucun await) : la vérification et la suppression sont atomiques
+        vis-à-vis des autres tâches de la boucle.
+        """
+        lock = self._locks.get(session_id)
+        last_access = self._last_access.get(session_id)
+        if lock is None or lock.locked() or last_access is None:
+            return None
+        if time.monotonic() - last_access < min_idle:
+            return None
+        self._locks.pop(session_id, None)
+        self._last_access.pop(session_id, None)
+        return self._sessions.pop(session_id, None)
+
+    async def snapshot_all(self, timeout: float) -> int:
+        """
+        Sauvegarde toutes les sessions dans le dossier de snapshots (arrêt du process)
+
+        Attend que chaque session soit libre (traitement en cours terminé), au plus `timeout`
+        secondes au total ; au-delà, la session est sauvegardée dans son état courant.
+        """
+        if self.snapshots is None:
+            return 0
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        blobs: Dict[str, bytes] = {}
+
+        for session_id, manager in list(self._sessions.items()):
+            lock = self._locks.get(session_id)
+            acquired = False
+            if lock is not None:
+                try:
+                    await asyncio.wait_for(lock.acquire(), timeout=max(0.0, deadline - loop.time()))
+                    acquired = True
+                except asyncio.TimeoutError:
+                    logger.warning(f"[SESSIONS] ⚠️ Session {session_id} toujours occupée, sauvegardée en l'état")
+            try:
+                blobs[session_id] = dumps_manager(manager)
+            except Exception as e:
+                logger.error(f"[SESSIONS] ❌ Sauvegarde de la session {session_id} impossible: {e}")
+            finally:
+                if acquired:
+                    lock.release()
+
+        return await asyncio.to_thread(self.snapshots.write_all, blobs)
+
+    @asynccontextmanager
+    async def session(self, session_id: str) -> AsyncIterator[CallManager]:
+        if session_id not in self._locks:
+            await self._restore(session_id)
+        lock = self._locks.get(session_id)
+        if lock is None:
+            raise SessionNotFoundError(session_id)
+        try:
+            await asyncio.wait_for(lock.acquire(), timeout=SESSION_LOCK_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise SessionLockTimeout(session_id)
+        try:
+            manager = self._sessions.get(session_id)
+            if manager is None:
+                raise SessionNotFoundError(session_id)
+            self._touch(session_id)
+            yield manager
+        finally:
+            if session_id in self._last_access:
+                self._touch(session_id)
+            lock.release()
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Sessions sérialisées dans Redis, verrou distribué (SET NX PX + libération atomique)
+
+    Le verrou (SESSION_LOCK_TTL) est prolongé toutes les lock_ttl / 3 secondes tant qu'il est
+    détenu : un traitement long (appel LLM en file) ne le laisse pas expirer. L'écriture finale
+    vérifie le jeton dans le même script : si le verrou a tout de même été perdu (Redis
+    injoignable le temps d'un TTL), une autre requête a pu modifier la session et rien n'est
+    écrit (SessionLockLost) plutôt que d'écraser sa mise à jour.
+
+    Index `{prefix}:sessions:by-expiry` : ensemble trié session → date d'expiration (epoch),
+    mise à jour à chaque écriture. La clé de la session expire seule ; son entrée d'index est
+    retirée par `count()` (ZREMRANGEBYSCORE) : /health ne compte pas les sessions abandonnées.
+    """
+
+    LOCK_RETRY_INTERVAL = 0.02
+
+    def __init__(
+        self,
+        url: str = REDIS_URL,
+        prefix: str = "kitt",
+        session_ttl: int = SESSION_STORE_TTL,
+        lock_ttl: float = SESSION_LOCK_TTL,
+        lock_timeout: float = SESSION_LOCK_TIMEOUT
+    ):
+        try:
+            import redis.asyncio as aioredis
+        except ImportError as e:
+            raise ImportError("SESSION_STORE=redis nécessite le paquet redis (pip install redis)") from e
+
+        self._redis = aioredis.from_url(url)
+        self._release_lock = self._redis.register_script(RELEASE_LOCK_SCRIPT)
+        self._renew_lock = self._redis.register_script(RENEW_LOCK_SCRIPT)
+        self._write_session = self._redis.register_script(WRITE_SESSION_SCRIPT)
+        self.prefix = prefix
+        self.session_ttl = session_ttl
+        self.lock_ttl = lock_ttl
+        self.lock_timeout = lock_timeout
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.prefix}:session:{session_id}"
+
+    def _lock_key(self, session_id: str) -> str:
+        return f"{self.prefix}:lock:{session_id}"
+
+    @property
+    def _index_key(self) -> str:
+        return f"{self.prefix}:sessions:by-expiry"
+
+    async def _write(self, session_id: str, blob: bytes) -> None:
+        await self._redis.set(self._key(session_id), blob, ex=self.session_ttl)
+        await self._redis.zadd(self._index_key, {session_id: time.time() + self.session_ttl})
+
+    async def create(self, manager: CallManager) -> None:
+        await self._write(manager.call_id, dumps_manager(manager))
+
+    async def get(self, session_id: str) -> Optional[CallManager]:
+        blob = await self._redis.get(self._key(session_id))
+        return loads_manager(blob) if blob is not None else None
+
+    async def exists(self, session_id: str) -> bool:
+        return bool(await self._redis.exists(self._key(session_id)))
+
+    async def pop(self, session_id: str) -> Optional[CallManager]:
+        async with self._locked(session_id):
+            blob = await self._redis.get(self._key(session_id))
+            await self._redis.delete(self._key(session_id))
+            await self._redis.zrem(self._index_key, session_id)
+        return loads_manager(blob) if blob is not None else None
+
+    async def count(self) -> int:
+        """Sessions non expirées (les entrées expirées sont retirées de l'index au passage)"""
+        await self._redis.zremrangebyscore(self._index_key, "-inf", time.time())
+        return await self._redis.zcard(self._index_key)
+
+    async def _keep_lock(self, session_id: str, lock_key: str, token: str) -> None:
+        """Prolonge le verrou tant qu'il est détenu (annulée à la libération)"""
+        ttl_ms = int(self.lock_ttl * 1000)
+        while True:
+            await asyncio.sleep(self.lock_ttl / 3)
+            try:
+                renewed = await self._renew_lock(keys=[lock_key], args=[token, ttl_ms])
+            except Exception as e:
+                logger.warning(f"[SESSIONS] ⚠️ Prolongation du verrou de {session_id} impossible: {e}")
+                continue
+            if not renewed:
+                logger.error(f"[SESSIONS] ❌ Verrou de la session {session_id} perdu (expiré ou repris)")
+                return
+
+    @asynccontextmanager
+    async def _locked(self, session_id: str) -> AsyncIterator[str]:
+        """Détient le verrou de la session (prolongé en continu) ; fournit son jeton"""
+        lock_key = self._lock_key(session_id)
+        token = uuid.uuid4().hex
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.lock_timeout
+
+        while not await self._redis.set(lock_key, token, nx=True, px=int(self.lock_ttl * 1000)):
+            if loop.time() >= deadline:
+                raise SessionLockTimeout(session_id)
+            await asyncio.sleep(self.LOCK_RETRY_INTERVAL)
+
+        keeper = asyncio.create_task(self._keep_lock(session_id, lock_key, token))
+        try:
+            yield token
+        finally:
+            keeper.cancel()
+            await self._release_lock(keys=[lock_key], args=[token])
+
+    @asynccontextmanager
+    async def session(self, session_id: str) -> AsyncIterator[CallManager]:
+        async with self._locked(session_id) as token:
+            blob = await self._redis.get(self._key(session_id))
+            if blob is None:
+                raise SessionNotFoundError(session_id)
+            manager = loads_manager(blob)
+            try:
+                yield manager
+            finally:
+                written = await self._write_session(
+                    keys=[self._lock_key(session_id), self._key(session_id), self._index_key],
+                    args=[token, dumps_manager(manager), self.session_ttl,
+                          time.time() + self.session_ttl, session_id]
+                )
+                if not written:
+                    raise SessionLockLost(session_id)
+
+
+# Store partagé par toutes les routes du process
+_session_store: Optional[SessionStore] = None
+
+
+def get_session_store() -> SessionStore:
+    """Retourne le store de sessions configuré (SESSION_STORE)"""
+    global _session_store
+    if _session_store is None:
+        if SESSION_STORE_BACKEND == "redis":
+            _session_store = RedisSessionStore()
+        elif SESSION_STORE_BACKEND == "memory":
+            snapshots = SnapshotDirectory(SESSION_SNAPSHOT_DIR) if SESSION_SNAPSHOT_DIR else None
+            _session_store = InMemorySessionStore(snapshots)
+        else:
+            raise ValueError(f"Backend de sessions inconnu: {SESSION_STORE_BACKEND} (attendu: memory, redis)")
+        logger.info(f"🗄️ Stockage des sessions: {SESSION_STORE_BACKEND}")
+    return _session_store
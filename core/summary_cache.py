@@ -0,0 +1,109 @@
+"""
+Cache des résumés de fin d'appel (/resume, /summary)
+
+Un résumé est gardé dans la session (`manager.summary_cache`), avec la version du transcript
+pour laquelle il a été généré : tant qu'aucun message n'est ajouté, il est resservi sans
+appel LLM. Il est sérialisé avec la session, donc conservé dans les snapshots et l'archive
+des sessions évincées.
+
+Single-flight : des requêtes identiques simultanées (double clic, retry du frontend) se
+partagent un seul appel LLM en cours. La génération continue même si la requête qui l'a
+lancée est abandonnée ; un échec n'est pas mis en cache.
+
+Le cache des appels en cours est local au process : avec plusieurs nœuds, le routage du
+cluster envoie toutes les requêtes d'une session au même nœud.
+"""
+import logging
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from core.session_store import get_session_store, SessionNotFoundError
+
+logger = logging.getLogger(__name__)
+
+Summary = Optional[Dict[str, Any]]
+
+
+class SummaryCache:
+    """Résumés par session, version du transcript et type, avec coalescence des appels"""
+
+    def __init__(self):
+        self._inflight: Dict[Tuple[str, str, str], asyncio.Task] = {}
+        self.stats = {"hits": 0, "coalesced": 0, "generated": 0, "failures": 0}
+
+    async def get_or_generate(
+        self,
+        session_id: str,
+        kind: str,
+        key: str,
+        generate: Callable[[], Awaitable[Summary]]
+    ) -> Tuple[Summary, bool]:
+        """
+        Résumé `kind` de la session pour la clé `key` (version du transcript)
+
+        Returns:
+            (résumé, True s'il vient du cache) ; résumé None si la réponse du LLM est inexploitable
+
+        Raises:
+            SessionNotFoundError: session inconnue
+            Exception: erreur de génération (partagée par toutes les requêtes coalescées)
+        """
+        manager = await get_session_store().get(session_id)
+        if manager is None:
+            raise SessionNotFoundError(session_id)
+
+        entry = manager.summary_cache.get(kind)
+        if entry is not None and entry["key"] == key:
+            self.stats["hits"] += 1
+            return entry["summary"], True
+
+        flight = (session_id, kind, key)
+        task = self._inflight.get(flight)
+        if task is None:
+            task = asyncio.create_task(self._generate(session_id, kind, key, generate), name=f"summary-{kind}-{session_id}")
+            self._inflight[flight] = task
+            task.add_done_callback(lambda _: self._inflight.pop(flight, None))
+        else:
+            self.stats["coalesced"] += 1
+            logger.info(f"[RÉSUMÉ] 🔗 Requête {kind} identique en cours pour {session_id}, résultat partagé")
+        # shield : l'abandon d'une requête n'annule pas la génération partagée
+        return await asyncio.shield(task), False
+
+    async def _generate(
+        self,
+        session_id: str,
+        kind: str,
+        key: str,
+        generate: Callable[[], Awaitable[Summary]]
+    ) -> Summary:
+        try:
+            summary = await generate()
+        except Exception:
+            self.stats["failures"] += 1
+            raise
+        if summary is None:
+            self.stats["failures"] += 1
+            return None
+
+        self.stats["generated"] += 1
+        try:
+            async with get_session_store().session(session_id) as manager:
+                manager.summary_cache[kind] = {"key": key, "summary": summary, "generated_at": time.time()}
+        except SessionNotFoundError:
+            pass  # Session terminée pendant la génération : résumé rendu sans être mis en cache
+        return summary
+
+    def snapshot(self) -> Dict[str, int]:
+        return {"in_flight": len(self._inflight), **self.stats}
+
+
+_summary_cache: Optional[SummaryCache] = None
+
+
+def get_summary_cache() -> SummaryCache:
+    """Retourne le cache des résumés du process"""
+    global _summary_cache
+    if _summary_cache is None:
+        _summary_cache = SummaryCache()
+    return _summary_cache
@@ -2,18 +2,19 @@
 KITT Backend - Application FastAPI principale
 Version refactorisée et modulaire
 """
+import asyncio
+import importlib
 import logging
-from logging.handlers import RotatingFileHandler
-import sys
-from pathlib import Path
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from config.settings import (
     VERSION,
     ALLOWED_ORIGINS,
     LOG_LEVEL,
-    LOG_FORMAT,
+    LOG_FILE_FORMAT,
     MAX_CONTEXT_MESSAGES,
     LOG_DIR,
     LOG_FILE_MAIN,
@@ -21,87 +22,29 @@ from config.settings import (
     LOG_FILE_TRANSCRIPTION,
     LOG_FILE_INSIGHTS,
     LOG_MAX_BYTES,
-    LOG_BACKUP_COUNT
+    LOG_BACKUP_COUNT,
+    EMBEDDING_BACKEND,
+    EMBEDDING_MODEL_NAME,
+    SESSION_DRAIN_TIMEOUT,
+    ANALYTICS_STATE_FILE
 )
+from config.log_pipeline import build_handlers, start_log_pipeline
+from config.live_config import get_config_watcher
 
 # Configuration avancée du logging
 def setup_logging():
-    """Configure le système de logs avec fichiers et rotation"""
+    """
+    Configure le système de logs avec fichiers et rotation
+
+    Écriture dans un thread dédié (QueueHandler / QueueListener, voir config/log_pipeline.py) :
+    les requêtes ne font que mettre les records en file.
+    """
     
     # Créer le dossier logs s'il n'existe pas
     LOG_DIR.mkdir(exist_ok=True)
     
-    # Formatter commun
-    formatter = logging.Formatter(LOG_FORMAT)
-    
-    # Logger principal
-    root_logger = logging.getLogger()
-    root_logger.setLevel(getattr(logging, LOG_LEVEL))
-    
-    # Handler 1: Console (pour le terminal)
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(getattr(logging, LOG_LEVEL))
-    console_handler.setFormatter(formatter)
-    root_logger.addHandler(console_handler)
-    
-    # Handler 2: Fichier principal (tous les logs)
-    main_handler = RotatingFileHandler(
-        LOG_FILE_MAIN,
-        maxBytes=LOG_MAX_BYTES,
-        backupCount=LOG_BACKUP_COUNT,
-        encoding='utf-8'
-    )
-    main_handler.setLevel(logging.DEBUG)
-    main_handler.setFormatter(formatter)
-    root_logger.addHandler(main_handler)
-    
-    # Handler 3: Fichier erreurs uniquement
-    error_handler = RotatingFileHandler(
-        LOG_FILE_ERRORS,
-        maxBytes=LOG_MAX_BYTES,
-        backupCount=LOG_BACKUP_COUNT,
-        encoding='utf-8'
-    )
-    error_handler.setLevel(logging.ERROR)
-    error_handler.setFormatter(formatter)
-    root_logger.addHandler(error_handler)
-    
-    # Handler 4: Fichier transcription
-    transcription_handler = RotatingFileHandler(
-        LOG_FILE_TRANSCRIPTION,
-        maxBytes=LOG_MAX_BYTES,
-        backupCount=LOG_BACKUP_COUNT,
-        encoding='utf-8'
-    )
-    transcription_handler.setLevel(logging.INFO)
-    transcription_handler.setFormatter(formatter)
-    
-    # Filtrer uniquement les logs de transcription
-    class TranscriptionFilter(logging.Filter):
-        def filter(self, record):
-            return 'TRANSCRIPTION' in record.getMessage()
-    
-    transcription_handler.addFilter(TranscriptionFilter())
-    root_logger.addHandler(transcription_handler)
-    
-    # Handler 5: Fichier insights
-    insights_handler = RotatingFileHandler(
-        LOG_FILE_INSIGHTS,
-        maxBytes=LOG_MAX_BYTES,
-        backupCount=LOG_BACKUP_COUNT,
-        encoding='utf-8'
-    )
-    insights_handler.setLevel(logging.INFO)
-    insights_handler.setFormatter(formatter)
-    
-    # Filtrer uniquement les logs d'insights
-    class InsightsFilter(logging.Filter):
-        def filter(self, record):
-            msg = record.getMessage()
-            return any(keyword in msg for keyword in ['INSIGHT', 'COACHING', 'ANTI-DOUBLON'])
-    
-    insights_handler.addFilter(InsightsFilter())
-    root_logger.addHandler(insights_handler)
+    # Console, fichier principal, erreurs, transcription et insights (routés par catégorie)
+    start_log_pipeline(build_handlers())
     
     # Log de démarrage
     logging.info(f"{'='*80}")
@@ -112,7 +55,7 @@ def setup_logging():
     logging.info(f"   - Erreurs uniquement : {LOG_FILE_ERRORS.name}")
     logging.info(f"   - Transcriptions     : {LOG_FILE_TRANSCRIPTION.name}")
     logging.info(f"   - Insights           : {LOG_FILE_INSIGHTS.name}")
-    logging.info(f"📊 Niveau de log : {LOG_LEVEL}")
+    logging.info(f"📊 Niveau de log : {LOG_LEVEL} (fichiers : {LOG_FILE_FORMAT})")
     logging.info(f"🔄 Rotation : {LOG_MAX_BYTES // (1024*1024)} MB, {LOG_BACKUP_COUNT} backups")
     logging.info(f"{'='*80}\n")
 
@@ -138,42 +81,146 @@ app.add_middleware(
 )
 
 # Import et enregistrement des routes
-from api import calls, audio, insights, summary
+from api import calls, audio, insights, events, summary, analytics, jobs, metrics, admin
 
 app.include_router(calls.router)
 app.include_router(audio.router)
 app.include_router(insights.router)
+app.include_router(events.router)
 app.include_router(summary.router)
+app.include_router(analytics.router)
+app.include_router(jobs.router)
+app.include_router(metrics.router)
+app.include_router(admin.router)
+
+from core.session_store import SessionNotFoundError, SessionLockTimeout, SessionLockLost
+from core.cluster import get_cluster_router
+from core.profiler import ProfilerMiddleware
+
+# Profilage à la demande (/admin/profile, X-Profile sur /audio) ; placé sous le relais du
+# cluster : une requête est profilée sur le nœud qui la traite
+app.add_middleware(ProfilerMiddleware)
+
+# Plusieurs nœuds : chaque requête de session est relayée vers le nœud qui la détient
+if get_cluster_router() is not None:
+    app.middleware("http")(get_cluster_router().dispatch)
+
+
+@app.exception_handler(SessionNotFoundError)
+async def session_not_found_handler(request: Request, exc: SessionNotFoundError):
+    """Session terminée ou expirée pendant le traitement de la requête"""
+    return JSONResponse(status_code=404, content={"detail": "Session non trouvée"})
+
+
+@app.exception_handler(SessionLockTimeout)
+async def session_lock_timeout_handler(request: Request, exc: SessionLockTimeout):
+    """Une autre requête détient la session trop longtemps"""
+    return JSONResponse(status_code=503, content={"detail": "Session occupée, réessayer"})
+
+
+@app.exception_handler(SessionLockLost)
+async def session_lock_lost_handler(request: Request, exc: SessionLockLost):
+    """Verrou perdu pendant le traitement : le chunk n'a pas été appliqué, il peut être renvoyé"""
+    return JSONResponse(status_code=503, content={"detail": "Session reprise par une autre requête, réessayer"})
 
 # ═══════════════════════════════════════════════════════════════════════════
-# PRÉCHARGEMENT DES MODÈLES AU DÉMARRAGE
+# PRÉCHARGEMENT DES MODÈLES EN ARRIÈRE-PLAN
 # ═══════════════════════════════════════════════════════════════════════════
-@app.on_event("startup")
-async def startup_event():
-    """Précharge les modèles lourds au démarrage du serveur"""
-    logger.info("\n" + "="*80)
-    logger.info("🔄 PRÉCHARGEMENT DES MODÈLES")
-    logger.info("="*80)
+# Le serveur accepte les sessions immédiatement : seule la vérification anti-doublon
+# sémantique attend le modèle (fallback textuel en attendant, voir CallManager)
+_background_tasks = set()
 
-    # Précharger le modèle d'embeddings pour la détection de doublons
-    try:
-        from services.duplicate_detector import get_embedding_model
-        logger.info("📥 Chargement du modèle sentence-transformers...")
-        model = get_embedding_model()
 
-        # Force le téléchargement complet des poids du modèle
-        logger.info("🔄 Téléchargement des poids du modèle (peut prendre quelques secondes)...")
-        _ = model.encode(["test preload"], show_progress_bar=False)
+async def _preload_models():
+    """Précharge le SDK OpenAI et le modèle d'embeddings hors de la boucle d'événements"""
+    from services.duplicate_detector import warm_up_embedding_model
+
+    await asyncio.to_thread(importlib.import_module, "openai")
 
-        logger.info("✅ Modèle d'embeddings préchargé avec succès")
-        logger.info(f"   Type: {type(model).__name__}")
-        logger.info(f"   Modèle: paraphrase-multilingual-MiniLM-L12-v2")
+    try:
+        logger.info("📥 Chargement du modèle d'embeddings en arrière-plan...")
+        await asyncio.to_thread(warm_up_embedding_model)
+        logger.info(f"✅ Modèle d'embeddings préchargé: {EMBEDDING_MODEL_NAME} (backend: {EMBEDDING_BACKEND})")
     except Exception as e:
         logger.error(f"❌ Erreur lors du préchargement du modèle: {e}")
 
-    logger.info("="*80)
-    logger.info("✅ Serveur prêt à traiter les requêtes")
-    logger.info("="*80 + "\n")
+
+@app.on_event("startup")
+async def startup_event():
+    """Lance le préchargement des modèles lourds sans bloquer le démarrage"""
+    from core.session_reaper import get_session_reaper
+    from core.analytics import get_session_analytics
+    from services.metrics import get_metrics
+
+    task = asyncio.create_task(_preload_models())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+    get_session_reaper().start()
+    get_config_watcher().start()
+    get_session_analytics().start()
+    get_metrics().start()
+
+    from services.audio_pool import get_audio_pool
+    if get_audio_pool() is not None:
+        task = asyncio.create_task(get_audio_pool().warm_up())
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+    logger.info("✅ Serveur prêt à accepter des sessions (modèles en cours de préchargement)")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """
+    Arrêt (SIGTERM) : uvicorn a cessé d'accepter des connexions et drainé les requêtes en cours,
+    les sessions en mémoire et les agrégats /analytics sont sauvegardés pour le process suivant,
+    les compteurs /metrics écrits pour les autres workers
+    """
+    from core.session_store import InMemorySessionStore, get_session_store
+    from core.session_reaper import get_session_reaper
+    from core.analytics import get_session_analytics
+    from core.jobs import get_job_queue
+    from core.event_bus import get_event_bus
+
+    from services.audio_pool import get_audio_pool
+    from services.capture import get_capture
+    from services.llm_scheduler import get_llm_scheduler
+    from services.metrics import get_metrics
+
+    get_session_reaper().stop()
+    get_config_watcher().stop()
+    get_job_queue().shutdown()
+    get_llm_scheduler().shutdown()
+    await get_event_bus().close()
+    if get_cluster_router() is not None:
+        await get_cluster_router().close()
+    store = get_session_store()
+    if isinstance(store, InMemorySessionStore) and store.snapshots is not None:
+        start = time.perf_counter()
+        count = await store.snapshot_all(timeout=SESSION_DRAIN_TIMEOUT)
+        logger.info(
+            f"💾 {count} session(s) sauvegardée(s) dans {store.snapshots.directory} "
+            f"en {(time.perf_counter() - start) * 1000:.0f}ms"
+        )
+
+    get_session_analytics().stop()
+    if ANALYTICS_STATE_FILE:
+        try:
+            await get_session_analytics().save()
+        except OSError as e:
+            logger.error(f"❌ Sauvegarde des agrégats analytics impossible: {e}")
+
+    get_metrics().stop()
+    try:
+        await get_metrics().save()
+    except OSError as e:
+        logger.error(f"❌ Écriture des compteurs /metrics impossible: {e}")
+
+    if get_audio_pool() is not None:
+        get_audio_pool().shutdown()
+
+    get_capture().close()
 
 
 # Routes principales
@@ -208,6 +255,10 @@ async def root():
             "config": "Configuration centralisée"
         },
         "endpoints": {
+            "probes": {
+                "health": "GET /health",
+                "ready": "GET /ready"
+            },
             "calls": {
                 "start": "POST /calls/start",
                 "end": "POST /calls/{session_id}/end",
@@ -227,18 +278,57 @@ async def root():
     }
 
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness probe : le pod peut recevoir des sessions
+
+    Ne dépend PAS du modèle d'embeddings (son état est seulement rapporté).
+    """
+    from api.audio import get_transcription_service
+    from services.duplicate_detector import get_embedding_model_status
+
+    try:
+        get_transcription_service()
+    except Exception as e:
+        return JSONResponse(status_code=503, content={"status": "not_ready", "reason": str(e)})
+
+    return {"status": "ready", "embedding_model": get_embedding_model_status()}
+
+
 @app.get("/health")
 async def health_check():
     """Vérification de santé du backend"""
-    from api.calls import get_active_calls
-    
-    active_calls = get_active_calls()
+    from core.session_store import get_session_store
+    from core.session_pipeline import get_session_pipelines
+    from core.event_bus import get_event_bus
+    from core.rolling_summary import get_rolling_summarizer
+    from core.summary_cache import get_summary_cache
+    from core.jobs import get_job_queue
+    from core.profiler import get_profiler
+    from services.capture import get_capture
+    from core.session_reaper import get_session_reaper
+    from services.llm_scheduler import get_llm_scheduler
+    from services.duplicate_detector import get_embedding_model_status, get_duplicate_tier_stats
     
     return {
         "status": "healthy",
         "version": VERSION,
-        "active_calls": len(active_calls),
+        "active_calls": await get_session_store().count(),
         "max_context_messages": MAX_CONTEXT_MESSAGES,
+        "embedding_model": get_embedding_model_status(),
+        "llm_scheduler": get_llm_scheduler().stats(),
+        "duplicate_tiers": get_duplicate_tier_stats(),
+        "session_pipelines": get_session_pipelines().snapshot(),
+        "session_reaper": get_session_reaper().snapshot(),
+        "event_bus": get_event_bus().snapshot(),
+        "rolling_summary": get_rolling_summarizer().snapshot(),
+        "summary_cache": get_summary_cache().snapshot(),
+        "summary_jobs": get_job_queue().snapshot(),
+        "profiler": get_profiler().snapshot(),
+        "capture": get_capture().snapshot(),
+        "config": get_config_watcher().snapshot(),
+        "cluster": get_cluster_router().snapshot() if get_cluster_router() is not None else None,
         "features": [
             "extended-context-window",
             "structured-context",
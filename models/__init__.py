@@ -11,6 +11,7 @@ from models.schemas import (
     InsightResponse,
     AudioProcessResponse,
     CallStateResponse,
+    InsightRecord,
     InsightHistoryResponse,
     SummaryResponse
 )
@@ -26,6 +27,7 @@ __all__ = [
     "InsightResponse",
     "AudioProcessResponse",
     "CallStateResponse",
+    "InsightRecord",
     "InsightHistoryResponse",
     "SummaryResponse",
     "PROFILE_TEMPLATES"
@@ -113,6 +113,16 @@ class CallStateResponse(BaseModel):
     current_personality: Optional[Dict[str, Any]] = None
 
 
+class InsightRecord(BaseModel):
+    """Insight accepté, classé une seule fois à l'ajout (historique complet de la session)"""
+    index: int
+    insight: str
+    title: str
+    type: str  # InsightType, ou "unknown"
+    concepts: List[str]
+    timestamp: float
+
+
 class InsightHistoryResponse(BaseModel):
     """Historique complet des insights"""
     session_id: str
@@ -121,6 +131,7 @@ class InsightHistoryResponse(BaseModel):
     statistics: Dict[str, Any]
     conversation_context: Dict[str, Any]
     duplicate_detection: Dict[str, Any]
+    pagination: Optional[Dict[str, Any]] = None
 
 
 class SummaryResponse(BaseModel):
@@ -0,0 +1,150 @@
+"""
+Analyse des chunks audio (VAD) dans un pool de process optionnel
+
+Par chunk, avant la transcription : début de parole (`detect_speech_start_time`) et
+silence absolu (`is_silence`) pour chaque piste. Par défaut ce calcul (vectorisé) s'exécute
+dans la boucle d'événements ; avec AUDIO_PROCESS_POOL_WORKERS > 0, il part dans un pool de
+process pour qu'un seul process API utilise tous les cœurs.
+
+L'audio n'est pas picklé : les deux pistes sont copiées une fois dans un bloc de mémoire
+partagée (multiprocessing.shared_memory), que le process du pool lit sans copie. Seuls
+le nom du bloc, les offsets, l'empreinte de la configuration du process API (seuils de
+silence rechargés à chaud, le process du pool relit les fichiers si la sienne diffère) et
+les résultats (deux nombres par piste) transitent. Les deux pistes d'un chunk sont analysées
+avec un même instantané (celui du chunk, ou celui relu une fois par le process du pool).
+
+Les embeddings restent hors du pool (thread du batcher ou sidecar : le calcul natif libère
+le GIL) ; les filtres de texte (~0,1 ms) coûtent moins cher qu'un aller-retour vers le pool.
+"""
+import logging
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from config.settings import AUDIO_PROCESS_POOL_WORKERS, LOG_LEVEL, LOG_FORMAT
+from config.live_config import ConfigSnapshot, get_config, get_config_watcher
+
+logger = logging.getLogger(__name__)
+
+# (début de parole en secondes, silence absolu) pour une piste
+TrackAnalysis = Tuple[float, bool]
+
+ROLES = ("CLIENT", "COMMERCIAL")
+
+
+def analyze_track(audio: np.ndarray, role: str, config: Optional[ConfigSnapshot] = None) -> TrackAnalysis:
+    from services.transcription import TranscriptionService
+
+    config = config or get_config()
+    start_time = TranscriptionService.detect_speech_start_time(audio, role, config)
+    silent = TranscriptionService.is_silence(audio, role, config=config)
+    return float(start_time), bool(silent)
+
+
+def _init_worker() -> None:
+    logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+    # Import du service une fois pour toutes (et non au premier chunk)
+    import services.transcription  # noqa: F401
+
+
+def _attach(shm_name: str) -> shared_memory.SharedMemory:
+    """
+    Ouvre un bloc créé par le process API (qui reste seul responsable de l'unlink)
+
+    Avant Python 3.13, l'ouverture enregistre le bloc auprès du resource tracker : celui
+    du process API, hérité via le forkserver, où l'enregistrement existe déjà.
+    """
+    try:
+        return shared_memory.SharedMemory(name=shm_name, track=False)  # Python >= 3.13
+    except TypeError:
+        return shared_memory.SharedMemory(name=shm_name)
+
+
+def _analyze_shared(shm_name: str, tracks: List[Tuple[int, int, str]], config_fingerprint: str) -> List[TrackAnalysis]:
+    """Exécuté dans le pool : lit les pistes directement dans la mémoire partagée"""
+    get_config_watcher().ensure(config_fingerprint)
+    config = get_config()
+    shm = _attach(shm_name)
+    try:
+        results = []
+        for offset, samples, role in tracks:
+            audio = np.ndarray((samples,), dtype=np.int16, buffer=shm.buf, offset=offset)
+            results.append(analyze_track(audio, role, config))
+            del audio  # Aucune vue ne doit survivre à shm.close()
+        return results
+    finally:
+        shm.close()
+
+
+class AudioProcessPool:
+    """Pool de process dédié à l'analyse des chunks audio"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        # forkserver : pas de fork d'un process multi-thread (batcher, clients HTTP)
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=get_context("forkserver"),
+            initializer=_init_worker
+        )
+
+    async def warm_up(self) -> None:
+        """Démarre les process du pool avant le premier chunk"""
+        loop = asyncio.get_running_loop()
+        silence = np.zeros(1, dtype=np.int16)
+        await asyncio.gather(*(
+            loop.run_in_executor(self._executor, analyze_track, silence, "CLIENT")
+            for _ in range(self.workers)
+        ))
+        logger.info(f"🧮 Pool audio prêt ({self.workers} process)")
+
+    async def analyze(self, tracks: List[np.ndarray], config: Optional[ConfigSnapshot] = None) -> List[TrackAnalysis]:
+        """Analyse les pistes (dans l'ordre de ROLES) dans un process du pool, avec l'instantané `config`"""
+        size = sum(track.nbytes for track in tracks)
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        try:
+            layout, offset = [], 0
+            for track, role in zip(tracks, ROLES):
+                view = np.ndarray(track.shape, dtype=np.int16, buffer=shm.buf, offset=offset)
+                view[:] = track
+                del view
+                layout.append((offset, len(track), role))
+                offset += track.nbytes
+
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, _analyze_shared, shm.name, layout, (config or get_config()).fingerprint
+            )
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_audio_pool: Optional[AudioProcessPool] = None
+
+
+def get_audio_pool() -> Optional[AudioProcessPool]:
+    """Pool audio du process (None si AUDIO_PROCESS_POOL_WORKERS = 0)"""
+    global _audio_pool
+    if _audio_pool is None and AUDIO_PROCESS_POOL_WORKERS > 0:
+        _audio_pool = AudioProcessPool(AUDIO_PROCESS_POOL_WORKERS)
+    return _audio_pool
+
+
+async def analyze_chunk(
+    client_audio: np.ndarray,
+    commercial_audio: np.ndarray,
+    config: Optional[ConfigSnapshot] = None
+) -> List[TrackAnalysis]:
+    """Analyse (client, commercial) : dans le pool s'il est activé, sinon sur place"""
+    config = config or get_config()
+    pool = get_audio_pool()
+    if pool is None:
+        return [analyze_track(client_audio, "CLIENT", config), analyze_track(commercial_audio, "COMMERCIAL", config)]
+    return await pool.analyze([client_audio, commercial_audio], config)
@@ -0,0 +1,238 @@
+"""
+Capture des sessions pour rejeu hors ligne (tools/replay_capture.py)
+
+Avec CAPTURE_DIR défini, chaque session enregistre dans `{CAPTURE_DIR}/{session_id}.kcap` :
+- chunk      : audio PCM reçu par /audio (client + commercial), numéro de séquence, heure d'arrivée
+- transcript : texte brut renvoyé par Deepgram (avant nettoyage), par empreinte de l'audio
+- llm        : réponse OpenAI (détection de phase, coaching, anti-doublon, résumés), par
+               empreinte des messages envoyés
+- result     : issue de la requête /audio (accepted, cooldown, low_relevance...), titre de
+               l'insight et durée
+
+Le rejeu renvoie les réponses capturées à la place des API : seuils de pertinence, cooldowns
+et anti-doublon peuvent être réglés et comparés sur de vrais appels.
+
+Format (little-endian) :
+    en-tête  : magic "KCAP" | version u16
+    records  : taille méta u32 | taille données u32 | méta JSON UTF-8 | données brutes
+
+Hors du chemin critique : la requête ne fait que mettre le record en file (file bornée à
+CAPTURE_MAX_PENDING, au-delà les records sont ignorés et comptés) ; les empreintes, le JSON
+et l'écriture se font dans un thread dédié.
+
+Module sans dépendance interne (hors config) : importable depuis api/, core/ et services/.
+"""
+import logging
+import contextvars
+import hashlib
+import json
+import queue
+import re
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from config.settings import CAPTURE_DIR, CAPTURE_MAX_PENDING
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"KCAP"
+VERSION = 1
+CAPTURE_SUFFIX = ".kcap"
+
+_HEADER = struct.Struct("<4sH")
+_RECORD = struct.Struct("<II")
+
+# Identifiants acceptés comme nom de fichier (pas de séparateur de chemin)
+_SAFE_ID = re.compile(r"^[A-Za-z0-9_.-]{1,128}$")
+
+# (session, heure d'arrivée du chunk) de la requête /audio en cours : attribue les transcriptions
+# (qui ne connaissent pas la session) et relie l'issue de la requête à son chunk
+_current_chunk: contextvars.ContextVar[Optional[Tuple[str, float]]] = contextvars.ContextVar(
+    "capture_chunk", default=None
+)
+
+
+class CaptureFormatError(ValueError):
+    """Fichier qui n'est pas une capture lisible (magic, version ou record tronqué)"""
+
+
+def audio_key(audio, role: str) -> str:
+    """Empreinte d'un chunk audio (tableau numpy ou octets) pour un rôle"""
+    data = audio if isinstance(audio, bytes) else audio.tobytes()
+    return hashlib.sha1(role.encode() + data).hexdigest()[:20]
+
+
+def messages_key(messages: Optional[List[Dict[str, Any]]]) -> str:
+    """Empreinte des messages d'un appel LLM"""
+    blob = json.dumps(messages or [], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()[:20]
+
+
+def read_capture(path: Path) -> Iterator[Tuple[Dict[str, Any], bytes]]:
+    """
+    Lit une capture → (méta, données) par record, dans l'ordre d'écriture
+
+    Raises:
+        CaptureFormatError: magic ou version inconnus, record tronqué
+    """
+    with open(path, "rb") as f:
+        header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            raise CaptureFormatError(f"{path}: fichier vide ou tronqué")
+        magic, version = _HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise CaptureFormatError(f"{path}: capture non reconnue ({magic!r}, version {version})")
+
+        while True:
+            head = f.read(_RECORD.size)
+            if not head:
+                return
+            if len(head) < _RECORD.size:
+                raise CaptureFormatError(f"{path}: record tronqué")
+            meta_len, data_len = _RECORD.unpack(head)
+            meta, data = f.read(meta_len), f.read(data_len)
+            if len(meta) < meta_len or len(data) < data_len:
+                raise CaptureFormatError(f"{path}: record tronqué")
+            yield json.loads(meta), data
+
+
+class SessionCapture:
+    """Enregistre les records des sessions ; écriture dans un thread dédié"""
+
+    def __init__(self, directory: str = CAPTURE_DIR, max_pending: int = CAPTURE_MAX_PENDING):
+        self.directory = Path(directory) if directory else None
+        self.enabled = self.directory is not None
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=max_pending)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.stats = {"records": 0, "dropped": 0, "bytes": 0, "errors": 0}
+
+    # ------------------------------------------------------------------
+    # Chemin critique : mise en file uniquement
+    # ------------------------------------------------------------------
+    def chunk(self, session_id: str, seq: Optional[int], client: bytes, commercial: bytes) -> None:
+        """Chunk audio reçu par /audio ; la requête en cours lui est attribuée"""
+        now = time.time()
+        _current_chunk.set((session_id, now))
+        self._put(session_id, {"kind": "chunk", "t": now, "seq": seq, "client_bytes": len(client)}, (client, commercial))
+
+    def transcript(self, role: str, audio, text: str, seconds: float) -> None:
+        """Texte brut renvoyé par Deepgram pour le chunk de la requête en cours"""
+        current = _current_chunk.get()
+        if current is not None:
+            self._put(current[0], {"kind": "transcript", "t": time.time(), "role": role, "text": text,
+                                   "seconds": round(seconds, 4), "audio": (audio, role)})
+
+    def llm(self, session_id: Optional[str], operation: str, messages, content: str,
+            usage: Optional[Dict[str, int]], seconds: float) -> None:
+        """Réponse OpenAI d'un appel fait pour une session"""
+        if session_id is not None:
+            self._put(session_id, {"kind": "llm", "t": time.time(), "operation": operation, "content": content,
+                                   "usage": usage, "seconds": round(seconds, 4), "messages": messages})
+
+    def result(self, outcome: str, result: Optional[Dict[str, Any]], seconds: float) -> None:
+        """Issue de la requête /audio en cours (rien si son chunk n'a pas été capturé)"""
+        current = _current_chunk.get()
+        if current is None:
+            return
+        _current_chunk.set(None)
+        session_id, chunk_t = current
+        advice = (result or {}).get("advice") or {}
+        self._put(session_id, {"kind": "result", "t": time.time(), "chunk": chunk_t, "outcome": outcome,
+                               "title": advice.get("title"), "seconds": round(seconds, 4)})
+
+    def _put(self, session_id: str, meta: Dict[str, Any], payload: Tuple[bytes, ...] = ()) -> None:
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((session_id, meta, payload))
+        except queue.Full:
+            self.stats["dropped"] += 1
+
+    # ------------------------------------------------------------------
+    # Thread d'écriture
+    # ------------------------------------------------------------------
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                self._thread = threading.Thread(target=self._run, name="kitt-capture", daemon=True)
+                self._thread.start()
+                logger.info(f"[CAPTURE] 🎙️ Capture des sessions dans {self.directory}")
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            while item is not None:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+
+            by_session: Dict[str, List[bytes]] = {}
+            for entry in batch:
+                if entry is not None:
+                    session_id, meta, payload = entry
+                    by_session.setdefault(session_id, []).append(self._encode(meta, payload))
+            for session_id, records in by_session.items():
+                self._write(session_id, records)
+
+            if batch[-1] is None:
+                return
+
+    @staticmethod
+    def _encode(meta: Dict[str, Any], payload: Tuple[bytes, ...]) -> bytes:
+        # Empreintes calculées ici plutôt que dans la requête
+        if "audio" in meta:
+            meta["audio"] = audio_key(*meta["audio"])
+        if "messages" in meta:
+            meta["key"] = messages_key(meta.pop("messages"))
+        blob = json.dumps(meta, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        data = b"".join(payload)
+        return _RECORD.pack(len(blob), len(data)) + blob + data
+
+    def _write(self, session_id: str, records: List[bytes]) -> None:
+        if not _SAFE_ID.match(session_id):
+            self.stats["errors"] += len(records)
+            return
+        path = self.directory / f"{session_id}{CAPTURE_SUFFIX}"
+        try:
+            with open(path, "ab") as f:
+                if f.tell() == 0:
+                    f.write(_HEADER.pack(MAGIC, VERSION))
+                for record in records:
+                    f.write(record)
+        except OSError as e:
+            self.stats["errors"] += len(records)
+            logger.error(f"[CAPTURE] ❌ Écriture impossible ({path}): {e}")
+            return
+        self.stats["records"] += len(records)
+        self.stats["bytes"] += sum(len(record) for record in records)
+
+    def close(self) -> None:
+        """Écrit les records en attente puis arrête le thread (arrêt du serveur)"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "pending": self._queue.qsize(), **self.stats}
+
+
+_capture: Optional[SessionCapture] = None
+
+
+def get_capture() -> SessionCapture:
+    """Retourne la capture du process (inactive si CAPTURE_DIR est vide)"""
+    global _capture
+    if _capture is None:
+        _capture = SessionCapture()
+    return _capture
@@ -2,10 +2,9 @@
 Service de génération d'insights et coaching en temps réel
 """
 import logging
-import asyncio
 from typing import Optional, Dict
-import openai
 
+from services.llm_scheduler import get_llm_scheduler, LLMPriority
 from config.settings import (
     FINE_TUNED_MODEL,
     COACHING_TEMPERATURE,
@@ -25,19 +24,21 @@ class CoachingService:
         self.model = FINE_TUNED_MODEL
         self.temperature = COACHING_TEMPERATURE
     
-    async def generate_insight(self, prompt: str) -> Optional[str]:
+    async def generate_insight(self, prompt: str, session_id: str = None) -> Optional[str]:
         """
         Génère un insight de coaching via le modèle fine-tuné
         
         Args:
             prompt: Prompt complet avec contexte
+            session_id: Session à l'origine de l'appel (file équitable)
         
         Returns:
             Texte brut de l'insight ou None
         """
         try:
-            response = await asyncio.to_thread(
-                openai.chat.completions.create,
+            response = await get_llm_scheduler().chat_completion(
+                priority=LLMPriority.COACHING,
+                session_id=session_id,
                 model=self.model,
                 messages=[{"role": "user", "content": prompt}],
                 max_tokens=80,  # ✅ OPTIMISÉ: 80 tokens pour format dataset complet
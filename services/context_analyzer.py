@@ -3,8 +3,8 @@ Service d'analyse de contexte de conversation
 """
 from typing import List, Dict
 import logging
-import asyncio
-import openai
+
+from services.llm_scheduler import get_llm_scheduler, LLMPriority
 
 logger = logging.getLogger(__name__)
 
@@ -59,7 +59,7 @@ class ContextAnalyzer:
         
         return ", ".join(detected_concepts)
     
-    async def detect_conversation_phase_ai(self, messages: List[Dict]) -> str:
+    async def detect_conversation_phase_ai(self, messages: List[Dict], session_id: str = None) -> str:
         """
         🆕 Détecte la phase actuelle avec IA (GPT-4o-mini)
         Plus précis que le pattern matching simple
@@ -89,8 +89,9 @@ Réponds UNIQUEMENT avec l'une de ces phases (un seul mot):
 Phase:"""
 
         try:
-            response = await asyncio.to_thread(
-                openai.chat.completions.create,
+            response = await get_llm_scheduler().chat_completion(
+                priority=LLMPriority.PHASE,
+                session_id=session_id,
                 model="gpt-4o-mini",
                 messages=[{"role": "user", "content": prompt}],
                 max_tokens=10,
@@ -2,35 +2,94 @@
 Service de détection intelligente de doublons avec IA + vectorisation sémantique
 """
 import logging
-import asyncio
 import json
+import threading
+from collections import Counter
 from typing import List, Dict, Optional
 from datetime import datetime
-import openai
 import numpy as np
-from sentence_transformers import SentenceTransformer
 
+from services.llm_scheduler import get_llm_scheduler, LLMPriority
+from services.embedding_backends import load_embedding_backend
+from services.minhash import estimate_jaccard
 from config.settings import (
     OPENAI_MODEL,
     DUPLICATE_CHECK_TEMPERATURE,
-    TIME_THRESHOLD_DUPLICATE
+    TIME_THRESHOLD_DUPLICATE,
+    EMBEDDING_BACKEND,
+    EMBEDDING_MODEL_NAME,
+    DUPLICATE_LEXICAL_HIGH,
+    DUPLICATE_LEXICAL_LOW
 )
 
 logger = logging.getLogger(__name__)
 
-# Modèle d'embeddings (chargé une seule fois au démarrage)
+# Modèle d'embeddings (chargé une seule fois, en arrière-plan au démarrage)
 _embedding_model = None
+_embedding_model_lock = threading.Lock()
+_embedding_model_status = "not_loaded"  # not_loaded | loading | ready | failed
 
 def get_embedding_model():
-    """Lazy loading du modèle d'embeddings"""
-    global _embedding_model
+    """Lazy loading du modèle d'embeddings (thread-safe)"""
+    global _embedding_model, _embedding_model_status
     if _embedding_model is None:
-        logger.info("🔄 Chargement du modèle d'embeddings (sentence-transformers)...")
-        _embedding_model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
-        logger.info("✅ Modèle d'embeddings chargé avec succès")
+        with _embedding_model_lock:
+            if _embedding_model is None:
+                _embedding_model_status = "loading"
+                logger.info(f"🔄 Chargement du modèle d'embeddings {EMBEDDING_MODEL_NAME} (backend: {EMBEDDING_BACKEND})...")
+                try:
+                    _embedding_model = load_embedding_backend(EMBEDDING_BACKEND)
+                except Exception:
+                    _embedding_model_status = "failed"
+                    raise
+                logger.info("✅ Modèle d'embeddings chargé avec succès")
     return _embedding_model
 
 
+def warm_up_embedding_model() -> None:
+    """Charge le modèle et force un premier encodage (poids téléchargés, kernels initialisés)"""
+    global _embedding_model_status
+    try:
+        get_embedding_model().encode(["test preload"], show_progress_bar=False)
+        _embedding_model_status = "ready"
+    except Exception:
+        _embedding_model_status = "failed"
+        raise
+
+
+def get_embedding_model_status() -> str:
+    """État du modèle d'embeddings : not_loaded, loading, ready ou failed"""
+    return _embedding_model_status
+
+
+def is_embedding_model_ready() -> bool:
+    return _embedding_model_status == "ready"
+
+
+# Étage ayant tranché chaque vérification anti-doublon (tous appels confondus)
+DUPLICATE_TIERS = ("title", "no_history", "lexical_duplicate", "lexical_unique", "semantic", "fallback", "error")
+_duplicate_tier_counts: Counter = Counter()
+
+
+def record_duplicate_tier(tier: str) -> None:
+    _duplicate_tier_counts[tier] += 1
+
+
+def get_duplicate_tier_stats() -> Dict:
+    """Nombre et pourcentage de vérifications tranchées par chaque étage"""
+    total = sum(_duplicate_tier_counts.values())
+    return {
+        "total": total,
+        "tiers": {
+            tier: {
+                "count": _duplicate_tier_counts[tier],
+                "percent": round(100 * _duplicate_tier_counts[tier] / total, 1) if total else 0.0
+            }
+            for tier in DUPLICATE_TIERS
+        }
+    }
+
+
 class DuplicateDetector:
     """Détecte les insights en doublon avec IA et fenêtre temporelle"""
 
@@ -43,6 +102,22 @@ class DuplicateDetector:
         # 0.72 = Strict
         # 0.85 = Permissif
 
+    @staticmethod
+    def encode(texts: List[str]) -> np.ndarray:
+        """
+        Encode des textes en embeddings normalisés (norme L2 = 1)
+
+        Avec des vecteurs normalisés, la similarité cosine se réduit à un produit scalaire :
+        les embeddings peuvent donc être calculés une seule fois puis réutilisés.
+
+        Returns:
+            Matrice (len(texts), dim) en float32
+        """
+        model = get_embedding_model()
+        embeddings = np.asarray(model.encode(texts, show_progress_bar=False), dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.maximum(norms, 1e-12)
+
     def _compute_semantic_similarity(self, text1: str, text2: str) -> float:
         """
         Calcule la similarité sémantique entre deux textes avec embeddings
@@ -55,26 +130,10 @@ class DuplicateDetector:
             Score de similarité cosine (0-1)
         """
         try:
-            model = get_embedding_model()
-
-            # Générer les embeddings (vecteurs) pour les deux textes
-            embeddings = model.encode([text1, text2], show_progress_bar=False)
-
-            # Calculer la similarité cosine
-            vec1 = embeddings[0]
-            vec2 = embeddings[1]
-
-            # Formule de similarité cosine : (A · B) / (||A|| × ||B||)
-            dot_product = np.dot(vec1, vec2)
-            norm1 = np.linalg.norm(vec1)
-            norm2 = np.linalg.norm(vec2)
-
-            similarity = dot_product / (norm1 * norm2)
+            vec1, vec2 = self.encode([text1, text2])
 
-            # Convertir de [-1, 1] à [0, 1]
-            similarity = (similarity + 1) / 2
-
-            return float(similarity)
+            # Vecteurs normalisés → cosine = produit scalaire, converti de [-1, 1] à [0, 1]
+            return float((np.dot(vec1, vec2) + 1) / 2)
 
         except Exception as e:
             logger.error(f"❌ Erreur lors du calcul de similarité sémantique: {e}")
@@ -114,23 +173,84 @@ class DuplicateDetector:
 
         return False, f"✅ Titre OK (répété seulement {consecutive_count} fois)"
 
+    def check_duplicate_lexical(
+        self,
+        new_sketch: np.ndarray,
+        sketches_history: List[np.ndarray],
+        timestamps_history: List[float],
+        time_threshold_seconds: int = None
+    ) -> tuple[Optional[bool], Dict]:
+        """
+        Pré-filtre lexical : tranche les cas évidents en quelques microsecondes
+
+        Même fenêtre que la vérification sémantique (5 derniers insights).
+
+        Returns:
+            Tuple (is_duplicate, analysis) avec is_duplicate à None si le cas est ambigu
+            (à trancher par les embeddings)
+        """
+        recent_sketches = sketches_history[-5:]
+        if not recent_sketches:
+            return False, {"reason": "Aucun historique", "method": "lexical"}
+
+        start_index = len(sketches_history) - len(recent_sketches)
+        threshold = time_threshold_seconds or self.time_threshold
+        current_time = datetime.now().timestamp()
+
+        jaccards = estimate_jaccard(new_sketch, np.stack(recent_sketches))
+        is_recent = np.array([
+            start_index + i < len(timestamps_history)
+            and current_time - timestamps_history[start_index + i] <= threshold
+            for i in range(len(recent_sketches))
+        ])
+        max_recent = float(jaccards[is_recent].max()) if is_recent.any() else 0.0
+        max_jaccard = float(jaccards.max())
+
+        if max_recent >= DUPLICATE_LEXICAL_HIGH:
+            is_duplicate = True
+            reason = f"Quasi-identique à un insight RÉCENT (Jaccard: {max_recent:.2f} ≥ {DUPLICATE_LEXICAL_HIGH})"
+        elif max_jaccard < DUPLICATE_LEXICAL_LOW:
+            is_duplicate = False
+            reason = f"Aucun vocabulaire commun (Jaccard max: {max_jaccard:.2f} < {DUPLICATE_LEXICAL_LOW})"
+        else:
+            is_duplicate = None
+            reason = f"Zone ambiguë (Jaccard max: {max_jaccard:.2f})"
+
+        if is_duplicate is not None:
+            logger.info(f"[ANTI-DOUBLON LEXICAL] {'❌ DOUBLON' if is_duplicate else '✅ UNIQUE'} - {reason}")
+
+        return is_duplicate, {
+            "is_duplicate": is_duplicate,
+            "reason": reason,
+            "similarity_score": max_jaccard,
+            "method": "lexical_minhash"
+        }
+
     def check_duplicate_semantic(
         self,
         new_insight: str,
         insights_history: List[str],
         timestamps_history: List[float],
-        time_threshold_seconds: int = None
+        time_threshold_seconds: int = None,
+        embeddings_history: List[Optional[np.ndarray]] = None,
+        new_embedding: Optional[np.ndarray] = None
     ) -> tuple[bool, Dict]:
         """
         Vérifie si un insight est un doublon avec VECTORISATION SÉMANTIQUE
 
         NOUVELLE MÉTHODE : Plus rapide et plus précise que l'appel IA complet
 
+        Le nouvel insight est encodé une seule fois, les embeddings de l'historique sont
+        réutilisés (cache du CallManager) et les similarités sont calculées en un seul
+        produit matrice-vecteur.
+
         Args:
             new_insight: Nouvel insight à vérifier
             insights_history: Liste des insights précédents
             timestamps_history: Timestamps correspondants
             time_threshold_seconds: Seuil temporel (défaut: config)
+            embeddings_history: Embeddings normalisés alignés sur insights_history (None = à calculer)
+            new_embedding: Embedding normalisé du nouvel insight s'il est déjà calculé
 
         Returns:
             Tuple (is_duplicate: bool, analysis: dict)
@@ -138,6 +258,20 @@ class DuplicateDetector:
         if not insights_history:
             return False, {"reason": "Aucun historique", "method": "semantic"}
 
+        recent_insights = insights_history[-5:]
+        start_index = len(insights_history) - len(recent_insights)
+
+        try:
+            similarities = self._compute_similarities(
+                new_insight,
+                recent_insights,
+                embeddings_history[start_index:] if embeddings_history is not None else None,
+                new_embedding
+            )
+        except Exception as e:
+            logger.error(f"❌ Erreur lors du calcul de similarité sémantique: {e}")
+            similarities = np.zeros(len(recent_insights), dtype=np.float32)
+
         threshold = time_threshold_seconds or self.time_threshold
         current_time = datetime.now().timestamp()
 
@@ -153,8 +287,8 @@ class DuplicateDetector:
         is_recent = False
 
         # Comparer avec les 5 derniers insights
-        for i, old_insight in enumerate(insights_history[-5:]):
-            actual_index = len(insights_history) - 5 + i
+        for i, old_insight in enumerate(recent_insights):
+            actual_index = start_index + i
 
             if actual_index >= 0 and actual_index < len(timestamps_history):
                 timestamp = timestamps_history[actual_index]
@@ -164,8 +298,7 @@ class DuplicateDetector:
             time_elapsed = current_time - timestamp
             is_old = time_elapsed > threshold
 
-            # Calcul de la similarité sémantique
-            similarity = self._compute_semantic_similarity(new_insight, old_insight)
+            similarity = float(similarities[i])
 
             minutes_ago = int(time_elapsed / 60)
             seconds_ago = int(time_elapsed % 60)
@@ -215,12 +348,47 @@ class DuplicateDetector:
 
         return is_duplicate, analysis
     
+    def _compute_similarities(
+        self,
+        new_insight: str,
+        recent_insights: List[str],
+        recent_embeddings: Optional[List[Optional[np.ndarray]]],
+        new_embedding: Optional[np.ndarray]
+    ) -> np.ndarray:
+        """
+        Similarités (0-1) entre le nouvel insight et chaque insight récent
+
+        Seuls les textes sans embedding en cache sont encodés, en un seul batch.
+        """
+        if recent_embeddings is None or len(recent_embeddings) != len(recent_insights):
+            recent_embeddings = [None] * len(recent_insights)
+
+        missing = [i for i, emb in enumerate(recent_embeddings) if emb is None]
+        to_encode = [recent_insights[i] for i in missing]
+        if new_embedding is None:
+            to_encode.append(new_insight)
+
+        encoded = self.encode(to_encode) if to_encode else None
+        if new_embedding is None:
+            new_embedding = encoded[-1]
+
+        matrix = np.empty((len(recent_insights), new_embedding.shape[0]), dtype=np.float32)
+        for row, i in enumerate(missing):
+            matrix[i] = encoded[row]
+        for i, emb in enumerate(recent_embeddings):
+            if emb is not None:
+                matrix[i] = emb
+
+        # Cosine sur vecteurs normalisés = produit scalaire, converti de [-1, 1] à [0, 1]
+        return (matrix @ new_embedding + 1) / 2
+
     async def check_duplicate(
         self,
         new_insight: str,
         insights_history: List[str],
         timestamps_history: List[float],
-        time_threshold_seconds: int = None
+        time_threshold_seconds: int = None,
+        session_id: str = None
     ) -> tuple[bool, Dict]:
         """
         Vérifie si un insight est un doublon avec l'IA
@@ -230,6 +398,7 @@ class DuplicateDetector:
             insights_history: Liste des insights précédents
             timestamps_history: Timestamps correspondants
             time_threshold_seconds: Seuil temporel (défaut: config)
+            session_id: Session à l'origine de l'appel (file équitable)
         
         Returns:
             Tuple (is_duplicate: bool, analysis: dict)
@@ -274,8 +443,9 @@ class DuplicateDetector:
         
         try:
             # Appel à l'IA
-            response = await asyncio.to_thread(
-                openai.chat.completions.create,
+            response = await get_llm_scheduler().chat_completion(
+                priority=LLMPriority.DUPLICATE,
+                session_id=session_id,
                 model=self.model,
                 messages=[{"role": "user", "content": prompt}],
                 max_tokens=150,
@@ -0,0 +1,185 @@
+"""
+Backends d'embeddings pour la détection de doublons sémantique
+
+- torch : SentenceTransformer complet (PyTorch, fp32)
+- onnx  : même modèle exporté en ONNX + quantification dynamique int8,
+          exécuté par ONNX Runtime (pas de torch chargé dans les workers)
+- sidecar : client d'un process sidecar qui détient le seul modèle du nœud
+
+Tous les backends exposent la même méthode `encode(texts, show_progress_bar=False)`.
+
+L'export ONNX (qui nécessite torch) se fait une fois, hors production :
+    python -m tools.export_onnx_embeddings
+"""
+import logging
+import inspect
+import json
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from config.settings import (
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_ONNX_DIR,
+    EMBEDDING_ONNX_THREADS
+)
+
+logger = logging.getLogger(__name__)
+
+ONNX_MODEL_FILE = "model_int8.onnx"
+ONNX_FP32_FILE = "model.onnx"
+ONNX_META_FILE = "kitt_embedding.json"
+
+
+def load_torch_model(model_name: str = EMBEDDING_MODEL_NAME):
+    """Charge le modèle sentence-transformers complet (import de torch différé)"""
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+
+class OnnxEmbeddingModel:
+    """Modèle d'embeddings ONNX int8 (tokenizer Rust + ONNX Runtime, sans torch)"""
+
+    def __init__(self, model_dir: Path = EMBEDDING_ONNX_DIR, threads: int = EMBEDDING_ONNX_THREADS):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_dir = Path(model_dir)
+        meta = json.loads((model_dir / ONNX_META_FILE).read_text(encoding="utf-8"))
+        self.max_seq_length = int(meta["max_seq_length"])
+        self.model_name = meta["model"]
+
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.max_seq_length)
+        self.tokenizer.enable_padding(pad_id=int(meta["pad_token_id"]), pad_token=meta["pad_token"])
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            str(model_dir / ONNX_MODEL_FILE),
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def encode(self, texts: List[str], show_progress_bar: bool = False, batch_size: int = 32) -> np.ndarray:
+        """Encode des textes (mean pooling, comme le modèle sentence-transformers d'origine)"""
+        if isinstance(texts, str):
+            texts = [texts]
+
+        outputs = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + batch_size])
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+            feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self._input_names:
+                feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+            token_embeddings = self.session.run(None, feeds)[0]
+
+            # Mean pooling pondéré par le masque d'attention
+            mask = attention_mask[..., None].astype(np.float32)
+            summed = (token_embeddings * mask).sum(axis=1)
+            outputs.append(summed / np.clip(mask.sum(axis=1), 1e-9, None))
+
+        return np.concatenate(outputs).astype(np.float32) if outputs else np.empty((0, 0), np.float32)
+
+
+def onnx_model_exists(model_dir: Path = EMBEDDING_ONNX_DIR) -> bool:
+    model_dir = Path(model_dir)
+    return (model_dir / ONNX_MODEL_FILE).exists() and (model_dir / ONNX_META_FILE).exists()
+
+
+def export_onnx_model(model_dir: Path = EMBEDDING_ONNX_DIR, model_name: str = EMBEDDING_MODEL_NAME) -> Path:
+    """
+    Exporte le modèle sentence-transformers en ONNX puis le quantifie en int8 (dynamique)
+
+    Nécessite torch + onnx + onnxruntime (à lancer une fois, en CI ou sur un poste de dev).
+
+    Returns:
+        Chemin du dossier contenant le modèle quantifié
+    """
+    import torch
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    model_dir = Path(model_dir)
+    model_dir.mkdir(parents=True, exist_ok=True)
+
+    st_model = load_torch_model(model_name)
+    transformer = st_model[0].auto_model.eval()
+    hf_tokenizer = st_model.tokenizer
+    max_seq_length = st_model.max_seq_length
+
+    dummy = hf_tokenizer(["export onnx"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in dummy]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["token_embeddings"] = {0: "batch", 1: "sequence"}
+
+    class _TokenEmbeddings(torch.nn.Module):
+        """Ne garde que last_hidden_state (le pooling est fait côté numpy)"""
+
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(input_names, inputs))).last_hidden_state
+
+    export_kwargs = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        export_kwargs["dynamo"] = False  # Exporteur TorchScript (axes dynamiques stables)
+
+    fp32_path = model_dir / ONNX_FP32_FILE
+    with torch.no_grad():
+        torch.onnx.export(
+            _TokenEmbeddings(transformer),
+            tuple(dummy[name] for name in input_names),
+            str(fp32_path),
+            input_names=input_names,
+            output_names=["token_embeddings"],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+            **export_kwargs
+        )
+
+    quantize_dynamic(str(fp32_path), str(model_dir / ONNX_MODEL_FILE), weight_type=QuantType.QInt8)
+    fp32_path.unlink()
+
+    hf_tokenizer.save_pretrained(str(model_dir))
+    meta = {
+        "model": model_name,
+        "max_seq_length": max_seq_length,
+        "pad_token": hf_tokenizer.pad_token,
+        "pad_token_id": hf_tokenizer.pad_token_id,
+        "quantization": "dynamic-int8"
+    }
+    (model_dir / ONNX_META_FILE).write_text(json.dumps(meta, indent=2), encoding="utf-8")
+
+    logger.info(f"✅ Modèle ONNX int8 exporté dans {model_dir}")
+    return model_dir
+
+
+def load_embedding_backend(backend: str):
+    """Instancie le backend d'embeddings demandé ("torch", "onnx" ou "sidecar")"""
+    if backend == "torch":
+        return load_torch_model()
+
+    if backend == "onnx":
+        if not onnx_model_exists():
+            logger.warning(
+                f"⚠️ Modèle ONNX absent de {EMBEDDING_ONNX_DIR}, export automatique "
+                f"(nécessite torch, préférer: python -m tools.export_onnx_embeddings)"
+            )
+            export_onnx_model()
+        return OnnxEmbeddingModel()
+
+    if backend == "sidecar":
+        from services.embedding_sidecar import SidecarEmbeddingModel
+        return SidecarEmbeddingModel()
+
+    raise ValueError(f"Backend d'embeddings inconnu: {backend} (attendu: torch, onnx, sidecar)")
@@ -0,0 +1,137 @@
+"""
+Worker d'embeddings dédié avec micro-batching inter-sessions
+
+`SentenceTransformer.encode` est synchrone et coûteux : appelé depuis une route async,
+il bloque la boucle d'événements (et donc toutes les autres sessions).
+
+Ce worker tourne dans un thread dédié (l'inférence PyTorch relâche le GIL) :
+- les demandes d'encodage de toutes les sessions sont collectées pendant quelques ms
+- elles sont encodées en UN seul batch
+- chaque appelant reçoit un Future avec ses propres embeddings
+"""
+import logging
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from config.settings import EMBEDDING_BATCH_WINDOW_MS, EMBEDDING_MAX_BATCH
+
+logger = logging.getLogger(__name__)
+
+
+class _EncodeRequest:
+    __slots__ = ("texts", "future")
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.future: Future = Future()
+
+
+class EmbeddingBatcher:
+    """Regroupe les demandes d'encodage concurrentes en batchs"""
+
+    def __init__(
+        self,
+        encode_fn: Optional[Callable[[List[str]], np.ndarray]] = None,
+        window_ms: float = EMBEDDING_BATCH_WINDOW_MS,
+        max_batch: int = EMBEDDING_MAX_BATCH
+    ):
+        self._encode_fn = encode_fn
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[_EncodeRequest]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+        self.stats = {"requests": 0, "batches": 0, "texts": 0}
+
+    def submit(self, texts: List[str]) -> Future:
+        """
+        Planifie l'encodage de `texts`
+
+        Returns:
+            Future résolu avec une matrice (len(texts), dim) d'embeddings normalisés
+        """
+        self._ensure_started()
+        request = _EncodeRequest(list(texts))
+        self._queue.put(request)
+        return request.future
+
+    async def encode(self, texts: List[str]) -> np.ndarray:
+        """Version async : n'occupe pas la boucle d'événements pendant l'inférence"""
+        return await asyncio.wrap_future(self.submit(texts))
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._thread.start()
+
+    def _collect_batch(self) -> List[_EncodeRequest]:
+        """Attend une première demande puis collecte les suivantes pendant la fenêtre"""
+        batch = [self._queue.get()]
+        size = len(batch[0].texts)
+        deadline = time.monotonic() + self.window
+
+        while size < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.texts)
+
+        return batch
+
+    def _run(self) -> None:
+        encode_fn = self._encode_fn
+        if encode_fn is None:
+            from services.duplicate_detector import DuplicateDetector
+            encode_fn = DuplicateDetector.encode
+
+        while True:
+            batch = self._collect_batch()
+            batch = [r for r in batch if r.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            texts = [text for request in batch for text in request.texts]
+            try:
+                embeddings = encode_fn(texts) if texts else None
+            except Exception as e:
+                logger.error(f"[EMBEDDINGS] ❌ Erreur d'encodage du batch ({len(texts)} textes): {e}")
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+
+            self.stats["batches"] += 1
+            self.stats["requests"] += len(batch)
+            self.stats["texts"] += len(texts)
+
+            offset = 0
+            for request in batch:
+                count = len(request.texts)
+                request.future.set_result(embeddings[offset:offset + count] if count else np.empty((0, 0)))
+                offset += count
+
+
+# Worker partagé par toutes les sessions du process
+_embedding_batcher: Optional[EmbeddingBatcher] = None
+
+
+def get_embedding_batcher() -> EmbeddingBatcher:
+    """Retourne le worker d'embeddings partagé"""
+    global _embedding_batcher
+    if _embedding_batcher is None:
+        _embedding_batcher = EmbeddingBatcher()
+    return _embedding_batcher
@@ -0,0 +1,161 @@
+"""
+Sidecar d'embeddings : un seul modèle en mémoire pour tous les workers uvicorn d'un nœud
+
+Le sidecar charge le modèle une fois et sert les encodages sur une socket Unix.
+Les demandes de toutes les connexions (donc de tous les workers) passent par le même
+EmbeddingBatcher : elles sont regroupées en batchs.
+
+Côté workers : EMBEDDING_BACKEND=sidecar (aucun modèle chargé dans le worker).
+
+Protocole (big-endian) :
+    requête  : [u32 longueur] + JSON {"texts": [...]}
+    réponse  : [u32 lignes][u32 dimension] + float32 (lignes × dimension)
+    erreur   : [u32 0xFFFFFFFF][u32 longueur] + message UTF-8
+
+Usage:
+    python -m services.embedding_sidecar --socket /tmp/kitt-embeddings.sock --backend onnx
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+from typing import List
+
+import numpy as np
+
+from config.settings import EMBEDDING_SIDECAR_SOCKET, EMBEDDING_SIDECAR_BACKEND
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct(">I")
+_SHAPE = struct.Struct(">II")
+_ERROR = 0xFFFFFFFF
+
+
+class SidecarError(Exception):
+    """Erreur renvoyée par le sidecar d'embeddings"""
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# CLIENT (dans les workers)
+# ═══════════════════════════════════════════════════════════════════════════
+class SidecarEmbeddingModel:
+    """Client du sidecar, compatible avec l'interface `encode` de sentence-transformers"""
+
+    def __init__(self, socket_path: str = EMBEDDING_SIDECAR_SOCKET, timeout: float = 10.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()  # Une connexion par thread appelant
+
+    def _connection(self) -> socket.socket:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            conn.settimeout(self.timeout)
+            conn.connect(self.socket_path)
+            self._local.conn = conn
+        return conn
+
+    def _reset(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+        self._local.conn = None
+
+    @staticmethod
+    def _recv_exact(conn: socket.socket, size: int) -> bytes:
+        chunks = bytearray()
+        while len(chunks) < size:
+            chunk = conn.recv(size - len(chunks))
+            if not chunk:
+                raise ConnectionError("Connexion au sidecar fermée")
+            chunks.extend(chunk)
+        return bytes(chunks)
+
+    def encode(self, texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+        if isinstance(texts, str):
+            texts = [texts]
+        payload = json.dumps({"texts": list(texts)}, ensure_ascii=False).encode("utf-8")
+
+        # Une reconnexion en cas de socket cassée (redémarrage du sidecar)
+        for attempt in (1, 2):
+            try:
+                conn = self._connection()
+                conn.sendall(_HEADER.pack(len(payload)) + payload)
+                rows, dim = _SHAPE.unpack(self._recv_exact(conn, _SHAPE.size))
+                if rows == _ERROR:
+                    raise SidecarError(self._recv_exact(conn, dim).decode("utf-8"))
+                data = self._recv_exact(conn, rows * dim * 4)
+                return np.frombuffer(data, dtype=np.float32).reshape(rows, dim)
+            except (OSError, ConnectionError):
+                self._reset()
+                if attempt == 2:
+                    raise
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# SERVEUR (process sidecar)
+# ═══════════════════════════════════════════════════════════════════════════
+async def _handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, batcher) -> None:
+    try:
+        while True:
+            try:
+                (length,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+                request = json.loads(await reader.readexactly(length))
+            except asyncio.IncompleteReadError:
+                break
+
+            try:
+                embeddings = np.ascontiguousarray(await batcher.encode(request["texts"]), dtype=np.float32)
+                rows, dim = embeddings.shape if embeddings.size else (0, 0)
+                writer.write(_SHAPE.pack(rows, dim) + embeddings.tobytes())
+            except Exception as e:
+                message = str(e).encode("utf-8")
+                writer.write(_SHAPE.pack(_ERROR, len(message)) + message)
+            await writer.drain()
+    finally:
+        writer.close()
+
+
+async def serve(socket_path: str, backend: str) -> None:
+    """Charge le modèle puis sert les encodages sur la socket Unix"""
+    from services.embedding_backends import load_embedding_backend
+    from services.embedding_batcher import EmbeddingBatcher
+
+    model = load_embedding_backend(backend)
+    model.encode(["test preload"], show_progress_bar=False)
+
+    def encode_normalized(texts: List[str]) -> np.ndarray:
+        embeddings = np.asarray(model.encode(texts, show_progress_bar=False), dtype=np.float32)
+        return embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+    batcher = EmbeddingBatcher(encode_fn=encode_normalized)
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = await asyncio.start_unix_server(
+        lambda r, w: _handle_connection(r, w, batcher),
+        path=socket_path
+    )
+    logger.info(f"✅ Sidecar d'embeddings prêt sur {socket_path} (backend: {backend})")
+
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Sidecar d'embeddings partagé entre workers")
+    parser.add_argument("--socket", default=EMBEDDING_SIDECAR_SOCKET)
+    parser.add_argument("--backend", default=EMBEDDING_SIDECAR_BACKEND, choices=["torch", "onnx"])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(name)s - %(message)s")
+    asyncio.run(serve(args.socket, args.backend))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+"""
+Ordonnanceur central de tout le trafic sortant vers l'API LLM (OpenAI)
+
+Objectif : les insights de coaching (temps réel) ne doivent jamais attendre
+derrière des tâches de fond (détection de phase, anti-doublon IA, résumés).
+
+- Classes de priorité : coaching > phase > anti-doublon > résumé
+- Rate limiting par token bucket (requêtes/min + tokens/min de l'organisation)
+- File équitable par session (round-robin) à l'intérieur de chaque priorité
+- Délestage des priorités basses quand on approche de la limite
+"""
+import logging
+import asyncio
+import contextvars
+import functools
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from enum import IntEnum
+from typing import Any, Callable, Deque, Dict, Optional, Set
+
+from services.metrics import get_metrics
+from services.capture import get_capture
+from config.settings import (
+    LLM_RATE_LIMIT_RPM,
+    LLM_RATE_LIMIT_TPM,
+    LLM_MAX_CONCURRENCY,
+    LLM_SHED_THRESHOLDS
+)
+
+logger = logging.getLogger(__name__)
+
+
+class LLMPriority(IntEnum):
+    """Classes de priorité (plus petit = plus prioritaire)"""
+    COACHING = 0
+    PHASE = 1
+    DUPLICATE = 2
+    SUMMARY = 3
+
+
+class LLMOverloadedError(Exception):
+    """Requête délestée : la limite de débit est presque atteinte"""
+
+
+class TokenBucket:
+    """Token bucket simple (capacité = limite par minute, recharge continue)"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(max(per_minute, 1))
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def level(self) -> float:
+        """Fraction de capacité disponible (0-1)"""
+        self._refill()
+        return max(self.tokens, 0.0) / self.capacity
+
+    def time_until(self, amount: float) -> float:
+        """Secondes à attendre avant de pouvoir consommer `amount`"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def refund(self, amount: float) -> None:
+        """Corrige l'estimation a posteriori (amount négatif = surcoût)"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class _Job:
+    __slots__ = ("fn", "kwargs", "priority", "session_id", "cost", "future", "enqueued_at")
+
+    def __init__(self, fn, kwargs, priority, session_id, cost, future):
+        self.fn = fn
+        self.kwargs = kwargs
+        self.priority = priority
+        self.session_id = session_id
+        self.cost = cost
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class LLMScheduler:
+    """Ordonnanceur à priorités pour les appels LLM bloquants (SDK OpenAI)"""
+
+    def __init__(
+        self,
+        rpm: int = LLM_RATE_LIMIT_RPM,
+        tpm: int = LLM_RATE_LIMIT_TPM,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        shed_thresholds: Optional[Dict[str, float]] = None
+    ):
+        self.requests_bucket = TokenBucket(rpm)
+        self.tokens_bucket = TokenBucket(tpm)
+        self.max_concurrency = max_concurrency
+        self.shed_thresholds = {
+            LLMPriority[name.upper()]: value
+            for name, value in (shed_thresholds or LLM_SHED_THRESHOLDS).items()
+        }
+
+        # Une file par priorité, et dans chaque priorité une sous-file par session
+        self._queues: Dict[LLMPriority, "OrderedDict[str, Deque[_Job]]"] = {
+            priority: OrderedDict() for priority in LLMPriority
+        }
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        # Appels en cours : référencés jusqu'à leur fin (sinon collectables), annulés à l'arrêt
+        self._running: Set[asyncio.Task] = set()
+
+        self.stats_counters = {
+            priority.name.lower(): {"dispatched": 0, "shed": 0, "wait_ms_total": 0.0}
+            for priority in LLMPriority
+        }
+
+    # ------------------------------------------------------------------
+    # API publique
+    # ------------------------------------------------------------------
+    async def submit(
+        self,
+        fn: Callable[..., Any],
+        *,
+        priority: LLMPriority,
+        session_id: Optional[str] = None,
+        estimated_tokens: Optional[int] = None,
+        **kwargs
+    ) -> Any:
+        """
+        Planifie un appel LLM bloquant et attend son résultat
+
+        Args:
+            fn: Fonction synchrone du SDK (ex: openai.chat.completions.create)
+            priority: Classe de priorité
+            session_id: Session à l'origine de l'appel (file équitable)
+            estimated_tokens: Coût estimé (défaut: prompt/4 + max_tokens)
+            **kwargs: Arguments passés tels quels à `fn`
+
+        Raises:
+            LLMOverloadedError: si la requête est délestée
+        """
+        self._ensure_started()
+
+        cost = estimated_tokens if estimated_tokens is not None else self._estimate_tokens(kwargs)
+        self._check_shedding(priority)
+
+        future = self._loop.create_future()
+        job = _Job(fn, kwargs, priority, session_id or "_global", cost, future)
+
+        queue = self._queues[priority]
+        queue.setdefault(job.session_id, deque()).append(job)
+        self._wakeup.set()
+
+        return await future
+
+    async def chat_completion(self, *, priority: LLMPriority, session_id: Optional[str] = None, **kwargs) -> Any:
+        """
+        Planifie un appel `openai.chat.completions.create`
+
+        Le SDK OpenAI (lourd à importer) n'est chargé qu'au premier appel
+        (ou pendant le préchargement en arrière-plan au démarrage).
+        Avec CAPTURE_DIR, la réponse est capturée pour le rejeu (services/capture.py).
+        """
+        import openai
+        start = time.perf_counter()
+        response = await self.submit(
+            openai.chat.completions.create,
+            priority=priority,
+            session_id=session_id,
+            **kwargs
+        )
+        if get_capture().enabled:
+            usage = getattr(response, "usage", None)
+            get_capture().llm(
+                session_id,
+                priority.name.lower(),
+                kwargs.get("messages"),
+                response.choices[0].message.content,
+                {"prompt": usage.prompt_tokens, "completion": usage.completion_tokens} if usage else None,
+                time.perf_counter() - start
+            )
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        """Statistiques de l'ordonnanceur (pour /health)"""
+        return {
+            "requests_capacity": round(self.requests_bucket.level(), 3),
+            "tokens_capacity": round(self.tokens_bucket.level(), 3),
+            "queued": {
+                priority.name.lower(): sum(len(jobs) for jobs in self._queues[priority].values())
+                for priority in LLMPriority
+            },
+            "by_priority": self.stats_counters
+        }
+
+    # ------------------------------------------------------------------
+    # Interne
+    # ------------------------------------------------------------------
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._dispatcher and not self._dispatcher.done():
+            return
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        # Contexte vierge : tâche du process, pas de la requête qui la démarre (core.profiler)
+        self._dispatcher = loop.create_task(self._dispatch_loop(), name="llm-scheduler", context=contextvars.Context())
+
+    @staticmethod
+    def _estimate_tokens(kwargs: Dict[str, Any]) -> int:
+        """Estimation grossière : ~4 caractères par token + tokens de sortie max"""
+        prompt_chars = sum(len(str(m.get("content", ""))) for m in kwargs.get("messages", []))
+        return prompt_chars // 4 + int(kwargs.get("max_tokens") or 0)
+
+    def _check_shedding(self, priority: LLMPriority) -> None:
+        threshold = self.shed_thresholds.get(priority)
+        if threshold is None:
+            return
+        level = min(self.requests_bucket.level(), self.tokens_bucket.level())
+        if level < threshold:
+            self.stats_counters[priority.name.lower()]["shed"] += 1
+            get_metrics().record_api_call("openai", priority.name.lower(), "shed")
+            logger.warning(
+                f"[LLM SCHEDULER] ⚠️ Délestage {priority.name} "
+                f"(capacité {level:.0%} < seuil {threshold:.0%})"
+            )
+            raise LLMOverloadedError(f"Requête {priority.name} délestée (capacité {level:.0%})")
+
+    def _peek_next(self) -> Optional[_Job]:
+        for priority in LLMPriority:
+            queue = self._queues[priority]
+            while queue:
+                session_id, jobs = next(iter(queue.items()))
+                while jobs and jobs[0].future.cancelled():
+                    jobs.popleft()
+                if not jobs:
+                    del queue[session_id]
+                    continue
+                return jobs[0]
+        return None
+
+    def _pop(self, job: _Job) -> None:
+        queue = self._queues[job.priority]
+        jobs = queue[job.session_id]
+        jobs.popleft()
+        if jobs:
+            # Round-robin : la session servie passe en fin de file
+            queue.move_to_end(job.session_id)
+        else:
+            del queue[job.session_id]
+
+    async def _wait_wakeup(self, timeout: Optional[float] = None) -> None:
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _dispatch_loop(self) -> None:
+        while True:
+            await self._slots.acquire()
+            while True:
+                job = self._peek_next()
+                if job is None:
+                    await self._wait_wakeup()
+                    continue
+
+                delay = max(
+                    self.requests_bucket.time_until(1),
+                    self.tokens_bucket.time_until(job.cost)
+                )
+                if delay > 0:
+                    # Attendre la recharge, ou l'arrivée d'un job plus prioritaire
+                    await self._wait_wakeup(timeout=delay)
+                    continue
+
+                self._pop(job)
+                self.requests_bucket.consume(1)
+                self.tokens_bucket.consume(job.cost)
+                break
+
+            task = self._loop.create_task(self._run(job))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, job: _Job) -> None:
+        counters = self.stats_counters[job.priority.name.lower()]
+        counters["dispatched"] += 1
+        counters["wait_ms_total"] += (time.monotonic() - job.enqueued_at) * 1000
+        operation = job.priority.name.lower()
+        metrics = get_metrics()
+        start = time.perf_counter()
+        try:
+            result = await self._loop.run_in_executor(
+                self._executor, functools.partial(job.fn, **job.kwargs)
+            )
+            metrics.record_api_call("openai", operation, "ok", time.perf_counter() - start)
+            usage = getattr(result, "usage", None)
+            actual = getattr(usage, "total_tokens", None)
+            if actual is not None:
+                self.tokens_bucket.refund(job.cost - actual)
+            metrics.record_tokens(
+                operation, getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None)
+            )
+            if not job.future.done():
+                job.future.set_result(result)
+        except asyncio.CancelledError:
+            # Arrêt du serveur : l'appelant ne doit pas attendre indéfiniment
+            job.future.cancel()
+            raise
+        except Exception as e:
+            metrics.record_api_call("openai", operation, "error", time.perf_counter() - start)
+            if not job.future.done():
+                job.future.set_exception(e)
+        finally:
+            self._slots.release()
+
+    def shutdown(self) -> None:
+        """Arrêt du serveur : annule la répartition, les appels en cours et les jobs en file"""
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+        for task in list(self._running):
+            task.cancel()
+        for queue in self._queues.values():
+            for jobs in queue.values():
+                for job in jobs:
+                    job.future.cancel()
+            queue.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Ordonnanceur partagé par tous les services (une instance par process)
+_llm_scheduler: Optional[LLMScheduler] = None
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    """Retourne l'ordonnanceur LLM partagé"""
+    global _llm_scheduler
+    if _llm_scheduler is None:
+        _llm_scheduler = LLMScheduler()
+    return _llm_scheduler
@@ -0,0 +1,328 @@
+"""
+Métriques du process au format texte Prometheus (GET /metrics)
+
+- kitt_stage_duration_seconds{stage} : étapes de /audio (formulaire, VAD, transcription,
+  détection de phase, pertinence, prompt, appel LLM, parsing, anti-doublon...)
+- kitt_audio_request_duration_seconds{outcome} : requête /audio complète selon son issue
+  (cooldown, low_relevance, duplicate, accepted...)
+- kitt_api_calls_total{api, operation, status} et kitt_api_call_duration_seconds{api, operation} :
+  appels OpenAI (par priorité de l'ordonnanceur) et Deepgram
+- kitt_llm_tokens_total{operation, type} : tokens prompt / completion consommés
+
+Mesure légère : `with span("vad"):` coûte deux perf_counter et une recherche dichotomique
+dans des bornes fixes, sans verrou (tout est enregistré depuis la boucle asyncio).
+METRICS_ENABLED=false rend les spans inopérants.
+
+Module sans dépendance interne (hors config) : importable depuis api/, core/ et services/.
+
+Plusieurs workers (tools/serve_prefork.py) : chaque process a ses propres compteurs, et une
+requête /metrics n'atteint qu'un seul worker. Avec METRICS_MULTIPROCESS_DIR (créé par
+serve_prefork), chaque worker y écrit ses compteurs toutes les METRICS_FLUSH_INTERVAL
+secondes et à l'arrêt ; /metrics renvoie la somme de ses compteurs en mémoire et des
+fichiers des autres workers (en retard d'au plus un intervalle). Les fichiers des workers
+terminés sont gardés : les compteurs du nœud ne redescendent pas. Le dossier est vidé au
+lancement de serve_prefork. Plusieurs nœuds : Prometheus interroge chaque nœud.
+"""
+import asyncio
+import bisect
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from config.settings import METRICS_ENABLED, METRICS_MULTIPROCESS_DIR, METRICS_FLUSH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# Bornes des histogrammes de durée (secondes)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Tuple[str, ...], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+class Counter:
+    """Compteur monotone, par combinaison de labels"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def export(self) -> List[list]:
+        return [[list(labels), value] for labels, value in self._values.items()]
+
+    def merge(self, rows: List[list]) -> None:
+        """Ajoute les valeurs exportées par un autre process"""
+        for labels, value in rows:
+            self.inc(*labels, amount=value)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_label_text(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    """Histogramme à bornes fixes, par combinaison de labels"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels → [compte par tranche (non cumulé, +Inf en dernier), somme, nombre]
+        self._series: Dict[Labels, list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def export(self) -> List[list]:
+        return [[list(labels), counts, total, count] for labels, (counts, total, count) in self._series.items()]
+
+    def merge(self, rows: List[list]) -> None:
+        """Ajoute les séries exportées par un autre process (mêmes bornes)"""
+        for labels, counts, total, count in rows:
+            series = self._series.get(tuple(labels))
+            if series is None:
+                series = self._series[tuple(labels)] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0] = [a + b for a, b in zip(series[0], counts)]
+            series[1] += total
+            series[2] += count
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            bounds = [_number(bound) for bound in self.buckets] + ["+Inf"]
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labelnames, labels)} {repr(total)}")
+            lines.append(f"{self.name}_count{_label_text(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Metrics:
+    """Métriques du process"""
+
+    def __init__(
+        self,
+        enabled: bool = METRICS_ENABLED,
+        directory: str = METRICS_MULTIPROCESS_DIR,
+        flush_interval: float = METRICS_FLUSH_INTERVAL
+    ):
+        self.enabled = enabled
+        self.directory = Path(directory) if directory else None
+        self.flush_interval = flush_interval
+        self._task: Optional[asyncio.Task] = None
+        self.stage_seconds = Histogram(
+            "kitt_stage_duration_seconds", "Durée des étapes du traitement audio", ("stage",)
+        )
+        self.request_seconds = Histogram(
+            "kitt_audio_request_duration_seconds", "Durée d'une requête /audio selon son issue", ("outcome",)
+        )
+        self.api_calls = Counter(
+            "kitt_api_calls_total", "Appels aux API externes", ("api", "operation", "status")
+        )
+        self.api_call_seconds = Histogram(
+            "kitt_api_call_duration_seconds", "Durée des appels aux API externes", ("api", "operation")
+        )
+        self.llm_tokens = Counter(
+            "kitt_llm_tokens_total", "Tokens LLM consommés", ("operation", "type")
+        )
+        self._all = (self.stage_seconds, self.request_seconds, self.api_calls, self.api_call_seconds, self.llm_tokens)
+
+    def span(self, stage: str) -> "_Span":
+        """Mesure la durée du bloc `with` dans kitt_stage_duration_seconds{stage}"""
+        return _Span(self.stage_seconds, (stage,)) if self.enabled else _NOOP_SPAN
+
+    def observe_stage(self, stage: str, seconds: float) -> None:
+        """Durée d'une étape mesurée hors d'un bloc `with` (ex: attente dans une file)"""
+        if self.enabled:
+            self.stage_seconds.observe(seconds, stage)
+
+    def record_api_call(self, api: str, operation: str, status: str, seconds: Optional[float] = None) -> None:
+        if not self.enabled:
+            return
+        self.api_calls.inc(api, operation, status)
+        if seconds is not None:
+            self.api_call_seconds.observe(seconds, api, operation)
+
+    def record_tokens(self, operation: str, prompt: Optional[int], completion: Optional[int]) -> None:
+        if not self.enabled:
+            return
+        if prompt:
+            self.llm_tokens.inc(operation, "prompt", amount=prompt)
+        if completion:
+            self.llm_tokens.inc(operation, "completion", amount=completion)
+
+    def record_request(self, outcome: str, seconds: float) -> None:
+        if self.enabled:
+            self.request_seconds.observe(seconds, outcome)
+
+    def render(self) -> str:
+        """Exposition texte Prometheus (version 0.0.4) des compteurs de ce process"""
+        lines: List[str] = []
+        for metric in self._all:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    # ------------------------------------------------------------------
+    # Plusieurs workers (METRICS_MULTIPROCESS_DIR)
+    # ------------------------------------------------------------------
+
+    def export(self) -> Dict[str, List[list]]:
+        """Valeurs brutes par métrique (JSON), additionnables avec `merge`"""
+        return {metric.name: metric.export() for metric in self._all}
+
+    def merge(self, exported: Dict[str, List[list]]) -> None:
+        for metric in self._all:
+            metric.merge(exported.get(metric.name, []))
+
+    def _read_peers(self) -> List[Dict[str, Any]]:
+        """Derniers compteurs écrits par les autres process (vivants ou terminés)"""
+        exports = []
+        own = f"{os.getpid()}.json"
+        for path in self.directory.glob("*.json"):
+            if path.name == own:
+                continue
+            try:
+                exports.append(json.loads(path.read_text()))
+            except FileNotFoundError:
+                continue
+            except (OSError, ValueError) as e:
+                logger.error(f"[METRICS] ❌ Fichier illisible ({path}), ignoré: {e}")
+        return exports
+
+    def _write(self, blob: str) -> None:
+        """Écriture atomique des compteurs de ce process (pid lu à l'écriture : process forkés)"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{os.getpid()}.json"
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(blob)
+        tmp.replace(path)
+
+    async def render_node(self) -> str:
+        """Exposition des compteurs du nœud : ce process + fichiers des autres workers"""
+        if self.directory is None:
+            return self.render()
+        total = Metrics(enabled=True, directory="")
+        total.merge(self.export())
+        for exported in await asyncio.to_thread(self._read_peers):
+            total.merge(exported)
+        return total.render()
+
+    async def save(self) -> None:
+        """Écrit les compteurs du process (sérialisés dans la boucle, écrits dans un thread)"""
+        if self.directory is not None:
+            await asyncio.to_thread(self._write, json.dumps(self.export()))
+
+    def start(self) -> None:
+        """Écriture périodique, pour que /metrics sur un autre worker compte ce trafic"""
+        if self.directory is not None and self.flush_interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._flush_loop(), name="metrics-flush")
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.save()
+            except OSError as e:
+                logger.error(f"[METRICS] ❌ Écriture des compteurs impossible: {e}")
+
+
+def reset_multiprocess_dir(directory: str) -> None:
+    """Vide le dossier partagé avant de lancer les workers (compteurs d'un lancement précédent)"""
+    path = Path(directory)
+    path.mkdir(parents=True, exist_ok=True)
+    for stale in list(path.glob("*.json")) + list(path.glob("*.tmp")):
+        stale.unlink(missing_ok=True)
+
+
+class _Span:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: Labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+_metrics: Optional[Metrics] = None
+
+
+def get_metrics() -> Metrics:
+    """Retourne les métriques du process"""
+    global _metrics
+    if _metrics is None:
+        _metrics = Metrics()
+    return _metrics
+
+
+def span(stage: str) -> _Span:
+    """Raccourci pour get_metrics().span(stage)"""
+    return get_metrics().span(stage)
@@ -0,0 +1,46 @@
+"""
+Signatures MinHash sur n-grammes de caractères (pré-filtre lexical anti-doublon)
+
+Une signature de NUM_PERM entiers est calculée une fois par insight ; la similarité de
+Jaccard entre deux insights est estimée par la proportion de composantes égales,
+en quelques microsecondes (aucun modèle, aucune allocation de texte).
+"""
+import re
+import unicodedata
+import zlib
+
+import numpy as np
+
+NUM_PERM = 64
+SHINGLE_SIZE = 3
+
+_MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+_rng = np.random.RandomState(1337)  # Permutations fixes : signatures comparables entre process
+_PERM_A = _rng.randint(1, (1 << 31) - 1, size=NUM_PERM).astype(np.uint64)[:, None]
+_PERM_B = _rng.randint(0, (1 << 31) - 1, size=NUM_PERM).astype(np.uint64)[:, None]
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_text(text: str) -> str:
+    """Minuscules, sans accents, ponctuation ni emojis"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return _NON_WORD.sub(" ", text).strip()
+
+
+def compute_sketch(text: str) -> np.ndarray:
+    """Signature MinHash (NUM_PERM × uint64) des n-grammes de caractères du texte"""
+    normalized = f" {normalize_text(text)} "
+    shingles = {normalized[i:i + SHINGLE_SIZE] for i in range(max(len(normalized) - SHINGLE_SIZE + 1, 1))}
+    hashes = np.fromiter(
+        (zlib.crc32(s.encode("utf-8")) for s in shingles),
+        dtype=np.uint64,
+        count=len(shingles)
+    )
+    return ((_PERM_A * hashes + _PERM_B) % _MERSENNE_PRIME).min(axis=1)
+
+
+def estimate_jaccard(sketch: np.ndarray, sketches: np.ndarray) -> np.ndarray:
+    """Jaccard estimée entre une signature et une matrice de signatures (une par ligne)"""
+    return (sketches == sketch).mean(axis=1)
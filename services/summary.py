@@ -2,11 +2,10 @@
 Service de génération de résumés d'appels
 """
 import logging
-import asyncio
 import json
-from typing import Dict, Any
-import openai
+from typing import Dict, Any, List
 
+from services.llm_scheduler import get_llm_scheduler, LLMPriority
 from config.settings import FINE_TUNED_MODEL, SUMMARY_TEMPERATURE
 
 logger = logging.getLogger(__name__)
@@ -19,19 +18,89 @@ class SummaryService:
         self.model = FINE_TUNED_MODEL
         self.temperature = SUMMARY_TEMPERATURE
     
-    async def generate_client_focused_summary(self, full_transcript: str) -> Dict[str, Any]:
+    async def summarize_segment(self, segment: str, session_id: str = None) -> str:
+        """
+        Map : résume un segment de transcript sorti de la fenêtre de contexte
+
+        Raises:
+            LLMOverloadedError: requête délestée (réessayée au prochain segment)
+        """
+        prompt = f"""Résume ce passage d'un appel commercial en 3 à 5 puces courtes et factuelles :
+besoins et problèmes exprimés par le client, chiffres cités, objections, engagements pris.
+N'invente rien, pas d'interprétation.
+
+PASSAGE :
+\"\"\"{segment}\"\"\"
+
+Réponds uniquement avec les puces."""
+        response = await get_llm_scheduler().chat_completion(
+            priority=LLMPriority.SUMMARY,
+            session_id=session_id,
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=200,
+            temperature=self.temperature
+        )
+        return response.choices[0].message.content.strip()
+
+    async def reduce_summaries(self, running_summary: str, segment_summaries: List[str], session_id: str = None) -> str:
+        """
+        Reduce : fusionne le résumé courant et les résumés de segments suivants en un seul
+
+        Raises:
+            LLMOverloadedError: requête délestée
+        """
+        segments = "\n\n".join(f"Passage {i}:\n{s}" for i, s in enumerate(segment_summaries, 1))
+        prompt = f"""Voici la mémoire d'un appel commercial en cours : le résumé du début de l'appel,
+puis les résumés des passages suivants, dans l'ordre.
+
+RÉSUMÉ DU DÉBUT :
+{running_summary or "(aucun)"}
+
+PASSAGES SUIVANTS :
+{segments}
+
+Fusionne le tout en un seul résumé chronologique de 12 puces maximum. Garde les faits utiles
+pour la suite de l'appel (besoins, chiffres, objections, décideurs, engagements), supprime les redites.
+
+Réponds uniquement avec les puces."""
+        response = await get_llm_scheduler().chat_completion(
+            priority=LLMPriority.SUMMARY,
+            session_id=session_id,
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=400,
+            temperature=self.temperature
+        )
+        return response.choices[0].message.content.strip()
+
+    async def generate_client_focused_summary(
+        self,
+        full_transcript: str,
+        session_id: str = None,
+        earlier_summary: str = None,
+        fallback: bool = True
+    ) -> Dict[str, Any]:
         """
         Génère un résumé centré sur le CLIENT
         
         Args:
-            full_transcript: Transcript complet de la conversation
+            full_transcript: Transcript complet de la conversation (ou sa fin si `earlier_summary`)
+            session_id: Session à l'origine de l'appel (file équitable)
+            earlier_summary: Résumé glissant du début de l'appel (réduction finale, appels longs)
+            fallback: En cas d'erreur, résumé par défaut (sinon l'exception est propagée)
         
         Returns:
             Dict avec summary structuré
         """
-        prompt = f"""Tu es un analyste commercial expert qui évalue des appels de vente de manière objective et factuelle.
+        earlier = f"""
+RÉSUMÉ DU DÉBUT DE L'ÉCHANGE :
+{earlier_summary}
 
-TRANSCRIPTION DE L'ÉCHANGE :
+SUITE ET FIN DE L'ÉCHANGE (transcription) :""" if earlier_summary else """
+TRANSCRIPTION DE L'ÉCHANGE :"""
+        prompt = f"""Tu es un analyste commercial expert qui évalue des appels de vente de manière objective et factuelle.
+{earlier}
 \"\"\"{full_transcript}\"\"\"
 
 MISSION :
@@ -72,8 +141,9 @@ FORMAT DE RÉPONSE (JSON strict, sans markdown) :
 Réponds uniquement avec le JSON"""
         
         try:
-            response = await asyncio.to_thread(
-                openai.chat.completions.create,
+            response = await get_llm_scheduler().chat_completion(
+                priority=LLMPriority.SUMMARY,
+                session_id=session_id,
                 model=self.model,
                 messages=[{"role": "user", "content": prompt}],
                 max_tokens=900,
@@ -87,15 +157,24 @@ Réponds uniquement avec le JSON"""
             return summary_json
             
         except Exception as e:
+            if not fallback:
+                raise
             logger.exception("Erreur appel OpenAI pour summary")
-            return self._get_fallback_summary()
+            return self.get_fallback_summary()
     
-    async def generate_commercial_focused_summary(self, conversation_text: str) -> Dict[str, Any]:
+    async def generate_commercial_focused_summary(
+        self,
+        conversation_text: str,
+        session_id: str = None,
+        fallback: bool = True
+    ) -> Dict[str, Any]:
         """
         Génère un résumé centré sur le COMMERCIAL
         
         Args:
             conversation_text: Texte de la conversation
+            session_id: Session à l'origine de l'appel (file équitable)
+            fallback: En cas d'erreur, résumé par défaut (sinon l'exception est propagée)
         
         Returns:
             Dict avec évaluation du commercial
@@ -134,8 +213,9 @@ FORMAT DE RÉPONSE (JSON strict, sans markdown) :
 Réponds UNIQUEMENT avec le JSON."""
         
         try:
-            response = await asyncio.to_thread(
-                openai.chat.completions.create,
+            response = await get_llm_scheduler().chat_completion(
+                priority=LLMPriority.SUMMARY,
+                session_id=session_id,
                 model=self.model,
                 messages=[{"role": "user", "content": prompt}],
                 max_tokens=500,
@@ -147,8 +227,10 @@ Réponds UNIQUEMENT avec le JSON."""
             return summary_json
             
         except Exception as e:
+            if not fallback:
+                raise
             logger.exception("Erreur appel OpenAI pour summary commercial")
-            return self._get_fallback_commercial_summary()
+            return self.get_fallback_commercial_summary()
     
     def _safe_json_parse(self, raw_text: str) -> Dict[str, Any]:
         """Parse JSON de manière sécurisée avec nettoyage"""
@@ -163,7 +245,7 @@ Réponds UNIQUEMENT avec le JSON."""
                 logger.error("[RÉSUMÉ] Impossible de parser le JSON")
                 return None
     
-    def _get_fallback_summary(self) -> Dict[str, Any]:
+    def get_fallback_summary(self) -> Dict[str, Any]:
         """Résumé par défaut en cas d'erreur"""
         return {
             "summary": {"main": "Non disponible", "details": "Résumé non disponible"},
@@ -176,7 +258,7 @@ Réponds UNIQUEMENT avec le JSON."""
             }
         }
     
-    def _get_fallback_commercial_summary(self) -> Dict[str, Any]:
+    def get_fallback_commercial_summary(self) -> Dict[str, Any]:
         """Résumé commercial par défaut en cas d'erreur"""
         return {
             "summary": "",
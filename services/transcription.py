@@ -2,27 +2,28 @@
 Service de transcription audio via Deepgram (ultra-rapide <300ms)
 """
 import logging
-import tempfile
-import os
+import io
+import copy
 import asyncio
+import time
 from datetime import datetime
+from typing import Optional, Tuple
 import numpy as np
 import soundfile as sf
 from deepgram import DeepgramClient
+from deepgram.environment import DeepgramClientEnvironment
 
+from services.metrics import get_metrics, span
+from services.capture import get_capture
 from config.settings import (
     DEEPGRAM_API_KEY,
+    DEEPGRAM_BASE_URL,
     AUDIO_SAMPLE_RATE,
-    AUDIO_SUBTYPE,
-    SILENCE_THRESHOLD_MIC,
-    MIN_AMPLITUDE_MIC,
-    MIN_AUDIO_LENGTH_MIC,
-    SILENCE_THRESHOLD_BROWSER,
-    MIN_AMPLITUDE_BROWSER,
-    MIN_AUDIO_LENGTH_BROWSER,
-    MIN_TRANSCRIPTION_LENGTH,
-    UNWANTED_PATTERNS
+    AUDIO_SUBTYPE
 )
+# Seuils de silence et filtrage : instantané courant, rechargé à chaud (config/live_config.py)
+# Lu une fois par chunk (api/audio.py) et passé aux étapes, qui le lisent elles-mêmes sinon
+from config.live_config import ConfigSnapshot, get_config
 
 logger = logging.getLogger(__name__)
 
@@ -40,23 +41,31 @@ class TranscriptionService:
             )
 
         # ✅ CORRECTION: api_key comme paramètre nommé (deepgram-sdk v5.x)
-        self.deepgram = DeepgramClient(api_key=DEEPGRAM_API_KEY)
+        if DEEPGRAM_BASE_URL:
+            # Serveur alternatif (substitution locale pour les tests de charge)
+            environment = copy.copy(DeepgramClientEnvironment.PRODUCTION)
+            environment.base = DEEPGRAM_BASE_URL
+            self.deepgram = DeepgramClient(api_key=DEEPGRAM_API_KEY, environment=environment)
+            logger.info(f"🔧 Deepgram redirigé vers {DEEPGRAM_BASE_URL}")
+        else:
+            self.deepgram = DeepgramClient(api_key=DEEPGRAM_API_KEY)
         self.sample_rate = AUDIO_SAMPLE_RATE
         self.subtype = AUDIO_SUBTYPE
 
         logger.info("✅ TranscriptionService initialisé avec Deepgram")
     
     @staticmethod
-    def detect_speech_start_time(audio_data: np.ndarray, role: str) -> float:
+    def detect_speech_start_time(audio_data: np.ndarray, role: str, config: Optional[ConfigSnapshot] = None) -> float:
         """
         Détecte le moment où la parole commence dans l'audio
 
-        Analyse l'audio échantillon par échantillon pour trouver le premier moment
-        où l'amplitude dépasse le seuil de silence, indiquant le début de la parole.
+        Cherche (vectorisé) le premier échantillon dont l'amplitude dépasse le seuil
+        de silence, indiquant le début de la parole.
 
         Args:
             audio_data: Array numpy de l'audio
             role: "CLIENT" ou "COMMERCIAL" pour utiliser les bons seuils
+            config: Instantané de configuration du chunk (courant si None)
 
         Returns:
             float: Temps en secondes où la parole commence
@@ -66,15 +75,16 @@ class TranscriptionService:
             return float('inf')
 
         # Choisir le seuil selon la source
-        threshold = SILENCE_THRESHOLD_BROWSER if role == "CLIENT" else SILENCE_THRESHOLD_MIC
+        threshold = (config or get_config()).silence_thresholds(role).rms_threshold
 
-        # Parcourir l'audio pour trouver le premier échantillon > seuil
-        for i, sample in enumerate(audio_data):
-            if abs(sample) > threshold:
-                # Convertir l'index en secondes
-                time_seconds = i / AUDIO_SAMPLE_RATE
-                logger.debug(f"[SPEECH_DETECTION] {role}: Parole détectée à {time_seconds:.3f}s")
-                return time_seconds
+        # Premier échantillon > seuil (int32 : abs(-32768) déborde en int16)
+        loud = np.abs(audio_data.astype(np.int32)) > threshold
+        first = int(np.argmax(loud))
+        if loud[first]:
+            # Convertir l'index en secondes
+            time_seconds = first / AUDIO_SAMPLE_RATE
+            logger.debug(f"[SPEECH_DETECTION] {role}: Parole détectée à {time_seconds:.3f}s")
+            return time_seconds
 
         # Aucune parole détectée
         logger.debug(f"[SPEECH_DETECTION] {role}: Aucune parole détectée (silence complet)")
@@ -86,7 +96,8 @@ class TranscriptionService:
         role: str,
         threshold: float = None,
         min_amplitude: int = None,
-        min_audio_length: int = None
+        min_audio_length: int = None,
+        config: Optional[ConfigSnapshot] = None
     ) -> bool:
         """
         Détecte si l'audio est du silence COMPLET
@@ -103,6 +114,7 @@ class TranscriptionService:
             threshold: Seuil RMS (optionnel, utilise config si None)
             min_amplitude: Amplitude min (optionnel, utilise config si None)
             min_audio_length: Durée min (optionnel, utilise config si None)
+            config: Instantané de configuration du chunk (courant si None)
 
         Les seuils sont différents selon la source:
         - CLIENT (navigateur): Plus sensible (audio souvent plus faible)
@@ -117,16 +129,11 @@ class TranscriptionService:
 
         # Seuils réduits de 50% pour ne détecter QUE le silence absolu
         # On laisse Deepgram gérer l'audio faible (il est très performant)
-        if role == "CLIENT":
-            # Audio du navigateur → seuils très sensibles
-            threshold = (threshold or SILENCE_THRESHOLD_BROWSER) * 0.5
-            min_amplitude = (min_amplitude or MIN_AMPLITUDE_BROWSER) * 0.5
-            min_audio_length = (min_audio_length or MIN_AUDIO_LENGTH_BROWSER) * 0.5
-        else:
-            # Audio du micro → seuils réduits
-            threshold = (threshold or SILENCE_THRESHOLD_MIC) * 0.5
-            min_amplitude = (min_amplitude or MIN_AMPLITUDE_MIC) * 0.5
-            min_audio_length = (min_audio_length or MIN_AUDIO_LENGTH_MIC) * 0.5
+        # Audio du navigateur (CLIENT) → seuils très sensibles ; micro → seuils réduits
+        defaults = (config or get_config()).silence_thresholds(role)
+        threshold = (threshold or defaults.rms_threshold) * 0.5
+        min_amplitude = (min_amplitude or defaults.min_amplitude) * 0.5
+        min_audio_length = (min_audio_length or defaults.min_audio_length) * 0.5
 
         # Calcul du RMS (niveau sonore moyen)
         audio_float = audio_data.astype(np.float32)
@@ -291,28 +298,29 @@ class TranscriptionService:
         return False
 
     @staticmethod
-    def clean_transcription(text: str) -> str:
+    def clean_transcription(text: str, config: Optional[ConfigSnapshot] = None) -> str:
         """
         Nettoie les transcriptions parasites
 
-        Filtre les patterns indésirables configurés dans UNWANTED_PATTERNS,
-        vérifie la longueur minimale MIN_TRANSCRIPTION_LENGTH,
-        et détecte les hallucinations (répétitions excessives + YouTube)
+        Filtre les patterns indésirables configurés (unwanted_patterns, une seule regex
+        compilée par rechargement de la config), vérifie la longueur minimale (min_length),
+        et détecte les hallucinations (répétitions excessives + YouTube), avec l'instantané
+        `config` du chunk (courant si None)
         """
         if not text:
             return ""
 
-        text_lower = text.lower()
+        config = config or get_config()
 
         # 1. Vérifier les patterns indésirables (configurables)
-        for pattern in UNWANTED_PATTERNS:
-            if pattern.lower() in text_lower:
-                logger.debug(f"[FILTER] Transcription rejetée (pattern: '{pattern}'): {text}")
-                return ""
+        pattern = config.find_unwanted(text.lower())
+        if pattern is not None:
+            logger.debug(f"[FILTER] Transcription rejetée (pattern: '{pattern}'): {text}")
+            return ""
 
         # 2. Vérifier la longueur minimale (configurable)
-        if len(text.strip()) < MIN_TRANSCRIPTION_LENGTH:
-            logger.debug(f"[FILTER] Transcription trop courte ({len(text.strip())} < {MIN_TRANSCRIPTION_LENGTH}): {text}")
+        if len(text.strip()) < config.min_transcription_length:
+            logger.debug(f"[FILTER] Transcription trop courte ({len(text.strip())} < {config.min_transcription_length}): {text}")
             return ""
 
         # 3. 🆕 Détecter les hallucinations YouTube (NOUVEAU - très agressif)
@@ -332,44 +340,60 @@ class TranscriptionService:
 
         return text
     
-    async def transcribe_audio(self, audio_array: np.ndarray, role: str) -> str:
+    async def transcribe_audio(
+        self,
+        audio_array: np.ndarray,
+        role: str,
+        silent: Optional[bool] = None,
+        config: Optional[ConfigSnapshot] = None
+    ) -> str:
         """
         Transcrit un array audio via Deepgram (ultra-rapide <300ms)
 
         Args:
             audio_array: Array numpy contenant l'audio
             role: Rôle (CLIENT ou COMMERCIAL) pour les logs et seuils de silence
+            silent: Résultat de `is_silence` s'il est déjà calculé (pool audio)
+            config: Instantané de configuration du chunk (courant si None)
 
         Returns:
             Texte transcrit et nettoyé
         """
+        config = config or get_config()
         # Utiliser les seuils adaptés selon la source (CLIENT=navigateur, COMMERCIAL=micro)
-        if self.is_silence(audio_array, role):
+        if self.is_silence(audio_array, role, config=config) if silent is None else silent:
             logger.debug(f"[TRANSCRIPTION DEEPGRAM] {role}: Silence détecté")
             return ""
 
-        tmp_file = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
-        tmp_path = tmp_file.name
-        tmp_file.close()
+        with span("transcription"):
+            return await self._transcribe(audio_array, role, config)
 
+    async def _transcribe(self, audio_array: np.ndarray, role: str, config: ConfigSnapshot) -> str:
+        """Appel Deepgram et nettoyage d'un chunk non silencieux"""
+        metrics = get_metrics()
         try:
-            # Écrire l'audio dans un fichier temporaire
-            sf.write(tmp_path, audio_array, self.sample_rate, subtype=self.subtype)
-
-            # ⚡ DEEPGRAM - Transcription ultra-rapide
-            with open(tmp_path, "rb") as audio_file:
-                buffer_data = audio_file.read()
+            # WAV construit en mémoire (pas de fichier temporaire)
+            wav = io.BytesIO()
+            sf.write(wav, audio_array, self.sample_rate, subtype=self.subtype, format="WAV")
+            buffer_data = wav.getvalue()
 
             # ✅ CORRECTION: request comme bytes directement (pas de dictionnaire)
-            response = await asyncio.to_thread(
-                self.deepgram.listen.v1.media.transcribe_file,
-                request=buffer_data,  # Bytes directement
-                model="nova-2",  # Modèle le plus récent et performant
-                language="fr",   # Français
-                smart_format=True,  # Formatage automatique
-                punctuate=True,  # Ponctuation
-                diarize=False  # Pas de diarisation
-            )
+            start = time.perf_counter()
+            try:
+                response = await asyncio.to_thread(
+                    self.deepgram.listen.v1.media.transcribe_file,
+                    request=buffer_data,  # Bytes directement
+                    model="nova-2",  # Modèle le plus récent et performant
+                    language="fr",   # Français
+                    smart_format=True,  # Formatage automatique
+                    punctuate=True,  # Ponctuation
+                    diarize=False  # Pas de diarisation
+                )
+            except Exception:
+                metrics.record_api_call("deepgram", "transcribe", "error", time.perf_counter() - start)
+                raise
+            seconds = time.perf_counter() - start
+            metrics.record_api_call("deepgram", "transcribe", "ok", seconds)
 
             # Parser la réponse Deepgram
             text = ""
@@ -380,8 +404,12 @@ class TranscriptionService:
                     if alternatives and len(alternatives) > 0:
                         text = alternatives[0].transcript.strip()
 
+            # Texte brut capturé : le rejeu applique le nettoyage de la version rejouée
+            if get_capture().enabled:
+                get_capture().transcript(role, audio_array, text, seconds)
+
             # Nettoyage et filtrage
-            text = self.clean_transcription(text)
+            text = self.clean_transcription(text, config)
 
             if text:
                 # Log avec horodatage
@@ -393,26 +421,28 @@ class TranscriptionService:
         except Exception as e:
             logger.error(f"[TRANSCRIPTION DEEPGRAM] Erreur {role}: {e}")
             return ""
-        finally:
-            try:
-                os.unlink(tmp_path)
-            except:
-                pass
     
     async def transcribe_parallel(
         self,
         client_audio: np.ndarray,
-        commercial_audio: np.ndarray
+        commercial_audio: np.ndarray,
+        silent: Tuple[Optional[bool], Optional[bool]] = (None, None),
+        config: Optional[ConfigSnapshot] = None
     ) -> tuple[str, str]:
         """
         Transcrit les deux audios en parallèle
+
+        Args:
+            silent: Silence (client, commercial) déjà détecté, None = à calculer
+            config: Instantané de configuration du chunk (courant si None)
         
         Returns:
             Tuple (client_text, commercial_text)
         """
+        config = config or get_config()
         client_text, commercial_text = await asyncio.gather(
-            self.transcribe_audio(client_audio, "CLIENT"),
-            self.transcribe_audio(commercial_audio, "COMMERCIAL")
+            self.transcribe_audio(client_audio, "CLIENT", silent[0], config),
+            self.transcribe_audio(commercial_audio, "COMMERCIAL", silent[1], config)
         )
         
         return client_text, commercial_text
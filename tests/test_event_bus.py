@@ -0,0 +1,64 @@
+"""
+Relais Redis du bus d'événements contre le serveur de substitution (tools/redis_standin.py)
+
+Deux EventBus reliés au même serveur jouent deux workers.
+"""
+import asyncio
+
+from core.event_bus import EventBus, RedisEventRelay
+from tools.redis_standin import create_server
+
+
+def run_with_buses(scenario):
+    """Exécute `scenario(url, worker_a, worker_b)` avec un serveur de substitution neuf"""
+
+    async def main():
+        server = await create_server("127.0.0.1", 0)
+        url = f"redis://127.0.0.1:{server.sockets[0].getsockname()[1]}/0"
+        worker_a, worker_b = EventBus(relay=RedisEventRelay(url)), EventBus(relay=RedisEventRelay(url))
+        try:
+            return await scenario(url, worker_a, worker_b)
+        finally:
+            await worker_a.close()
+            await worker_b.close()
+            server.close()
+            await server.wait_closed()
+
+    return asyncio.run(main())
+
+
+async def wait_for(condition, timeout: float = 2.0) -> None:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline, "condition non atteinte"
+        await asyncio.sleep(0.01)
+
+
+def test_events_reach_subscribers_on_other_workers():
+    async def scenario(url, worker_a, worker_b):
+        subscription = worker_a.subscribe("suivie")
+        await worker_a.follow("suivie")
+
+        worker_b.publish("suivie", "phase", {"phase": "discovery"})
+        event = await subscription.get(timeout=2.0)
+        assert (event.id, event.type) == (1, "phase")
+
+    run_with_buses(scenario)
+
+
+def test_unwatched_sessions_are_neither_numbered_nor_published():
+    async def scenario(url, worker_a, worker_b):
+        subscription = worker_a.subscribe("suivie")
+        await worker_a.follow("suivie")
+
+        worker_b.publish("personne", "message", {"text": "bonjour"})
+        worker_b.publish("suivie", "message", {"text": "bonjour"})
+        await wait_for(lambda: worker_b.relay.stats["sent"] + worker_b.relay.stats["unwatched"] == 2)
+
+        assert worker_b.relay.stats["sent"] == 1
+        assert worker_b.relay.stats["unwatched"] == 1
+        assert not await worker_b.relay._redis.exists("kitt:events-seq:personne")
+        assert (await subscription.get(timeout=2.0)).id == 1
+
+    run_with_buses(scenario)
@@ -0,0 +1,132 @@
+"""
+RedisSessionStore contre le serveur de substitution (tools/redis_standin.py)
+
+Chaque test démarre le serveur sur un port libre dans sa propre boucle asyncio.
+"""
+import asyncio
+import time
+
+import pytest
+
+from core.call_manager import CallManager
+from core.session_store import RedisSessionStore, SessionLockLost, SessionLockTimeout, SessionNotFoundError
+from tools.redis_standin import create_server
+
+
+def run_with_store(scenario, **store_options):
+    """Exécute `scenario(store)` avec un store relié à un serveur de substitution neuf"""
+
+    async def main():
+        server = await create_server("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        store = RedisSessionStore(url=f"redis://127.0.0.1:{port}/0", **store_options)
+        try:
+            return await scenario(store)
+        finally:
+            await store._redis.aclose()
+            server.close()
+            await server.wait_closed()
+
+    return asyncio.run(main())
+
+
+def new_manager(call_id: str) -> CallManager:
+    manager = CallManager()
+    manager.call_id = call_id
+    return manager
+
+
+def test_create_get_pop_roundtrip():
+    async def scenario(store):
+        await store.create(new_manager("a"))
+        await store.create(new_manager("b"))
+        assert await store.exists("a")
+        assert (await store.get("a")).call_id == "a"
+        assert await store.count() == 2
+
+        popped = await store.pop("a")
+        assert popped.call_id == "a"
+        assert not await store.exists("a")
+        assert await store.get("a") is None
+        assert await store.pop("a") is None
+        assert await store.count() == 1
+
+    run_with_store(scenario)
+
+
+def test_session_changes_are_persisted():
+    async def scenario(store):
+        await store.create(new_manager("a"))
+        async with store.session("a") as manager:
+            await manager.add_message("user", "Bonjour")
+        assert [m["content"] for m in (await store.get("a")).full_transcript] == ["Bonjour"]
+
+        with pytest.raises(SessionNotFoundError):
+            async with store.session("inconnue"):
+                pass
+
+    run_with_store(scenario)
+
+
+def test_expired_sessions_leave_the_count():
+    async def scenario(store):
+        await store.create(new_manager("abandonnee"))
+        assert await store.count() == 1
+        await asyncio.sleep(1.1)
+        assert not await store.exists("abandonnee")
+        assert await store.count() == 0
+
+        # Une écriture repousse l'expiration
+        await store.create(new_manager("active"))
+        await asyncio.sleep(0.6)
+        async with store.session("active"):
+            pass
+        await asyncio.sleep(0.6)
+        assert await store.exists("active")
+        assert await store.count() == 1
+
+    run_with_store(scenario, session_ttl=1)
+
+
+def test_session_lock_is_exclusive():
+    async def scenario(store):
+        await store.create(new_manager("a"))
+        async with store.session("a"):
+            start = time.monotonic()
+            with pytest.raises(SessionLockTimeout):
+                async with store.session("a"):
+                    pass
+            assert time.monotonic() - start >= store.lock_timeout
+        async with store.session("a"):
+            pass
+
+    run_with_store(scenario, lock_timeout=0.2)
+
+
+def test_lock_is_renewed_while_held():
+    async def scenario(store):
+        await store.create(new_manager("a"))
+        async with store.session("a") as manager:
+            await asyncio.sleep(store.lock_ttl * 4)  # Traitement plus long que le TTL du verrou
+            with pytest.raises(SessionLockTimeout):
+                async with store.session("a"):
+                    pass
+            await manager.add_message("user", "Après un long traitement")
+        assert len((await store.get("a")).full_transcript) == 1
+
+    run_with_store(scenario, lock_ttl=0.3, lock_timeout=0.2)
+
+
+def test_lost_lock_does_not_overwrite_newer_state():
+    async def scenario(store):
+        await store.create(new_manager("a"))
+        with pytest.raises(SessionLockLost):
+            async with store.session("a") as stale:
+                # Verrou expiré puis repris par une autre requête, qui modifie la session
+                await store._redis.delete(store._lock_key("a"))
+                async with store.session("a") as other:
+                    await other.add_message("user", "Mise à jour concurrente")
+                await stale.add_message("user", "Écriture périmée")
+        assert [m["content"] for m in (await store.get("a")).full_transcript] == ["Mise à jour concurrente"]
+
+    run_with_store(scenario)
@@ -0,0 +1,3 @@
+"""
+Outils de développement : serveurs de substitution, test de charge, rejeu
+"""
@@ -0,0 +1,29 @@
+"""
+Export du modèle d'embeddings en ONNX int8 (quantification dynamique)
+
+À lancer une fois (CI ou poste de dev, torch requis), puis déployer le dossier produit
+et démarrer les workers avec EMBEDDING_BACKEND=onnx.
+
+Usage:
+    python -m tools.export_onnx_embeddings [--output model_cache/minilm-l12-onnx-int8]
+"""
+import argparse
+import logging
+from pathlib import Path
+
+from config.settings import EMBEDDING_MODEL_NAME, EMBEDDING_ONNX_DIR
+from services.embedding_backends import export_onnx_model
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export ONNX int8 du modèle d'embeddings")
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME)
+    parser.add_argument("--output", type=Path, default=EMBEDDING_ONNX_DIR)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    export_onnx_model(args.output, args.model)
+
+
+if __name__ == "__main__":
+    main()
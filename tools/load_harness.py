@@ -0,0 +1,225 @@
+"""
+Harnais de charge : rejoue des séquences de chunks audio sur N sessions concurrentes
+
+Chaque session virtuelle suit le parcours réel du frontend :
+    POST /calls/start → N × POST /audio/{id} → GET /calls/{id}/insights
+    → POST /resume/{id} → POST /calls/{id}/end
+
+Format d'enregistrement (JSONL, une ligne par chunk) :
+    {"offset_ms": 0, "client_audio": "<PCM int16 en base64>", "commercial_audio": "<...>"}
+
+Sans enregistrement, des chunks synthétiques (voix simulée au-dessus des seuils de silence)
+sont générés.
+
+Usage:
+    python -m tools.load_harness --base-url http://127.0.0.1:8000 --sessions 20 --chunks 30
+    python -m tools.load_harness --recording session.jsonl --sessions 50 --no-pacing --json report.json
+    python -m tools.load_harness --sessions 20 --no-pacing --parallel 4   # chunks numérotés, 4 envois en vol
+"""
+import argparse
+import asyncio
+import base64
+import json
+import math
+import random
+import struct
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+SAMPLE_RATE = 44100
+
+
+def synthetic_chunk(seconds: float = 2.0, amplitude: int = 4000) -> bytes:
+    """Génère un chunk PCM int16 (sinusoïde modulée + bruit) au-dessus des seuils de silence"""
+    n = int(seconds * SAMPLE_RATE)
+    freq = random.uniform(120, 260)
+    samples = (
+        int(amplitude * math.sin(2 * math.pi * freq * i / SAMPLE_RATE) * (0.6 + 0.4 * math.sin(i / 5000)))
+        + random.randint(-200, 200)
+        for i in range(n)
+    )
+    return struct.pack(f"<{n}h", *samples)
+
+
+def load_recording(path: Path) -> List[Tuple[float, bytes, bytes]]:
+    """Charge un enregistrement JSONL → [(offset_s, client_pcm, commercial_pcm)]"""
+    chunks = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            chunks.append((
+                entry.get("offset_ms", 0) / 1000.0,
+                base64.b64decode(entry["client_audio"]),
+                base64.b64decode(entry["commercial_audio"]),
+            ))
+    return chunks
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p
+    low, high = math.floor(k), math.ceil(k)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (k - low)
+
+
+class LoadStats:
+    """Collecte les latences par endpoint (chemin normalisé)"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.outcomes: Dict[str, int] = defaultdict(int)
+
+    def record(self, endpoint: str, seconds: float, ok: bool) -> None:
+        self.latencies[endpoint].append(seconds)
+        if not ok:
+            self.errors[endpoint] += 1
+
+    def report(self, elapsed: float) -> Dict:
+        total = sum(len(v) for v in self.latencies.values())
+        endpoints = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            endpoints[endpoint] = {
+                "count": len(values),
+                "errors": self.errors[endpoint],
+                "p50_ms": round(percentile(values, 0.50) * 1000, 1),
+                "p95_ms": round(percentile(values, 0.95) * 1000, 1),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 1),
+                "max_ms": round(values[-1] * 1000, 1),
+            }
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 2) if elapsed > 0 else 0.0,
+            "endpoints": endpoints,
+            "audio_outcomes": dict(self.outcomes),
+        }
+
+
+async def timed(stats: LoadStats, endpoint: str, coro) -> Optional[httpx.Response]:
+    start = time.perf_counter()
+    try:
+        response = await coro
+        stats.record(endpoint, time.perf_counter() - start, response.status_code < 400)
+        return response
+    except httpx.HTTPError:
+        stats.record(endpoint, time.perf_counter() - start, False)
+        return None
+
+
+async def run_session(
+    client: httpx.AsyncClient,
+    stats: LoadStats,
+    chunks: List[Tuple[float, bytes, bytes]],
+    pacing: bool,
+    with_summary: bool,
+    parallel: int = 1
+) -> None:
+    response = await timed(stats, "POST /calls/start", client.post("/calls/start"))
+    if response is None or response.status_code >= 400:
+        return
+    call_id = response.json()["call_id"]
+
+    # parallel > 1 : chunks numérotés (X-Chunk-Seq), jusqu'à `parallel` envois en vol
+    in_flight = asyncio.Semaphore(parallel)
+
+    async def send_chunk(seq: int, client_pcm: bytes, commercial_pcm: bytes) -> None:
+        files = {
+            "client_audio": ("client.raw", client_pcm, "application/octet-stream"),
+            "commercial_audio": ("commercial.raw", commercial_pcm, "application/octet-stream"),
+        }
+        headers = {"X-Chunk-Seq": str(seq)} if parallel > 1 else None
+        try:
+            response = await timed(
+                stats, "POST /audio/{id}", client.post(f"/audio/{call_id}", files=files, headers=headers)
+            )
+        finally:
+            in_flight.release()
+        if response is not None and response.status_code < 400:
+            body = response.json()
+            outcome = "accepted" if body.get("advice") else body.get("reason", "no_advice")
+            stats.outcomes[outcome] += 1
+
+    started = time.perf_counter()
+    uploads = []
+    for seq, (offset, client_pcm, commercial_pcm) in enumerate(chunks):
+        if pacing:
+            delay = offset - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        await in_flight.acquire()
+        uploads.append(asyncio.create_task(send_chunk(seq, client_pcm, commercial_pcm)))
+    await asyncio.gather(*uploads)
+
+    await timed(stats, "GET /calls/{id}/insights", client.get(f"/calls/{call_id}/insights"))
+    if with_summary:
+        payload = {"call_id": call_id, "user_message": "", "timestamp": time.time()}
+        await timed(stats, "POST /resume/{id}", client.post(f"/resume/{call_id}", json=payload))
+    await timed(stats, "POST /calls/{id}/end", client.post(f"/calls/{call_id}/end"))
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    if args.recording:
+        chunks = load_recording(args.recording)[: args.chunks or None]
+    else:
+        chunks = [
+            (i * args.chunk_interval, synthetic_chunk(), synthetic_chunk())
+            for i in range(args.chunks)
+        ]
+
+    stats = LoadStats()
+    limits = httpx.Limits(max_connections=args.sessions * 2)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            run_session(client, stats, chunks, not args.no_pacing, not args.no_summary, args.parallel)
+            for _ in range(args.sessions)
+        ))
+        elapsed = time.perf_counter() - start
+
+    return stats.report(elapsed)
+
+
+def print_report(report: Dict) -> None:
+    print(f"\n{'='*80}")
+    print(f"📊 RAPPORT DE CHARGE - {report['requests']} requêtes en {report['elapsed_s']}s "
+          f"({report['throughput_rps']} req/s)")
+    print(f"{'='*80}")
+    print(f"{'Endpoint':<28}{'count':>7}{'err':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for endpoint, row in report["endpoints"].items():
+        print(f"{endpoint:<28}{row['count']:>7}{row['errors']:>6}{row['p50_ms']:>10}"
+              f"{row['p95_ms']:>10}{row['p99_ms']:>10}{row['max_ms']:>10}")
+    print(f"\nIssues /audio : {report['audio_outcomes']}")
+    print(f"{'='*80}\n")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Test de charge KITT par rejeu de chunks")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--sessions", type=int, default=10, help="Sessions concurrentes")
+    parser.add_argument("--chunks", type=int, default=20, help="Chunks par session")
+    parser.add_argument("--recording", type=Path, help="Enregistrement JSONL à rejouer")
+    parser.add_argument("--chunk-interval", type=float, default=2.0, help="Intervalle des chunks synthétiques (s)")
+    parser.add_argument("--no-pacing", action="store_true", help="Envoyer les chunks sans attendre")
+    parser.add_argument("--no-summary", action="store_true", help="Ne pas appeler /resume en fin d'appel")
+    parser.add_argument("--parallel", type=int, default=1, help="Envois de chunks simultanés par session")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--json", type=Path, help="Écrire le rapport JSON dans ce fichier")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Serveur local de substitution pour les API OpenAI et Deepgram
+
+Permet de lancer `main:app` et de le tester en charge sans clés réelles :
+les réponses sont préenregistrées et la latence suit une distribution configurable.
+
+Usage:
+    python -m tools.mock_apis --port 8900 --llm-latency lognormal:600:1500 --stt-latency lognormal:250:600
+
+Puis démarrer le backend en pointant vers le serveur local :
+    OPENAI_API_KEY=local OPENAI_BASE_URL=http://127.0.0.1:8900/v1 \\
+    DEEPGRAM_API_KEY=local DEEPGRAM_BASE_URL=http://127.0.0.1:8900 \\
+    uvicorn main:app --port 8000
+
+Distributions de latence (en millisecondes) :
+    fixed:300              → toujours 300 ms
+    uniform:200:800        → uniforme entre 200 et 800 ms
+    lognormal:600:1500     → médiane 600 ms, p95 1500 ms
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import random
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+
+# ═══════════════════════════════════════════════════════════════════════════
+# RÉPONSES PRÉENREGISTRÉES
+# ═══════════════════════════════════════════════════════════════════════════
+DEFAULT_RESPONSES: Dict[str, Any] = {
+    "coaching": [
+        "🟢 Contexte compris - Creuser l'impact chiffré du problème",
+        "🔵 Signal d'achat - Proposer une démo la semaine prochaine",
+        "🔴 Objection prix - Recentrer sur le ROI mesuré",
+        "🟢 Pain identifié - Demander combien d'heures sont perdues",
+        "🔵 Décideur cité - Valider qui signe et le budget",
+    ],
+    "phase": ["introduction", "discovery", "discovery", "presentation", "negotiation", "closing"],
+    "duplicate": [
+        {"is_duplicate": False, "reason": "Angle différent", "similarity_score": 0.3, "time_factor": "recent"}
+    ],
+    "summary_client": [{
+        "summary": {"main": "Le client cherche à mieux qualifier ses leads.", "details": "Résumé de substitution."},
+        "next_actions": {"priority": "medium", "actions": [], "follow_up": "Relance sous une semaine"},
+        "key_points": {
+            "strengths": ["Écoute"], "weaknesses": ["Peu de chiffres"], "improvements": ["Quantifier"],
+            "score": {"value": 14, "comment": "Réponse de substitution"}
+        }
+    }],
+    "summary_commercial": [{
+        "summary": "Appel de substitution.",
+        "strengths": ["Écoute"],
+        "weaknesses": ["Closing"],
+        "ratings": {"politeness": 8, "listening": 7, "persuasion": 6, "clarity": 7,
+                    "objection_handling": 6, "overall": 7}
+    }],
+    "rolling_summary": ["Le client a décrit son contexte et un problème de qualification des leads."],
+    "transcripts": [
+        "Bonjour, merci de prendre le temps pour cet appel.",
+        "Aujourd'hui on perd beaucoup de temps sur la qualification des leads.",
+        "Combien d'heures par semaine votre équipe passe sur ce problème ?",
+        "Je dirais dix heures par commercial, c'est frustrant.",
+        "Qui d'autre est impliqué dans la décision et quel est le budget ?",
+        "On pourrait organiser une démo avec votre directeur commercial.",
+    ],
+}
+
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """Construit un générateur de latence (secondes) depuis une spécification texte"""
+    kind, *params = spec.split(":")
+    values = [float(p) / 1000.0 for p in params]
+
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        low, high = values
+        return lambda: random.uniform(low, high)
+    if kind == "lognormal":
+        median, p95 = values
+        mu = math.log(median)
+        sigma = max(math.log(p95 / median) / 1.645, 1e-6)
+        return lambda: random.lognormvariate(mu, sigma)
+    raise ValueError(f"Distribution de latence inconnue: {spec}")
+
+
+class CannedResponses:
+    """Fait tourner les réponses préenregistrées de chaque catégorie"""
+
+    def __init__(self, responses: Dict[str, Any]):
+        self._cycles = {key: itertools.cycle(values) for key, values in responses.items()}
+
+    def next(self, kind: str) -> Any:
+        return next(self._cycles[kind])
+
+
+def classify_prompt(prompt: str) -> str:
+    """Devine le type d'appel LLM à partir du prompt envoyé par le backend"""
+    if "PILIERS DE DISCOVERY" in prompt:
+        return "coaching"
+    if "Phase:" in prompt:
+        return "phase"
+    if "is_duplicate" in prompt:
+        return "duplicate"
+    if "objection_handling" in prompt:
+        return "summary_commercial"
+    if "next_actions" in prompt:
+        return "summary_client"
+    return "rolling_summary"
+
+
+def create_app(
+    llm_latency: Callable[[], float],
+    stt_latency: Callable[[], float],
+    responses: Optional[Dict[str, Any]] = None
+) -> FastAPI:
+    """Crée l'application de substitution"""
+    canned = CannedResponses({**DEFAULT_RESPONSES, **(responses or {})})
+    app = FastAPI(title="KITT - API de substitution")
+    app.state.counters = {"chat_completions": 0, "listen": 0}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request) -> Dict[str, Any]:
+        body = await request.json()
+        prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+        kind = classify_prompt(prompt)
+        content = canned.next(kind)
+        if not isinstance(content, str):
+            content = json.dumps(content, ensure_ascii=False)
+
+        await asyncio.sleep(llm_latency())
+        app.state.counters["chat_completions"] += 1
+
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = len(content) // 4
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }
+
+    @app.post("/v1/listen")
+    async def listen(request: Request) -> Dict[str, Any]:
+        audio = await request.body()
+        transcript = canned.next("transcripts")
+
+        await asyncio.sleep(stt_latency())
+        app.state.counters["listen"] += 1
+
+        return {
+            "metadata": {
+                "request_id": str(uuid.uuid4()),
+                "created": time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "duration": len(audio) / 2 / 44100,
+                "channels": 1,
+                "models": ["nova-2"],
+                "model_info": {}
+            },
+            "results": {
+                "channels": [{
+                    "alternatives": [{"transcript": transcript, "confidence": 0.98, "words": []}]
+                }]
+            }
+        }
+
+    @app.get("/stats")
+    async def stats() -> Dict[str, int]:
+        return app.state.counters
+
+    return app
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Serveur de substitution OpenAI + Deepgram")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--llm-latency", default="lognormal:600:1500", help="Latence des complétions LLM")
+    parser.add_argument("--stt-latency", default="lognormal:250:600", help="Latence de la transcription")
+    parser.add_argument("--responses", type=Path, help="Fichier JSON remplaçant les réponses par défaut")
+    args = parser.parse_args(argv)
+
+    responses = json.loads(args.responses.read_text(encoding="utf-8")) if args.responses else None
+    app = create_app(parse_latency(args.llm_latency), parse_latency(args.stt_latency), responses)
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,421 @@
+"""
+Serveur local parlant le protocole Redis (RESP2/RESP3), pour tester SESSION_STORE=redis sans Redis
+
+Implémente le sous-ensemble de commandes utilisé par core/session_store.py et le relais
+d'événements de core/event_bus.py :
+HELLO, PING, GET, SET (NX/XX/EX/PX), DEL, EXISTS, INCR, EXPIRE, SADD, SREM, SCARD, SMEMBERS,
+ZADD, ZREM, ZCARD, ZSCORE, ZREMRANGEBYSCORE, DBSIZE, FLUSHDB, PUBLISH, SUBSCRIBE, UNSUBSCRIBE,
+PUBSUB NUMSUB, EVAL/EVALSHA/SCRIPT LOAD. Il n'y a pas
+d'interpréteur Lua : les scripts connus du backend sont émulés en Python (voir KNOWN_SCRIPTS).
+
+Usage:
+    python -m tools.redis_standin --port 6390
+
+Puis lancer plusieurs workers partageant les sessions :
+    SESSION_STORE=redis REDIS_URL=redis://127.0.0.1:6390/0 uvicorn main:app --workers 4
+"""
+import argparse
+import asyncio
+import hashlib
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from core.event_bus import PUBLISH_EVENT_SCRIPT
+from core.session_store import RELEASE_LOCK_SCRIPT, RENEW_LOCK_SCRIPT, WRITE_SESSION_SCRIPT
+
+
+class RespError(Exception):
+    """Erreur renvoyée au client (réponse '-ERR ...')"""
+
+
+class Push(list):
+    """Message poussé hors réponse à une commande (pub/sub : type push en RESP3)"""
+
+
+class Database:
+    """Clés chaînes, ensembles et ensembles triés, avec expiration paresseuse ; abonnés pub/sub"""
+
+    def __init__(self):
+        self.data: Dict[bytes, Any] = {}
+        self.expires: Dict[bytes, float] = {}
+        self.channels: Dict[bytes, Set["CommandHandler"]] = {}
+
+    def _alive(self, key: bytes) -> bool:
+        deadline = self.expires.get(key)
+        if deadline is not None and time.monotonic() >= deadline:
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def get(self, key: bytes) -> Optional[Any]:
+        return self.data[key] if self._alive(key) else None
+
+    def set(self, key: bytes, value: Any, ttl: Optional[float] = None) -> None:
+        self.data[key] = value
+        if ttl is None:
+            self.expires.pop(key, None)
+        else:
+            self.expires[key] = time.monotonic() + ttl
+
+    def delete(self, key: bytes) -> int:
+        existed = self._alive(key)
+        self.data.pop(key, None)
+        self.expires.pop(key, None)
+        return int(existed)
+
+    def incr(self, key: bytes) -> int:
+        value = int(self.get(key) or 0) + 1
+        deadline = self.expires.get(key)
+        self.data[key] = str(value).encode()
+        if deadline is not None:
+            self.expires[key] = deadline
+        return value
+
+    def expire(self, key: bytes, ttl: float) -> int:
+        if not self._alive(key):
+            return 0
+        self.expires[key] = time.monotonic() + ttl
+        return 1
+
+    def publish(self, channel: bytes, message: bytes) -> int:
+        subscribers = self.channels.get(channel, ())
+        for handler in subscribers:
+            handler.push(Push([b"message", channel, message]))
+        return len(subscribers)
+
+    def set_members(self, key: bytes, create: bool = False) -> Optional[set]:
+        value = self.get(key)
+        if value is None and create:
+            value = set()
+            self.set(key, value)
+        if value is not None and not isinstance(value, set):
+            raise RespError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def sorted_members(self, key: bytes, create: bool = False) -> Optional[Dict[bytes, float]]:
+        """Ensemble trié : membre → score"""
+        value = self.get(key)
+        if value is None and create:
+            value = {}
+            self.set(key, value)
+        if value is not None and not isinstance(value, dict):
+            raise RespError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+
+def _score_range(low: bytes, high: bytes) -> Callable[[float], bool]:
+    """Intervalle de ZREMRANGEBYSCORE : -inf, +inf, borne incluse ou exclue ("(1.5")"""
+    low_open, high_open = low.startswith(b"("), high.startswith(b"(")
+    low_value, high_value = float(low.lstrip(b"(")), float(high.lstrip(b"("))
+    return lambda score: (score > low_value if low_open else score >= low_value) and (
+        score < high_value if high_open else score <= high_value
+    )
+
+
+def _release_lock(db: Database, keys: List[bytes], args: List[bytes]) -> int:
+    if db.get(keys[0]) == args[0]:
+        return db.delete(keys[0])
+    return 0
+
+
+def _renew_lock(db: Database, keys: List[bytes], args: List[bytes]) -> int:
+    if db.get(keys[0]) == args[0]:
+        return db.expire(keys[0], int(args[1]) / 1000)
+    return 0
+
+
+def _write_session(db: Database, keys: List[bytes], args: List[bytes]) -> int:
+    if db.get(keys[0]) != args[0]:
+        return 0
+    db.set(keys[1], args[1], int(args[2]))
+    db.sorted_members(keys[2], create=True)[args[4]] = float(args[3])
+    return 1
+
+
+def _publish_event(db: Database, keys: List[bytes], args: List[bytes]) -> int:
+    if not db.channels.get(args[0]):
+        return 0
+    event_id = db.incr(keys[0])
+    db.expire(keys[0], int(args[2]))
+    db.publish(args[0], str(event_id).encode() + b" " + args[1])
+    return event_id
+
+
+KNOWN_SCRIPTS: Dict[str, Callable[[Database, List[bytes], List[bytes]], Any]] = {
+    hashlib.sha1(RELEASE_LOCK_SCRIPT.encode("utf-8")).hexdigest(): _release_lock,
+    hashlib.sha1(RENEW_LOCK_SCRIPT.encode("utf-8")).hexdigest(): _renew_lock,
+    hashlib.sha1(WRITE_SESSION_SCRIPT.encode("utf-8")).hexdigest(): _write_session,
+    hashlib.sha1(PUBLISH_EVENT_SCRIPT.encode("utf-8")).hexdigest(): _publish_event,
+}
+
+
+class CommandHandler:
+    """Exécute les commandes d'une connexion (base partagée, protocole propre à la connexion)"""
+
+    def __init__(self, db: Database, writer: Optional[asyncio.StreamWriter] = None):
+        self.db = db
+        self.writer = writer
+        self.protocol = 2
+        self.subscriptions: Set[bytes] = set()
+
+    def push(self, message: Push) -> None:
+        if self.writer is not None:
+            self.writer.write(encode(message, self.protocol))
+
+    def close(self) -> None:
+        """Connexion fermée : ses abonnements disparaissent"""
+        for channel in self.subscriptions:
+            self.db.channels.get(channel, set()).discard(self)
+        self.subscriptions.clear()
+
+    def execute(self, args: List[bytes]) -> Any:
+        name = args[0].decode().lower()
+        method = getattr(self, f"cmd_{name}", None)
+        if method is None:
+            raise RespError(f"ERR unknown command '{name}'")
+        return method(*args[1:])
+
+    def cmd_ping(self, *args):
+        return args[0] if args else "PONG"
+
+    def cmd_hello(self, *args):
+        if args:
+            self.protocol = int(args[0])
+        # Carte renvoyée sous forme de tableau clé/valeur (accepté par les clients RESP3)
+        return [b"server", b"redis", b"version", b"7.2.0", b"proto", self.protocol]
+
+    def cmd_select(self, db):
+        return "OK"
+
+    def cmd_client(self, *args):
+        return "OK"
+
+    def cmd_get(self, key):
+        value = self.db.get(key)
+        if isinstance(value, (set, dict)):
+            raise RespError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def cmd_set(self, key, value, *options):
+        ttl, nx, xx = None, False, False
+        options = [o.upper() for o in options]
+        i = 0
+        while i < len(options):
+            option = options[i]
+            if option == b"NX":
+                nx = True
+            elif option == b"XX":
+                xx = True
+            elif option in (b"EX", b"PX"):
+                i += 1
+                ttl = int(options[i]) / (1 if option == b"EX" else 1000)
+            else:
+                raise RespError("ERR syntax error")
+            i += 1
+
+        exists = self.db.get(key) is not None
+        if (nx and exists) or (xx and not exists):
+            return None
+        self.db.set(key, value, ttl)
+        return "OK"
+
+    def cmd_del(self, *keys):
+        return sum(self.db.delete(key) for key in keys)
+
+    def cmd_exists(self, *keys):
+        return sum(self.db.get(key) is not None for key in keys)
+
+    def cmd_incr(self, key):
+        return self.db.incr(key)
+
+    def cmd_expire(self, key, seconds):
+        return self.db.expire(key, int(seconds))
+
+    def cmd_publish(self, channel, message):
+        return self.db.publish(channel, message)
+
+    def cmd_subscribe(self, *channels):
+        if not channels:
+            raise RespError("ERR wrong number of arguments for 'subscribe' command")
+        for channel in channels:
+            self.subscriptions.add(channel)
+            self.db.channels.setdefault(channel, set()).add(self)
+            self.push(Push([b"subscribe", channel, len(self.subscriptions)]))
+        return None
+
+    def cmd_unsubscribe(self, *channels):
+        for channel in channels or list(self.subscriptions):
+            self.subscriptions.discard(channel)
+            self.db.channels.get(channel, set()).discard(self)
+            self.push(Push([b"unsubscribe", channel, len(self.subscriptions)]))
+        return None
+
+    def cmd_pubsub(self, subcommand, *channels):
+        if subcommand.upper() != b"NUMSUB":
+            raise RespError("ERR unknown PUBSUB subcommand")
+        return [value for channel in channels for value in (channel, len(self.db.channels.get(channel, ())))]
+
+    def cmd_sadd(self, key, *members):
+        values = self.db.set_members(key, create=True)
+        before = len(values)
+        values.update(members)
+        return len(values) - before
+
+    def cmd_srem(self, key, *members):
+        values = self.db.set_members(key) or set()
+        removed = sum(1 for m in members if m in values)
+        values.difference_update(members)
+        return removed
+
+    def cmd_scard(self, key):
+        return len(self.db.set_members(key) or ())
+
+    def cmd_smembers(self, key):
+        return sorted(self.db.set_members(key) or ())
+
+    def cmd_zadd(self, key, *pairs):
+        if not pairs or len(pairs) % 2:
+            raise RespError("ERR syntax error")
+        values = self.db.sorted_members(key, create=True)
+        added = 0
+        for score, member in zip(pairs[::2], pairs[1::2]):
+            added += member not in values
+            values[member] = float(score)
+        return added
+
+    def cmd_zrem(self, key, *members):
+        values = self.db.sorted_members(key) or {}
+        return sum(values.pop(member, None) is not None for member in members)
+
+    def cmd_zcard(self, key):
+        return len(self.db.sorted_members(key) or ())
+
+    def cmd_zscore(self, key, member):
+        score = (self.db.sorted_members(key) or {}).get(member)
+        return None if score is None else repr(score).encode()
+
+    def cmd_zremrangebyscore(self, key, low, high):
+        values = self.db.sorted_members(key) or {}
+        in_range = _score_range(low, high)
+        removed = [member for member, score in values.items() if in_range(score)]
+        for member in removed:
+            del values[member]
+        return len(removed)
+
+    def cmd_dbsize(self):
+        return sum(1 for key in list(self.db.data) if self.db.get(key) is not None)
+
+    def cmd_flushdb(self, *args):
+        self.db.data.clear()
+        self.db.expires.clear()
+        return "OK"
+
+    def cmd_script(self, subcommand, *args):
+        subcommand = subcommand.upper()
+        if subcommand == b"LOAD":
+            sha = hashlib.sha1(args[0]).hexdigest()
+            if sha not in KNOWN_SCRIPTS:
+                raise RespError("ERR script non émulé par le serveur de substitution")
+            return sha
+        if subcommand == b"EXISTS":
+            return [int(a.decode() in KNOWN_SCRIPTS) for a in args]
+        raise RespError("ERR unknown SCRIPT subcommand")
+
+    def _run_script(self, sha: str, numkeys, *rest):
+        script = KNOWN_SCRIPTS.get(sha)
+        if script is None:
+            raise RespError("NOSCRIPT No matching script. Please use EVAL.")
+        numkeys = int(numkeys)
+        return script(self.db, list(rest[:numkeys]), list(rest[numkeys:]))
+
+    def cmd_evalsha(self, sha, numkeys, *rest):
+        return self._run_script(sha.decode(), numkeys, *rest)
+
+    def cmd_eval(self, script, numkeys, *rest):
+        return self._run_script(hashlib.sha1(script).hexdigest(), numkeys, *rest)
+
+
+def encode(value: Any, protocol: int = 2) -> bytes:
+    """Encode une réponse RESP (seul le nul diffère entre RESP2 et RESP3 ici)"""
+    if value is None:
+        return b"_\r\n" if protocol == 3 else b"$-1\r\n"
+    if isinstance(value, RespError):
+        return f"-{value}\r\n".encode()
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, int):
+        return f":{value}\r\n".encode()
+    if isinstance(value, str):
+        return f"+{value}\r\n".encode()
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    if isinstance(value, Push):
+        return (b">" if protocol == 3 else b"*") + b"%d\r\n" % len(value) + b"".join(encode(v, protocol) for v in value)
+    if isinstance(value, (list, tuple)):
+        return b"*%d\r\n" % len(value) + b"".join(encode(v, protocol) for v in value)
+    raise TypeError(f"Type de réponse non supporté: {type(value)}")
+
+
+async def read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+    """Lit une commande RESP (tableau de bulk strings, ou commande inline)"""
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        return line.strip().split()
+
+    args = []
+    for _ in range(int(line[1:].strip())):
+        header = await reader.readline()
+        length = int(header[1:].strip())
+        args.append((await reader.readexactly(length + 2))[:-2])
+    return args
+
+
+def create_server(host: str, port: int):
+    db = Database()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        handler = CommandHandler(db, writer)
+        try:
+            while True:
+                args = await read_command(reader)
+                if args is None:
+                    break
+                if not args:
+                    continue
+                try:
+                    response = handler.execute(args)
+                except RespError as e:
+                    response = e
+                except (TypeError, ValueError):
+                    response = RespError(f"ERR wrong arguments for '{args[0].decode().lower()}' command")
+                if args[0].upper() not in (b"SUBSCRIBE", b"UNSUBSCRIBE") or isinstance(response, RespError):
+                    # (UN)SUBSCRIBE : une réponse par canal, déjà poussée
+                    writer.write(encode(response, handler.protocol))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            handler.close()
+            writer.close()
+
+    return asyncio.start_server(handle, host, port)
+
+
+async def serve(host: str, port: int) -> None:
+    server = await create_server(host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Serveur de substitution Redis")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args(argv)
+    asyncio.run(serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
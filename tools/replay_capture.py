@@ -0,0 +1,342 @@
+"""
+Rejeu déterministe de sessions capturées (CAPTURE_DIR, voir services/capture.py)
+
+Chaque capture est rejouée dans le process, par le vrai chemin POST /audio/{id} (transport
+ASGI, sans serveur), avec des backends simulés :
+- Deepgram : texte brut capturé pour le même audio, nettoyé par la version rejouée
+- OpenAI   : réponse capturée pour les mêmes messages ; si le prompt a changé (réglage,
+             historique différent), réponse suivante non utilisée de la même opération
+- horloge  : virtuelle, fixée à l'heure d'arrivée capturée de chaque chunk (cooldowns,
+             fenêtres de l'anti-doublon et de la pertinence identiques à la production)
+
+Les chunks sont rejoués un par un, sans attendre : une session d'une heure se rejoue en
+quelques secondes. --api-latency rejoue aussi la durée capturée des appels API.
+
+Rapport : issues capturées vs rejouées, chunks dont l'issue ou l'insight diffère, durée
+par étape de /audio (moyenne, p50, p95) et réponses manquantes. --json écrit le rapport,
+--baseline compare les durées par étape à un rapport précédent (autre version, autre réglage).
+
+Usage:
+    python -m tools.replay_capture captures/*.kcap
+    python -m tools.replay_capture captures/abc.kcap --json new.json --baseline old.json
+    python -m tools.replay_capture captures/abc.kcap --api-latency   # durées comparables à la capture
+"""
+import os
+
+# Le rejeu ne se capture pas lui-même, et n'a pas besoin de clés d'API
+os.environ["CAPTURE_DIR"] = ""
+os.environ.setdefault("OPENAI_API_KEY", "replay")
+os.environ.setdefault("DEEPGRAM_API_KEY", "replay")
+os.environ.setdefault("SESSION_SNAPSHOT_DIR", "")
+
+import argparse
+import asyncio
+import importlib
+import json
+import logging
+import time
+from collections import Counter, defaultdict, deque
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import httpx
+
+import services.llm_scheduler as llm_scheduler_module
+import services.metrics as metrics_module
+from services.capture import audio_key, messages_key, read_capture
+from services.llm_scheduler import LLMPriority, LLMScheduler
+from services.metrics import Metrics
+from services.transcription import TranscriptionService
+
+# Modules dont les décisions lisent l'heure via datetime.now()
+CLOCK_MODULES = ("api.audio", "core.call_manager", "services.relevance_filter", "services.duplicate_detector")
+
+
+# ----------------------------------------------------------------------
+# Capture chargée
+# ----------------------------------------------------------------------
+class CapturedResponses:
+    """Réponses capturées, consommées une fois chacune (par empreinte, puis dans l'ordre)"""
+
+    def __init__(self):
+        self._by_key: Dict[Tuple[str, str], Deque[Dict]] = defaultdict(deque)
+        self._by_kind: Dict[str, Deque[Dict]] = defaultdict(deque)
+        self._used = set()
+        self.stats: Counter = Counter()
+
+    def add(self, kind: str, key: str, record: Dict) -> None:
+        self._by_key[(kind, key)].append(record)
+        self._by_kind[kind].append(record)
+
+    def take(self, kind: str, key: str, fallback: bool = True) -> Optional[Dict]:
+        queues = [(self._by_key[(kind, key)], "exact")]
+        if fallback:
+            queues.append((self._by_kind[kind], "fallback"))
+        for pending, hit in queues:
+            while pending:
+                record = pending.popleft()
+                if id(record) not in self._used:
+                    self._used.add(id(record))
+                    self.stats[f"{kind.split(':')[0]}_{hit}"] += 1
+                    return record
+        self.stats[f"{kind.split(':')[0]}_missing"] += 1
+        return None
+
+
+class CapturedSession:
+    """Chunks d'une capture (avec leur issue capturée) et réponses des API"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.chunks: List[Dict[str, Any]] = []
+        self.responses = CapturedResponses()
+        by_time = {}
+        for meta, data in read_capture(path):
+            kind = meta["kind"]
+            if kind == "chunk":
+                split = meta["client_bytes"]
+                chunk = {**meta, "client": data[:split], "commercial": data[split:], "result": None}
+                self.chunks.append(chunk)
+                by_time[meta["t"]] = chunk
+            elif kind == "transcript":
+                self.responses.add(f"transcript:{meta['role']}", meta["audio"], meta)
+            elif kind == "llm":
+                self.responses.add(meta["operation"], meta["key"], meta)
+            elif kind == "result" and meta["chunk"] in by_time:
+                by_time[meta["chunk"]]["result"] = meta
+
+
+# ----------------------------------------------------------------------
+# Backends simulés
+# ----------------------------------------------------------------------
+class VirtualClock:
+    """Heure lue par datetime.now() dans CLOCK_MODULES"""
+
+    now = 0.0
+
+    @classmethod
+    def install(cls) -> None:
+        class VirtualDatetime(datetime):
+            @classmethod
+            def now(klass, tz=None):
+                return datetime.fromtimestamp(cls.now, tz)
+
+        for name in CLOCK_MODULES:
+            importlib.import_module(name).datetime = VirtualDatetime
+
+
+class ReplayTranscriptionService(TranscriptionService):
+    """Transcription : texte brut capturé pour le même audio"""
+
+    def __init__(self, api_latency: bool = False):
+        self.sample_rate = 0
+        self.subtype = None
+        self.api_latency = api_latency
+        self.responses = CapturedResponses()
+
+    async def _transcribe(self, audio_array, role: str, config) -> str:
+        record = self.responses.take(f"transcript:{role}", audio_key(audio_array, role), fallback=False)
+        if record is None:
+            return ""
+        if self.api_latency:
+            await asyncio.sleep(record["seconds"])
+        return self.clean_transcription(record["text"], config)
+
+
+class ReplayLLMScheduler(LLMScheduler):
+    """Appels OpenAI : réponse capturée pour les mêmes messages (ou la suivante de l'opération)"""
+
+    def __init__(self, api_latency: bool = False):
+        super().__init__()
+        self.api_latency = api_latency
+        self.responses = CapturedResponses()
+
+    async def chat_completion(self, *, priority: LLMPriority, session_id: Optional[str] = None, **kwargs) -> Any:
+        record = self.responses.take(priority.name.lower(), messages_key(kwargs.get("messages")))
+        if record is None:
+            raise RuntimeError(f"Réponse {priority.name.lower()} absente de la capture")
+        if self.api_latency:
+            await asyncio.sleep(record["seconds"])
+        usage = record.get("usage") or {}
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=record["content"]))],
+            usage=SimpleNamespace(
+                prompt_tokens=usage.get("prompt"),
+                completion_tokens=usage.get("completion"),
+                total_tokens=(usage.get("prompt") or 0) + (usage.get("completion") or 0)
+            ) if usage else None
+        )
+
+
+class _Samples:
+    def __init__(self):
+        self.values: Dict[str, List[float]] = defaultdict(list)
+
+    def observe(self, value: float, label: str) -> None:
+        self.values[label].append(value)
+
+
+class RecordingMetrics(Metrics):
+    """Métriques gardant chaque durée d'étape (percentiles exacts)"""
+
+    def __init__(self):
+        super().__init__(enabled=True)
+        self.stages = _Samples()
+        self.stage_seconds = self.stages
+
+
+# ----------------------------------------------------------------------
+# Rejeu
+# ----------------------------------------------------------------------
+def _summary(values: List[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000, 2)
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+        "p50_ms": pick(0.5),
+        "p95_ms": pick(0.95),
+    }
+
+
+async def replay_session(
+    client: httpx.AsyncClient,
+    session: CapturedSession,
+    transcription: ReplayTranscriptionService,
+    llm: ReplayLLMScheduler
+) -> Dict[str, Any]:
+    from api.audio import _outcome
+
+    transcription.responses = llm.responses = session.responses
+    if session.chunks:
+        VirtualClock.now = session.chunks[0]["t"]
+    call_id = (await client.post("/calls/start")).json()["call_id"]
+
+    outcomes = {"captured": Counter(), "replayed": Counter()}
+    diffs, captured_seconds, replayed_seconds = [], [], []
+    for index, chunk in enumerate(session.chunks):
+        VirtualClock.now = chunk["t"]
+        headers = {"X-Chunk-Seq": str(chunk["seq"])} if chunk["seq"] is not None else {}
+        files = {
+            "client_audio": ("client.raw", chunk["client"], "application/octet-stream"),
+            "commercial_audio": ("commercial.raw", chunk["commercial"], "application/octet-stream"),
+        }
+        start = time.perf_counter()
+        response = await client.post(f"/audio/{call_id}", files=files, headers=headers)
+        replayed_seconds.append(time.perf_counter() - start)
+
+        body = response.json() if response.status_code == 200 else {}
+        outcome = _outcome(body) if response.status_code == 200 else f"http_{response.status_code}"
+        title = (body.get("advice") or {}).get("title")
+        outcomes["replayed"][outcome] += 1
+
+        captured = chunk["result"]
+        if captured is None:
+            continue
+        outcomes["captured"][captured["outcome"]] += 1
+        captured_seconds.append(captured["seconds"])
+        if (captured["outcome"], captured["title"]) != (outcome, title):
+            diffs.append({
+                "chunk": index, "seq": chunk["seq"],
+                "captured": {"outcome": captured["outcome"], "title": captured["title"]},
+                "replayed": {"outcome": outcome, "title": title},
+            })
+
+    return {
+        "capture": str(session.path),
+        "chunks": len(session.chunks),
+        "outcomes": {key: dict(value) for key, value in outcomes.items()},
+        "diffs": diffs,
+        "responses": dict(session.responses.stats),
+        "request": {
+            "captured": _summary(captured_seconds) if captured_seconds else None,
+            "replayed": _summary(replayed_seconds) if replayed_seconds else None,
+        },
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    logging.disable(logging.NOTSET if args.verbose else logging.INFO)
+
+    import api.audio as audio_module
+    from main import app
+
+    metrics = RecordingMetrics()
+    transcription = ReplayTranscriptionService(args.api_latency)
+    llm = ReplayLLMScheduler(args.api_latency)
+    metrics_module._metrics = metrics
+    llm_scheduler_module._llm_scheduler = llm
+    audio_module._transcription_service = transcription
+    VirtualClock.install()
+
+    if not args.no_embeddings:
+        # Comme en production (préchargé au démarrage) : pas de repli textuel de l'anti-doublon
+        from services.duplicate_detector import warm_up_embedding_model
+        await asyncio.to_thread(warm_up_embedding_model)
+
+    sessions = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://replay", timeout=None) as client:
+        for path in args.captures:
+            sessions.append(await replay_session(client, CapturedSession(path), transcription, llm))
+
+    return {
+        "sessions": sessions,
+        "stages": {stage: _summary(values) for stage, values in sorted(metrics.stages.values.items())},
+    }
+
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> None:
+    for session in report["sessions"]:
+        print(f"\n{'='*80}")
+        print(f"🔁 REJEU {session['capture']} - {session['chunks']} chunks")
+        print(f"{'='*80}")
+        captured, replayed = session["outcomes"]["captured"], session["outcomes"]["replayed"]
+        print(f"{'Issue':<20}{'capturé':>10}{'rejoué':>10}")
+        for outcome in sorted(set(captured) | set(replayed)):
+            print(f"{outcome:<20}{captured.get(outcome, 0):>10}{replayed.get(outcome, 0):>10}")
+
+        print(f"\nChunks dont l'issue diffère : {len(session['diffs'])}")
+        for diff in session["diffs"]:
+            before, after = diff["captured"], diff["replayed"]
+            print(
+                f"  #{diff['chunk']:<4} seq={diff['seq']}  {before['outcome']} {before['title'] or ''}"
+                f"  →  {after['outcome']} {after['title'] or ''}"
+            )
+
+        print(f"\nRéponses capturées utilisées : {session['responses']}")
+        for label, row in session["request"].items():
+            if row:
+                print(f"Durée /audio {label:<9}: p50 {row['p50_ms']} ms, p95 {row['p95_ms']} ms")
+
+    stages = report["stages"]
+    before = (baseline or {}).get("stages", {})
+    print(f"\n{'Étape':<18}{'count':>7}{'moy ms':>10}{'p50 ms':>10}{'p95 ms':>10}" + (f"{'Δ moy':>10}" if before else ""))
+    for stage, row in stages.items():
+        line = f"{stage:<18}{row['count']:>7}{row['mean_ms']:>10}{row['p50_ms']:>10}{row['p95_ms']:>10}"
+        if stage in before:
+            line += f"{row['mean_ms'] - before[stage]['mean_ms']:>+10.2f}"
+        print(line)
+    print()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Rejeu de sessions capturées (CAPTURE_DIR)")
+    parser.add_argument("captures", type=Path, nargs="+", help="Fichiers .kcap")
+    parser.add_argument("--api-latency", action="store_true", help="Rejouer la durée capturée des appels API")
+    parser.add_argument("--no-embeddings", action="store_true", help="Ne pas précharger le modèle d'embeddings")
+    parser.add_argument("--json", type=Path, help="Écrire le rapport JSON dans ce fichier")
+    parser.add_argument("--baseline", type=Path, help="Rapport JSON précédent (durées par étape comparées)")
+    parser.add_argument("--verbose", action="store_true", help="Afficher les logs INFO du backend")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8")) if args.baseline else None
+    print_report(report, baseline)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
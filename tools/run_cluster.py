@@ -0,0 +1,98 @@
+"""
+Lance un cluster local de N nœuds backend (un process uvicorn par nœud)
+
+Chaque nœud reçoit NODE_ID=node-{i} et la même liste CLUSTER_NODES ; les requêtes de session
+reçues par un nœud qui ne détient pas la session sont relayées vers son propriétaire.
+
+Usage:
+    python -m tools.run_cluster --nodes 3 --base-port 8000            # jusqu'à Ctrl-C
+    python -m tools.run_cluster --nodes 3 --base-port 8000 --check    # vérifie le routage puis s'arrête
+
+--check démarre une session sur chaque nœud puis l'interroge via tous les nœuds : la réponse
+doit toujours venir du nœud créateur (en-tête X-Kitt-Node).
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+
+def start_nodes(count: int, host: str, base_port: int, extra_args: List[str]) -> Dict[str, subprocess.Popen]:
+    urls = {f"node-{i}": f"http://{host}:{base_port + i}" for i in range(count)}
+    cluster_nodes = ",".join(f"{node}={url}" for node, url in urls.items())
+    processes = {}
+    for i, node in enumerate(urls):
+        env = dict(os.environ, NODE_ID=node, CLUSTER_NODES=cluster_nodes)
+        processes[node] = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", host, "--port", str(base_port + i), *extra_args],
+            env=env
+        )
+    return processes
+
+
+def wait_ready(urls: List[str], timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    for url in urls:
+        while True:
+            try:
+                if httpx.get(f"{url}/ready", timeout=2).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{url} ne répond pas")
+            time.sleep(0.2)
+
+
+def check_routing(urls: Dict[str, str]) -> bool:
+    """Chaque session, interrogée via chaque nœud, doit être servie par son créateur"""
+    ok = True
+    with httpx.Client(timeout=30) as client:
+        for creator, creator_url in urls.items():
+            call_id = client.post(f"{creator_url}/calls/start").json()["call_id"]
+            for entry, entry_url in urls.items():
+                response = client.get(f"{entry_url}/calls/{call_id}/state")
+                served_by = response.headers.get("x-kitt-node")
+                good = response.status_code == 200 and served_by == creator
+                ok &= good
+                print(f"{'✅' if good else '❌'} {call_id[:18]:<18} via {entry:<8} → {served_by} ({response.status_code})")
+            client.post(f"{creator_url}/calls/{call_id}/end")
+    return ok
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Cluster local de nœuds KITT")
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--base-port", type=int, default=8000)
+    parser.add_argument("--check", action="store_true", help="Vérifier le routage puis arrêter le cluster")
+    args, uvicorn_args = parser.parse_known_args(argv)
+
+    processes = start_nodes(args.nodes, args.host, args.base_port, uvicorn_args)
+    urls = {f"node-{i}": f"http://{args.host}:{args.base_port + i}" for i in range(args.nodes)}
+    exit_code = 0
+    try:
+        wait_ready(list(urls.values()))
+        print(f"🕸️ Cluster prêt: {', '.join(f'{n}={u}' for n, u in urls.items())}")
+        if args.check:
+            exit_code = 0 if check_routing(urls) else 1
+        else:
+            for process in processes.values():
+                process.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes.values():
+            process.send_signal(signal.SIGTERM)
+        for process in processes.values():
+            process.wait()
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Lancement multi-workers avec modèle d'embeddings préchargé avant le fork
+
+Le process parent importe l'application et charge les poids du modèle, puis fork les
+workers uvicorn : les pages du modèle sont partagées en copy-on-write par tous les workers
+au lieu d'être dupliquées N fois.
+
+- gc.freeze() juste avant le fork : le GC des workers ne parcourt plus (et donc ne
+  réécrit plus) les objets hérités du parent, ce qui préserve le partage des pages
+- le parent ne fait AUCUNE inférence : les pools de threads (OpenMP / ONNX Runtime)
+  ne survivent pas à un fork, chaque worker fait son propre premier encodage au démarrage
+
+/metrics : METRICS_MULTIPROCESS_DIR (dossier temporaire par défaut, vidé au lancement) est
+partagé par les workers, qui y écrivent leurs compteurs : chaque worker répond avec la somme.
+
+Alternative sans fork : EMBEDDING_BACKEND=sidecar + `python -m services.embedding_sidecar`.
+
+Usage:
+    python -m tools.serve_prefork --workers 4 --port 8000
+"""
+import argparse
+import gc
+import logging
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def preload() -> None:
+    """Importe l'application et charge les poids du modèle dans le parent"""
+    import main  # noqa: F401  (routers, services, settings)
+    from services.duplicate_detector import get_embedding_model
+
+    start = time.perf_counter()
+    get_embedding_model()
+    logger.info(f"✅ Modèle d'embeddings chargé dans le parent en {time.perf_counter() - start:.1f}s")
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock: socket.socket, log_level: str) -> None:
+    """
+    Boucle uvicorn d'un worker sur la socket héritée du parent
+
+    Le pipeline de logs (importé avec main) a relancé son thread d'écriture dans ce process
+    au fork ; il est vidé ici car le worker sort par os._exit (pas d'atexit).
+    """
+    import uvicorn
+    from main import app
+    from config.log_pipeline import stop_log_pipeline
+
+    config = uvicorn.Config(app, log_level=log_level, lifespan="on")
+    try:
+        uvicorn.Server(config).run(sockets=[sock])
+    finally:
+        stop_log_pipeline()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Workers uvicorn forkés après préchargement du modèle")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    # Avant l'import de config.settings : lu par chaque worker pour agréger /metrics
+    metrics_dir = os.environ.get("METRICS_MULTIPROCESS_DIR")
+    created_dir = not metrics_dir
+    if created_dir:
+        metrics_dir = os.environ["METRICS_MULTIPROCESS_DIR"] = tempfile.mkdtemp(prefix="kitt-metrics-")
+    from services.metrics import reset_multiprocess_dir
+    reset_multiprocess_dir(metrics_dir)
+
+    # Logs configurés par l'import de main (pipeline à file, relancé dans chaque worker forké)
+    preload()
+    sock = bind_socket(args.host, args.port)
+
+    gc.collect()
+    gc.freeze()
+
+    children = []
+    for _ in range(args.workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(sock, args.log_level)
+            finally:
+                os._exit(0)
+        children.append(pid)
+
+    logger.info(f"🚀 {args.workers} workers démarrés sur {args.host}:{args.port} (pids: {children})")
+
+    def _terminate(signum, frame):
+        for child in children:
+            try:
+                os.kill(child, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, _terminate)
+    signal.signal(signal.SIGINT, _terminate)
+
+    for child in children:
+        try:
+            os.waitpid(child, 0)
+        except ChildProcessError:
+            pass
+    if created_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()